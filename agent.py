@@ -1,14 +1,83 @@
+import time
+
+# Referencia para --profile-startup: todo se mide desde aquí
+_PROCESS_START = time.perf_counter()
+
+import argparse
+import atexit
+import concurrent.futures
+import contextlib
 import os
+import signal
+import sys
+import threading
 import typing
-import dotenv
-import openai
-import logfire
 from datetime import date
-from typing import Union
+from typing import Annotated, Literal, Union
+
+# logfire registra un plugin de pydantic que se carga (importando todo logfire) al
+# definir el primer modelo. No usamos logfire.instrument_pydantic(), así que lo
+# desactivamos para que definir las herramientas no arrastre esa importación.
+os.environ.setdefault('PYDANTIC_DISABLE_PLUGINS', 'logfire-plugin')
+
 from pydantic import BaseModel, Field
-from pydantic_ai import Agent
+from src.daemon import AgentDaemon, default_socket_path, run_client
 from src.logseq_manager import LogseqManager
 
+# openai, logfire, pydantic_ai y dotenv se importan de forma diferida: el cliente
+# ligero (--connect) y LogseqManager no los necesitan, y en el modo interactivo
+# se cargan en un hilo de fondo mientras el usuario escribe su primer comando.
+if typing.TYPE_CHECKING:
+    import httpx
+    from pydantic_ai import Agent
+    from pydantic_ai.models import Model
+    from src.http_client import AgentEventLoop
+    from src.metrics import MetricsRegistry
+
+_IMPORT_DONE = time.perf_counter()
+
+
+class StartupProfiler:
+    """
+    Mide la duración de cada fase del arranque para --profile-startup.
+    
+    Las fases pueden registrarse desde varios hilos (la carga del agente ocurre
+    en segundo plano), por eso cada entrada guarda también el hilo que la ejecutó.
+    """
+
+    def __init__(self, enabled: bool = False) -> None:
+        self.enabled = enabled
+        self.phases: list[tuple[str, str, float, float]] = []
+        self._lock = threading.Lock()
+        self.record("import agent.py (pydantic, src)", _PROCESS_START, _IMPORT_DONE)
+
+    def record(self, name: str, start: float, end: float) -> None:
+        """Registra una fase ya medida (tiempos de time.perf_counter())."""
+        with self._lock:
+            self.phases.append((name, threading.current_thread().name, start - _PROCESS_START, end - start))
+
+    @contextlib.contextmanager
+    def phase(self, name: str) -> typing.Iterator[None]:
+        """Mide el bloque de código envuelto como una fase del arranque."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, start, time.perf_counter())
+
+    def report(self) -> str:
+        """Devuelve una tabla con las fases ordenadas por su instante de inicio."""
+        lines = [
+            "⏱️  Perfil de arranque (ms desde el inicio del proceso):",
+            f"   {'Fase':<44}{'Hilo':<16}{'Inicio':>9}{'Duración':>10}",
+        ]
+        with self._lock:
+            phases = sorted(self.phases, key=lambda phase: phase[2])
+        for name, thread_name, offset, duration in phases:
+            lines.append(f"   {name:<44}{thread_name:<16}{offset * 1000:>9.1f}{duration * 1000:>10.1f}")
+        lines.append(f"   {'Total':<60}{(time.perf_counter() - _PROCESS_START) * 1000:>19.1f}")
+        return "\n".join(lines)
+
 
 class AppendToPage(BaseModel):
     """
@@ -17,6 +86,7 @@ class AppendToPage(BaseModel):
     Esta herramienta permite al agente de IA añadir contenido como bloques (bullets) 
     al final de páginas existentes o crear páginas nuevas si no existen.
     """
+    tool: Literal["AppendToPage"] = Field("AppendToPage", description="Identificador de la herramienta.")
     page_title: str = Field(
         ..., 
         description="El título de la página a la que se añadirá el contenido. Ej: 'Tareas', 'Ideas/Proyecto Secreto'"
@@ -27,30 +97,134 @@ class AppendToPage(BaseModel):
     )
 
 
+class AddNestedBlock(BaseModel):
+    """
+    Herramienta para añadir un bloque ANIDADO bajo otro bloque de una página (o justo detrás de él).
+    """
+    tool: Literal["AddNestedBlock"] = Field("AddNestedBlock", description="Identificador de la herramienta.")
+    page_title: str = Field(
+        ...,
+        description="El título de la página. Ej: 'Proyectos/Apolo'"
+    )
+    parent_block: str = Field(
+        ...,
+        description="El contenido exacto del bloque bajo el que se añade, sin el prefijo '- '. Ej: 'Fase 1'"
+    )
+    content: str = Field(
+        ...,
+        description="El texto del bloque nuevo. Ej: 'Revisar el diseño'"
+    )
+    as_sibling: bool = Field(
+        False,
+        description="Si es True, el bloque se añade al mismo nivel, justo después de parent_block y sus hijos, en lugar de como hijo."
+    )
+
+
 class ReadPageContent(BaseModel):
     """
     Herramienta para leer y recuperar el contenido completo de una página de Logseq.
     """
+    tool: Literal["ReadPageContent"] = Field("ReadPageContent", description="Identificador de la herramienta.")
     page_title: str = Field(
         ..., 
         description="El título de la página que se debe leer. Ej: 'Tareas'"
     )
+    first_blocks: typing.Optional[int] = Field(
+        None,
+        description="Si el usuario pide solo el principio de la página, cuántos bloques leer desde el inicio. Ej: 'los 5 primeros' → 5"
+    )
+    last_blocks: typing.Optional[int] = Field(
+        None,
+        description="Si el usuario pide solo lo último o lo más reciente de la página, cuántos bloques leer desde el final. Ej: 'las últimas 10 entradas' → 10"
+    )
+
+
+class ListPages(BaseModel):
+    """
+    Herramienta para LISTAR las páginas de un espacio de nombres (ej: 'Proyectos/...').
+    """
+    tool: Literal["ListPages"] = Field("ListPages", description="Identificador de la herramienta.")
+    namespace: str = Field(
+        "",
+        description="Espacio de nombres cuyas páginas listar, sin '/' final. Vacío para las páginas de primer nivel. Ej: 'Proyectos', 'Ideas/IA'"
+    )
+
+
+class RenamePage(BaseModel):
+    """
+    Herramienta para CAMBIAR EL NOMBRE de una página, actualizando todos los enlaces a ella.
+    """
+    tool: Literal["RenamePage"] = Field("RenamePage", description="Identificador de la herramienta.")
+    old_title: str = Field(
+        ...,
+        description="El título actual de la página. Ej: 'Apolo'"
+    )
+    new_title: str = Field(
+        ...,
+        description="El título nuevo de la página. Ej: 'Proyecto Apolo'"
+    )
 
 
 class SearchInPages(BaseModel):
     """
-    Herramienta para buscar un término en TODAS las páginas de Logseq.
+    Herramienta para buscar un término en TODAS las páginas y diarios de Logseq.
     """
+    tool: Literal["SearchInPages"] = Field("SearchInPages", description="Identificador de la herramienta.")
     query: str = Field(
         ..., 
         description="El término de búsqueda. Ej: 'Inteligencia Artificial', 'receta de cocina'"
     )
+    boolean: bool = Field(
+        False,
+        description="True si la consulta combina términos con AND, OR, NOT o busca una frase exacta entre comillas. Ej: 'python AND agente NOT borrador', '\"proyecto apolo\"'"
+    )
+    date_from: typing.Optional[str] = Field(
+        None,
+        description="Si el usuario acota la búsqueda a un periodo, primer día (incluido) en formato YYYY-MM-DD. Con fechas solo se buscan los diarios. Ej: 'la semana pasada', 'desde marzo'"
+    )
+    date_to: typing.Optional[str] = Field(
+        None,
+        description="Último día (incluido) del periodo en formato YYYY-MM-DD. Ej: 'hasta ayer', 'en enero' → el 31 de enero"
+    )
+
+
+class SemanticSearch(BaseModel):
+    """
+    Herramienta para encontrar los BLOQUES más relacionados con un tema, aunque no
+    contengan las palabras exactas (búsqueda semántica local sobre todo el grafo).
+    """
+    tool: Literal["SemanticSearch"] = Field("SemanticSearch", description="Identificador de la herramienta.")
+    query: str = Field(
+        ...,
+        description="Tema o pregunta en lenguaje natural. Ej: 'ideas para organizar reuniones'"
+    )
+    top_k: int = Field(
+        5,
+        ge=1,
+        le=20,
+        description="Número de bloques a devolver (por defecto 5)"
+    )
+
+
+class AnswerFromNotes(BaseModel):
+    """
+    Herramienta para RESPONDER una pregunta usando el contenido de las notas del grafo.
+    
+    El agente no lee páginas enteras: se reúnen solo los bloques relevantes dentro de
+    un presupuesto de tokens y se responde a partir de ellos.
+    """
+    tool: Literal["AnswerFromNotes"] = Field("AnswerFromNotes", description="Identificador de la herramienta.")
+    question: str = Field(
+        ...,
+        description="La pregunta del usuario, conservando los enlaces [[Página]] que mencione. Ej: '¿Qué decidimos en la reunión de [[Proyecto Apolo]]?'"
+    )
 
 
 class CreateTask(BaseModel):
     """
     Herramienta para crear una nueva tarea (TODO) en una página de Logseq.
     """
+    tool: Literal["CreateTask"] = Field("CreateTask", description="Identificador de la herramienta.")
     page_title: str = Field(
         ..., 
         description="El título de la página donde se creará la tarea. Ej: 'Tareas', 'Proyectos/Mi App'"
@@ -65,6 +239,7 @@ class MarkTaskAsDone(BaseModel):
     """
     Herramienta para marcar una tarea existente como completada (DONE) en una página.
     """
+    tool: Literal["MarkTaskAsDone"] = Field("MarkTaskAsDone", description="Identificador de la herramienta.")
     page_title: str = Field(
         ..., 
         description="El título de la página donde está la tarea a marcar como hecha. Ej: 'Tareas'"
@@ -79,6 +254,7 @@ class SaveToJournal(BaseModel):
     """
     Añade un bloque de contenido al final de la página del diario en una fecha específica.
     """
+    tool: Literal["SaveToJournal"] = Field("SaveToJournal", description="Identificador de la herramienta.")
     content: str = Field(
         ..., 
         description="El contenido a añadir al diario"
@@ -99,6 +275,7 @@ class DeleteBlockFromPage(BaseModel):
     
     Úsala cuando el usuario quiera borrar contenido de una página específica (no un diario).
     """
+    tool: Literal["DeleteBlockFromPage"] = Field("DeleteBlockFromPage", description="Identificador de la herramienta.")
     page_title: str = Field(
         ..., 
         description="El título de la página de la que se eliminará el bloque. Ej: 'Tareas', 'Ideas'"
@@ -115,6 +292,7 @@ class DeleteBlockFromJournal(BaseModel):
     
     Úsala cuando el usuario quiera borrar contenido de su diario (hoy, ayer, una fecha específica).
     """
+    tool: Literal["DeleteBlockFromJournal"] = Field("DeleteBlockFromJournal", description="Identificador de la herramienta.")
     content_to_delete: str = Field(
         ..., 
         description="El contenido exacto del bloque a eliminar, sin el prefijo '-'."
@@ -125,24 +303,69 @@ class DeleteBlockFromJournal(BaseModel):
     )
 
 
-def create_logseq_agent(openai_api_key: str) -> Agent:
+LogseqAction = Union[SaveToJournal, AppendToPage, AddNestedBlock, ReadPageContent, ListPages, RenamePage, SearchInPages, SemanticSearch, AnswerFromNotes, CreateTask, MarkTaskAsDone, DeleteBlockFromPage, DeleteBlockFromJournal]
+
+
+class ActionPlan(BaseModel):
     """
-    Crea un agente de IA específicamente diseñado para trabajar con Logseq.
+    Plan con VARIAS acciones de Logseq pedidas en un mismo mensaje.
+    
+    Permite resolver peticiones compuestas con una sola llamada al LLM; las escrituras
+    se agrupan por archivo y se confirman todas juntas.
+    """
+    actions: list[Annotated[LogseqAction, Field(discriminator="tool")]] = Field(
+        ...,
+        min_length=1,
+        description="Las acciones a ejecutar, una por cada cosa que pide el usuario y en el mismo orden."
+    )
+
+
+def create_openai_model(openai_api_key: str, http_client: typing.Optional["httpx.AsyncClient"] = None) -> "Model":
+    """
+    Crea el modelo de OpenAI con un único proveedor.
     
     Args:
         openai_api_key: Clave de API de OpenAI
+        http_client: Cliente HTTP compartido (ver src.http_client). Si es None, el
+            proveedor usa su propio cliente por defecto.
+    """
+    from pydantic_ai.models.openai import OpenAIChatModel
+    from pydantic_ai.providers.openai import OpenAIProvider
+
+    # Un único proveedor con la clave y el pool de conexiones que le pasamos
+    provider = OpenAIProvider(api_key=openai_api_key, http_client=http_client)
+    return OpenAIChatModel('gpt-4.1-mini', provider=provider)
+
+
+def create_logseq_agent(
+    openai_api_key: typing.Optional[str],
+    http_client: typing.Optional["httpx.AsyncClient"] = None,
+    model: typing.Optional["Model"] = None,
+) -> "Agent":
+    """
+    Crea un agente de IA específicamente diseñado para trabajar con Logseq.
+    
+    Args:
+        openai_api_key: Clave de API de OpenAI (no se usa si se pasa `model`)
+        http_client: Cliente HTTP compartido (ver src.http_client). Si es None, el
+            proveedor usa su propio cliente por defecto.
+        model: Modelo a usar en lugar del de OpenAI (p. ej. un ReplayModel)
         
     Returns:
         Agent: Agente configurado para interpretar comandos y devolver acciones de Logseq
     """
+    from pydantic_ai import Agent
+
+    if model is None:
+        model = create_openai_model(openai_api_key, http_client=http_client)
+
     agent = Agent(
-        'openai:gpt-4.1-mini',
-        output_type=Union[SaveToJournal, AppendToPage, ReadPageContent, SearchInPages, CreateTask, MarkTaskAsDone, DeleteBlockFromPage, DeleteBlockFromJournal],
+        model,
+        output_type=Union[LogseqAction, ActionPlan],
         system_prompt=(
-            f"La fecha de hoy es {date.today().isoformat()}. Úsala como referencia para cualquier cálculo de fechas relativas (ayer, mañana, etc.).\n\n"
             "Eres un asistente de IA especializado en Logseq, un sistema de toma de notas basado en bloques. "
             "Tu tarea es interpretar las solicitudes del usuario y convertirlas en acciones específicas de Logseq.\n\n"
-            "Tienes ocho herramientas disponibles:\n\n"
+            "Tienes trece herramientas disponibles, y ActionPlan para combinarlas:\n\n"
             "1. **SaveToJournal**: Úsala cuando el usuario quiera anotar algo en su DIARIO para cualquier fecha. Es la opción PREFERIDA para cualquier cosa relacionada con \"hoy\", \"ayer\", \"mañana\", \"diario\" o \"anotar rápidamente\".\n"
             "   - 'En mi diario: tuve una gran idea...' → SaveToJournal(content='Tuve una gran idea...')\n"
             "   - 'Anota para hoy la tarea de llamar a Juan' → SaveToJournal(content='Llamar a Juan', is_task=True)\n"
@@ -166,12 +389,21 @@ def create_logseq_agent(openai_api_key: str) -> Agent:
             "   - '¿Qué hay en mis Tareas?' → ReadPageContent(page_title='Tareas')\n"
             "   - 'Muéstrame mis ideas' → ReadPageContent(page_title='Ideas')\n"
             "   - 'Lee mi página de proyectos' → ReadPageContent(page_title='Proyectos')\n"
-            "   - '¿Qué tengo anotado en mi agenda?' → ReadPageContent(page_title='Agenda')\n\n"
+            "   - '¿Qué tengo anotado en mi agenda?' → ReadPageContent(page_title='Agenda')\n"
+            "   - 'Muéstrame lo último de mi Registro' → ReadPageContent(page_title='Registro', last_blocks=10)\n"
+            "   - 'Lee las 5 primeras ideas' → ReadPageContent(page_title='Ideas', first_blocks=5)\n\n"
             "6. **SearchInPages**: Úsala cuando el usuario quiera BUSCAR, ENCONTRAR o preguntar sobre un tema en general a través de TODO el grafo.\n"
             "   - 'Busca mis notas sobre IA' → SearchInPages(query='IA')\n"
             "   - 'Encuentra dónde mencioné el \"Proyecto Apolo\"' → SearchInPages(query='Proyecto Apolo')\n"
             "   - '¿En qué páginas hablo de cocina?' → SearchInPages(query='cocina')\n"
-            "   - 'Busca referencias a Python' → SearchInPages(query='Python')\n\n"
+            "   - 'Busca referencias a Python' → SearchInPages(query='Python')\n"
+            "   - '¿Qué escribí sobre Apolo en enero?' → SearchInPages(query='Apolo', date_from='2025-01-01', date_to='2025-01-31') (asumiendo que estamos en 2025)\n"
+            "   - Si combina condiciones (y, o, sin) o pide una frase exacta, usa boolean=True con AND, OR, NOT y comillas:\n"
+            "     'Notas que hablen de python y del agente pero no sean borradores' → SearchInPages(query='python AND agente NOT borrador', boolean=True)\n"
+            "     'Busca exactamente \"proyecto apolo\"' → SearchInPages(query='\"proyecto apolo\"', boolean=True)\n"
+            "   - Si el usuario busca por TEMA o IDEA (no por una palabra exacta) o quiere los BLOQUES relacionados, usa **SemanticSearch** en su lugar:\n"
+            "     '¿Qué he anotado sobre cómo llevar mejor las reuniones?' → SemanticSearch(query='cómo llevar mejor las reuniones')\n"
+            "     'Dame las 10 notas más relacionadas con productividad' → SemanticSearch(query='productividad', top_k=10)\n\n"
             "7. **DeleteBlockFromPage**: Úsala para BORRAR un bloque de una PÁGINA ESPECÍFICA (no un diario).\n"
             "   - 'En mi página de Ideas, borra la nota sobre X' → DeleteBlockFromPage(page_title='Ideas', content_to_delete='nota sobre X')\n"
             "   - 'Elimina la tarea completada de comprar pan' → DeleteBlockFromPage(page_title='Tareas', content_to_delete='DONE Comprar pan')\n"
@@ -182,13 +414,35 @@ def create_logseq_agent(openai_api_key: str) -> Agent:
             "   - 'Elimina la nota de ayer sobre Y' → DeleteBlockFromJournal(content_to_delete='nota sobre Y', target_date='2025-06-29')\n"
             "   - 'Quita esa tarea del diario de mañana' → DeleteBlockFromJournal(content_to_delete='tarea...', target_date='2025-07-01')\n"
             "   - 'Borra la entrada del diario del 5 de julio' → DeleteBlockFromJournal(content_to_delete='entrada...', target_date='2025-07-05')\n\n"
+            "9. **AnswerFromNotes**: Úsala cuando el usuario haga una PREGUNTA cuya respuesta está en sus notas y quiera una RESPUESTA, no una lista de páginas o bloques.\n"
+            "   - '¿Qué decidimos sobre el lanzamiento del Proyecto Apolo?' → AnswerFromNotes(question='¿Qué decidimos sobre el lanzamiento del Proyecto Apolo?')\n"
+            "   - 'Resume lo que tengo en [[Ideas]] sobre productividad' → AnswerFromNotes(question='Resume lo que tengo en [[Ideas]] sobre productividad')\n"
+            "   - '¿Qué hice esta semana?' → AnswerFromNotes(question='¿Qué hice esta semana?')\n\n"
+            "10. **ListPages**: Úsala cuando el usuario quiera saber QUÉ PÁGINAS tiene, en general o dentro de un espacio de nombres.\n"
+            "   - '¿Qué proyectos tengo?' → ListPages(namespace='Proyectos')\n"
+            "   - 'Lista las páginas de Ideas/IA' → ListPages(namespace='Ideas/IA')\n"
+            "   - '¿Qué páginas hay en mi grafo?' → ListPages(namespace='')\n\n"
+            "11. **RenamePage**: Úsala cuando el usuario quiera CAMBIAR EL NOMBRE de una página. Los enlaces [[...]] y #etiquetas a ella se actualizan solos.\n"
+            "   - 'Renombra la página Apolo a Proyecto Apolo' → RenamePage(old_title='Apolo', new_title='Proyecto Apolo')\n\n"
+            "12. **AddNestedBlock**: Úsala cuando el usuario quiera añadir algo DENTRO DE / DEBAJO DE un bloque concreto (un sub-bloque).\n"
+            "   - 'En Proyectos/Apolo, añade Pruebas de carga dentro de Fase 1' → AddNestedBlock(page_title='Proyectos/Apolo', parent_block='Fase 1', content='Pruebas de carga')\n"
+            "   - 'En Apolo, pon Fase 3 justo después de Fase 2' → AddNestedBlock(page_title='Apolo', parent_block='Fase 2', content='Fase 3', as_sibling=True)\n\n"
+            "13. **ActionPlan**: Úsala cuando el usuario pida VARIAS acciones en un mismo mensaje. Pon en `actions` una acción por cada cosa pedida, en orden, usando las herramientas anteriores.\n"
+            "   - 'Añade leche, pan y huevos a Tareas y apunta en el diario que fui al súper' → ActionPlan(actions=[CreateTask(page_title='Tareas', content='Comprar leche'), CreateTask(page_title='Tareas', content='Comprar pan'), CreateTask(page_title='Tareas', content='Comprar huevos'), SaveToJournal(content='Fui al súper')])\n"
+            "   - 'Marca como hecha la tarea de llamar a mamá y borra la reunión de hoy' → ActionPlan(actions=[MarkTaskAsDone(page_title='Tareas', task_content='Llamar a mamá'), DeleteBlockFromJournal(content_to_delete='Reunión')])\n\n"
             "**IMPORTANTE:** Analiza cuidadosamente la intención del usuario:\n"
+            "- Si pide VARIAS acciones en un mismo mensaje → ActionPlan (todas en una sola respuesta)\n"
             "- Si menciona HOY, AYER, MAÑANA, DIARIO, o quiere anotar rápidamente sin especificar página → SaveToJournal\n"
             "- Si quiere crear una TAREA/TODO/PENDIENTE en una página específica → CreateTask\n"
             "- Si quiere MARCAR COMO HECHA/COMPLETAR/FINALIZAR una tarea existente → MarkTaskAsDone\n"
             "- Si quiere AGREGAR/ANOTAR contenido general en una página específica → AppendToPage\n"
+            "- Si quiere añadir algo DENTRO DE / DEBAJO DE un bloque concreto de una página → AddNestedBlock\n"
             "- Si quiere VER/LEER una página específica → ReadPageContent\n"
-            "- Si quiere BUSCAR/ENCONTRAR en todo el grafo → SearchInPages\n"
+            "- Si quiere saber QUÉ PÁGINAS tiene (en general o bajo un espacio de nombres) → ListPages\n"
+            "- Si quiere CAMBIAR EL NOMBRE de una página → RenamePage\n"
+            "- Si quiere BUSCAR/ENCONTRAR un término en todo el grafo → SearchInPages\n"
+            "- Si quiere las notas RELACIONADAS con un tema o idea, aunque no usen esas palabras → SemanticSearch\n"
+            "- Si hace una PREGUNTA sobre el contenido de sus notas y espera una RESPUESTA → AnswerFromNotes\n"
             "- Si quiere BORRAR/ELIMINAR/QUITAR un bloque de una página específica → DeleteBlockFromPage\n"
             "- Si quiere BORRAR/ELIMINAR/QUITAR un bloque del diario (hoy, ayer, fecha específica) → DeleteBlockFromJournal\n"
             "Si el usuario no especifica una página, usa una página lógica basada en el contexto:\n"
@@ -199,25 +453,39 @@ def create_logseq_agent(openai_api_key: str) -> Agent:
             "- Proyectos → 'Proyectos'"
         )
     )
+
+    @agent.system_prompt
+    def current_date() -> str:
+        # Se evalúa en cada ejecución, así un agente de larga duración (modo demonio)
+        # no se queda con la fecha del día en que arrancó
+        return (
+            f"La fecha de hoy es {date.today().isoformat()}. "
+            "Úsala como referencia para cualquier cálculo de fechas relativas (ayer, mañana, etc.)."
+        )
+
     return agent
 
 
-def initialize_agent():
+def initialize_agent(require_api_key: bool = True):
     """
-    Inicializa el agente de IA configurando las conexiones a Logseq y OpenAI.
+    Inicializa la configuración y el gestor de Logseq.
+    
+    Es deliberadamente ligera: no importa openai, logfire ni pydantic_ai. El agente
+    se construye aparte con build_ai_agent (normalmente en segundo plano).
+    
+    Args:
+        require_api_key: Si False, no exige OPENAI_API_KEY (p. ej. al reproducir una grabación)
     
     Returns:
-        tuple: (logseq_manager, openai_client) - Instancias configuradas
+        tuple: (logseq_manager, openai_api_key) - Gestor configurado y clave de OpenAI
         
     Raises:
         ValueError: Si alguna variable de entorno requerida no está definida
     """
     # Cargar variables de entorno desde .env
+    import dotenv
     dotenv.load_dotenv()
     
-    # Configurar Logfire para observabilidad
-    logfire.configure()
-    
     # Obtener variables de entorno requeridas
     graph_path = os.getenv('LOGSEQ_GRAPH_PATH')
     openai_api_key = os.getenv('OPENAI_API_KEY')
@@ -230,23 +498,99 @@ def initialize_agent():
             "   LOGSEQ_GRAPH_PATH=/ruta/a/tu/grafo/de/logseq"
         )
     
-    if not openai_api_key:
+    if not openai_api_key and require_api_key:
         raise ValueError(
             "❌ ERROR: Variable de entorno OPENAI_API_KEY no encontrada.\n"
             "   Por favor, asegúrate de tener un archivo .env con:\n"
             "   OPENAI_API_KEY=tu_clave_de_openai"
         )
     
-    # Instanciar el cliente de OpenAI
-    openai_client = openai.OpenAI(api_key=openai_api_key)
+    # Instanciar nuestro gestor de Logseq (LOGSEQ_SEARCH_INDEX=sqlite activa el índice
+    # FTS5; LOGSEQ_SEARCH_INDEX=trigram, el índice de trigramas en memoria)
+    search_index = os.getenv('LOGSEQ_SEARCH_INDEX', '').strip().lower()
+    if search_index not in ('', 'sqlite', 'trigram'):
+        raise ValueError(f"❌ ERROR: LOGSEQ_SEARCH_INDEX debe ser 'sqlite', 'trigram' o estar vacía (valor: {search_index!r})")
+    logseq_manager = LogseqManager(graph_path=graph_path, sqlite_index=search_index == 'sqlite')
+    if search_index == 'trigram':
+        logseq_manager.enable_trigram_index()
+    
+    # Las escrituras del agente se pueden revertir con "deshacer"
+    logseq_manager.enable_undo_log()
+    
+    # LOGSEQ_CONTEXT_TOKENS acota el contexto de notas de AnswerFromNotes
+    context_tokens = os.getenv('LOGSEQ_CONTEXT_TOKENS', '').strip()
+    if context_tokens:
+        if not context_tokens.isdigit() or int(context_tokens) <= 0:
+            raise ValueError(f"❌ ERROR: LOGSEQ_CONTEXT_TOKENS debe ser un número entero positivo (valor: {context_tokens!r})")
+        logseq_manager.context_token_budget = int(context_tokens)
+    
+    return logseq_manager, openai_api_key
+
+
+def build_ai_agent(
+    openai_api_key: typing.Optional[str],
+    profiler: typing.Optional[StartupProfiler] = None,
+    record_path: typing.Optional[str] = None,
+    replay_path: typing.Optional[str] = None,
+) -> "Agent":
+    """
+    Importa las dependencias pesadas, configura Logfire y crea el agente.
+    
+    Args:
+        openai_api_key: Clave de API de OpenAI
+        profiler: Perfilador de arranque donde registrar cada fase
+        record_path: Si se indica, graba cada llamada al modelo en este archivo JSONL
+        replay_path: Si se indica, sirve las respuestas grabadas en este archivo (sin red)
+        
+    Returns:
+        Agent: Agente listo para interpretar comandos
+    """
+    profiler = profiler or StartupProfiler()
+    
+    with profiler.phase("import logfire"):
+        import logfire
+    with profiler.phase("import pydantic_ai"):
+        import pydantic_ai  # noqa: F401
+    
+    # Configurar Logfire para observabilidad
+    with profiler.phase("logfire.configure()"):
+        logfire.configure()
     
     # Instrumentar PydanticAI con Logfire para observabilidad completa
-    logfire.instrument_pydantic_ai()
+    with profiler.phase("logfire.instrument_pydantic_ai()"):
+        logfire.instrument_pydantic_ai()
+    
+    # Reproducción: ni red ni cliente HTTP, solo las respuestas grabadas
+    if replay_path:
+        with profiler.phase("ReplayModel.from_file()"):
+            from src.model_recording import ReplayModel
+            model = ReplayModel.from_file(replay_path)
+        with profiler.phase("create_logseq_agent()"):
+            return create_logseq_agent(None, model=model)
     
-    # Instanciar nuestro gestor de Logseq
-    logseq_manager = LogseqManager(graph_path=graph_path)
+    # Un solo cliente HTTP con keep-alive para todas las llamadas al modelo
+    with profiler.phase("create_http_client()"):
+        from src.http_client import create_http_client
+        http_client = create_http_client()
     
-    return logseq_manager, openai_client
+    with profiler.phase("create_logseq_agent()"):
+        model = create_openai_model(openai_api_key, http_client=http_client)
+        if record_path:
+            from src.model_recording import RecordingModel
+            model = RecordingModel(model, record_path)
+        return create_logseq_agent(openai_api_key, model=model)
+
+
+def load_agent_in_background(openai_api_key: typing.Optional[str], profiler: StartupProfiler, **options) -> concurrent.futures.Future:
+    """
+    Lanza build_ai_agent en un hilo de fondo y devuelve un Future con el agente.
+    
+    Las opciones adicionales (record_path, replay_path) se pasan a build_ai_agent.
+    """
+    executor = concurrent.futures.ThreadPoolExecutor(max_workers=1, thread_name_prefix="carga-agente")
+    future = executor.submit(build_ai_agent, openai_api_key, profiler, **options)
+    executor.shutdown(wait=False)
+    return future
 
 
 def confirm_action(action_description: str) -> bool:
@@ -264,38 +608,831 @@ def confirm_action(action_description: str) -> bool:
     return response == 's'
 
 
-def main():
+def execute_action(
+    action: BaseModel,
+    logseq_manager: LogseqManager,
+    confirm: typing.Callable[[str], bool] = confirm_action,
+    emit: typing.Callable[[str], None] = print,
+) -> None:
+    """
+    Ejecuta sobre el grafo la acción devuelta por el agente.
+    
+    Args:
+        action: Herramienta (objeto Pydantic) elegida por el agente
+        logseq_manager: Gestor del grafo de Logseq
+        confirm: Función que pide confirmación antes de escribir o borrar
+        emit: Función que muestra los mensajes al usuario
+    """
+    # Verificar que la acción sea de un tipo conocido
+    if isinstance(action, SaveToJournal):
+        # La descripción para la confirmación es más simple aquí
+        action_type = "TAREA" if action.is_task else "NOTA"
+
+        # Manejar la fecha objetivo
+        if action.target_date:
+            # Convertir la cadena YYYY-MM-DD en un objeto date
+            try:
+                target_date_obj = date.fromisoformat(action.target_date)
+                date_description = f"para el {action.target_date}"
+            except ValueError:
+                emit(f"❌ Error: Formato de fecha inválido '{action.target_date}'. Usando fecha de hoy.")
+                target_date_obj = None
+                date_description = "para HOY"
+        else:
+            target_date_obj = None
+            date_description = "para HOY"
+
+        description = f"Añadir {action_type} '{action.content}' al diario {date_description}"
+
+        if confirm(description):
+            logseq_manager.append_to_journal(
+                content=action.content,
+                is_task=action.is_task,
+                target_date=target_date_obj
+            )
+            emit(f"✅ ¡Hecho! Se añadió la anotación al diario {date_description}.")
+        else:
+            emit("❌ Acción cancelada por el usuario.")
+
+    elif isinstance(action, CreateTask):
+        description = f"Crear TAREA '{action.content}' en la página '{action.page_title}'"
+
+        if confirm(description):
+            # Formatear el contenido como una tarea TODO
+            task_content = f"TODO {action.content}"
+            try:
+                logseq_manager.append_to_page(
+                    page_title=action.page_title,
+                    content=task_content
+                )
+            except ValueError as e:
+                emit(str(e))
+                return
+            emit(f"✅ ¡Tarea creada! Se añadió '{task_content}' a la página '{action.page_title}'.")
+        else:
+            emit("❌ Acción cancelada por el usuario.")
+
+    elif isinstance(action, MarkTaskAsDone):
+        description = f"Marcar como HECHA la tarea '{action.task_content}' en la página '{action.page_title}'"
+
+        if confirm(description):
+            emit(f"✅ Marcando tarea como hecha en '{action.page_title}'...")
+
+            # Construir el contenido viejo y nuevo del bloque
+            old_block = f"TODO {action.task_content}"
+            new_block = f"DONE {action.task_content}"
+
+            # Llamar a nuestro nuevo método del manager
+            try:
+                success = logseq_manager.update_block_in_page(
+                    action.page_title,
+                    old_block,
+                    new_block
+                )
+            except ValueError as e:
+                emit(str(e))
+                return
+
+            if success:
+                emit(f"🎉 ¡Tarea completada! Se actualizó '{action.task_content}' en '{action.page_title}'.")
+            else:
+                emit(f"❌ No pude encontrar la tarea 'TODO {action.task_content}' en la página '{action.page_title}'.")
+        else:
+            emit("❌ Acción cancelada por el usuario.")
+
+    elif isinstance(action, AppendToPage):
+        description = f"Añadir CONTENIDO '{action.content}' a la página '{action.page_title}'"
+
+        if confirm(description):
+            # Ejecutar la acción usando nuestro LogseqManager
+            try:
+                logseq_manager.append_to_page(
+                    page_title=action.page_title, 
+                    content=action.content
+                )
+            except ValueError as e:
+                emit(str(e))
+                return
+
+            # Confirmar éxito
+            emit(f"✅ ¡Hecho! Se añadió '{action.content}' a la página '{action.page_title}'.")
+        else:
+            emit("❌ Acción cancelada por el usuario.")
+
+    elif isinstance(action, ReadPageContent):
+        emit(f"🔎 Leyendo el contenido de la página '{action.page_title}'...")
+        # Con un tramo de bloques solo se lee esa parte del archivo, no la página entera
+        try:
+            if action.last_blocks:
+                block_lines = logseq_manager.tail_page(action.page_title, action.last_blocks)
+                content = "\n".join(block_lines or [])
+            elif action.first_blocks:
+                block_lines = logseq_manager.read_page_blocks(action.page_title, 0, action.first_blocks)
+                content = "\n".join(block_lines or [])
+            else:
+                content = logseq_manager.read_page_content(action.page_title)
+        except ValueError as e:
+            emit(str(e))
+            return
+        if content:
+            emit("\n--- Contenido de la Página ---")
+            # Las referencias ((uuid)) se muestran con el texto del bloque citado
+            emit(logseq_manager.resolve_block_references(content))
+            emit("---------------------------\n")
+        else:
+            emit(f"❌ La página '{action.page_title}' no existe o está vacía.")
+            # Sugerir títulos existentes que empiezan igual (sin tocar el disco)
+            suggestions = [title for title in logseq_manager.complete_page_title(action.page_title, limit=5) if title != action.page_title]
+            if suggestions:
+                emit(f"💡 ¿Quizás quisiste decir: {', '.join(suggestions)}?")
+
+    elif isinstance(action, ListPages):
+        label = f"'{action.namespace}'" if action.namespace else "el nivel superior"
+        children = logseq_manager.list_namespace(action.namespace)
+        if children:
+            emit(f"📂 Páginas en {label}:")
+            for page_title, page_count in children:
+                emit(f"  - {page_title}" + (f" ({page_count} páginas)" if page_count > 1 else ""))
+        else:
+            emit(f"❌ No hay páginas en {label}.")
+
+    elif isinstance(action, AddNestedBlock):
+        where = "después de" if action.as_sibling else "dentro de"
+        description = f"Añadir el bloque '{action.content}' {where} '{action.parent_block}' en la página '{action.page_title}'"
+        
+        if confirm(description):
+            try:
+                success = logseq_manager.add_nested_block(
+                    action.page_title,
+                    action.parent_block,
+                    action.content,
+                    position="sibling" if action.as_sibling else "child",
+                )
+            except ValueError as e:
+                emit(str(e))
+                return
+            if success:
+                emit(f"✅ ¡Hecho! Se añadió '{action.content}' {where} '{action.parent_block}'.")
+            else:
+                emit(f"❌ No encontré el bloque '{action.parent_block}' en la página '{action.page_title}'.")
+        else:
+            emit("❌ Acción cancelada por el usuario.")
+
+    elif isinstance(action, RenamePage):
+        description = f"Renombrar la página '{action.old_title}' a '{action.new_title}' y actualizar los enlaces a ella"
+        
+        # Reescribe todas las páginas y diarios que la enlazan: pedir confirmación
+        if confirm(description):
+            try:
+                result = logseq_manager.rename_page(action.old_title, action.new_title)
+            except ValueError as e:
+                emit(str(e))
+                return
+            emit(f"✅ ¡Hecho! La página '{action.old_title}' ahora se llama '{result.title}'.")
+            if result.updated:
+                emit(f"🔗 Actualicé {result.references} enlaces en: {', '.join(result.updated)}")
+        else:
+            emit("❌ Acción cancelada por el usuario.")
+
+    elif isinstance(action, SearchInPages) and action.boolean:
+        emit(f"🔎 Buscando páginas y diarios que cumplan '{action.query}'...")
+        try:
+            results = logseq_manager.boolean_search(action.query)
+        except ValueError as e:
+            emit(str(e))
+            return
+        if results:
+            emit(f"✅ La cumplen {len(results)} páginas o diarios:")
+            for page_title in results:
+                emit(f"  - {page_title}")
+        else:
+            emit(f"❌ Ninguna página ni diario cumple '{action.query}'.")
+
+    elif isinstance(action, SearchInPages):
+        try:
+            date_from = date.fromisoformat(action.date_from) if action.date_from else None
+            date_to = date.fromisoformat(action.date_to) if action.date_to else None
+        except ValueError:
+            emit(f"❌ Error: Formato de fecha inválido en el periodo '{action.date_from}' - '{action.date_to}'.")
+            return
+        # Las páginas no tienen fecha: un periodo se refiere a los diarios
+        dated = date_from is not None or date_to is not None
+        if dated:
+            emit(f"🔎 Buscando '{action.query}' en los diarios del {action.date_from or 'principio'} al {action.date_to or 'final'}...")
+        else:
+            emit(f"🔎 Buscando '{action.query}' en todas las páginas y diarios...")
+        try:
+            results = logseq_manager.search_graph(action.query, include_pages=not dated, date_from=date_from, date_to=date_to)
+        except ValueError as e:
+            emit(str(e))
+            return
+        if results:
+            emit(f"✅ Encontré menciones en {len(results)} páginas o diarios:")
+            for hit in results:
+                emit(f"  - 📅 {hit.date.isoformat()}" if hit.date else f"  - {hit.title}")
+        elif dated:
+            emit(f"❌ No encontré ningún diario de ese periodo que mencione '{action.query}'.")
+        else:
+            # La consulta puede venir con erratas (p. ej. dictada): probar por parecido
+            similar = logseq_manager.fuzzy_search(action.query, limit=5)
+            if similar:
+                emit(f"🔤 No encontré '{action.query}' exactamente, pero sí bloques parecidos:")
+                for page_title, block, score in similar:
+                    emit(f"  - [{page_title}] {block} ({score:.0%})")
+            else:
+                emit(f"❌ No encontré ninguna página que mencione '{action.query}'.")
+
+    elif isinstance(action, SemanticSearch):
+        emit(f"🧠 Buscando bloques relacionados con '{action.query}'...")
+        try:
+            results = logseq_manager.semantic_search(action.query, top_k=action.top_k)
+        except ImportError as e:
+            emit(str(e))
+            return
+        if results:
+            emit(f"✅ Estos son los {len(results)} bloques más relacionados:")
+            for page_title, block, score in results:
+                emit(f"  - [{page_title}] {block} ({score:.2f})")
+        else:
+            emit(f"❌ No encontré ningún bloque relacionado con '{action.query}'.")
+
+    elif isinstance(action, AnswerFromNotes):
+        # Sin modelo a mano (p. ej. dentro de un ActionPlan) se muestra el contexto
+        # reunido; process_command responde la pregunta con answer_from_notes
+        emit(f"📚 Reuniendo notas sobre '{action.question}'...")
+        context = logseq_manager.build_context(action.question)
+        if context.blocks:
+            emit(f"✅ {len(context.blocks)} bloques relevantes (~{context.tokens} tokens):")
+            emit(context.text.rstrip())
+        else:
+            emit(f"❌ No encontré notas relacionadas con '{action.question}'.")
+
+    elif isinstance(action, DeleteBlockFromPage):
+        description = f"Eliminar bloque '{action.content_to_delete}' de la página '{action.page_title}'"
+
+        # ¡ACCIÓN DESTRUCTIVA! Proteger siempre con confirmación.
+        if confirm(description):
+            try:
+                success = logseq_manager.delete_block_from_page(
+                    page_title=action.page_title,
+                    content_to_delete=action.content_to_delete,
+                    is_journal=False
+                )
+            except ValueError as e:
+                emit(str(e))
+                return
+
+            if success:
+                emit(f"🗑️ ¡Bloque eliminado con éxito de la página '{action.page_title}'!")
+            else:
+                emit(f"❌ No pude encontrar el bloque '{action.content_to_delete}' en la página '{action.page_title}'.")
+        else:
+            emit("❌ Acción cancelada por el usuario.")
+
+    elif isinstance(action, DeleteBlockFromJournal):
+
+        # Manejar la fecha objetivo para el diario
+        if action.target_date:
+            # Convertir la cadena YYYY-MM-DD en un objeto date
+            try:
+                target_date_obj = date.fromisoformat(action.target_date)
+                journal_page_title = target_date_obj.strftime("%Y_%m_%d")
+                date_description = f"del diario del {action.target_date}"
+            except ValueError:
+                emit(f"❌ Error: Formato de fecha inválido '{action.target_date}'. Usando fecha de hoy.")
+                target_date_obj = date.today()
+                journal_page_title = target_date_obj.strftime("%Y_%m_%d")
+                date_description = "del diario de HOY"
+        else:
+            target_date_obj = date.today()
+            journal_page_title = target_date_obj.strftime("%Y_%m_%d")
+            date_description = "del diario de HOY"
+
+        description = f"Eliminar bloque '{action.content_to_delete}' {date_description}"
+
+        # ¡ACCIÓN DESTRUCTIVA! Proteger siempre con confirmación.
+        if confirm(description):
+            success = logseq_manager.delete_block_from_page(
+                page_title=journal_page_title,
+                content_to_delete=action.content_to_delete,
+                is_journal=True
+            )
+
+            if success:
+                emit(f"🗑️ ¡Bloque eliminado con éxito {date_description}!")
+            else:
+                emit(f"❌ No pude encontrar el bloque '{action.content_to_delete}' {date_description}.")
+        else:
+            emit("❌ Acción cancelada por el usuario.")
+
+    else:
+        emit("❌ Lo siento, no pude entender ese comando. ¿Podrías reformularlo?")
+        emit("💡 Intenta con algo como: 'Crear tarea: [descripción]', 'Añade [nota] a [página]', '¿Qué hay en [página]?', 'Busca [término]' o 'Elimina [bloque] de [página]'")
+
+
+def _journal_date(target_date: typing.Optional[str], emit: typing.Callable[[str], None]) -> date:
+    """
+    Convierte la fecha YYYY-MM-DD de una acción de diario; usa hoy si falta o es inválida.
+    """
+    if target_date:
+        try:
+            return date.fromisoformat(target_date)
+        except ValueError:
+            emit(f"❌ Error: Formato de fecha inválido '{target_date}'. Usando fecha de hoy.")
+    return date.today()
+
+
+def execute_plan(
+    actions: list[BaseModel],
+    logseq_manager: LogseqManager,
+    confirm: typing.Callable[[str], bool] = confirm_action,
+    emit: typing.Callable[[str], None] = print,
+) -> None:
+    """
+    Ejecuta varias acciones en el orden del plan, agrupando las escrituras por archivo.
+    
+    Las escrituras consecutivas (añadir, crear tareas, marcarlas hechas, eliminar
+    bloques) se agrupan por página o diario, se confirman todas con una sola pregunta y
+    cada archivo se escribe una única vez con LogseqManager.apply_page_batch, con sus
+    operaciones en el orden del plan. Antes de una acción que no se agrupa (lecturas,
+    búsquedas, AddNestedBlock, RenamePage) se escriben los lotes pendientes, para que
+    esa acción vea el efecto de las anteriores.
+    
+    Args:
+        actions: Acciones del ActionPlan devuelto por el agente
+        logseq_manager: Gestor del grafo de Logseq
+        confirm: Función que pide confirmación antes de escribir o borrar
+        emit: Función que muestra los mensajes al usuario
+    """
+    # Una sola acción no necesita agrupación
+    if len(actions) == 1:
+        execute_action(actions[0], logseq_manager, confirm=confirm, emit=emit)
+        return
+    
+    # Escrituras pendientes por archivo: (título, es_diario) → lote
+    batches: dict[tuple[str, bool], dict] = {}
+    
+    def add_to_batch(key: tuple[str, bool], label: str, payload, description: str) -> None:
+        batch = batches.setdefault(key, {"label": label, "operations": []})
+        # Cada operación guarda su payload y su descripción para informar del resultado
+        batch["operations"].append((payload, description))
+    
+    def write_batches() -> None:
+        if not batches:
+            return
+        pending = list(batches.items())
+        batches.clear()
+        
+        # Una única confirmación para todas las escrituras pendientes
+        operation_count = sum(len(batch["operations"]) for _, batch in pending)
+        description_lines = [f"{operation_count} cambios en {len(pending)} archivo(s):"]
+        for _, batch in pending:
+            for _, operation_description in batch["operations"]:
+                description_lines.append(f"      • {operation_description} en {batch['label']}")
+        
+        # ¡Puede incluir ACCIONES DESTRUCTIVAS! Proteger siempre con confirmación.
+        if not confirm("\n".join(description_lines)):
+            emit("❌ Acciones canceladas por el usuario.")
+            return
+        
+        # Una sola lectura y una sola escritura por archivo. Un error en un archivo
+        # (título ambiguo, lock ocupado, conflictos) no impide escribir los demás.
+        for (page_title, is_journal), batch in pending:
+            try:
+                results = logseq_manager.apply_page_batch(
+                    page_title,
+                    operations=[payload for payload, _ in batch["operations"]],
+                    is_journal=is_journal
+                )
+            except (ValueError, RuntimeError, TimeoutError) as e:
+                emit(str(e))
+                emit(f"⏭️ Sin cambios en {batch['label']}; sigo con el resto del plan.")
+                continue
+            for (payload, operation_description), success in zip(batch["operations"], results):
+                if success:
+                    emit(f"✅ {operation_description} en {batch['label']}.")
+                elif isinstance(payload, tuple):
+                    emit(f"❌ No pude encontrar el bloque '{payload[0]}' en {batch['label']}.")
+                else:
+                    emit(f"❌ No pude escribir en {batch['label']}.")
+    
+    for action in actions:
+        if isinstance(action, (ReadPageContent, ListPages, SearchInPages, SemanticSearch, AnswerFromNotes, AddNestedBlock, RenamePage)):
+            # Lecturas, inserciones respecto a otro bloque y renombrados (que llevan su
+            # propia confirmación) no se agrupan: antes se escribe lo pendiente
+            write_batches()
+            execute_action(action, logseq_manager, confirm=confirm, emit=emit)
+        elif isinstance(action, SaveToJournal):
+            journal_date = _journal_date(action.target_date, emit)
+            key = (journal_date.strftime("%Y_%m_%d"), True)
+            block = f"TODO {action.content}" if action.is_task else action.content
+            action_type = "TAREA" if action.is_task else "NOTA"
+            add_to_batch(key, f"el diario del {journal_date.isoformat()}", block, f"Añadir {action_type} '{action.content}'")
+        elif isinstance(action, CreateTask):
+            key = (action.page_title, False)
+            add_to_batch(key, f"la página '{action.page_title}'", f"TODO {action.content}", f"Crear TAREA '{action.content}'")
+        elif isinstance(action, AppendToPage):
+            key = (action.page_title, False)
+            add_to_batch(key, f"la página '{action.page_title}'", action.content, f"Añadir CONTENIDO '{action.content}'")
+        elif isinstance(action, MarkTaskAsDone):
+            key = (action.page_title, False)
+            edit = (f"TODO {action.task_content}", f"DONE {action.task_content}")
+            add_to_batch(key, f"la página '{action.page_title}'", edit, f"Marcar como HECHA la tarea '{action.task_content}'")
+        elif isinstance(action, DeleteBlockFromPage):
+            key = (action.page_title, False)
+            add_to_batch(key, f"la página '{action.page_title}'", (action.content_to_delete, None), f"Eliminar bloque '{action.content_to_delete}'")
+        elif isinstance(action, DeleteBlockFromJournal):
+            journal_date = _journal_date(action.target_date, emit)
+            key = (journal_date.strftime("%Y_%m_%d"), True)
+            add_to_batch(key, f"el diario del {journal_date.isoformat()}", (action.content_to_delete, None), f"Eliminar bloque '{action.content_to_delete}'")
+        else:
+            emit("❌ El plan incluye una acción que no sé ejecutar; la omito.")
+    
+    write_batches()
+
+
+_agent_loop: typing.Optional["AgentEventLoop"] = None
+_agent_loop_lock = threading.Lock()
+
+
+def run_agent(
+    ai_agent: "Agent",
+    prompt: str,
+    metrics: typing.Optional["MetricsRegistry"] = None,
+    agent_name: str = "actions",
+):
+    """
+    Ejecuta el agente sobre un event loop compartido y devuelve su resultado.
+    
+    A diferencia de Agent.run_sync (un loop por hilo), todas las ejecuciones usan el
+    mismo loop, así las conexiones del cliente HTTP compartido se reutilizan también
+    cuando los comandos llegan desde hilos distintos (modo demonio).
+    
+    Args:
+        ai_agent: Agente a ejecutar
+        prompt: Prompt del usuario
+        metrics: Registro donde anotar la latencia, las peticiones y los tokens del modelo
+        agent_name: Etiqueta "agent" de esas métricas ("actions" o "answer")
+    """
+    global _agent_loop
+    from src.http_client import AgentEventLoop
+    
+    with _agent_loop_lock:
+        if _agent_loop is None:
+            _agent_loop = AgentEventLoop()
+    
+    if metrics is None:
+        return _agent_loop.run(ai_agent.run(prompt))
+    
+    latency = metrics.histogram(
+        "logseq_llm_run_seconds", "Duración de cada ejecución del agente (todas sus llamadas al modelo)", ["agent"]
+    )
+    with latency.time(agent_name):
+        result = _agent_loop.run(ai_agent.run(prompt))
+    usage = result.usage
+    metrics.counter("logseq_llm_requests_total", "Peticiones al modelo", ["agent"]).inc(agent_name, amount=usage.requests)
+    tokens = metrics.counter(
+        "logseq_llm_tokens_total",
+        "Tokens del modelo; cache_read son los de entrada servidos desde la caché del proveedor",
+        ["agent", "type"],
+    )
+    tokens.inc(agent_name, "input", amount=usage.input_tokens)
+    tokens.inc(agent_name, "output", amount=usage.output_tokens)
+    tokens.inc(agent_name, "cache_read", amount=usage.cache_read_tokens)
+    return result
+
+
+def create_answer_agent(model: typing.Union[str, "Model"]) -> "Agent":
+    """
+    Crea el agente que responde preguntas a partir de un contexto de notas.
+    
+    Usa el mismo modelo que el agente de acciones, pero devuelve texto libre y solo
+    ve la pregunta y los bloques seleccionados por LogseqManager.build_context.
+    """
+    from pydantic_ai import Agent
+
+    return Agent(
+        model,
+        output_type=str,
+        system_prompt=(
+            "Eres un asistente que responde preguntas sobre las notas de Logseq del usuario. "
+            "Responde en el idioma de la pregunta, de forma breve, usando SOLO la información de las notas "
+            "que se te proporcionan (agrupadas por página bajo '## Título'). "
+            "Si las notas no contienen la respuesta, dilo claramente en lugar de inventarla. "
+            "Cuando sea útil, menciona la página de la que sale cada dato como [[Título]]."
+        ),
+    )
+
+
+def answer_from_notes(
+    action: AnswerFromNotes,
+    ai_agent: "Agent",
+    logseq_manager: LogseqManager,
+    emit: typing.Callable[[str], None] = print,
+) -> None:
+    """
+    Responde una pregunta con el modelo usando solo un contexto acotado de notas.
+    
+    El contexto nunca supera logseq_manager.context_token_budget tokens estimados, así
+    que el tamaño del prompt (y la latencia) no depende del tamaño de las páginas.
+    
+    Args:
+        action: Acción AnswerFromNotes devuelta por el agente
+        ai_agent: Agente de acciones; se reutiliza su modelo
+        logseq_manager: Gestor del grafo de Logseq
+        emit: Función que muestra los mensajes al usuario
+    """
+    emit(f"📚 Reuniendo notas sobre '{action.question}'...")
+    context = logseq_manager.build_context(action.question)
+    if not context.blocks:
+        emit(f"❌ No encontré notas relacionadas con '{action.question}'.")
+        return
+    
+    from src.model_recording import RecordingModel
+    
+    model = ai_agent.model
+    if isinstance(model, RecordingModel):
+        # Al grabar, esta llamada no es un comando del usuario y no debe reproducirse como tal
+        model = model.nested()
+    prompt = f"Notas:\n{context.text}\nPregunta: {action.question}"
+    result = run_agent(create_answer_agent(model), prompt, logseq_manager.metrics, "answer")
+    emit(f"💬 {result.output}")
+    
+    sources = list(dict.fromkeys(block.title for block in context.blocks))
+    emit(f"📎 Fuentes ({len(context.blocks)} bloques, ~{context.tokens} tokens): {', '.join(sources)}")
+
+
+def process_command(
+    prompt: str,
+    ai_agent: "Agent",
+    logseq_manager: LogseqManager,
+    confirm: typing.Callable[[str], bool] = confirm_action,
+    emit: typing.Callable[[str], None] = print,
+) -> None:
+    """
+    Interpreta un comando del usuario con el agente y ejecuta la acción resultante.
+    
+    Args:
+        prompt: Comando en lenguaje natural
+        ai_agent: Agente creado con create_logseq_agent
+        logseq_manager: Gestor del grafo de Logseq
+        confirm: Función que pide confirmación antes de escribir o borrar
+        emit: Función que muestra los mensajes al usuario
+    """
+    metrics = logseq_manager.metrics
+    normalized = prompt.strip().lower()
+    command = "undo" if normalized in ("deshacer", "rehacer") else "llm"
+    latency = metrics.histogram("logseq_agent_command_seconds", "Duración de cada comando del usuario", ["command"])
+    outcome = "error"
+    try:
+        with latency.time(command):
+            if command == "undo":
+                # "deshacer" y "rehacer" no necesitan al modelo
+                undo_last_command(normalized == "rehacer", logseq_manager, confirm=confirm, emit=emit)
+            else:
+                _process_command(prompt, ai_agent, logseq_manager, confirm, emit)
+        outcome = "ok"
+    finally:
+        metrics.counter(
+            "logseq_agent_commands_total", "Comandos del usuario procesados", ["command", "result"]
+        ).inc(command, outcome)
+
+
+def _process_command(
+    prompt: str,
+    ai_agent: "Agent",
+    logseq_manager: LogseqManager,
+    confirm: typing.Callable[[str], bool],
+    emit: typing.Callable[[str], None],
+) -> None:
+    """Cuerpo de process_command para los comandos que interpreta el modelo, sin las métricas."""
+    import logfire
+
+    emit("🤔 Interpretando comando...")
+    with logfire.span("procesando_comando: {prompt}", prompt=prompt):
+        result = run_agent(ai_agent, prompt, logseq_manager.metrics)
+        
+        # Todas las escrituras del comando se deshacen juntas con "deshacer"
+        with logseq_manager.undo_group(prompt):
+            # Un ActionPlan trae varias acciones planificadas en una sola llamada al LLM
+            if isinstance(result.output, ActionPlan):
+                execute_plan(result.output.actions, logseq_manager, confirm=confirm, emit=emit)
+            elif isinstance(result.output, AnswerFromNotes):
+                # Segunda llamada al modelo, con las notas relevantes como contexto
+                answer_from_notes(result.output, ai_agent, logseq_manager, emit=emit)
+            else:
+                execute_action(result.output, logseq_manager, confirm=confirm, emit=emit)
+
+
+def undo_last_command(
+    redo: bool,
+    logseq_manager: LogseqManager,
+    confirm: typing.Callable[[str], bool] = confirm_action,
+    emit: typing.Callable[[str], None] = print,
+) -> None:
+    """
+    Deshace (o rehace, si `redo`) el último comando que escribió en el grafo.
+    
+    Args:
+        redo: Si True, vuelve a aplicar el último comando deshecho
+        logseq_manager: Gestor del grafo de Logseq, con el registro de deshacer activado
+        confirm: Función que pide confirmación antes de escribir
+        emit: Función que muestra los mensajes al usuario
+    """
+    undo_log = logseq_manager.undo_log
+    group = None
+    if undo_log is not None:
+        group = undo_log.peek_redo() if redo else undo_log.peek_undo()
+    if group is None:
+        emit(f"🤷 No hay nada que {'rehacer' if redo else 'deshacer'}.")
+        return
+    
+    verb = "Rehacer" if redo else "Deshacer"
+    if not confirm(f"{verb}: '{group['label']}'"):
+        emit("❌ Acción cancelada por el usuario.")
+        return
+    try:
+        if redo:
+            logseq_manager.redo()
+        else:
+            logseq_manager.undo()
+    except ValueError as e:
+        emit(str(e))
+        return
+    emit(f"↩️ Hecho: {'rehice' if redo else 'deshice'} '{group['label']}'.")
+
+
+def run_daemon(ai_agent: "Agent", logseq_manager: LogseqManager, socket_path: str) -> int:
+    """
+    Sirve comandos por un socket Unix manteniendo el gestor y el agente en memoria.
+    
+    Args:
+        ai_agent: Agente creado con create_logseq_agent
+        logseq_manager: Gestor del grafo de Logseq
+        socket_path: Ruta del socket Unix en el que escuchar
+        
+    Returns:
+        int: Código de salida del proceso
+    """
+    def handle_command(prompt, confirm, emit):
+        process_command(prompt, ai_agent, logseq_manager, confirm=confirm, emit=emit)
+
+    try:
+        server = AgentDaemon(socket_path, handle_command)
+    except (RuntimeError, OSError) as e:
+        print(f"❌ No se pudo iniciar el demonio: {e}")
+        return 1
+
+    # Terminar limpiamente (borrando el socket) también con SIGTERM
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+
+    print(f"🛰️ Demonio escuchando en {socket_path}")
+    print("💡 Conéctate con: python agent.py --connect")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print("👋 Demonio detenido.")
+
+    return 0
+
+
+def parse_args(argv: typing.Optional[list[str]] = None) -> argparse.Namespace:
+    """
+    Analiza los argumentos de línea de comandos.
+    """
+    parser = argparse.ArgumentParser(description="Agente de IA para Logseq")
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument(
+        "--daemon",
+        action="store_true",
+        help="Mantener el agente en memoria y atender comandos por un socket Unix"
+    )
+    mode.add_argument(
+        "--connect",
+        action="store_true",
+        help="Conectarse como cliente ligero a un demonio en ejecución"
+    )
+    parser.add_argument(
+        "--socket",
+        default=None,
+        help="Ruta del socket Unix (por defecto LOGSEQ_AGENT_SOCKET o una ruta por usuario)"
+    )
+    parser.add_argument(
+        "--change-feed",
+        metavar="SOCKET",
+        default=None,
+        help="Publicar los cambios del grafo (propios y externos) como JSON-lines en este socket Unix"
+    )
+    parser.add_argument(
+        "--metrics-port",
+        metavar="PUERTO",
+        type=int,
+        default=None,
+        help="Servir las métricas en formato Prometheus en http://127.0.0.1:PUERTO/metrics"
+    )
+    parser.add_argument(
+        "--metrics-file",
+        metavar="ARCHIVO",
+        default=None,
+        help="Volcar las métricas en formato Prometheus a ARCHIVO tras cada comando y al salir"
+    )
+    parser.add_argument(
+        "--profile-startup",
+        action="store_true",
+        help="Mostrar el tiempo de cada fase del arranque (importaciones y configuración)"
+    )
+    recording = parser.add_mutually_exclusive_group()
+    recording.add_argument(
+        "--record",
+        metavar="ARCHIVO",
+        default=None,
+        help="Grabar cada petición/respuesta del modelo (con su latencia) en un archivo JSONL"
+    )
+    recording.add_argument(
+        "--replay",
+        metavar="ARCHIVO",
+        default=None,
+        help="Responder con las llamadas grabadas en ARCHIVO, sin red ni OPENAI_API_KEY"
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv: typing.Optional[list[str]] = None):
     """
     Punto de entrada principal del agente de IA.
-    Crea un bucle interactivo para procesar comandos del usuario.
+    Crea un bucle interactivo para procesar comandos del usuario, o bien
+    arranca el demonio (--daemon) o el cliente ligero (--connect).
     """
+    args = parse_args(argv)
+    socket_path = args.socket or default_socket_path()
+    
+    # El cliente ligero no necesita inicializar nada: todo vive en el demonio
+    if args.connect:
+        return run_client(socket_path)
+    
+    profiler = StartupProfiler(enabled=args.profile_startup)
+    
     print("🤖 Inicializando Agente de IA para Logseq...")
     print("=" * 50)
     
     try:
-        # Inicializar el agente
-        logseq_manager, openai_client = initialize_agent()
+        # Inicializar la configuración y el gestor (sin dependencias pesadas)
+        with profiler.phase("initialize_agent() (.env, LogseqManager)"):
+            logseq_manager, openai_api_key = initialize_agent(require_api_key=not args.replay)
+        
+        # Cargar openai/logfire/pydantic_ai y crear el agente mientras el usuario lee y escribe
+        agent_future = load_agent_in_background(
+            openai_api_key, profiler, record_path=args.record, replay_path=args.replay
+        )
         
         # Confirmar inicializaciones exitosas
         print(f"✅ LogseqManager inicializado para el grafo en: {logseq_manager.graph_path}")
-        print(f"✅ Cliente de OpenAI inicializado correctamente.")
-        
-        # Crear el agente de IA
-        ai_agent = create_logseq_agent(openai_client.api_key)
-        print(f"🤖 Agente de IA creado y listo para interpretar comandos.")
-        print(f"🚀 ¡Configuración lista! El agente está funcionando.")
+        print(f"🧠 Cargando el agente de IA en segundo plano...")
         
         # Información adicional sobre el entorno
         print("\n" + "=" * 50)
         print("📊 Información del entorno:")
         print(f"   📁 Directorio de páginas: {logseq_manager.pages_path}")
-        print(f"   🧠 Cliente OpenAI: Configurado y listo")
         print(f"   🤖 Agente IA: Especializado en Logseq")
         print("=" * 50)
         
+        # Flujo de cambios para otras herramientas (índices, paneles) que siguen el grafo
+        if args.change_feed:
+            try:
+                logseq_manager.serve_change_feed(args.change_feed)
+                logseq_manager.watch_external_changes()
+                print(f"📡 Cambios del grafo publicados en {args.change_feed}")
+            except (RuntimeError, OSError) as e:
+                print(f"⚠️ No se pudo publicar el flujo de cambios: {e}")
+        
+        # Métricas agregadas: por HTTP local (pensado para el demonio) o volcadas a un archivo
+        if args.metrics_port is not None:
+            try:
+                metrics_server = logseq_manager.metrics.serve(args.metrics_port)
+                print(f"📈 Métricas en http://127.0.0.1:{metrics_server.server_address[1]}/metrics")
+            except OSError as e:
+                print(f"⚠️ No se pudieron servir las métricas: {e}")
+        if args.metrics_file:
+            atexit.register(logseq_manager.metrics.write_file, args.metrics_file)
+        
+        # El demonio y el perfil de arranque necesitan el agente completo desde el principio
+        ai_agent = None
+        if args.daemon or args.profile_startup:
+            with profiler.phase("esperar al agente"):
+                ai_agent = agent_future.result()
+            if args.profile_startup:
+                print(profiler.report())
+        
+        if args.daemon:
+            return run_daemon(ai_agent, logseq_manager, socket_path)
+        
         # Bucle interactivo principal
         print("\n🎯 ¡Agente listo! Puedes empezar a dar comandos.")
         print("💡 Ejemplos: 'Añade comprar leche a mis tareas', 'Guarda esta idea: usar IA'")
+        print("↩️ Escribe 'deshacer' para revertir el último comando.")
         print("📝 Escribe 'salir' para terminar.\n")
         
         while True:
@@ -308,180 +1445,22 @@ def main():
                     print("👋 ¡Hasta la vista! Agente desconectado.")
                     break
                 
-                # Usar el agente para interpretar el comando con observabilidad
-                print("🤔 Interpretando comando...")
-                with logfire.span("procesando_comando: {prompt}", prompt=prompt):
-                    result = ai_agent.run_sync(prompt)
-                    
-                    # Verificar que el resultado sea del tipo esperado
-                    if isinstance(result.output, SaveToJournal):
-                        action = result.output
-                        # La descripción para la confirmación es más simple aquí
-                        action_type = "TAREA" if action.is_task else "NOTA"
-                        
-                        # Manejar la fecha objetivo
-                        if action.target_date:
-                            # Convertir la cadena YYYY-MM-DD en un objeto date
-                            try:
-                                target_date_obj = date.fromisoformat(action.target_date)
-                                date_description = f"para el {action.target_date}"
-                            except ValueError:
-                                print(f"❌ Error: Formato de fecha inválido '{action.target_date}'. Usando fecha de hoy.")
-                                target_date_obj = None
-                                date_description = "para HOY"
-                        else:
-                            target_date_obj = None
-                            date_description = "para HOY"
-                        
-                        description = f"Añadir {action_type} '{action.content}' al diario {date_description}"
-
-                        if confirm_action(description):
-                            logseq_manager.append_to_journal(
-                                content=action.content,
-                                is_task=action.is_task,
-                                target_date=target_date_obj
-                            )
-                            print(f"✅ ¡Hecho! Se añadió la anotación al diario {date_description}.")
-                        else:
-                            print("❌ Acción cancelada por el usuario.")
-                        
-                    elif isinstance(result.output, CreateTask):
-                        action = result.output
-                        description = f"Crear TAREA '{action.content}' en la página '{action.page_title}'"
-                        
-                        if confirm_action(description):
-                            # Formatear el contenido como una tarea TODO
-                            task_content = f"TODO {action.content}"
-                            logseq_manager.append_to_page(
-                                page_title=action.page_title,
-                                content=task_content
-                            )
-                            print(f"✅ ¡Tarea creada! Se añadió '{task_content}' a la página '{action.page_title}'.")
-                        else:
-                            print("❌ Acción cancelada por el usuario.")
-                        
-                    elif isinstance(result.output, MarkTaskAsDone):
-                        action = result.output
-                        description = f"Marcar como HECHA la tarea '{action.task_content}' en la página '{action.page_title}'"
-                        
-                        if confirm_action(description):
-                            print(f"✅ Marcando tarea como hecha en '{action.page_title}'...")
-                            
-                            # Construir el contenido viejo y nuevo del bloque
-                            old_block = f"TODO {action.task_content}"
-                            new_block = f"DONE {action.task_content}"
-                            
-                            # Llamar a nuestro nuevo método del manager
-                            success = logseq_manager.update_block_in_page(
-                                action.page_title,
-                                old_block,
-                                new_block
-                            )
-                            
-                            if success:
-                                print(f"🎉 ¡Tarea completada! Se actualizó '{action.task_content}' en '{action.page_title}'.")
-                            else:
-                                print(f"❌ No pude encontrar la tarea 'TODO {action.task_content}' en la página '{action.page_title}'.")
-                        else:
-                            print("❌ Acción cancelada por el usuario.")
-                        
-                    elif isinstance(result.output, AppendToPage):
-                        action = result.output
-                        description = f"Añadir CONTENIDO '{action.content}' a la página '{action.page_title}'"
-                        
-                        if confirm_action(description):
-                            # Ejecutar la acción usando nuestro LogseqManager
-                            logseq_manager.append_to_page(
-                                page_title=action.page_title, 
-                                content=action.content
-                            )
-                            
-                            # Confirmar éxito
-                            print(f"✅ ¡Hecho! Se añadió '{action.content}' a la página '{action.page_title}'.")
-                        else:
-                            print("❌ Acción cancelada por el usuario.")
-                        
-                    elif isinstance(result.output, ReadPageContent):
-                        read_action = result.output
-                        print(f"🔎 Leyendo el contenido de la página '{read_action.page_title}'...")
-                        content = logseq_manager.read_page_content(read_action.page_title)
-                        if content:
-                            print("\n--- Contenido de la Página ---")
-                            print(content)
-                            print("---------------------------\n")
-                        else:
-                            print(f"❌ La página '{read_action.page_title}' no existe o está vacía.")
-                            
-                    elif isinstance(result.output, SearchInPages):
-                        search_action = result.output
-                        print(f"🔎 Buscando '{search_action.query}' en todas las páginas...")
-                        results = logseq_manager.search_in_pages(search_action.query)
-                        if results:
-                            print(f"✅ Encontré menciones en las siguientes {len(results)} páginas:")
-                            for page_title in results:
-                                print(f"  - {page_title}")
-                        else:
-                            print(f"❌ No encontré ninguna página que mencione '{search_action.query}'.")
-                    
-                    elif isinstance(result.output, DeleteBlockFromPage):
-                        action = result.output
-                        description = f"Eliminar bloque '{action.content_to_delete}' de la página '{action.page_title}'"
-                        
-                        # ¡ACCIÓN DESTRUCTIVA! Proteger siempre con confirmación.
-                        if confirm_action(description):
-                            success = logseq_manager.delete_block_from_page(
-                                page_title=action.page_title,
-                                content_to_delete=action.content_to_delete,
-                                is_journal=False
-                            )
-                            
-                            if success:
-                                print(f"🗑️ ¡Bloque eliminado con éxito de la página '{action.page_title}'!")
-                            else:
-                                print(f"❌ No pude encontrar el bloque '{action.content_to_delete}' en la página '{action.page_title}'.")
-                        else:
-                            print("❌ Acción cancelada por el usuario.")
-                            
-                    elif isinstance(result.output, DeleteBlockFromJournal):
-                        action = result.output
-                        
-                        # Manejar la fecha objetivo para el diario
-                        if action.target_date:
-                            # Convertir la cadena YYYY-MM-DD en un objeto date
-                            try:
-                                target_date_obj = date.fromisoformat(action.target_date)
-                                journal_page_title = target_date_obj.strftime("%Y_%m_%d")
-                                date_description = f"del diario del {action.target_date}"
-                            except ValueError:
-                                print(f"❌ Error: Formato de fecha inválido '{action.target_date}'. Usando fecha de hoy.")
-                                target_date_obj = date.today()
-                                journal_page_title = target_date_obj.strftime("%Y_%m_%d")
-                                date_description = "del diario de HOY"
-                        else:
-                            target_date_obj = date.today()
-                            journal_page_title = target_date_obj.strftime("%Y_%m_%d")
-                            date_description = "del diario de HOY"
-                        
-                        description = f"Eliminar bloque '{action.content_to_delete}' {date_description}"
-                        
-                        # ¡ACCIÓN DESTRUCTIVA! Proteger siempre con confirmación.
-                        if confirm_action(description):
-                            success = logseq_manager.delete_block_from_page(
-                                page_title=journal_page_title,
-                                content_to_delete=action.content_to_delete,
-                                is_journal=True
-                            )
-                            
-                            if success:
-                                print(f"🗑️ ¡Bloque eliminado con éxito {date_description}!")
-                            else:
-                                print(f"❌ No pude encontrar el bloque '{action.content_to_delete}' {date_description}.")
-                        else:
-                            print("❌ Acción cancelada por el usuario.")
-                            
-                    else:
-                        print("❌ Lo siento, no pude entender ese comando. ¿Podrías reformularlo?")
-                        print("💡 Intenta con algo como: 'Crear tarea: [descripción]', 'Añade [nota] a [página]', '¿Qué hay en [página]?', 'Busca [término]' o 'Elimina [bloque] de [página]'")
+                # Normalmente el agente ya terminó de cargar mientras el usuario escribía
+                if ai_agent is None:
+                    if not agent_future.done():
+                        print("⏳ Terminando de cargar el agente...")
+                    try:
+                        ai_agent = agent_future.result()
+                    except Exception as e:
+                        print(f"❌ ERROR inesperado al crear el agente de IA: {e}")
+                        return 1
+                
+                # Usar el agente para interpretar el comando y ejecutar la acción
+                try:
+                    process_command(prompt, ai_agent, logseq_manager)
+                finally:
+                    if args.metrics_file:
+                        logseq_manager.metrics.write_file(args.metrics_file)
                 
                 print()  # Línea en blanco para separar comandos
                 
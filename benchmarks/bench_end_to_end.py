@@ -0,0 +1,145 @@
+"""
+Benchmark y suite de regresión de extremo a extremo a partir de una grabación.
+
+Reproduce con ReplayModel los comandos grabados con `python agent.py --record ARCHIVO`
+y los pasa por el mismo camino que el bucle de main() (process_command → despacho a
+LogseqManager), sobre una copia temporal del grafo y confirmando todas las acciones.
+
+Con --storage memory el grafo se carga en un MemoryStorage, de modo que la medida
+excluye el coste de E/S y deja solo el del agente y los algoritmos del gestor.
+
+Uso:
+    python -m benchmarks.bench_end_to_end grabacion.jsonl --graph /ruta/al/grafo --repeat 5
+    python -m benchmarks.bench_end_to_end grabacion.jsonl --graph /ruta/al/grafo --storage memory
+    python -m benchmarks.bench_end_to_end grabacion.jsonl --golden esperado.json --update-golden
+    python -m benchmarks.bench_end_to_end grabacion.jsonl --golden esperado.json   # regresión
+"""
+
+import argparse
+import json
+import os
+import pathlib
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import typing
+
+os.environ.setdefault('LOGFIRE_IGNORE_NO_CONFIG', '1')
+
+import agent
+from src.logseq_manager import LogseqManager
+from src.model_recording import ReplayModel, load_recordings, recorded_prompts
+from src.storage import MemoryStorage, PosixStorage, StorageBackend
+
+
+def _prepare_graph(source_graph: typing.Optional[str], workdir: pathlib.Path) -> pathlib.Path:
+    """Copia el grafo de origen (o crea uno vacío) en un directorio temporal."""
+    graph_path = workdir / "grafo"
+    if source_graph:
+        shutil.copytree(source_graph, graph_path, ignore=shutil.ignore_patterns(".logseq-agent"))
+    else:
+        (graph_path / "pages").mkdir(parents=True)
+        (graph_path / "journals").mkdir()
+    return graph_path
+
+
+def _graph_files(storage: StorageBackend, graph_path: pathlib.Path) -> dict[str, str]:
+    """Devuelve el contenido de todas las páginas y diarios, indexado por ruta relativa."""
+    files = {}
+    for folder in ("pages", "journals"):
+        for file_path in storage.list_files(graph_path / folder, "*.md"):
+            files[f"{folder}/{file_path.name}"] = storage.read_text(file_path)
+    return files
+
+
+def run_once(
+    recordings: list[dict],
+    source_graph: typing.Optional[str],
+    simulate_latency: bool,
+    in_memory: bool = False,
+) -> tuple[list[dict], dict[str, str]]:
+    """
+    Ejecuta todos los comandos grabados una vez.
+
+    Args:
+        in_memory: Si True, trabaja sobre un MemoryStorage en lugar de una copia en disco
+
+    Returns:
+        (transcripción, archivos_finales): por comando su prompt, salida y latencia en ms;
+        y el contenido final del grafo
+    """
+    with tempfile.TemporaryDirectory() as workdir:
+        graph_path = _prepare_graph(source_graph, pathlib.Path(workdir))
+        if in_memory:
+            storage = MemoryStorage.from_directory(graph_path)
+        else:
+            storage = PosixStorage(graph_path / ".logseq-agent" / "locks")
+        logseq_manager = LogseqManager(str(graph_path), storage=storage)
+        ai_agent = agent.create_logseq_agent(None, model=ReplayModel(recordings, simulate_latency=simulate_latency))
+
+        transcript = []
+        for prompt in recorded_prompts(recordings):
+            output: list[str] = []
+            start = time.perf_counter()
+            agent.process_command(prompt, ai_agent, logseq_manager, confirm=lambda description: True, emit=output.append)
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            transcript.append({"prompt": prompt, "output": output, "elapsed_ms": elapsed_ms})
+
+        return transcript, _graph_files(storage, graph_path)
+
+
+def _golden(transcript: list[dict], files: dict[str, str]) -> dict:
+    """Parte determinista del resultado (sin latencias) para comparar entre ejecuciones."""
+    return {
+        "commands": [{"prompt": entry["prompt"], "output": entry["output"]} for entry in transcript],
+        "files": files,
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark de extremo a extremo con respuestas grabadas")
+    parser.add_argument("recording", help="Archivo JSONL grabado con agent.py --record")
+    parser.add_argument("--graph", default=None, help="Grafo de partida (se copia; por defecto uno vacío)")
+    parser.add_argument("--repeat", type=int, default=1, help="Número de repeticiones para el benchmark")
+    parser.add_argument("--storage", choices=["disk", "memory"], default="disk", help="Grafo en disco o en memoria (sin coste de E/S)")
+    parser.add_argument("--simulate-latency", action="store_true", help="Reproducir también la latencia grabada del LLM")
+    parser.add_argument("--golden", default=None, help="Archivo JSON con la salida y el grafo esperados")
+    parser.add_argument("--update-golden", action="store_true", help="Escribir --golden con el resultado actual")
+    args = parser.parse_args()
+
+    recordings = load_recordings(args.recording)
+    per_command: dict[int, list[float]] = {}
+    totals = []
+
+    for _ in range(max(1, args.repeat)):
+        transcript, files = run_once(recordings, args.graph, args.simulate_latency, in_memory=args.storage == "memory")
+        totals.append(sum(entry["elapsed_ms"] for entry in transcript))
+        for index, entry in enumerate(transcript):
+            per_command.setdefault(index, []).append(entry["elapsed_ms"])
+
+    print(f"📊 {len(transcript)} comandos × {len(totals)} repeticiones")
+    for index, entry in enumerate(transcript):
+        latencies = per_command[index]
+        print(f"   {statistics.median(latencies):>8.2f} ms  {entry['prompt'][:60]}")
+    print(f"   Total por repetición: mediana {statistics.median(totals):.2f} ms, mínimo {min(totals):.2f} ms")
+
+    if args.golden:
+        result = _golden(transcript, files)
+        golden_path = pathlib.Path(args.golden)
+        if args.update_golden:
+            golden_path.write_text(json.dumps(result, ensure_ascii=False, indent=2), encoding='utf-8')
+            print(f"💾 Resultado esperado guardado en {golden_path}")
+        else:
+            expected = json.loads(golden_path.read_text(encoding='utf-8'))
+            if result != expected:
+                print("❌ REGRESIÓN: la salida o el grafo final no coinciden con el resultado esperado")
+                return 1
+            print("✅ Sin regresiones: salida y grafo final idénticos al resultado esperado")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,84 @@
+"""
+Benchmark de latencia del cliente HTTP compartido contra un servidor stub local.
+
+Compara dos configuraciones del mismo agente de pydantic_ai:
+    - sin keep-alive: cada llamada al modelo abre una conexión nueva
+    - pool compartido: el cliente de src.http_client, que reutiliza conexiones
+
+Uso:
+    python -m benchmarks.bench_http_client --requests 50 --handshake-ms 20
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+
+import httpx
+from pydantic_ai import Agent
+from pydantic_ai.models.openai import OpenAIChatModel
+from pydantic_ai.providers.openai import OpenAIProvider
+
+from benchmarks.stub_openai_server import StubOpenAIServer
+from src.http_client import HttpClientConfig, create_http_client
+
+
+def _build_agent(base_url: str, http_client: httpx.AsyncClient) -> Agent:
+    provider = OpenAIProvider(base_url=base_url, api_key="stub", http_client=http_client)
+    return Agent(OpenAIChatModel("gpt-4.1-mini", provider=provider), output_type=str)
+
+
+async def _measure(agent: Agent, requests: int) -> list[float]:
+    latencies = []
+    for _ in range(requests):
+        start = time.perf_counter()
+        await agent.run("hola")
+        latencies.append((time.perf_counter() - start) * 1000)
+    return latencies
+
+
+def _percentile(values: list[float], fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+async def run_benchmark(requests: int, handshake_ms: float, response_ms: float) -> list[tuple[str, list[float], int]]:
+    """
+    Ejecuta ambas configuraciones y devuelve (nombre, latencias_ms, conexiones_abiertas).
+    """
+    results = []
+    with StubOpenAIServer(handshake_ms=handshake_ms, response_ms=response_ms) as server:
+        configurations = [
+            ("sin keep-alive", httpx.AsyncClient(limits=httpx.Limits(max_keepalive_connections=0))),
+            ("pool compartido", create_http_client(HttpClientConfig())),
+        ]
+        for name, http_client in configurations:
+            agent = _build_agent(server.base_url, http_client)
+            await _measure(agent, 1)  # Calentamiento (importaciones, esquemas)
+            server.reset_counters()
+            latencies = await _measure(agent, requests)
+            results.append((name, latencies, server.connections_opened))
+            await http_client.aclose()
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark del cliente HTTP compartido")
+    parser.add_argument("--requests", type=int, default=50, help="Llamadas al modelo por configuración")
+    parser.add_argument("--handshake-ms", type=float, default=20.0, help="Coste simulado de abrir una conexión")
+    parser.add_argument("--response-ms", type=float, default=5.0, help="Tiempo simulado de respuesta del modelo")
+    args = parser.parse_args()
+
+    results = asyncio.run(run_benchmark(args.requests, args.handshake_ms, args.response_ms))
+
+    print(f"📊 {args.requests} llamadas por configuración (handshake {args.handshake_ms} ms, respuesta {args.response_ms} ms)")
+    print(f"   {'Configuración':<18}{'media':>9}{'p50':>9}{'p95':>9}{'conexiones':>12}")
+    for name, latencies, connections in results:
+        print(
+            f"   {name:<18}{statistics.mean(latencies):>9.2f}{_percentile(latencies, 0.5):>9.2f}"
+            f"{_percentile(latencies, 0.95):>9.2f}{connections:>12}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""
+Servidor HTTP local que imita la API de chat completions de OpenAI.
+
+Sirve para medir latencias sin red: cada conexión nueva puede pagar un retardo
+configurable (simula el handshake TCP+TLS de una conexión real) y cada petición un
+tiempo de respuesta fijo. Cuenta las conexiones abiertas para poder comprobar
+cuántas se reutilizaron.
+"""
+
+import json
+import socket
+import threading
+import time
+import typing
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+# Recibe el JSON de la petición y devuelve el "message" del asistente
+Responder = typing.Callable[[dict], dict]
+
+
+def text_responder(request: dict) -> dict:
+    """Respuesta por defecto: un mensaje de texto corto."""
+    return {"role": "assistant", "content": "ok"}
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+    # HTTP/1.1 para que el cliente pueda mantener la conexión abierta (keep-alive)
+    protocol_version = "HTTP/1.1"
+
+    def setup(self) -> None:
+        super().setup()
+        # Cabeceras y cuerpo salen en dos escrituras: sin TCP_NODELAY, Nagle y el ACK
+        # diferido del cliente añadirían ~40 ms a cada respuesta en conexiones reutilizadas
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.server.count_connection()
+        if self.server.handshake_delay:
+            time.sleep(self.server.handshake_delay)
+
+    def do_POST(self) -> None:
+        length = int(self.headers.get("Content-Length", 0))
+        request = json.loads(self.rfile.read(length) or b"{}")
+
+        if self.server.response_delay:
+            time.sleep(self.server.response_delay)
+
+        if not self.path.endswith("/chat/completions"):
+            self.send_error(404)
+            return
+
+        body = json.dumps({
+            "id": "chatcmpl-stub",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": request.get("model", "stub"),
+            "choices": [{"index": 0, "message": self.server.responder(request), "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": 1, "completion_tokens": 1, "total_tokens": 2},
+        }).encode("utf-8")
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args) -> None:
+        # Silencioso: el benchmark imprime su propio informe
+        pass
+
+
+class StubOpenAIServer(ThreadingHTTPServer):
+    """
+    Servidor stub compatible con OpenAI que se ejecuta en un hilo de fondo.
+
+    Example:
+        with StubOpenAIServer(handshake_ms=20) as server:
+            provider = OpenAIProvider(base_url=server.base_url, api_key="stub")
+    """
+
+    daemon_threads = True
+
+    def __init__(self, handshake_ms: float = 0.0, response_ms: float = 0.0, responder: Responder = text_responder) -> None:
+        super().__init__(("127.0.0.1", 0), _StubHandler)
+        self.handshake_delay = handshake_ms / 1000
+        self.response_delay = response_ms / 1000
+        self.responder = responder
+        self.connections_opened = 0
+        self._counter_lock = threading.Lock()
+        self._thread = threading.Thread(target=self.serve_forever, name="stub-openai", daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def count_connection(self) -> None:
+        with self._counter_lock:
+            self.connections_opened += 1
+
+    def reset_counters(self) -> None:
+        with self._counter_lock:
+            self.connections_opened = 0
+
+    def __enter__(self) -> "StubOpenAIServer":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.shutdown()
+        self.server_close()
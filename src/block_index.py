@@ -0,0 +1,103 @@
+"""
+Índice de identificadores de bloque: del UUID de la propiedad "id::" al archivo y desplazamiento.
+
+Logseq da a un bloque un identificador estable escribiendo una propiedad bajo él:
+
+    - Decidir la fecha de lanzamiento
+      id:: 6512bd43-d9ca-4c3b-9b1d-2f0c5e6a7b10
+
+y lo cita desde otros bloques con ((6512bd43-...)). Con este índice, leer, editar o
+eliminar un bloque por su UUID va directo a su archivo y a su desplazamiento en bytes,
+sin recorrer el grafo ni comparar textos (que además se repiten).
+
+Por archivo se guarda, por cada UUID, el tramo en bytes de su bloque. Solo se
+construye el árbol de bloques de los archivos que contienen "id::"; el resto cuesta
+una búsqueda de subcadena. Se sincroniza por stat como los demás índices del gestor
+(ver src/file_index.py).
+"""
+
+import bisect
+import pathlib
+import re
+import typing
+import uuid
+
+from src.blocks import block_tree
+from src.file_index import FileValueIndex
+from src.storage import StorageBackend
+
+
+# Propiedad "id::" con un UUID, en su propia línea
+_ID_RE = re.compile(rb"^[ \t]*id::[ \t]*([0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12})[ \t]*\r?$", re.MULTILINE)
+
+# Referencia a un bloque dentro de un texto: ((uuid))
+BLOCK_REF_RE = re.compile(r"\(\(([0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12})\)\)")
+
+
+class BlockLocation(typing.NamedTuple):
+    """Dónde está un bloque con identificador."""
+    path: pathlib.Path
+    start: int  # Desplazamiento en bytes de la línea "- " del bloque
+    end: int    # Fin del bloque con sus líneas de continuación (ver blocks.BlockSpan)
+
+
+def new_block_id() -> str:
+    """UUID nuevo para la propiedad "id::" de un bloque."""
+    return str(uuid.uuid4())
+
+
+def block_ids(data: bytes) -> dict[str, tuple[int, int]]:
+    """
+    UUID (en minúsculas) → tramo (inicio, fin) en bytes de su bloque en un archivo.
+
+    La propiedad pertenece al bloque en cuyas líneas aparece; una "id::" antes del
+    primer bloque es una propiedad de página y no se indexa.
+    """
+    if b"id::" not in data:
+        return {}
+    spans = block_tree(data)
+    starts = [span.start for span in spans]
+    found = {}
+    for match in _ID_RE.finditer(data):
+        index = bisect.bisect_right(starts, match.start()) - 1
+        if index >= 0 and match.start() <= spans[index].end:
+            found[match.group(1).decode('ascii').lower()] = (spans[index].start, spans[index].end)
+    return found
+
+
+class BlockIdIndex(FileValueIndex):
+    """Índice UUID → bloque de todos los archivos del grafo."""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self._ids: dict[str, str] = {}  # UUID → archivo
+
+    def __len__(self) -> int:
+        """Número de bloques con identificador."""
+        return len(self._ids)
+
+    def _read(self, storage: StorageBackend, path: pathlib.Path) -> dict[str, tuple[int, int]]:
+        try:
+            data = storage.read_bytes(path)
+        except (IOError, OSError):
+            data = b""
+        return block_ids(data)
+
+    def _link(self, path: str, ids: dict[str, tuple[int, int]]) -> None:
+        for block_id in ids:
+            self._ids[block_id] = path
+
+    def _unlink(self, path: str, ids: dict[str, tuple[int, int]]) -> None:
+        for block_id in ids:
+            if self._ids.get(block_id) == path:
+                del self._ids[block_id]
+
+    def locate(self, block_id: str) -> typing.Optional[BlockLocation]:
+        """Archivo y tramo del bloque con ese UUID, o None si no está indexado."""
+        block_id = block_id.strip().lower()
+        with self._lock:
+            path = self._ids.get(block_id)
+            if path is None:
+                return None
+            start, end = self._files[path][1][block_id]
+        return BlockLocation(pathlib.Path(path), start, end)
@@ -0,0 +1,346 @@
+"""
+Parser de bloques de Logseq compartido por el gestor y los índices de búsqueda.
+
+Un bloque es una línea que, sin espacios iniciales, empieza por "- ". Su texto es el
+resto de la línea sin el prefijo ni espacios sobrantes; es el mismo criterio que usan
+find_block_in_page, update_block_in_page y delete_block_from_page, de modo que los
+índices ven exactamente los mismos bloques que el recorrido de archivos.
+
+head_block_lines() y tail_block_lines() leen solo el principio o el final de un
+archivo, por tramos, hasta reunir los bloques pedidos: leer los últimos bloques de un
+diario enorme cuesta lo que ocupan esos bloques, no lo que ocupa el archivo.
+
+block_tree() construye el árbol de bloques (el padre de cada uno es el anterior con
+menos sangría) con desplazamientos en bytes. insert_block(), move_subtree() y
+delete_subtree() lo usan para empalmar solo el tramo afectado del archivo, en lugar de
+rehacerlo línea a línea.
+"""
+
+import re
+import typing
+
+# Bytes leídos por tramo en head_block_lines y tail_block_lines
+_CHUNK_SIZE = 8192
+
+# Lee `length` bytes a partir de `offset` (ver StorageBackend.read_range)
+RangeReader = typing.Callable[[int, int], bytes]
+
+
+class Block(typing.NamedTuple):
+    """Un bloque de una página o diario."""
+    line: int    # Índice de la línea en el archivo (empezando en 0)
+    indent: int  # Caracteres de sangría antes del "- "
+    text: str    # Contenido sin el prefijo "- " ni espacios sobrantes
+
+
+def block_text(line: str) -> typing.Optional[str]:
+    """
+    Devuelve el texto del bloque de una línea, o None si la línea no es un bloque.
+
+    Example:
+        block_text("  - TODO Comprar pan ") → "TODO Comprar pan"
+        block_text("title:: Compras") → None
+    """
+    cleaned_line = line.strip()
+    if cleaned_line.startswith("- "):
+        return cleaned_line[2:].strip()
+    return None
+
+
+def iter_blocks(content: str) -> typing.Iterator[Block]:
+    """Recorre los bloques de un archivo en orden."""
+    for index, line in enumerate(content.splitlines()):
+        text = block_text(line)
+        if text is not None:
+            yield Block(index, len(line) - len(line.lstrip()), text)
+
+
+def _block_line(raw: bytes) -> typing.Optional[str]:
+    """La línea tal como está escrita (sin salto final) si es un bloque, o None."""
+    line = raw.decode('utf-8', 'replace').rstrip("\r")
+    return line.rstrip() if block_text(line) is not None else None
+
+
+def head_block_lines(
+    read_range: RangeReader,
+    size: int,
+    skip: int,
+    count: int,
+    chunk_size: int = _CHUNK_SIZE,
+) -> list[str]:
+    """
+    Líneas de los bloques `skip` a `skip + count - 1` de un archivo, leyendo desde el principio.
+
+    Se devuelven con su sangría, para que se vea el anidamiento. La lectura se detiene
+    en cuanto se tienen los bloques pedidos.
+
+    Args:
+        read_range: Función (desplazamiento, longitud) → bytes del archivo
+        size: Tamaño del archivo en bytes
+        skip: Bloques que saltar desde el principio
+        count: Bloques que devolver
+        chunk_size: Bytes por lectura
+    """
+    found: list[str] = []
+    offset = 0
+    pending = b""
+    while len(found) < count and offset < size:
+        data = read_range(offset, chunk_size)
+        if not data:
+            break
+        offset += len(data)
+        lines = (pending + data).split(b"\n")
+        # La última línea puede seguir en el siguiente tramo
+        pending = lines.pop() if offset < size else b""
+        for raw in lines:
+            line = _block_line(raw)
+            if line is None:
+                continue
+            if skip:
+                skip -= 1
+                continue
+            found.append(line)
+            if len(found) == count:
+                break
+    return found
+
+
+def tail_block_lines(
+    read_range: RangeReader,
+    size: int,
+    count: int,
+    chunk_size: int = _CHUNK_SIZE,
+) -> list[str]:
+    """
+    Líneas de los últimos `count` bloques de un archivo, en orden, leyendo hacia atrás.
+
+    Se lee el archivo por tramos desde el final y se para al reunir `count` bloques.
+
+    Args:
+        read_range: Función (desplazamiento, longitud) → bytes del archivo
+        size: Tamaño del archivo en bytes
+        count: Bloques que devolver
+        chunk_size: Bytes por lectura
+    """
+    found: list[str] = []
+    end = size
+    pending = b""
+    while len(found) < count and end > 0:
+        start = max(0, end - chunk_size)
+        lines = (read_range(start, end - start) + pending).split(b"\n")
+        end = start
+        # La primera línea puede empezar en el tramo anterior
+        pending = lines.pop(0) if end > 0 else b""
+        for raw in reversed(lines):
+            line = _block_line(raw)
+            if line is not None:
+                found.append(line)
+                if len(found) == count:
+                    break
+    found.reverse()
+    return found
+
+
+class BlockSpan(typing.NamedTuple):
+    """
+    Un bloque del árbol de un archivo, con desplazamientos en bytes sobre su UTF-8.
+
+    Los finales apuntan al salto de línea que cierra la última línea (o al final del
+    archivo), así que archivo[start:end] es el bloque con sus líneas de continuación
+    y archivo[start:tree_end] el bloque con todos sus descendientes.
+    """
+    start: int      # Inicio de la línea "- "
+    end: int        # Fin del propio bloque (líneas de continuación incluidas)
+    tree_end: int   # Fin del subárbol
+    indent: bytes   # Sangría tal como está escrita (tabuladores o espacios)
+    parent: int     # Índice del bloque padre en la lista, o -1 si es de primer nivel
+    text: str       # Contenido sin el prefijo "- " ni espacios sobrantes
+
+
+# Sangría por nivel cuando el archivo todavía no tiene bloques anidados
+DEFAULT_INDENT = b"  "
+
+# Línea de bloque: sangría y resto de la línea tras "- "
+_BLOCK_LINE_RE = re.compile(rb"^([ \t]*)- ([^\n]*)", re.MULTILINE)
+
+# Posiciones de insert_block y move_subtree respecto al bloque de destino
+POSITIONS = ("child", "sibling")
+
+
+def _indent_width(indent: bytes) -> int:
+    # Un tabulador cuenta como un nivel de dos espacios, como los escribe Logseq
+    return len(indent.replace(b"\t", DEFAULT_INDENT))
+
+
+def subtree_end(lines: typing.Sequence[typing.Optional[str]], index: int) -> int:
+    """
+    Índice de la primera línea después del subárbol del bloque de la línea `index`.
+
+    El subárbol acaba en el siguiente bloque con igual o menos sangría; las líneas
+    None (ya eliminadas) se saltan.
+    """
+    width = _indent_width(lines[index][:len(lines[index]) - len(lines[index].lstrip())].encode('utf-8'))
+    end = index + 1
+    while end < len(lines):
+        line = lines[end]
+        if line is not None and block_text(line) is not None \
+                and _indent_width(line[:len(line) - len(line.lstrip())].encode('utf-8')) <= width:
+            break
+        end += 1
+    return end
+
+
+def block_tree(data: bytes) -> list[BlockSpan]:
+    """
+    Bloques de un archivo en orden, con su padre y el final de su subárbol.
+
+    El padre de un bloque es el bloque anterior con menos sangría. Las líneas que no
+    son bloques pertenecen al bloque anterior (continuaciones, propiedades como
+    "id::"); las que hay antes del primer bloque (propiedades de página) no son de
+    ninguno.
+    """
+    matches = [match for match in _BLOCK_LINE_RE.finditer(data) if match.group(2).strip()]
+    size = len(data)
+    # Un bloque llega hasta la línea anterior al siguiente bloque (sus continuaciones)
+    ends = [match.start() - 1 for match in matches[1:]]
+    ends.append(size - 1 if data.endswith(b"\n") else size)
+
+    parents: list[int] = []
+    tree_ends = list(ends)
+    # Bloques abiertos: (anchura de la sangría, índice); el subárbol de cada uno se
+    # cierra al sacarlo de la pila, en el final del bloque anterior al que lo saca
+    stack: list[tuple[int, int]] = []
+    for index, match in enumerate(matches):
+        width = _indent_width(match.group(1))
+        while stack and stack[-1][0] >= width:
+            tree_ends[stack.pop()[1]] = ends[index - 1]
+        parents.append(stack[-1][1] if stack else -1)
+        stack.append((width, index))
+    for _, index in stack:
+        tree_ends[index] = ends[-1]
+
+    return [
+        BlockSpan(match.start(), end, tree_end, match.group(1), parent, match.group(2).decode('utf-8', 'replace').strip())
+        for match, end, tree_end, parent in zip(matches, ends, tree_ends, parents)
+    ]
+
+
+def span_at(data: bytes, offset: int) -> typing.Optional[BlockSpan]:
+    """
+    El bloque que empieza en `offset`, con su subárbol, leyendo solo hacia delante.
+
+    Cuesta lo que ocupa el subárbol, no el archivo. Devuelve None si en `offset` no
+    empieza un bloque. El padre no se calcula (-1).
+    """
+    if offset and data[offset - 1:offset] != b"\n":
+        return None
+    match = _BLOCK_LINE_RE.match(data, offset)
+    if match is None or not match.group(2).strip():
+        return None
+    width = _indent_width(match.group(1))
+    file_end = len(data) - 1 if data.endswith(b"\n") else len(data)
+    end = tree_end = None
+    for following in _BLOCK_LINE_RE.finditer(data, match.end()):
+        if not following.group(2).strip():
+            continue
+        if end is None:
+            end = following.start() - 1
+        if _indent_width(following.group(1)) <= width:
+            tree_end = following.start() - 1
+            break
+    return BlockSpan(
+        offset,
+        file_end if end is None else end,
+        file_end if tree_end is None else tree_end,
+        match.group(1),
+        -1,
+        match.group(2).decode('utf-8', 'replace').strip(),
+    )
+
+
+def indent_unit(data: bytes, spans: typing.Sequence[BlockSpan]) -> bytes:
+    """Sangría de un nivel que usa el archivo (la del primer hijo), o DEFAULT_INDENT."""
+    for span in spans:
+        if span.parent >= 0:
+            parent_indent = spans[span.parent].indent
+            if span.indent.startswith(parent_indent) and len(span.indent) > len(parent_indent):
+                return span.indent[len(parent_indent):]
+    return DEFAULT_INDENT
+
+
+def format_block(content: str, indent: bytes) -> bytes:
+    """
+    Un bloque listo para insertar con la sangría dada, sin salto de línea final.
+
+    Las líneas después de la primera se escriben como continuación del bloque.
+
+    Example:
+        format_block("Diseño", b"  ") → b"  - Diseño"
+    """
+    first, *rest = content.splitlines() or [""]
+    lines = [indent + f"- {first}".encode('utf-8')]
+    lines.extend(indent + f"  {line}".encode('utf-8') for line in rest)
+    return b"\n".join(lines)
+
+
+def _reindent(segment: bytes, old_indent: bytes, new_indent: bytes) -> bytes:
+    """Cambia el prefijo de sangría de las líneas de un subárbol."""
+    lines = segment.split(b"\n")
+    return b"\n".join(
+        new_indent + line[len(old_indent):] if line.startswith(old_indent) else line
+        for line in lines
+    )
+
+
+def _removal(data: bytes, span: BlockSpan) -> tuple[int, int]:
+    """Tramo que ocupa un subárbol junto con uno de los saltos de línea que lo rodean."""
+    if span.tree_end < len(data):
+        return span.start, span.tree_end + 1
+    return max(span.start - 1, 0), span.tree_end
+
+
+def _insertion(spans: typing.Sequence[BlockSpan], target: int, position: str, unit: bytes) -> tuple[int, bytes]:
+    """Desplazamiento y sangría con que se inserta un bloque respecto al de destino."""
+    if position not in POSITIONS:
+        raise ValueError(f"❌ ERROR: La posición debe ser 'child' o 'sibling' (valor: '{position}')")
+    span = spans[target]
+    # Como último hijo o como hermano justo después: en los dos casos, tras el subárbol
+    return span.tree_end, span.indent + unit if position == "child" else span.indent
+
+
+def insert_block(data: bytes, spans: typing.Sequence[BlockSpan], target: int, content: str, position: str = "child") -> bytes:
+    """
+    Inserta un bloque como último hijo ("child") o como hermano siguiente ("sibling")
+    del bloque `target`; solo se empalma el tramo nuevo en su sitio.
+
+    Raises:
+        ValueError: Si la posición no es válida
+    """
+    offset, indent = _insertion(spans, target, position, indent_unit(data, spans))
+    return data[:offset] + b"\n" + format_block(content, indent) + data[offset:]
+
+
+def delete_subtree(data: bytes, span: BlockSpan) -> bytes:
+    """Elimina un bloque con todos sus descendientes."""
+    start, end = _removal(data, span)
+    return data[:start] + data[end:]
+
+
+def move_subtree(data: bytes, spans: typing.Sequence[BlockSpan], source: int, target: int, position: str = "child") -> bytes:
+    """
+    Mueve el subárbol de `source` como último hijo o hermano siguiente de `target`,
+    ajustando su sangría.
+
+    Raises:
+        ValueError: Si la posición no es válida o `target` está dentro del subárbol movido
+    """
+    span = spans[source]
+    if span.start <= spans[target].start <= span.tree_end:
+        raise ValueError("❌ ERROR: No se puede mover un bloque dentro de sí mismo o de sus descendientes")
+    offset, indent = _insertion(spans, target, position, indent_unit(data, spans))
+    segment = _reindent(data[span.start:span.tree_end], span.indent, indent)
+    start, end = _removal(data, span)
+    if offset > start:
+        offset -= end - start
+    data = data[:start] + data[end:]
+    return data[:offset] + b"\n" + segment + data[offset:]
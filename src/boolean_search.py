@@ -0,0 +1,428 @@
+"""
+Búsquedas booleanas y de frases sobre un índice posicional en memoria.
+
+Sintaxis de las consultas (sin distinguir mayúsculas ni acentos en los términos):
+
+- palabras sueltas: `python agente` (equivale a `python AND agente`)
+- frases exactas: `"proyecto apolo"` (palabras consecutivas en la misma línea)
+- operadores AND, OR y NOT en mayúsculas, y paréntesis:
+  `python AND agente NOT borrador`, `(ideas OR notas) AND "mi canción"`
+
+NOT tiene más precedencia que AND, y AND más que OR; `a NOT b` equivale a
+`a AND NOT b`.
+
+El índice guarda, por cada término, dos listas codificadas con deltas en varint
+(enteros de 7 bits por byte): los documentos que lo contienen (diferencia con el
+anterior y número de apariciones) y las posiciones de cada aparición (diferencia
+con la anterior dentro del documento). Así ocupa una fracción de la lista sin
+comprimir, y los identificadores nuevos (siempre crecientes, como en
+src/trigram_index.py) se añaden al final sin reordenar nada.
+
+Al evaluar, las listas de documentos decodificadas se guardan en caché, las
+intersecciones empiezan por la lista más corta (con búsqueda binaria en las demás)
+y las posiciones solo se decodifican para comprobar frases.
+"""
+
+import bisect
+import heapq
+import pathlib
+import re
+import typing
+
+from src.file_index import FileIndex
+from src.storage import FileStat, StorageBackend
+from src.trigram_index import fold
+
+
+_WORD_RE = re.compile(r"\w+")
+_TOKEN_RE = re.compile(r'\s*(?:(\()|(\))|"([^"]*)"|([^\s()"]+))')
+
+# Nodo del árbol de una consulta: ("term", término), ("phrase", [términos]),
+# ("and", [nodos]), ("or", [nodos]) o ("not", nodo)
+QueryNode = tuple
+
+
+def tokenize(text: str) -> list[str]:
+    """Palabras de un texto en minúsculas y sin acentos."""
+    return _WORD_RE.findall(fold(text))
+
+
+def _encode_varint(value: int, out: bytearray) -> None:
+    while value >= 0x80:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def _decode_varints(data: bytes) -> typing.Iterator[int]:
+    value = 0
+    shift = 0
+    for byte in data:
+        value |= (byte & 0x7F) << shift
+        if byte & 0x80:
+            shift += 7
+        else:
+            yield value
+            value = 0
+            shift = 0
+
+
+def parse_query(query: str) -> QueryNode:
+    """
+    Convierte una consulta en su árbol de evaluación.
+
+    Raises:
+        ValueError: Si la consulta está vacía o no es sintácticamente válida
+    """
+    tokens: list[tuple[str, typing.Any]] = []
+    position = 0
+    query = query.strip()
+    while position < len(query):
+        match = _TOKEN_RE.match(query, position)
+        if match is None or match.end() == position:
+            raise ValueError(f"❌ ERROR: Consulta no válida {query!r}: comillas sin cerrar")
+        position = match.end()
+        open_paren, close_paren, phrase, word = match.groups()
+        if open_paren:
+            tokens.append(("(", None))
+        elif close_paren:
+            tokens.append((")", None))
+        elif phrase is not None:
+            terms = tokenize(phrase)
+            if terms:
+                tokens.append(("operand", ("term", terms[0]) if len(terms) == 1 else ("phrase", terms)))
+        elif word in ("AND", "OR", "NOT"):
+            tokens.append((word, None))
+        else:
+            # Una "palabra" con signos (ej: "agente-ia") es una frase de varias palabras
+            terms = tokenize(word)
+            if terms:
+                tokens.append(("operand", ("term", terms[0]) if len(terms) == 1 else ("phrase", terms)))
+
+    index = 0
+
+    def peek() -> typing.Optional[str]:
+        return tokens[index][0] if index < len(tokens) else None
+
+    def take() -> tuple[str, typing.Any]:
+        nonlocal index
+        if index >= len(tokens):
+            raise ValueError(f"❌ ERROR: Consulta no válida {query!r}: termina de forma inesperada")
+        index += 1
+        return tokens[index - 1]
+
+    def parse_or() -> QueryNode:
+        children = [parse_and()]
+        while peek() == "OR":
+            take()
+            children.append(parse_and())
+        return children[0] if len(children) == 1 else ("or", children)
+
+    def parse_and() -> QueryNode:
+        children = [parse_unary()]
+        while peek() in ("AND", "NOT", "operand", "("):
+            if peek() == "AND":
+                take()
+            children.append(parse_unary())
+        return children[0] if len(children) == 1 else ("and", children)
+
+    def parse_unary() -> QueryNode:
+        if peek() == "NOT":
+            take()
+            return ("not", parse_unary())
+        kind, value = take()
+        if kind == "operand":
+            return value
+        if kind == "(":
+            node = parse_or()
+            if take()[0] != ")":
+                raise ValueError(f"❌ ERROR: Consulta no válida {query!r}: falta ')'")
+            return node
+        raise ValueError(f"❌ ERROR: Consulta no válida {query!r}: '{kind}' inesperado")
+
+    if not tokens:
+        raise ValueError(f"❌ ERROR: Consulta vacía: {query!r}")
+    tree = parse_or()
+    if index != len(tokens):
+        raise ValueError(f"❌ ERROR: Consulta no válida {query!r}: '{tokens[index][0]}' inesperado")
+    return tree
+
+
+def _intersect(lists: list[list[int]]) -> list[int]:
+    """Intersección de listas ordenadas: recorre la más corta y busca en las demás."""
+    lists = sorted(lists, key=len)
+    result = lists[0]
+    for other in lists[1:]:
+        if not result:
+            break
+        kept = []
+        low = 0
+        for item in result:
+            low = bisect.bisect_left(other, item, low)
+            if low == len(other):
+                break
+            if other[low] == item:
+                kept.append(item)
+        result = kept
+    return result
+
+
+def _union(lists: list[list[int]]) -> list[int]:
+    """Unión de listas ordenadas, sin repetidos."""
+    result = []
+    for item in heapq.merge(*lists):
+        if not result or result[-1] != item:
+            result.append(item)
+    return result
+
+
+def _subtract(items: list[int], excluded: list[int]) -> list[int]:
+    """Elementos de `items` que no están en `excluded` (ambas ordenadas)."""
+    excluded_set = set(excluded)
+    return [item for item in items if item not in excluded_set]
+
+
+class _Document(typing.NamedTuple):
+    path: str
+    kind: str
+    stat: tuple[int, int]  # (mtime_ns, tamaño) con el que se indexó
+    terms: frozenset[str]
+
+
+class BooleanIndex(FileIndex):
+    """Índice posicional de páginas y diarios con actualizaciones incrementales."""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self._documents: dict[int, _Document] = {}
+        self._document_by_path: dict[str, int] = {}
+        self._next_document = 0
+        # Por término: documentos (delta, apariciones) y posiciones (deltas)
+        self._doc_postings: dict[str, bytearray] = {}
+        self._position_postings: dict[str, bytearray] = {}
+        self._last_document: dict[str, int] = {}
+        self._document_frequency: dict[str, int] = {}
+        # Listas de documentos ya decodificadas (se invalidan al cambiar el término)
+        self._decoded: dict[str, list[int]] = {}
+        self._dead_documents = 0
+
+    def __len__(self) -> int:
+        """Número de documentos indexados."""
+        return len(self._documents)
+
+    # --- Altas y bajas ---
+
+    def _add_document(self, path: str, kind: str, stat: tuple[int, int], content: str) -> None:
+        document_id = self._next_document
+        self._next_document += 1
+
+        positions: dict[str, list[int]] = {}
+        position = 0
+        for line in content.splitlines():
+            for term in tokenize(line):
+                positions.setdefault(term, []).append(position)
+                position += 1
+            # Hueco entre líneas: una frase nunca une el final de una línea con la siguiente
+            position += 1
+
+        for term, term_positions in positions.items():
+            doc_postings = self._doc_postings.get(term)
+            if doc_postings is None:
+                doc_postings = self._doc_postings[term] = bytearray()
+                self._position_postings[term] = bytearray()
+            _encode_varint(document_id - self._last_document.get(term, 0), doc_postings)
+            _encode_varint(len(term_positions), doc_postings)
+            position_postings = self._position_postings[term]
+            previous = 0
+            for term_position in term_positions:
+                _encode_varint(term_position - previous, position_postings)
+                previous = term_position
+            self._last_document[term] = document_id
+            self._document_frequency[term] = self._document_frequency.get(term, 0) + 1
+            self._decoded.pop(term, None)
+
+        self._documents[document_id] = _Document(path, kind, stat, frozenset(positions))
+        self._document_by_path[path] = document_id
+
+    def _remove_document(self, path: str) -> None:
+        document_id = self._document_by_path.pop(path, None)
+        if document_id is None:
+            return
+        # Las listas conservan el identificador: se filtra al consultar
+        for term in self._documents.pop(document_id).terms:
+            self._document_frequency[term] -= 1
+            self._decoded.pop(term, None)
+        self._dead_documents += 1
+
+    def _compact(self) -> None:
+        """Reescribe las listas sin los documentos borrados (los identificadores no cambian)."""
+        for term in list(self._doc_postings):
+            doc_values = _decode_varints(self._doc_postings[term])
+            position_values = _decode_varints(self._position_postings[term])
+            doc_postings = bytearray()
+            position_postings = bytearray()
+            document_id = 0
+            last_kept = 0
+            for delta in doc_values:
+                document_id += delta
+                count = next(doc_values)
+                deltas = [next(position_values) for _ in range(count)]
+                if document_id not in self._documents:
+                    continue
+                _encode_varint(document_id - last_kept, doc_postings)
+                _encode_varint(count, doc_postings)
+                for position_delta in deltas:
+                    _encode_varint(position_delta, position_postings)
+                last_kept = document_id
+
+            if doc_postings:
+                self._doc_postings[term] = doc_postings
+                self._position_postings[term] = position_postings
+                self._last_document[term] = last_kept
+            else:
+                for table in (self._doc_postings, self._position_postings, self._last_document, self._document_frequency):
+                    table.pop(term, None)
+        self._decoded.clear()
+        self._dead_documents = 0
+
+    def _after_changes(self) -> None:
+        if self._dead_documents > 1024 and self._dead_documents > len(self._documents):
+            self._compact()
+
+    def _known_stats(self, kind: typing.Optional[str]) -> dict[str, tuple[int, int]]:
+        return {document.path: document.stat for document in self._documents.values() if document.kind == kind}
+
+    def _stat_of(self, path: str) -> typing.Optional[tuple[int, int]]:
+        document_id = self._document_by_path.get(path)
+        return None if document_id is None else self._documents[document_id].stat
+
+    def _refresh(
+        self,
+        storage: StorageBackend,
+        path: str,
+        kind: typing.Optional[str],
+        stat: typing.Optional[FileStat],
+    ) -> bool:
+        document_id = self._document_by_path.get(path)
+        if stat is None:
+            if document_id is None:
+                return False
+            self._remove_document(path)
+            return True
+
+        try:
+            content = storage.read_text(pathlib.Path(path))
+        except (IOError, OSError, UnicodeDecodeError):
+            content = ""
+        self._remove_document(path)
+        self._add_document(path, kind, (stat.mtime_ns, stat.size), content)
+        return True
+
+    # --- Evaluación ---
+
+    def _documents_with(self, term: str) -> list[int]:
+        """Documentos vivos que contienen el término, ordenados."""
+        cached = self._decoded.get(term)
+        if cached is not None:
+            return cached
+        documents = []
+        values = _decode_varints(self._doc_postings.get(term, b""))
+        document_id = 0
+        for delta in values:
+            document_id += delta
+            next(values)  # número de apariciones
+            if document_id in self._documents:
+                documents.append(document_id)
+        self._decoded[term] = documents
+        return documents
+
+    def _positions(self, term: str, wanted: set[int]) -> dict[int, set[int]]:
+        """Posiciones del término en los documentos de `wanted`."""
+        result = {}
+        doc_values = _decode_varints(self._doc_postings.get(term, b""))
+        position_values = _decode_varints(self._position_postings.get(term, b""))
+        document_id = 0
+        for delta in doc_values:
+            document_id += delta
+            count = next(doc_values)
+            position = 0
+            positions = set()
+            for _ in range(count):
+                position += next(position_values)
+                positions.add(position)
+            if document_id in wanted:
+                result[document_id] = positions
+        return result
+
+    def _estimate(self, node: QueryNode) -> int:
+        """Tamaño aproximado del resultado de un nodo, para evaluar primero lo más selectivo."""
+        kind = node[0]
+        if kind == "term":
+            return self._document_frequency.get(node[1], 0)
+        if kind == "phrase":
+            return min(self._document_frequency.get(term, 0) for term in node[1])
+        if kind == "and":
+            positives = [self._estimate(child) for child in node[1] if child[0] != "not"]
+            return min(positives) if positives else len(self._documents)
+        if kind == "or":
+            return sum(self._estimate(child) for child in node[1])
+        return len(self._documents)
+
+    def _evaluate(self, node: QueryNode) -> list[int]:
+        kind = node[0]
+        if kind == "term":
+            return self._documents_with(node[1])
+        if kind == "phrase":
+            terms = node[1]
+            candidates = _intersect([self._documents_with(term) for term in terms])
+            if not candidates:
+                return []
+            wanted = set(candidates)
+            positions = [self._positions(term, wanted) for term in terms]
+            return [
+                document_id for document_id in candidates
+                if any(
+                    all(start + offset in positions[offset][document_id] for offset in range(1, len(terms)))
+                    for start in positions[0][document_id]
+                )
+            ]
+        if kind == "or":
+            return _union([self._evaluate(child) for child in node[1]])
+        if kind == "not":
+            return _subtract(sorted(self._documents), self._evaluate(node[1]))
+
+        # AND: positivos de más a menos selectivo, parando en cuanto no queda nada;
+        # los NOT se restan al final
+        positives = sorted((child for child in node[1] if child[0] != "not"), key=self._estimate)
+        negatives = [child[1] for child in node[1] if child[0] == "not"]
+        if positives:
+            result = self._evaluate(positives[0])
+            for child in positives[1:]:
+                if not result:
+                    return []
+                result = _intersect([result, self._evaluate(child)])
+        else:
+            result = sorted(self._documents)
+        for child in negatives:
+            if not result:
+                break
+            result = _subtract(result, self._evaluate(child))
+        return result
+
+    def search(self, query: str, kind: typing.Optional[str] = None) -> list[pathlib.Path]:
+        """
+        Archivos que cumplen la consulta, ordenados por ruta.
+
+        Args:
+            query: Consulta booleana (ver la sintaxis al principio del módulo)
+            kind: Tipo de documento ("page" o "journal"); None para todos
+
+        Raises:
+            ValueError: Si la consulta no es válida
+        """
+        tree = parse_query(query)
+        with self._lock:
+            documents = [self._documents[document_id] for document_id in self._evaluate(tree)]
+        # Ordenar las rutas como texto es mucho más barato que comparar objetos Path
+        paths = sorted(document.path for document in documents if kind is None or document.kind == kind)
+        return [pathlib.Path(path) for path in paths]
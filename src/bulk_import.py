@@ -0,0 +1,405 @@
+"""
+Importación masiva de volcados de notas (directorios Markdown o CSV) al grafo.
+
+Migrar miles de notas con append_to_page supone una comprobación y una escritura por
+nota. bulk_import() recorre el origen en streaming, agrupa los bloques por página de
+destino y escribe cada archivo una sola vez por tanda:
+
+- Markdown: cada archivo *.md del directorio (y sus subdirectorios) va a la página de
+  su ruta relativa ("Proyectos/Apolo.md" → "Proyectos/Apolo"). Las líneas se
+  convierten en bloques (ver markdown_to_blocks) en un pool de procesos.
+- CSV: cada fila es un bloque. La columna de página indica el destino; si está vacía
+  y hay fecha (AAAA-MM-DD), el bloque va al diario de ese día. El módulo csv ya lee
+  en C, así que las filas se procesan en el proceso principal.
+
+Los bloques se acumulan hasta max_pending_bytes y entonces se escribe cada página
+afectada de una vez. Tras cada tanda se guarda un checkpoint JSON con cuántas fuentes
+(archivos o filas) se han escrito: si la importación se interrumpe, al relanzarla con
+el mismo checkpoint continúa donde se quedó. Antes de escribir una tanda el checkpoint
+anota sus páginas con el hash del texto; al reanudar, una página de esa tanda que ya
+termina con ese texto no se vuelve a escribir, así que no se duplican bloques.
+
+Uso:
+    python -m src.bulk_import /ruta/al/volcado --checkpoint importacion.json
+    python -m src.bulk_import notas.csv --page-column titulo --content-column texto
+"""
+
+import argparse
+import concurrent.futures
+import csv
+import hashlib
+import itertools
+import json
+import os
+import pathlib
+import re
+import sys
+import time
+import typing
+from datetime import date
+
+from src.blocks import block_text
+from src.title_registry import title_from_filename
+
+if typing.TYPE_CHECKING:
+    from src.logseq_manager import LogseqManager
+
+
+# Bytes de bloques acumulados antes de escribir una tanda
+DEFAULT_MAX_PENDING_BYTES = 8 * 1024 * 1024
+
+# Archivos Markdown que se reparten al pool de una vez (acota la memoria del streaming)
+_WINDOW_PER_WORKER = 64
+
+_CHECKPOINT_VERSION = 1
+
+_LIST_ITEM_RE = re.compile(r"^(?:[-*+]|\d+[.)])\s+")
+
+
+class ImportProgress(typing.NamedTuple):
+    """Estado de una importación (también el resultado final de bulk_import)."""
+    sources_done: int    # Archivos o filas procesados, incluidos los de una ejecución anterior
+    sources_total: typing.Optional[int]  # Total de archivos (None para CSV: se lee en streaming)
+    blocks: int          # Bloques escritos en esta ejecución
+    pages_written: int   # Escrituras de página o diario en esta ejecución
+    skipped: int         # Fuentes sin contenido (archivos vacíos, filas sin texto o sin destino)
+    elapsed: float       # Segundos desde el inicio de esta ejecución
+
+    @property
+    def blocks_per_second(self) -> float:
+        return self.blocks / self.elapsed if self.elapsed > 0 else 0.0
+
+
+def markdown_to_blocks(text: str) -> list[str]:
+    """
+    Convierte un documento Markdown en líneas de bloques de Logseq.
+
+    - Las líneas que ya son bloques se conservan con su sangría; los elementos de lista
+      con "*", "+" o "1." pasan a "- " conservando la sangría.
+    - Cada párrafo o título es un bloque de primer nivel ("# Título" → "- # Título").
+    - Un bloque de código (```) se conserva entero bajo el bloque que lo abre.
+    - Las líneas vacías se descartan.
+
+    Example:
+        markdown_to_blocks("# Compras\\n\\n* Pan\\n  * Integral") →
+            ["- # Compras", "- Pan", "  - Integral"]
+    """
+    blocks: list[str] = []
+    in_fence = False
+    for line in text.splitlines():
+        stripped = line.strip()
+        if in_fence:
+            blocks.append(f"  {line.rstrip()}")
+            if stripped.startswith("```"):
+                in_fence = False
+            continue
+        if not stripped:
+            continue
+
+        indent = line[: len(line) - len(line.lstrip())]
+        if block_text(line) is not None:
+            blocks.append(line.rstrip())
+        elif stripped[0] in "*+" and _LIST_ITEM_RE.match(stripped):
+            blocks.append(f"{indent}- {_LIST_ITEM_RE.sub('', stripped, count=1)}")
+        elif indent and blocks and _LIST_ITEM_RE.match(stripped) is None:
+            # Continuación sangrada de un elemento de lista (texto en varias líneas)
+            blocks.append(line.rstrip())
+        else:
+            blocks.append(f"{indent}- {stripped}")
+        # Una línea con un número impar de ``` abre un bloque de código
+        if stripped.count("```") % 2 == 1:
+            in_fence = True
+    return blocks
+
+
+def _parse_markdown_file(path: str) -> list[str]:
+    """Lee y convierte un archivo (se ejecuta en los procesos del pool)."""
+    try:
+        with open(path, encoding='utf-8', errors='replace') as file:
+            return markdown_to_blocks(file.read())
+    except OSError:
+        return []
+
+
+def _markdown_title(relative: pathlib.PurePath) -> str:
+    """Título de página de un archivo del volcado: los directorios son espacios de nombres."""
+    segments = [*relative.parts[:-1], relative.stem]
+    return "/".join(title_from_filename(segment) for segment in segments)
+
+
+# Destino de los bloques: (es_diario, título de página o nombre del diario AAAA_MM_DD)
+_Target = tuple[bool, str]
+# Unidad de entrada ya procesada: (nombre de la fuente, destino o None, líneas de bloques)
+_Parsed = tuple[str, typing.Optional[_Target], list[str]]
+
+
+def _iter_markdown(
+    source: pathlib.Path,
+    files: list[pathlib.Path],
+    workers: int,
+) -> typing.Iterator[_Parsed]:
+    """Convierte los archivos en orden, repartiendo el trabajo entre `workers` procesos."""
+    def parsed(chunk: list[pathlib.Path], blocks: typing.Iterable[list[str]]) -> typing.Iterator[_Parsed]:
+        for path, lines in zip(chunk, blocks):
+            relative = path.relative_to(source)
+            yield relative.as_posix(), (False, _markdown_title(relative)), lines
+
+    if workers <= 1:
+        yield from parsed(files, map(_parse_markdown_file, map(str, files)))
+        return
+
+    window = workers * _WINDOW_PER_WORKER
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+        for start in range(0, len(files), window):
+            chunk = files[start:start + window]
+            yield from parsed(chunk, executor.map(_parse_markdown_file, map(str, chunk), chunksize=16))
+
+
+def _iter_csv(
+    source: pathlib.Path,
+    skip: int,
+    page_column: str,
+    content_column: str,
+    date_column: str,
+) -> typing.Iterator[_Parsed]:
+    """Recorre las filas del CSV desde la fila `skip` (sin contar la cabecera)."""
+    with open(source, encoding='utf-8', newline='') as file:
+        reader = csv.DictReader(file)
+        if reader.fieldnames is None or content_column not in reader.fieldnames:
+            raise ValueError(f"❌ ERROR: El CSV no tiene la columna de contenido '{content_column}'")
+        for number, row in enumerate(itertools.islice(reader, skip, None), start=skip + 1):
+            content = (row.get(content_column) or "").strip()
+            page = (row.get(page_column) or "").strip()
+            day = (row.get(date_column) or "").strip()
+            target: typing.Optional[_Target] = None
+            if page:
+                target = (False, page)
+            elif day:
+                try:
+                    target = (True, date.fromisoformat(day).strftime("%Y_%m_%d"))
+                except ValueError:
+                    target = None
+            # Los saltos de línea del contenido se conservan como continuación del bloque
+            lines = [f"- {content}".replace("\n", "\n  ")] if content else []
+            yield f"fila {number}", target, lines
+
+
+def _text_hash(text: str) -> str:
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+class _Checkpoint:
+    """Checkpoint JSON de una importación, escrito de forma atómica."""
+
+    def __init__(self, path: typing.Optional[pathlib.Path], source: pathlib.Path) -> None:
+        self.path = path
+        self.source = str(source.resolve())
+        self.position = 0                  # Fuentes ya escritas
+        self.last: typing.Optional[str] = None  # Nombre de la última (para validar al reanudar)
+        self.pending: dict[str, str] = {}  # Páginas de la tanda en curso → hash del texto
+        if path is not None and path.exists():
+            self._load()
+
+    def _load(self) -> None:
+        try:
+            data = json.loads(self.path.read_text(encoding='utf-8'))
+        except (OSError, ValueError) as error:
+            raise ValueError(f"❌ ERROR: No se puede leer el checkpoint {self.path}: {error}") from None
+        if data.get("version") != _CHECKPOINT_VERSION or data.get("source") != self.source:
+            raise ValueError(
+                f"❌ ERROR: El checkpoint {self.path} es de otra importación ({data.get('source')})"
+            )
+        self.position = data["position"]
+        self.last = data.get("last")
+        self.pending = data.get("pending", {})
+
+    def save(self) -> None:
+        if self.path is None:
+            return
+        data = {
+            "version": _CHECKPOINT_VERSION,
+            "source": self.source,
+            "position": self.position,
+            "last": self.last,
+            "pending": self.pending,
+        }
+        temp_path = self.path.with_name(f"{self.path.name}.tmp")
+        temp_path.write_text(json.dumps(data, ensure_ascii=False), encoding='utf-8')
+        os.replace(temp_path, self.path)
+
+
+def _target_key(target: _Target) -> str:
+    is_journal, title = target
+    return f"journals/{title}" if is_journal else f"pages/{title}"
+
+
+def _write_group(manager: "LogseqManager", target: _Target, text: str, check_applied: bool) -> bool:
+    """
+    Añade el texto de una tanda a su página o diario con una sola escritura.
+
+    Con check_applied (páginas de la tanda interrumpida), no escribe si el archivo ya
+    termina con ese texto. Devuelve True si escribió.
+    """
+    is_journal, title = target
+    file_path = manager._get_journal_path(title) if is_journal else manager._get_page_path(title)
+    if not check_applied:
+        manager._append_text(file_path, text)
+        return True
+
+    def append_once(content: typing.Optional[str]) -> tuple[typing.Optional[str], bool]:
+        if content is not None and content.endswith(text):
+            return None, False
+        return (f"{content}\n{text}" if content else text), True
+
+    return manager._modify_file(file_path, append_once)
+
+
+def bulk_import(
+    manager: "LogseqManager",
+    source: typing.Union[str, pathlib.Path],
+    checkpoint: typing.Union[str, pathlib.Path, None] = None,
+    workers: typing.Optional[int] = None,
+    max_pending_bytes: int = DEFAULT_MAX_PENDING_BYTES,
+    progress: typing.Optional[typing.Callable[[ImportProgress], None]] = None,
+    progress_interval: float = 1.0,
+    page_column: str = "page",
+    content_column: str = "content",
+    date_column: str = "date",
+) -> ImportProgress:
+    """
+    Importa un directorio Markdown o un archivo CSV al grafo.
+
+    Args:
+        manager: Gestor del grafo de destino
+        source: Directorio con archivos *.md o archivo .csv
+        checkpoint: Archivo JSON para reanudar la importación (se crea si no existe)
+        workers: Procesos para convertir el Markdown (por defecto, uno por CPU; 1 para
+            no usar pool)
+        max_pending_bytes: Bytes de bloques acumulados antes de escribir una tanda
+        progress: Se llama con el estado tras cada tanda y cada progress_interval segundos
+        progress_interval: Segundos mínimos entre dos llamadas a `progress`
+        page_column: Columna CSV con el título de la página de destino
+        content_column: Columna CSV con el contenido del bloque
+        date_column: Columna CSV con la fecha (AAAA-MM-DD) para las filas sin página
+
+    Returns:
+        ImportProgress: Estado final de la importación
+
+    Raises:
+        ValueError: Si el origen no existe, el CSV no tiene la columna de contenido o
+            el checkpoint es de otra importación o no cuadra con el origen
+    """
+    source = pathlib.Path(source)
+    state = _Checkpoint(pathlib.Path(checkpoint) if checkpoint is not None else None, source)
+    started = time.monotonic()
+
+    if source.is_dir():
+        files = sorted(path for path in source.rglob("*.md") if path.is_file())
+        if state.position:
+            # El orden de los archivos tiene que ser el mismo que en la ejecución anterior
+            if state.position > len(files) or files[state.position - 1].relative_to(source).as_posix() != state.last:
+                raise ValueError(f"❌ ERROR: El directorio {source} cambió desde el checkpoint; no se puede reanudar")
+        total: typing.Optional[int] = len(files)
+        units = _iter_markdown(source, files[state.position:], workers or os.cpu_count() or 1)
+    elif source.is_file() and source.suffix.lower() == ".csv":
+        total = None
+        units = _iter_csv(source, state.position, page_column, content_column, date_column)
+    else:
+        raise ValueError(f"❌ ERROR: El origen debe ser un directorio con archivos .md o un archivo .csv: {source}")
+
+    # Tanda en curso: destino → líneas (los dict conservan el orden de llegada)
+    groups: dict[_Target, list[str]] = {}
+    pending_bytes = 0
+    done = state.position
+    last = state.last
+    blocks = pages_written = skipped = 0
+    last_report = started
+
+    def report() -> None:
+        nonlocal last_report
+        last_report = time.monotonic()
+        if progress is not None:
+            progress(ImportProgress(done, total, blocks, pages_written, skipped, last_report - started))
+
+    def flush() -> None:
+        nonlocal groups, pending_bytes, blocks, pages_written
+        if groups:
+            texts = {target: "\n".join(lines) for target, lines in groups.items()}
+            # Una tanda interrumpida a medias se reconoce al reanudar por estos hashes
+            resumed = state.pending
+            state.pending = {_target_key(target): _text_hash(text) for target, text in texts.items()}
+            state.save()
+            for target, text in texts.items():
+                check = resumed.get(_target_key(target)) == _text_hash(text)
+                if _write_group(manager, target, text, check):
+                    pages_written += 1
+                    # Las líneas de continuación (texto en varias líneas, código) no son bloques
+                    blocks += sum(1 for line in groups[target] if block_text(line) is not None)
+        state.position, state.last, state.pending = done, last, {}
+        state.save()
+        groups, pending_bytes = {}, 0
+        report()
+
+    for name, target, lines in units:
+        done += 1
+        last = name
+        if target is None or not lines:
+            skipped += 1
+        else:
+            groups.setdefault(target, []).extend(lines)
+            pending_bytes += sum(len(line) + 1 for line in lines)
+        if pending_bytes >= max_pending_bytes:
+            flush()
+        elif time.monotonic() - last_report >= progress_interval:
+            report()
+    flush()
+    return ImportProgress(done, total, blocks, pages_written, skipped, time.monotonic() - started)
+
+
+def _print_progress(status: ImportProgress) -> None:
+    total = f"/{status.sources_total}" if status.sources_total is not None else ""
+    print(
+        f"📦 {status.sources_done}{total} fuentes · {status.blocks} bloques · "
+        f"{status.pages_written} páginas escritas · {status.blocks_per_second:.0f} bloques/s",
+        flush=True,
+    )
+
+
+def main(argv: typing.Optional[list[str]] = None) -> int:
+    from dotenv import load_dotenv
+
+    from src.logseq_manager import LogseqManager
+
+    parser = argparse.ArgumentParser(description="Importación masiva de notas Markdown o CSV a Logseq")
+    parser.add_argument("source", help="Directorio con archivos .md o archivo .csv")
+    parser.add_argument("--graph", default=None, help="Ruta del grafo (por defecto LOGSEQ_GRAPH_PATH)")
+    parser.add_argument("--checkpoint", default=None, help="Archivo JSON para reanudar la importación")
+    parser.add_argument("--workers", type=int, default=None, help="Procesos para convertir el Markdown")
+    parser.add_argument("--page-column", default="page", help="Columna CSV con la página de destino")
+    parser.add_argument("--content-column", default="content", help="Columna CSV con el contenido")
+    parser.add_argument("--date-column", default="date", help="Columna CSV con la fecha de las filas sin página")
+    args = parser.parse_args(argv)
+
+    load_dotenv()
+    graph_path = args.graph or os.getenv('LOGSEQ_GRAPH_PATH')
+    if not graph_path:
+        print("❌ ERROR: Indica el grafo con --graph o la variable LOGSEQ_GRAPH_PATH")
+        return 1
+    try:
+        manager = LogseqManager(graph_path)
+        result = bulk_import(
+            manager, args.source, checkpoint=args.checkpoint, workers=args.workers, progress=_print_progress,
+            page_column=args.page_column, content_column=args.content_column, date_column=args.date_column,
+        )
+    except ValueError as e:
+        print(e)
+        return 1
+    print(
+        f"✅ Importación completada: {result.blocks} bloques en {result.pages_written} escrituras "
+        f"({result.skipped} fuentes vacías) en {result.elapsed:.1f} s"
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
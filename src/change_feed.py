@@ -0,0 +1,380 @@
+"""
+Flujo de cambios del grafo: eventos estructurados para las herramientas que lo siguen.
+
+En lugar de sondear el directorio del grafo, un servicio de búsqueda o un panel se
+suscribe al gestor y recibe un ChangeEvent por cada escritura (página, operación,
+bloques afectados, mtime nuevo). Los cambios hechos por fuera del gestor (Logseq, un
+demonio de sincronización) los detecta ExternalChangeWatcher comparando mtime y tamaño
+de pages/ y journals/, y llegan como eventos con external=True.
+
+Hay tres formas de consumirlos:
+
+- subscribe(callback): la función se llama en el hilo que escribe, al momento. Sus
+  excepciones se cuentan en `callback_errors` y no interrumpen la escritura.
+- events(maxsize): un iterador asíncrono (async for) con una cola acotada. Si el
+  consumidor no da abasto, el escritor espera hasta `block_timeout` segundos a que
+  haya sitio (contrapresión); pasado ese tiempo, o con overflow="drop", se descarta el
+  evento más antiguo y se cuenta en `dropped`.
+- ChangeFeedServer: exporta los eventos como JSON-lines por un socket Unix local, una
+  línea por evento, a todos los clientes conectados.
+
+asyncio solo se importa al consumir un iterador asíncrono.
+"""
+
+import collections
+import json
+import os
+import pathlib
+import socketserver
+import threading
+import typing
+
+from src.blocks import block_text
+from src.daemon import _remove_stale_socket
+from src.storage import StorageBackend
+from src.undo_log import line_diff
+
+
+class ChangeEvent(typing.NamedTuple):
+    """Un cambio en un archivo del grafo."""
+    path: pathlib.Path
+    kind: str                        # "page" o "journal"
+    title: str                       # Título de la página o nombre del diario ("2025_01_15")
+    operation: str                   # "create", "append", "modify", "rename" o "delete"
+    blocks: tuple[str, ...] = ()     # Textos de los bloques añadidos, cambiados o eliminados
+    mtime_ns: typing.Optional[int] = None  # mtime tras el cambio (None si el archivo ya no existe)
+    external: bool = False           # True si no lo escribió este gestor
+    previous: typing.Optional[str] = None  # Título anterior, en los renombrados
+
+    def to_json(self) -> dict:
+        """El evento como diccionario serializable a JSON."""
+        data = self._asdict()
+        data["path"] = str(self.path)
+        data["blocks"] = list(self.blocks)
+        return data
+
+
+def changed_blocks(before: str, after: str) -> tuple[str, ...]:
+    """
+    Textos de los bloques de las líneas que cambian entre dos versiones, sin repetir.
+
+    Example:
+        changed_blocks("- A\\n- B", "- A\\n- C") → ("B", "C")
+    """
+    found: dict[str, None] = {}
+    for _, _, old, new in line_diff(before, after):
+        for line in old + new:
+            text = block_text(line)
+            if text is not None:
+                found[text] = None
+    return tuple(found)
+
+
+class EventStream:
+    """
+    Iterador asíncrono de eventos con cola acotada (ver ChangeFeed.events).
+
+    La cola es segura entre hilos: los eventos se publican desde los hilos que escriben
+    y se consumen en el bucle de asyncio del suscriptor.
+    """
+
+    def __init__(self, feed: "ChangeFeed", maxsize: int, overflow: str, block_timeout: float) -> None:
+        self._feed = feed
+        self._maxsize = maxsize
+        self._overflow = overflow
+        self._block_timeout = block_timeout
+        self._queue: collections.deque[ChangeEvent] = collections.deque()
+        self._condition = threading.Condition()
+        self._loop = None
+        self._ready = None
+        self._closed = False
+        self.dropped = 0
+
+    def __len__(self) -> int:
+        return len(self._queue)
+
+    def _put(self, event: ChangeEvent) -> None:
+        with self._condition:
+            if self._closed:
+                return
+            if len(self._queue) >= self._maxsize and self._overflow == "block":
+                # Contrapresión: el escritor espera a que el consumidor saque eventos
+                self._condition.wait_for(
+                    lambda: len(self._queue) < self._maxsize or self._closed, self._block_timeout
+                )
+            if len(self._queue) >= self._maxsize:
+                self._queue.popleft()
+                self.dropped += 1
+            self._queue.append(event)
+            self._wake()
+
+    def _wake(self) -> None:
+        # Se llama con el lock tomado; el evento de asyncio solo se toca desde su bucle
+        if self._loop is not None and not self._loop.is_closed():
+            self._loop.call_soon_threadsafe(self._ready.set)
+
+    def __aiter__(self) -> "EventStream":
+        return self
+
+    async def __anext__(self) -> ChangeEvent:
+        import asyncio
+
+        while True:
+            with self._condition:
+                if self._loop is None:
+                    self._loop = asyncio.get_running_loop()
+                    self._ready = asyncio.Event()
+                if self._queue:
+                    event = self._queue.popleft()
+                    self._condition.notify_all()
+                    return event
+                if self._closed:
+                    raise StopAsyncIteration
+                self._ready.clear()
+            await self._ready.wait()
+
+    def close(self) -> None:
+        """Deja de recibir eventos; el iterador termina al vaciar la cola."""
+        self._feed._remove(self._put)
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+            self._wake()
+
+
+class ChangeFeed:
+    """
+    Bus de eventos de cambio en el proceso.
+
+    Es seguro entre hilos. Publicar sin suscriptores no cuesta nada más que mirar
+    `active`.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._subscribers: list[typing.Callable[[ChangeEvent], None]] = []
+        self.published = 0
+        self.callback_errors = 0
+
+    @property
+    def active(self) -> bool:
+        """True si hay algún suscriptor."""
+        return bool(self._subscribers)
+
+    def subscribe(self, callback: typing.Callable[[ChangeEvent], None]) -> typing.Callable[[], None]:
+        """
+        Llama a `callback` con cada evento, en el hilo que lo publica.
+
+        Returns:
+            Función sin argumentos que cancela la suscripción
+        """
+        with self._lock:
+            self._subscribers = self._subscribers + [callback]
+        return lambda: self._remove(callback)
+
+    def _remove(self, callback: typing.Callable[[ChangeEvent], None]) -> None:
+        with self._lock:
+            self._subscribers = [subscriber for subscriber in self._subscribers if subscriber != callback]
+
+    def events(self, maxsize: int = 1000, overflow: str = "block", block_timeout: float = 1.0) -> EventStream:
+        """
+        Iterador asíncrono de los eventos publicados desde ahora.
+
+        Args:
+            maxsize: Eventos que caben en la cola sin consumir
+            overflow: "block" (el escritor espera hasta block_timeout segundos) o "drop"
+                (se descarta el evento más antiguo sin esperar)
+            block_timeout: Espera máxima del escritor con overflow="block"
+
+        Raises:
+            ValueError: Si maxsize no es positivo u overflow no es válido
+
+        Example:
+            async for event in manager.change_feed.events(maxsize=100):
+                print(event.operation, event.title)
+        """
+        if maxsize <= 0:
+            raise ValueError(f"❌ ERROR: maxsize debe ser positivo (valor: {maxsize})")
+        if overflow not in ("block", "drop"):
+            raise ValueError(f"❌ ERROR: overflow debe ser 'block' o 'drop' (valor: '{overflow}')")
+        stream = EventStream(self, maxsize, overflow, block_timeout)
+        self.subscribe(stream._put)
+        return stream
+
+    def publish(self, event: ChangeEvent) -> None:
+        """Entrega un evento a todos los suscriptores."""
+        self.published += 1
+        for callback in self._subscribers:
+            try:
+                callback(event)
+            except Exception:
+                # Un suscriptor con errores no debe hacer fallar la escritura
+                self.callback_errors += 1
+
+
+class ExternalChangeWatcher:
+    """
+    Detecta cambios hechos por fuera del gestor comparando mtime y tamaño de los archivos.
+
+    Las escrituras del propio gestor se anotan con acknowledge(), así que poll() solo
+    publica lo que cambió otro proceso. start() sondea en un hilo en segundo plano.
+    """
+
+    def __init__(
+        self,
+        storage: StorageBackend,
+        directories: dict[str, pathlib.Path],
+        publish: typing.Callable[[ChangeEvent], None],
+        title: typing.Callable[[pathlib.Path], str],
+    ) -> None:
+        """
+        Args:
+            storage: Backend de almacenamiento del grafo
+            directories: Tipo de documento ("page", "journal") → directorio
+            publish: Función que recibe cada evento externo
+            title: Función que da el título de un archivo
+        """
+        self._storage = storage
+        self._directories = directories
+        self._publish = publish
+        self._title = title
+        self._lock = threading.Lock()
+        self._known: dict[pathlib.Path, tuple[int, int]] = {}
+        self._stop = threading.Event()
+        self._thread: typing.Optional[threading.Thread] = None
+        for directory in directories.values():
+            for name, stat in storage.list_stats(directory, "*.md").items():
+                self._known[directory / name] = (stat.mtime_ns, stat.size)
+
+    def acknowledge(self, path: pathlib.Path) -> None:
+        """Anota el estado actual de un archivo que acaba de escribir el gestor."""
+        stat = self._storage.stat(path)
+        with self._lock:
+            if stat is None:
+                self._known.pop(path, None)
+            else:
+                self._known[path] = (stat.mtime_ns, stat.size)
+
+    def poll(self) -> int:
+        """
+        Compara el grafo con el último estado conocido y publica los cambios externos.
+
+        Returns:
+            int: Número de eventos publicados
+        """
+        events = []
+        with self._lock:
+            seen = set()
+            for kind, directory in self._directories.items():
+                for name, stat in self._storage.list_stats(directory, "*.md").items():
+                    path = directory / name
+                    seen.add(path)
+                    previous = self._known.get(path)
+                    current = (stat.mtime_ns, stat.size)
+                    if previous != current:
+                        self._known[path] = current
+                        operation = "create" if previous is None else "modify"
+                        events.append(ChangeEvent(path, kind, self._title(path), operation, (), stat.mtime_ns, True))
+            for path in [path for path in self._known if path not in seen]:
+                del self._known[path]
+                kind = next(kind for kind, directory in self._directories.items() if path.parent == directory)
+                events.append(ChangeEvent(path, kind, self._title(path), "delete", (), None, True))
+        for event in events:
+            self._publish(event)
+        return len(events)
+
+    def start(self, interval: float = 1.0) -> None:
+        """Sondea cada `interval` segundos en un hilo en segundo plano."""
+        if self._thread is not None:
+            return
+
+        def run() -> None:
+            while not self._stop.wait(interval):
+                try:
+                    self.poll()
+                except OSError:
+                    # El grafo puede no estar disponible un momento (un volumen que se
+                    # desmonta, un directorio que se renombra): se reintenta en la siguiente vuelta
+                    pass
+
+        self._thread = threading.Thread(target=run, name="vigilante-grafo", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Detiene el hilo de sondeo."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+
+class _FeedRequestHandler(socketserver.StreamRequestHandler):
+    """Envía a un cliente los eventos como JSON-lines hasta que se desconecta."""
+
+    def handle(self) -> None:
+        server: ChangeFeedServer = self.server
+        # Cola propia por cliente: un cliente lento pierde eventos, no frena al escritor
+        pending: collections.deque[ChangeEvent] = collections.deque(maxlen=server.client_queue_size)
+        ready = threading.Event()
+
+        def enqueue(event: ChangeEvent) -> None:
+            pending.append(event)
+            ready.set()
+
+        unsubscribe = server.feed.subscribe(enqueue)
+        try:
+            while not server.stopping.is_set():
+                if not ready.wait(0.5):
+                    continue
+                ready.clear()
+                while pending:
+                    event = pending.popleft()
+                    line = json.dumps(event.to_json(), ensure_ascii=False) + "\n"
+                    self.wfile.write(line.encode('utf-8'))
+                self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+        finally:
+            unsubscribe()
+
+
+class ChangeFeedServer(socketserver.ThreadingUnixStreamServer):
+    """
+    Exporta un ChangeFeed como JSON-lines por un socket Unix local.
+
+    Cada cliente recibe una línea JSON por evento (ver ChangeEvent.to_json). Con
+    serve_in_background() atiende en un hilo propio.
+
+    Example:
+        socat - UNIX-CONNECT:/run/user/1000/logseq-changes.sock
+    """
+
+    daemon_threads = True
+
+    def __init__(self, feed: ChangeFeed, socket_path: str, client_queue_size: int = 1000) -> None:
+        """
+        Raises:
+            RuntimeError: Si ya hay otro proceso escuchando en esa ruta
+        """
+        self.feed = feed
+        self.socket_path = socket_path
+        self.client_queue_size = client_queue_size
+        self.stopping = threading.Event()
+        _remove_stale_socket(socket_path)
+        super().__init__(socket_path, _FeedRequestHandler)
+        # Solo el usuario propietario puede leer los cambios de su grafo
+        os.chmod(socket_path, 0o600)
+
+    def serve_in_background(self) -> threading.Thread:
+        """Atiende conexiones en un hilo en segundo plano."""
+        thread = threading.Thread(target=self.serve_forever, name="flujo-cambios", daemon=True)
+        thread.start()
+        return thread
+
+    def server_close(self) -> None:
+        self.stopping.set()
+        super().server_close()
+        try:
+            os.unlink(self.socket_path)
+        except FileNotFoundError:
+            pass
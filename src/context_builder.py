@@ -0,0 +1,246 @@
+"""
+Ensamblado de contexto del grafo con un presupuesto de tokens.
+
+Para responder preguntas sobre las notas, el agente no puede volcar páginas enteras
+en el prompt: una página grande lo desbordaría y haría impredecible la latencia.
+build_context() reúne bloques candidatos de tres fuentes:
+
+- búsqueda: bloques relacionados con la pregunta (semantic_search si numpy está
+  instalado; si no, las palabras de la pregunta con search_in_pages),
+- enlaces: los bloques de las páginas citadas como [[Página]] en la pregunta y los
+  bloques de otras páginas o diarios que las enlazan (backlinks),
+- recencia: los bloques de los últimos diarios.
+
+Los ordena por puntuación, descarta los repetidos (mismo texto sin distinguir
+mayúsculas, acentos ni espacios) y los añade hasta agotar el presupuesto. Los tokens
+se estiman sin tokenizador (unos 4 caracteres por token): sobra para acotar el
+tamaño del prompt y no añade dependencias.
+"""
+
+import re
+import typing
+import unicodedata
+
+from src.blocks import iter_blocks
+
+if typing.TYPE_CHECKING:
+    from src.logseq_manager import LogseqManager
+
+
+# Aproximación habitual para texto en lenguas europeas con tokenizadores BPE
+_CHARS_PER_TOKEN = 4
+
+_WORD_RE = re.compile(r"\w+")
+_PAGE_LINK_RE = re.compile(r"\[\[([^\[\]]+)\]\]")
+
+# Palabras demasiado frecuentes para servir como términos de búsqueda
+_STOPWORDS = frozenset(
+    "que con los las del por para una uno unos unas como mas pero sus este esta estos "
+    "estas ese esa eso hay tengo tiene sobre entre cual cuales cuando donde quien "
+    "todo todos toda todas mis tus nos les fue era son ser han has the and".split()
+)
+
+# Puntuaciones base de cada fuente: los bloques de páginas citadas van primero,
+# luego los encontrados por la búsqueda (0-1), los backlinks y los diarios recientes
+_LINKED_PAGE_SCORE = 2.0
+_BACKLINK_SCORE = 0.5
+_RECENT_SCORE = 0.3
+
+
+class ContextBlock(typing.NamedTuple):
+    """Un bloque seleccionado para el contexto."""
+    title: str    # Título de la página o nombre del diario (ej: "2025_01_15")
+    text: str     # Texto del bloque (recortado si superaba max_block_tokens)
+    source: str   # "page", "search", "backlink" o "recent"
+    score: float
+
+
+class NoteContext(typing.NamedTuple):
+    """Contexto ensamblado para una pregunta."""
+    text: str                   # Bloques agrupados por página, listos para el prompt
+    blocks: list[ContextBlock]  # Bloques incluidos, en el orden de `text`
+    tokens: int                 # Tokens estimados de `text`
+    dropped: int                # Candidatos que no cupieron en el presupuesto
+
+
+def estimate_tokens(text: str) -> int:
+    """Estimación barata del número de tokens de un texto (sin tokenizador)."""
+    return (len(text) + _CHARS_PER_TOKEN - 1) // _CHARS_PER_TOKEN
+
+
+def _fold(text: str) -> str:
+    """Minúsculas, sin acentos y con los espacios normalizados."""
+    normalized = unicodedata.normalize("NFKD", text.casefold())
+    normalized = "".join(char for char in normalized if not unicodedata.combining(char))
+    return " ".join(normalized.split())
+
+
+def _keywords(query: str) -> list[str]:
+    """Palabras significativas de la consulta, sin repetir y en orden."""
+    words = []
+    for word in _WORD_RE.findall(_fold(query)):
+        if len(word) >= 3 and word not in _STOPWORDS and word not in words:
+            words.append(word)
+    return words
+
+
+def _truncate(text: str, max_tokens: int) -> str:
+    """Recorta un bloque demasiado largo para que no acapare el presupuesto."""
+    max_chars = max_tokens * _CHARS_PER_TOKEN
+    if len(text) <= max_chars:
+        return text
+    return text[: max_chars - 1].rstrip() + "…"
+
+
+def _search_candidates(manager: "LogseqManager", query: str, limit: int) -> list[ContextBlock]:
+    """Bloques relacionados con la consulta: semánticos o, sin numpy, por palabras."""
+    try:
+        return [
+            ContextBlock(title, text, "search", score)
+            for title, text, score in manager.semantic_search(query, top_k=limit)
+        ]
+    except ImportError:
+        pass
+
+    keywords = _keywords(query)
+    if not keywords:
+        return []
+
+    titles: list[str] = []
+    for keyword in keywords:
+        for title in manager.search_in_pages(keyword):
+            if title not in titles:
+                titles.append(title)
+
+    candidates = []
+    for title in titles:
+        content = manager.read_page_content(title) or ""
+        for block in iter_blocks(content):
+            folded = _fold(block.text)
+            matches = sum(1 for keyword in keywords if keyword in folded)
+            if matches:
+                candidates.append(ContextBlock(title, block.text, "search", matches / len(keywords)))
+    candidates.sort(key=lambda candidate: -candidate.score)
+    return candidates[:limit]
+
+
+def _link_candidates(manager: "LogseqManager", query: str) -> list[ContextBlock]:
+    """Bloques de las páginas citadas como [[Página]] y de los archivos que las enlazan."""
+    candidates = []
+    for title in dict.fromkeys(_PAGE_LINK_RE.findall(query)):
+        content = manager.read_page_content(title) or ""
+        for position, block in enumerate(iter_blocks(content)):
+            if block.text:
+                # Se conserva el orden de la página: los primeros bloques primero
+                candidates.append(ContextBlock(title, block.text, "page", _LINKED_PAGE_SCORE - position * 1e-3))
+
+        link = f"[[{title}]]".lower()
+        sources = [manager._get_page_path(page) for page in manager.search_in_pages(link) if page != title]
+        if manager.sqlite_index is not None:
+            # El índice ya sabe qué diarios contienen el enlace
+            sources += [path for path, _ in manager.sqlite_index.substring_candidates(link, "journal")]
+        else:
+            sources += manager.storage.list_files(manager.journals_path, "*.md")
+        for file_path in sources:
+            try:
+                file_content = manager.storage.read_text(file_path)
+            except (IOError, OSError, UnicodeDecodeError):
+                continue
+            if link not in file_content.lower():
+                continue
+            for block in iter_blocks(file_content):
+                if link in block.text.lower():
+                    candidates.append(
+                        ContextBlock(manager._title_from_path(file_path), block.text, "backlink", _BACKLINK_SCORE)
+                    )
+    return candidates
+
+
+def _recent_candidates(manager: "LogseqManager", journal_count: int) -> list[ContextBlock]:
+    """Bloques de los últimos diarios, del más reciente al más antiguo."""
+    if journal_count <= 0:
+        return []
+    # Los diarios se llaman AAAA_MM_DD, así que el orden por nombre es cronológico
+    journals = manager.storage.list_files(manager.journals_path, "*.md")[-journal_count:]
+    candidates = []
+    for age, file_path in enumerate(reversed(journals)):
+        try:
+            content = manager.storage.read_text(file_path)
+        except (IOError, OSError, UnicodeDecodeError):
+            continue
+        title = manager._title_from_path(file_path)
+        for block in iter_blocks(content):
+            if block.text:
+                candidates.append(ContextBlock(title, block.text, "recent", _RECENT_SCORE - age * 0.01))
+    return candidates
+
+
+def build_context(
+    manager: "LogseqManager",
+    query: str,
+    token_budget: int = 1500,
+    max_block_tokens: int = 200,
+    search_limit: int = 30,
+    recent_journals: int = 3,
+) -> NoteContext:
+    """
+    Selecciona los bloques del grafo más útiles para una consulta sin pasar del presupuesto.
+
+    Args:
+        manager: Gestor del grafo
+        query: Pregunta o tema; las páginas citadas como [[Página]] se incluyen enteras
+            (si caben) junto con sus backlinks
+        token_budget: Tokens estimados máximos del texto devuelto
+        max_block_tokens: Tokens máximos de un solo bloque (los más largos se recortan)
+        search_limit: Bloques máximos que aporta la búsqueda
+        recent_journals: Número de diarios recientes que aportan bloques (0 para ninguno)
+
+    Returns:
+        NoteContext: Texto agrupado por página ("## Título" y sus bloques), bloques
+        incluidos, tokens estimados y candidatos descartados por falta de espacio
+
+    Raises:
+        ValueError: Si token_budget o max_block_tokens no son positivos
+    """
+    if token_budget <= 0 or max_block_tokens <= 0:
+        raise ValueError("❌ ERROR: El presupuesto de tokens y el máximo por bloque deben ser positivos")
+
+    # Los bloques de diario pendientes en el buffer también cuentan
+    manager.flush()
+    candidates = (
+        _link_candidates(manager, query)
+        + _search_candidates(manager, query, search_limit)
+        + _recent_candidates(manager, recent_journals)
+    )
+    # Orden estable: a igual puntuación se respeta el orden de las fuentes
+    candidates.sort(key=lambda candidate: -candidate.score)
+
+    selected: dict[str, list[ContextBlock]] = {}
+    seen: set[str] = set()
+    used = 0
+    dropped = 0
+    for candidate in candidates:
+        key = _fold(candidate.text)
+        if not key or key in seen:
+            continue
+        seen.add(key)
+
+        text = _truncate(candidate.text, max_block_tokens)
+        cost = estimate_tokens(f"- {text}\n")
+        if candidate.title not in selected:
+            cost += estimate_tokens(f"## {candidate.title}\n")
+        if used + cost > token_budget:
+            # Un bloque más corto todavía puede caber: se sigue probando
+            dropped += 1
+            continue
+
+        selected.setdefault(candidate.title, []).append(candidate._replace(text=text))
+        used += cost
+
+    sections = []
+    blocks = []
+    for title, title_blocks in selected.items():
+        sections.append(f"## {title}\n" + "".join(f"- {block.text}\n" for block in title_blocks))
+        blocks.extend(title_blocks)
+    text = "".join(sections)
+    return NoteContext(text, blocks, estimate_tokens(text), dropped)
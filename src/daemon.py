@@ -0,0 +1,270 @@
+"""
+Modo demonio del agente de Logseq.
+
+El demonio mantiene "calientes" en un proceso de larga duración el LogseqManager
+(con sus cachés e índices), el agente de IA y el cliente HTTP, y atiende comandos
+a través de un socket Unix local. El cliente ligero de este módulo solo usa la
+biblioteca estándar, por lo que arranca al instante.
+
+Protocolo (una línea JSON por mensaje):
+    cliente → {"type": "command", "prompt": "..."}
+    demonio → {"type": "output", "text": "..."}         (cero o más)
+    demonio → {"type": "confirm", "description": "..."}  (si la acción lo requiere)
+    cliente → {"type": "confirm", "answer": true | false}
+    demonio → {"type": "done"}
+"""
+
+import json
+import os
+import socket
+import socketserver
+import sys
+import tempfile
+import threading
+import typing
+
+
+# Firma de la función que procesa un comando: (prompt, confirm, emit)
+CommandHandler = typing.Callable[[str, typing.Callable[[str], bool], typing.Callable[[str], None]], None]
+
+EXIT_COMMANDS = ['salir', 'exit', 'quit', '']
+
+
+def default_socket_path() -> str:
+    """
+    Devuelve la ruta por defecto del socket Unix del demonio.
+
+    Usa LOGSEQ_AGENT_SOCKET si está definida; si no, $XDG_RUNTIME_DIR o el
+    directorio temporal del sistema, con un nombre por usuario.
+    """
+    socket_path = os.getenv('LOGSEQ_AGENT_SOCKET')
+    if socket_path:
+        return socket_path
+
+    runtime_dir = os.getenv('XDG_RUNTIME_DIR')
+    if runtime_dir:
+        return os.path.join(runtime_dir, "logseq-agent.sock")
+
+    return os.path.join(tempfile.gettempdir(), f"logseq-agent-{os.getuid()}.sock")
+
+
+def _send_message(wfile: typing.BinaryIO, message: dict) -> None:
+    """Escribe un mensaje JSON terminado en salto de línea y lo envía inmediatamente."""
+    wfile.write((json.dumps(message, ensure_ascii=False) + "\n").encode('utf-8'))
+    wfile.flush()
+
+
+def _read_message(rfile: typing.BinaryIO) -> typing.Optional[dict]:
+    """Lee un mensaje JSON. Devuelve None si la otra parte cerró la conexión."""
+    line = rfile.readline()
+    if not line:
+        return None
+    return json.loads(line.decode('utf-8'))
+
+
+class _CommandRequestHandler(socketserver.StreamRequestHandler):
+    """
+    Atiende una conexión de cliente: procesa comandos hasta que el cliente se desconecta.
+    """
+
+    def handle(self) -> None:
+        try:
+            while True:
+                message = _read_message(self.rfile)
+                if message is None:
+                    break
+
+                if message.get("type") == "ping":
+                    _send_message(self.wfile, {"type": "pong"})
+                    continue
+
+                if message.get("type") != "command":
+                    _send_message(self.wfile, {"type": "error", "text": f"Mensaje desconocido: {message.get('type')}"})
+                    continue
+
+                self._run_command(message.get("prompt", ""))
+        except (BrokenPipeError, ConnectionResetError):
+            # El cliente se fue a mitad de un comando; no hay nadie a quien responder
+            pass
+
+    def _run_command(self, prompt: str) -> None:
+        def emit(text: str = "") -> None:
+            _send_message(self.wfile, {"type": "output", "text": str(text)})
+
+        def confirm(description: str) -> bool:
+            _send_message(self.wfile, {"type": "confirm", "description": description})
+            reply = _read_message(self.rfile)
+            return bool(reply and reply.get("type") == "confirm" and reply.get("answer"))
+
+        try:
+            # Un solo comando a la vez: el gestor y el agente no son seguros entre hilos
+            with self.server.command_lock:
+                self.server.command_handler(prompt, confirm, emit)
+        except (BrokenPipeError, ConnectionResetError):
+            raise
+        except Exception as e:
+            emit(f"❌ Error al procesar el comando: {e}")
+
+        _send_message(self.wfile, {"type": "done"})
+
+
+class AgentDaemon(socketserver.ThreadingUnixStreamServer):
+    """
+    Servidor de socket Unix que delega cada comando en un CommandHandler.
+
+    Cada conexión se atiende en su propio hilo, pero la ejecución de los comandos
+    se serializa con un lock para no intercalar escrituras sobre el grafo.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, socket_path: str, command_handler: CommandHandler) -> None:
+        """
+        Args:
+            socket_path: Ruta del socket Unix en el que escuchar
+            command_handler: Función que procesa un comando (prompt, confirm, emit)
+
+        Raises:
+            RuntimeError: Si ya hay otro demonio escuchando en esa ruta
+        """
+        self.socket_path = socket_path
+        self.command_handler = command_handler
+        self.command_lock = threading.Lock()
+
+        _remove_stale_socket(socket_path)
+        super().__init__(socket_path, _CommandRequestHandler)
+
+        # Solo el usuario propietario puede hablar con el demonio
+        os.chmod(socket_path, 0o600)
+
+    def server_close(self) -> None:
+        super().server_close()
+        try:
+            os.unlink(self.socket_path)
+        except FileNotFoundError:
+            pass
+
+
+def _remove_stale_socket(socket_path: str) -> None:
+    """
+    Elimina un socket abandonado por un demonio anterior que terminó sin limpiar.
+
+    Raises:
+        RuntimeError: Si el socket pertenece a un demonio que sigue vivo
+    """
+    if not os.path.exists(socket_path):
+        return
+
+    probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        probe.connect(socket_path)
+    except (ConnectionRefusedError, FileNotFoundError):
+        os.unlink(socket_path)
+        return
+    finally:
+        probe.close()
+
+    raise RuntimeError(f"Ya hay un demonio escuchando en {socket_path}")
+
+
+class DaemonClient:
+    """
+    Cliente ligero del demonio. Solo depende de la biblioteca estándar.
+    """
+
+    def __init__(self, socket_path: typing.Optional[str] = None) -> None:
+        """
+        Args:
+            socket_path: Ruta del socket del demonio (por defecto default_socket_path())
+
+        Raises:
+            OSError: Si no se puede conectar con el demonio
+        """
+        self.socket_path = socket_path or default_socket_path()
+        self._socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._socket.connect(self.socket_path)
+        self._rfile = self._socket.makefile('rb')
+        self._wfile = self._socket.makefile('wb')
+
+    def execute(self, prompt: str, confirm: typing.Callable[[str], bool], emit: typing.Callable[[str], None] = print) -> None:
+        """
+        Envía un comando al demonio y atiende sus mensajes hasta que termina.
+
+        Args:
+            prompt: Comando en lenguaje natural
+            confirm: Función que pide confirmación al usuario para acciones de escritura
+            emit: Función que muestra la salida del demonio
+        """
+        _send_message(self._wfile, {"type": "command", "prompt": prompt})
+
+        while True:
+            message = _read_message(self._rfile)
+            if message is None:
+                raise ConnectionError("El demonio cerró la conexión")
+
+            if message["type"] == "output":
+                emit(message["text"])
+            elif message["type"] == "confirm":
+                answer = confirm(message["description"])
+                _send_message(self._wfile, {"type": "confirm", "answer": answer})
+            elif message["type"] == "error":
+                emit(f"❌ {message['text']}")
+            elif message["type"] == "done":
+                return
+
+    def close(self) -> None:
+        self._rfile.close()
+        self._wfile.close()
+        self._socket.close()
+
+
+def _confirm_from_terminal(action_description: str) -> bool:
+    """Pide confirmación en la terminal del cliente (mismo formato que agent.confirm_action)."""
+    print(f"\n🤔 Acción propuesta: {action_description}")
+    response = input("   ➡️ ¿Confirmar? (s/n): ").lower().strip()
+    return response == 's'
+
+
+def run_client(socket_path: typing.Optional[str] = None) -> int:
+    """
+    Bucle interactivo del cliente ligero.
+
+    Args:
+        socket_path: Ruta del socket del demonio (por defecto default_socket_path())
+
+    Returns:
+        int: Código de salida del proceso
+    """
+    socket_path = socket_path or default_socket_path()
+    try:
+        client = DaemonClient(socket_path)
+    except OSError as e:
+        print(f"❌ No se pudo conectar con el demonio en {socket_path}: {e}")
+        print("   Inícialo con: python agent.py --daemon")
+        return 1
+
+    print(f"🛰️ Conectado al demonio en {socket_path}")
+    print("📝 Escribe 'salir' para terminar.\n")
+
+    try:
+        while True:
+            prompt = input("🗣️  ¿Qué quieres hacer en Logseq? > ").strip()
+            if prompt.lower() in EXIT_COMMANDS:
+                print("👋 ¡Hasta la vista! Cliente desconectado.")
+                break
+
+            client.execute(prompt, confirm=_confirm_from_terminal)
+            print()  # Línea en blanco para separar comandos
+    except (KeyboardInterrupt, EOFError):
+        print("\n👋 ¡Hasta la vista! Cliente desconectado.")
+    except ConnectionError as e:
+        print(f"❌ Se perdió la conexión con el demonio: {e}")
+        return 1
+    finally:
+        client.close()
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(run_client(sys.argv[1] if len(sys.argv) > 1 else None))
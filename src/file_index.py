@@ -0,0 +1,177 @@
+"""
+Base común de los índices que el gestor sincroniza por el stat de los archivos.
+
+Todos los índices de LogseqManager (SQLite, vectorial, trigramas, booleano,
+referencias e identificadores de bloque) se mantienen al día igual: se listan los
+*.md de cada directorio con un solo stat por archivo, se releen solo los nuevos o
+cuyo (mtime_ns, tamaño) cambió y se quitan los que ya no existen. Las escrituras del
+propio gestor actualizan su archivo al momento con update_file().
+
+- walk_stats() hace el recorrido de un directorio.
+- FileIndex pone el lock y los bucles de sync() y update_file(); cada índice dice qué
+  stat guardó por archivo y cómo releer o quitar uno.
+- FileValueIndex es el caso más simple: un valor por archivo más las tablas inversas
+  que quiera mantener cada índice.
+"""
+
+import os
+import pathlib
+import threading
+import typing
+
+from src.storage import FileStat, StorageBackend
+
+
+def walk_stats(
+    storage: StorageBackend,
+    directory: pathlib.Path,
+    known: typing.Mapping[str, tuple[int, int]],
+) -> typing.Iterator[tuple[str, typing.Optional[FileStat]]]:
+    """
+    Archivos *.md de `directory` que un índice tiene que releer o quitar.
+
+    Las rutas van en texto: en grafos grandes construir un Path por archivo cuesta más
+    que el propio stat, así que solo se construye para los que cambiaron.
+
+    Args:
+        storage: Backend desde el que listar el directorio
+        directory: Directorio a recorrer (sin subdirectorios)
+        known: Ruta → (mtime_ns, tamaño) con que el índice leyó cada archivo; las
+            rutas de otros directorios se ignoran
+
+    Yields:
+        (ruta, stat) de cada archivo nuevo o cambiado y (ruta, None) de cada archivo
+        conocido que ya no existe
+    """
+    prefix = f"{directory}{os.sep}"
+    listed = {prefix + name: stat for name, stat in storage.list_stats(directory, "*.md").items()}
+    # Se calcula todo antes de devolver nada: el llamador modifica `known` al releer
+    changed = [(path, stat) for path, stat in listed.items() if known.get(path) != (stat.mtime_ns, stat.size)]
+    gone = [path for path in known
+            if path not in listed and path.startswith(prefix) and os.sep not in path[len(prefix):]]
+    yield from changed
+    for path in gone:
+        yield path, None
+
+
+class FileIndex:
+    """
+    Índice que se sincroniza con los archivos del grafo por su stat.
+
+    Es seguro entre hilos: sync(), update_file() y las consultas de las subclases se
+    serializan con self._lock. Las subclases implementan _known_stats(), _stat_of() y
+    _refresh(), y si lo necesitan _after_changes().
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+
+    def _known_stats(self, kind: typing.Optional[str]) -> typing.Mapping[str, tuple[int, int]]:
+        """Ruta → (mtime_ns, tamaño) de los archivos indexados de ese tipo (None: todos)."""
+        raise NotImplementedError
+
+    def _stat_of(self, path: str) -> typing.Optional[tuple[int, int]]:
+        """(mtime_ns, tamaño) con que se indexó `path`, o None si no está indexado."""
+        raise NotImplementedError
+
+    def _refresh(
+        self,
+        storage: StorageBackend,
+        path: str,
+        kind: typing.Optional[str],
+        stat: typing.Optional[FileStat],
+    ) -> bool:
+        """
+        Relee `path`, o lo quita si `stat` es None (puede no estar indexado).
+
+        Returns:
+            bool: Si el índice cambió
+        """
+        raise NotImplementedError
+
+    def _after_changes(self) -> None:
+        """Se llama con el lock tomado al final de sync() y de update_file()."""
+
+    def sync(
+        self,
+        storage: StorageBackend,
+        directories: typing.Union[typing.Mapping[str, pathlib.Path], typing.Iterable[pathlib.Path]],
+    ) -> int:
+        """
+        Sincroniza el índice con los archivos *.md de los directorios.
+
+        Args:
+            storage: Backend desde el que leer los archivos
+            directories: Tipo de documento → directorio (ej: {"page": pages_path}), o
+                solo los directorios si el índice no distingue tipos
+
+        Returns:
+            int: Número de archivos releídos o eliminados del índice
+        """
+        if isinstance(directories, typing.Mapping):
+            directories = directories.items()
+        else:
+            directories = [(None, directory) for directory in directories]
+        changed = 0
+        with self._lock:
+            for kind, directory in directories:
+                for path, stat in walk_stats(storage, directory, self._known_stats(kind)):
+                    changed += self._refresh(storage, path, kind, stat)
+            self._after_changes()
+        return changed
+
+    def update_file(self, storage: StorageBackend, path: pathlib.Path, kind: typing.Optional[str] = None) -> None:
+        """Relee un único archivo si cambió (o lo quita del índice si ya no existe)."""
+        key = str(path)
+        with self._lock:
+            stat = storage.stat(path)
+            if stat is None or self._stat_of(key) != (stat.mtime_ns, stat.size):
+                self._refresh(storage, key, kind, stat)
+            self._after_changes()
+
+
+class FileValueIndex(FileIndex):
+    """
+    FileIndex que guarda, por archivo, un valor extraído de su contenido.
+
+    Las subclases implementan _read() y mantienen sus tablas inversas en _link() y
+    _unlink().
+    """
+
+    def __init__(self) -> None:
+        super().__init__()
+        self._files: dict[str, tuple[tuple[int, int], typing.Any]] = {}
+
+    def _read(self, storage: StorageBackend, path: pathlib.Path) -> typing.Any:
+        """Valor que se guarda para el archivo; un archivo ilegible cuenta como vacío."""
+        raise NotImplementedError
+
+    def _link(self, path: str, value: typing.Any) -> None:
+        """Añade el valor del archivo a las tablas inversas."""
+
+    def _unlink(self, path: str, value: typing.Any) -> None:
+        """Quita el valor anterior del archivo de las tablas inversas."""
+
+    def _known_stats(self, kind: typing.Optional[str]) -> dict[str, tuple[int, int]]:
+        return {path: entry[0] for path, entry in self._files.items()}
+
+    def _stat_of(self, path: str) -> typing.Optional[tuple[int, int]]:
+        entry = self._files.get(path)
+        return None if entry is None else entry[0]
+
+    def _refresh(
+        self,
+        storage: StorageBackend,
+        path: str,
+        kind: typing.Optional[str],
+        stat: typing.Optional[FileStat],
+    ) -> bool:
+        previous = self._files.pop(path, None)
+        if previous is not None:
+            self._unlink(path, previous[1])
+        if stat is None:
+            return previous is not None
+        value = self._read(storage, pathlib.Path(path))
+        self._files[path] = ((stat.mtime_ns, stat.size), value)
+        self._link(path, value)
+        return True
@@ -0,0 +1,158 @@
+"""
+Bloqueo entre procesos y control de concurrencia optimista para los archivos del grafo.
+
+El agente convive con Logseq desktop, demonios de sincronización y otras instancias
+de sí mismo. Cada escritura de lectura-modificación-escritura:
+
+1. Lee el archivo junto con su versión (mtime_ns, tamaño, hash).
+2. Calcula el contenido nuevo sin tener ningún lock.
+3. Toma el lock advisory (fcntl.flock) del archivo, comprueba que la versión no ha
+   cambiado y escribe de forma atómica (archivo temporal + os.replace).
+4. Si la versión cambió, cuenta un conflicto y vuelve a empezar desde el paso 1.
+"""
+
+import contextlib
+import dataclasses
+import fcntl
+import hashlib
+import os
+import pathlib
+import threading
+import time
+import typing
+
+
+class ConcurrentModificationError(RuntimeError):
+    """El archivo cambió entre la lectura y la escritura en todos los reintentos."""
+
+
+class LockTimeoutError(TimeoutError):
+    """No se pudo obtener el lock de un archivo dentro del tiempo máximo de espera."""
+
+
+class FileVersion(typing.NamedTuple):
+    """Versión observada de un archivo: se compara entera antes de sobrescribirlo."""
+    mtime_ns: int
+    size: int
+    sha256: str
+
+
+def read_versioned(file_path: pathlib.Path) -> tuple[str, FileVersion]:
+    """
+    Lee un archivo de texto UTF-8 junto con la versión exacta de los bytes leídos.
+
+    Raises:
+        FileNotFoundError: Si el archivo no existe
+        UnicodeDecodeError: Si el archivo no es UTF-8 válido
+    """
+    while True:
+        with open(file_path, 'rb') as file:
+            data = file.read()
+            stat = os.fstat(file.fileno())
+        # Si alguien escribía el archivo en el sitio mientras lo leíamos, leer de nuevo
+        if stat.st_size == len(data):
+            break
+    return data.decode('utf-8'), FileVersion(stat.st_mtime_ns, stat.st_size, hashlib.sha256(data).hexdigest())
+
+
+def current_version(file_path: pathlib.Path) -> typing.Optional[FileVersion]:
+    """Devuelve la versión actual del archivo, o None si no existe."""
+    try:
+        return read_versioned(file_path)[1]
+    except FileNotFoundError:
+        return None
+
+
+@dataclasses.dataclass
+class LockStats:
+    """
+    Contadores de bloqueo y conflictos de un LogseqManager (solo de este proceso).
+    """
+    acquisitions: int = 0
+    wait_ns_total: int = 0
+    wait_ns_max: int = 0
+    conflicts: int = 0
+    failures: int = 0
+    _lock: threading.Lock = dataclasses.field(default_factory=threading.Lock, repr=False, compare=False)
+
+    def record_wait(self, wait_ns: int) -> None:
+        with self._lock:
+            self.acquisitions += 1
+            self.wait_ns_total += wait_ns
+            self.wait_ns_max = max(self.wait_ns_max, wait_ns)
+
+    def record_conflict(self) -> None:
+        with self._lock:
+            self.conflicts += 1
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+
+    def as_dict(self) -> dict:
+        """Instantánea de los contadores (tiempos en milisegundos)."""
+        with self._lock:
+            return {
+                "acquisitions": self.acquisitions,
+                "wait_ms_total": self.wait_ns_total / 1e6,
+                "wait_ms_max": self.wait_ns_max / 1e6,
+                "conflicts": self.conflicts,
+                "failures": self.failures,
+            }
+
+
+class FileLocker:
+    """
+    Locks exclusivos por archivo mediante fcntl.flock sobre archivos de lock auxiliares.
+
+    Se bloquea un archivo auxiliar y no el propio archivo porque las escrituras
+    atómicas lo sustituyen por otro inodo. flock excluye también entre hilos del mismo
+    proceso, porque cada adquisición abre su propio descriptor.
+    """
+
+    def __init__(self, lock_dir: pathlib.Path, stats: LockStats, timeout: float = 10.0) -> None:
+        """
+        Args:
+            lock_dir: Directorio donde se crean los archivos de lock
+            stats: Contadores donde registrar los tiempos de espera
+            timeout: Segundos máximos de espera por un lock
+        """
+        self.lock_dir = lock_dir
+        self.stats = stats
+        self.timeout = timeout
+
+    def _lock_path(self, file_path: pathlib.Path) -> pathlib.Path:
+        # "pages/Tareas.md" → "pages__Tareas.md.lock"
+        return self.lock_dir / f"{file_path.parent.name}__{file_path.name}.lock"
+
+    @contextlib.contextmanager
+    def lock(self, file_path: pathlib.Path) -> typing.Iterator[None]:
+        """
+        Mantiene el lock exclusivo del archivo mientras dura el bloque.
+
+        Raises:
+            LockTimeoutError: Si no se obtiene el lock en `timeout` segundos
+        """
+        self.lock_dir.mkdir(parents=True, exist_ok=True)
+        fd = os.open(self._lock_path(file_path), os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            start = time.perf_counter_ns()
+            deadline = time.monotonic() + self.timeout
+            delay = 0.001
+            while True:
+                try:
+                    fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    break
+                except BlockingIOError:
+                    if time.monotonic() >= deadline:
+                        raise LockTimeoutError(f"No se pudo bloquear {file_path} en {self.timeout} s")
+                    time.sleep(delay)
+                    delay = min(delay * 2, 0.05)
+            self.stats.record_wait(time.perf_counter_ns() - start)
+
+            try:
+                yield
+            finally:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+        finally:
+            os.close(fd)
@@ -0,0 +1,230 @@
+"""
+Instantáneas binarias de los índices en memoria, para arrancar sin reparsear el grafo.
+
+Construir un índice en memoria (ver src/trigram_index.py) obliga a leer y trocear en
+bloques todos los archivos en cada arranque. Una instantánea guarda el resultado ya
+procesado en un único archivo:
+
+    cabecera   magic "LSQSNAP\\0", versión del formato, tipo de índice (8 bytes),
+               número de secciones, longitud y crc32 del cuerpo
+    tabla      por sección: etiqueta de 4 bytes, desplazamiento y longitud
+    cuerpo     las secciones, cada una alineada a 8 bytes
+
+Las secciones son arrays de enteros de ancho fijo (tablas de páginas y de bloques,
+listas de identificadores) o cadenas internadas (un bloque UTF-8 con todas las cadenas
+distintas y la tabla de sus desplazamientos, que se decodifica de una vez). Nada hay que parsear: el archivo se abre
+con mmap y cada sección es un memoryview del mapa, que se puede convertir con
+cast("I") o cast("Q") sin copiar. Al abrirlo se comprueban la versión, el tipo y el
+crc32; si algo no cuadra se lanza SnapshotError y el llamador reconstruye el índice.
+
+La validación por archivo la hace el propio índice: la instantánea guarda el mtime y
+el tamaño con los que se procesó cada archivo, y la siguiente sincronización solo
+vuelve a procesar los que cambiaron.
+
+Solo usa la biblioteca estándar.
+"""
+
+import array
+import mmap
+import os
+import pathlib
+import struct
+import typing
+import zlib
+
+
+_MAGIC = b"LSQSNAP\0"
+
+# Versión del formato del contenedor; cada índice versiona aparte sus secciones
+FORMAT_VERSION = 1
+
+# magic, versión, tipo de índice, número de secciones, longitud y crc32 del cuerpo
+_HEADER = struct.Struct("<8sI8sIQI")
+# etiqueta, desplazamiento (desde el inicio del cuerpo) y longitud
+_SECTION = struct.Struct("<4sQQ")
+
+_ALIGNMENT = 8
+
+
+class SnapshotError(ValueError):
+    """La instantánea no existe entera, es de otra versión o está corrupta."""
+
+
+def _padding(length: int) -> int:
+    return -length % _ALIGNMENT
+
+
+class StringTable:
+    """Cadenas internadas: cada cadena distinta se guarda una vez y se cita por su número."""
+
+    def __init__(self) -> None:
+        self._ids: dict[str, int] = {}
+        self._strings: list[str] = []
+        # Desplazamientos en caracteres (no en bytes): al leer se decodifica todo el
+        # bloque de una vez y cada cadena es un corte del resultado
+        self._offsets = array.array('Q', [0])
+
+    def intern(self, text: str) -> int:
+        """Número de la cadena, añadiéndola si es nueva."""
+        string_id = self._ids.get(text)
+        if string_id is None:
+            string_id = self._ids[text] = len(self._strings)
+            self._strings.append(text)
+            self._offsets.append(self._offsets[-1] + len(text))
+        return string_id
+
+    def sections(self, prefix: bytes) -> dict[bytes, typing.Union[bytes, array.array]]:
+        """Secciones `prefix`+"O" (desplazamientos) y `prefix`+"D" (datos UTF-8)."""
+        data = "".join(self._strings).encode('utf-8', 'surrogatepass')
+        return {prefix + b"O": self._offsets, prefix + b"D": data}
+
+
+def read_strings(snapshot: "Snapshot", prefix: bytes) -> list[str]:
+    """Decodifica todas las cadenas guardadas con StringTable.sections(prefix)."""
+    offsets = snapshot.array(prefix + b"O", 'Q').tolist()
+    text = str(snapshot.section(prefix + b"D"), 'utf-8', 'surrogatepass')
+    if offsets[-1] != len(text):
+        raise SnapshotError(f"❌ ERROR: La tabla de cadenas {prefix!r} no cuadra con sus datos")
+    return [text[start:end] for start, end in zip(offsets, offsets[1:])]
+
+
+def write_snapshot(
+    path: pathlib.Path,
+    kind: bytes,
+    sections: dict[bytes, typing.Union[bytes, array.array]],
+) -> int:
+    """
+    Escribe una instantánea de forma atómica (archivo temporal y os.replace).
+
+    Args:
+        path: Archivo de destino
+        kind: Tipo de índice (hasta 8 bytes); open_snapshot comprueba que coincida
+        sections: Etiqueta de 4 bytes → contenido (bytes o array de enteros)
+
+    Returns:
+        int: Tamaño del archivo escrito en bytes
+    """
+    table = []
+    chunks = []
+    offset = 0
+    for tag, content in sections.items():
+        if len(tag) != 4:
+            raise ValueError(f"❌ ERROR: Las etiquetas de sección tienen 4 bytes: {tag!r}")
+        data = content.tobytes() if isinstance(content, array.array) else bytes(content)
+        table.append(_SECTION.pack(tag, offset, len(data)))
+        chunks.append(data)
+        chunks.append(b"\0" * _padding(len(data)))
+        offset += len(data) + _padding(len(data))
+
+    crc = 0
+    for chunk in chunks:
+        crc = zlib.crc32(chunk, crc)
+    header = _HEADER.pack(_MAGIC, FORMAT_VERSION, kind, len(table), offset, crc)
+    prefix = header + b"".join(table)
+
+    path.parent.mkdir(exist_ok=True)
+    temp_path = path.with_name(f"{path.name}.tmp")
+    with open(temp_path, 'wb') as file:
+        file.write(prefix)
+        file.write(b"\0" * _padding(len(prefix)))
+        for chunk in chunks:
+            file.write(chunk)
+    os.replace(temp_path, path)
+    return len(prefix) + _padding(len(prefix)) + offset
+
+
+class Snapshot:
+    """
+    Instantánea abierta con mmap; las secciones se leen sin copiarlas.
+
+    Se usa como gestor de contexto: al salir se cierra el mapa, así que los
+    memoryview obtenidos no deben guardarse más allá del bloque with.
+    """
+
+    def __init__(self, map_: mmap.mmap, sections: dict[bytes, memoryview]) -> None:
+        self._map = map_
+        self._sections = sections
+        self._casts: list[memoryview] = []
+
+    def __enter__(self) -> "Snapshot":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def __contains__(self, tag: bytes) -> bool:
+        return tag in self._sections
+
+    def section(self, tag: bytes) -> memoryview:
+        """Contenido de una sección como memoryview de bytes."""
+        try:
+            return self._sections[tag]
+        except KeyError:
+            raise SnapshotError(f"❌ ERROR: La instantánea no tiene la sección {tag!r}") from None
+
+    def array(self, tag: bytes, typecode: str) -> memoryview:
+        """Sección vista como array de enteros ('I' o 'Q'), sin copiar."""
+        view = self.section(tag)
+        if len(view) % struct.calcsize(typecode):
+            raise SnapshotError(f"❌ ERROR: La sección {tag!r} no es un array de '{typecode}'")
+        cast = view.cast(typecode)
+        self._casts.append(cast)
+        return cast
+
+    def close(self) -> None:
+        """Libera las vistas y cierra el mapa."""
+        for view in self._casts + list(self._sections.values()):
+            view.release()
+        self._casts = []
+        self._sections = {}
+        self._map.close()
+
+
+def open_snapshot(path: pathlib.Path, kind: bytes) -> Snapshot:
+    """
+    Abre una instantánea comprobando formato, versión, tipo y suma de control.
+
+    Raises:
+        OSError: Si el archivo no se puede abrir
+        SnapshotError: Si está truncada, es de otra versión o tipo, o el crc32 no cuadra
+    """
+    with open(path, 'rb') as file:
+        size = os.fstat(file.fileno()).st_size
+        if size < _HEADER.size:
+            raise SnapshotError(f"❌ ERROR: Instantánea truncada: {path}")
+        map_ = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    views: list[memoryview] = []
+    try:
+        magic, version, stored_kind, count, body_length, crc = _HEADER.unpack_from(map_, 0)
+        if magic != _MAGIC:
+            raise SnapshotError(f"❌ ERROR: {path} no es una instantánea")
+        if version != FORMAT_VERSION or stored_kind != kind.ljust(8, b"\0"):
+            raise SnapshotError(
+                f"❌ ERROR: Instantánea de otra versión o tipo: {path} ({stored_kind!r} v{version})"
+            )
+        table_end = _HEADER.size + count * _SECTION.size
+        body_start = table_end + _padding(table_end)
+        if body_start + body_length != size:
+            raise SnapshotError(f"❌ ERROR: Instantánea truncada: {path}")
+
+        body = memoryview(map_)[body_start:]
+        views.append(body)
+        if zlib.crc32(body) != crc:
+            raise SnapshotError(f"❌ ERROR: La suma de control de la instantánea no coincide: {path}")
+
+        sections = {}
+        for i in range(count):
+            tag, offset, length = _SECTION.unpack_from(map_, _HEADER.size + i * _SECTION.size)
+            if offset + length > body_length:
+                raise SnapshotError(f"❌ ERROR: Sección fuera de la instantánea: {tag!r}")
+            sections[tag] = body[offset:offset + length]
+            views.append(sections[tag])
+        body.release()
+    except BaseException:
+        # El mapa no se puede cerrar mientras queden vistas sobre él
+        for view in views:
+            view.release()
+        map_.close()
+        raise
+    return Snapshot(map_, sections)
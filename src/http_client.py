@@ -0,0 +1,137 @@
+"""
+Cliente HTTP compartido para las llamadas al modelo.
+
+Un único httpx.AsyncClient con keep-alive, límites de pool y timeouts se inyecta en
+el proveedor de pydantic_ai, de modo que todas las peticiones al LLM reutilizan las
+mismas conexiones. Como las conexiones de un cliente asíncrono quedan ligadas a un
+event loop, las ejecuciones del agente se hacen siempre en el mismo loop
+(AgentEventLoop), aunque se lancen desde hilos distintos (modo demonio).
+
+Configuración por variables de entorno (todas opcionales):
+    LOGSEQ_AGENT_HTTP_TIMEOUT            Timeout de lectura/escritura en segundos (30)
+    LOGSEQ_AGENT_HTTP_CONNECT_TIMEOUT    Timeout de conexión en segundos (5)
+    LOGSEQ_AGENT_HTTP_MAX_CONNECTIONS    Conexiones simultáneas máximas (10)
+    LOGSEQ_AGENT_HTTP_MAX_KEEPALIVE      Conexiones inactivas que se conservan (5)
+    LOGSEQ_AGENT_HTTP_KEEPALIVE_EXPIRY   Segundos que se conserva una conexión inactiva (60)
+"""
+
+import asyncio
+import concurrent.futures
+import contextvars
+import dataclasses
+import os
+import threading
+import typing
+
+import httpx
+
+
+_T = typing.TypeVar('_T')
+
+
+@dataclasses.dataclass(frozen=True)
+class HttpClientConfig:
+    """
+    Parámetros del pool de conexiones HTTP hacia el proveedor del modelo.
+    """
+    timeout: float = 30.0
+    connect_timeout: float = 5.0
+    max_connections: int = 10
+    max_keepalive_connections: int = 5
+    keepalive_expiry: float = 60.0
+
+    @classmethod
+    def from_env(cls) -> "HttpClientConfig":
+        """
+        Construye la configuración a partir de las variables LOGSEQ_AGENT_HTTP_*.
+
+        Raises:
+            ValueError: Si alguna variable tiene un valor no numérico
+        """
+        defaults = cls()
+
+        def read(name: str, default, cast):
+            value = os.getenv(f"LOGSEQ_AGENT_HTTP_{name}")
+            if value is None or value == "":
+                return default
+            try:
+                return cast(value)
+            except ValueError:
+                raise ValueError(f"❌ ERROR: LOGSEQ_AGENT_HTTP_{name} debe ser numérica (valor: {value!r})")
+
+        return cls(
+            timeout=read("TIMEOUT", defaults.timeout, float),
+            connect_timeout=read("CONNECT_TIMEOUT", defaults.connect_timeout, float),
+            max_connections=read("MAX_CONNECTIONS", defaults.max_connections, int),
+            max_keepalive_connections=read("MAX_KEEPALIVE", defaults.max_keepalive_connections, int),
+            keepalive_expiry=read("KEEPALIVE_EXPIRY", defaults.keepalive_expiry, float),
+        )
+
+
+def create_http_client(config: typing.Optional[HttpClientConfig] = None) -> httpx.AsyncClient:
+    """
+    Crea el cliente HTTP asíncrono con keep-alive, límites de pool y timeouts.
+
+    Args:
+        config: Configuración del pool (por defecto HttpClientConfig.from_env())
+
+    Returns:
+        httpx.AsyncClient listo para inyectarse en OpenAIProvider(http_client=...)
+    """
+    config = config or HttpClientConfig.from_env()
+    return httpx.AsyncClient(
+        timeout=httpx.Timeout(config.timeout, connect=config.connect_timeout),
+        limits=httpx.Limits(
+            max_connections=config.max_connections,
+            max_keepalive_connections=config.max_keepalive_connections,
+            keepalive_expiry=config.keepalive_expiry,
+        ),
+    )
+
+
+class AgentEventLoop:
+    """
+    Event loop persistente en un hilo propio para ejecutar las corrutinas del agente.
+
+    Agent.run_sync crea un loop por hilo; con un cliente HTTP compartido eso haría que
+    conexiones abiertas en un loop se usaran desde otro. Enviando todas las ejecuciones
+    a este loop, el pool se reutiliza entre comandos y entre conexiones del demonio.
+    """
+
+    def __init__(self) -> None:
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="agente-loop", daemon=True)
+        self._thread.start()
+
+    def run(self, coroutine: typing.Awaitable[_T]) -> _T:
+        """
+        Ejecuta la corrutina en el loop del agente y espera su resultado.
+
+        La tarea se crea con una copia del contexto del hilo que llama, para que los
+        spans de logfire abiertos alrededor de la ejecución sigan siendo los padres de
+        las llamadas al LLM.
+        """
+        context = contextvars.copy_context()
+        result: concurrent.futures.Future = concurrent.futures.Future()
+
+        def start() -> None:
+            task = self._loop.create_task(coroutine, context=context)
+
+            def copy_outcome(finished: asyncio.Task) -> None:
+                if finished.cancelled():
+                    result.cancel()
+                elif finished.exception() is not None:
+                    result.set_exception(finished.exception())
+                else:
+                    result.set_result(finished.result())
+
+            task.add_done_callback(copy_outcome)
+
+        self._loop.call_soon_threadsafe(start)
+        return result.result()
+
+    def close(self) -> None:
+        """Detiene el loop y espera a que termine su hilo."""
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
@@ -1,7 +1,109 @@
-import os
+import atexit
+import concurrent.futures
+import contextlib
+import functools
 import pathlib
+import re
+import time
 import typing
-from datetime import date
+from datetime import date, datetime
+
+from src.file_lock import ConcurrentModificationError
+from src.metrics import COUNT_BUCKETS, MetricsRegistry
+from src.blocks import (
+    POSITIONS,
+    BlockSpan,
+    block_text,
+    block_tree,
+    delete_subtree,
+    format_block,
+    head_block_lines,
+    insert_block,
+    move_subtree,
+    span_at,
+    subtree_end,
+    tail_block_lines,
+)
+from src.storage import PosixStorage, StorageBackend
+from src.title_registry import TitleRegistry, filename_for_title, title_from_filename
+from src.write_buffer import AppendBuffer, recover_orphan_logs
+
+if typing.TYPE_CHECKING:
+    from src.block_index import BlockLocation
+    from src.change_feed import ChangeEvent, ChangeFeedServer, EventStream, ExternalChangeWatcher
+    from src.context_builder import NoteContext
+    from src.undo_log import Change
+
+class SearchHit(typing.NamedTuple):
+    """Una página o diario encontrado por search_graph."""
+    title: str                   # Título de la página o nombre del diario (ej: "2025_01_15")
+    kind: str                    # "page" o "journal"
+    date: typing.Optional[date]  # Fecha del diario (None en las páginas)
+
+
+def _journal_date(name: str) -> typing.Optional[date]:
+    """Fecha de un diario a partir de su nombre de archivo AAAA_MM_DD, o None si no la tiene."""
+    # strptime admitiría "2025_1_5", que no se ordena como las fechas
+    if len(name) != 10:
+        return None
+    try:
+        return datetime.strptime(name, "%Y_%m_%d").date()
+    except ValueError:
+        return None
+
+
+class IndexedBlock(typing.NamedTuple):
+    """Un bloque localizado por su identificador "id::" (ver get_block)."""
+    id: str               # UUID en minúsculas
+    title: str            # Página o diario (ej: "2025_01_15") que lo contiene
+    path: pathlib.Path    # Archivo que lo contiene
+    text: str             # Contenido sin el prefijo "- "
+    content: str          # El bloque tal como está escrito, con sus propiedades (sin hijos)
+
+
+def _find_span(spans: list[BlockSpan], content: str) -> typing.Optional[int]:
+    """Índice del primer bloque cuyo texto es exactamente `content`, o None."""
+    for index, span in enumerate(spans):
+        if span.text == content:
+            return index
+    return None
+
+
+def _timed(method: typing.Callable) -> typing.Callable:
+    """Anota la duración de cada llamada al método en el histograma logseq_manager_call_seconds."""
+    name = method.__name__
+    
+    @functools.wraps(method)
+    def wrapper(self: "LogseqManager", *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return method(self, *args, **kwargs)
+        finally:
+            self._call_seconds.observe(time.perf_counter() - start, name)
+    
+    return wrapper
+
+
+def _check_position(position: str) -> None:
+    if position not in POSITIONS:
+        raise ValueError(f"❌ ERROR: La posición debe ser 'child' o 'sibling' (valor: '{position}')")
+
+
+class RenameResult(typing.NamedTuple):
+    """Resultado de rename_page."""
+    title: str                # Título nuevo
+    path: pathlib.Path        # Archivo de la página renombrada
+    updated: list[str]        # Páginas y diarios cuyas referencias se reescribieron
+    references: int           # Referencias reescritas en total
+
+
+# Propiedad "title::" de una página (Logseq la usa como título si está presente)
+_TITLE_PROPERTY_RE = re.compile(r"^(title::[ \t]*)(.+?)[ \t]*$", re.MULTILINE)
+
+
+# Resultado de una transformación de _modify_file: (contenido nuevo o None si no hay
+# nada que escribir, valor a devolver al llamador)
+_TransformResult = tuple[typing.Optional[str], typing.Any]
 
 
 class LogseqManager:
@@ -12,12 +114,34 @@ class LogseqManager:
     manejando la estructura de archivos y las operaciones básicas de contenido.
     """
 
-    def __init__(self, graph_path: str) -> None:
+    # Atributos de los índices que se sincronizan por el stat de los archivos (ver
+    # src/file_index.py); cada uno es None hasta que se activa
+    _FILE_INDEXES = (
+        "sqlite_index", "vector_index", "trigram_index", "boolean_index", "reference_index", "block_id_index",
+    )
+
+    def __init__(
+        self,
+        graph_path: str,
+        buffer_journal_appends: bool = False,
+        storage: typing.Optional[StorageBackend] = None,
+        sqlite_index: bool = False,
+        metrics: typing.Optional[MetricsRegistry] = None,
+    ) -> None:
         """
         Inicializa el LogseqManager con la ruta al grafo de Logseq.
         
         Args:
             graph_path: Ruta al directorio raíz del grafo de Logseq
+            buffer_journal_appends: Si True, append_to_journal acumula los bloques en un
+                buffer de escritura diferida (ver src/write_buffer.py) en lugar de
+                escribir el archivo en cada llamada
+            storage: Backend de almacenamiento (por defecto el sistema de archivos real;
+                ver src/storage.py para el backend en memoria)
+            sqlite_index: Si True, search_in_pages y find_block_in_page usan un índice
+                SQLite FTS5 (ver src/sqlite_index.py) en lugar de recorrer los archivos
+            metrics: Registro donde anotar las métricas del gestor (ver src/metrics.py);
+                por defecto uno propio, accesible en self.metrics
             
         Raises:
             ValueError: Si la ruta del grafo o el subdirectorio 'pages' no existen o no son directorios
@@ -26,44 +150,607 @@ class LogseqManager:
         self.pages_path = self.graph_path / "pages"
         self.journals_path = self.graph_path / "journals"
         
+        # Estado interno del agente (locks, registros...) dentro del propio grafo.
+        # Logseq ignora los directorios ocultos, así que no aparece como contenido.
+        self.state_path = self.graph_path / ".logseq-agent"
+        
+        # Todo el acceso a archivos pasa por el backend (ver src/storage.py)
+        self.storage = storage or PosixStorage(self.state_path / "locks")
+        
         # Verificar que el grafo principal existe y es un directorio
-        if not self.graph_path.exists():
-            raise ValueError(f"La ruta del grafo no existe: {self.graph_path}")
-        if not self.graph_path.is_dir():
-            raise ValueError(f"La ruta del grafo no es un directorio: {self.graph_path}")
+        if not self.storage.is_dir(self.graph_path):
+            raise ValueError(f"La ruta del grafo no existe o no es un directorio: {self.graph_path}")
             
         # Verificar que el directorio 'pages' existe y es un directorio
-        if not self.pages_path.exists():
-            raise ValueError(f"El directorio 'pages' no existe: {self.pages_path}")
-        if not self.pages_path.is_dir():
-            raise ValueError(f"El directorio 'pages' no es un directorio: {self.pages_path}")
+        if not self.storage.is_dir(self.pages_path):
+            raise ValueError(f"El directorio 'pages' no existe o no es un directorio: {self.pages_path}")
             
         # Verificar que el directorio 'journals' existe y es un directorio
-        if not self.journals_path.exists():
-            raise ValueError(f"El directorio 'journals' no existe: {self.journals_path}")
-        if not self.journals_path.is_dir():
-            raise ValueError(f"El directorio 'journals' no es un directorio: {self.journals_path}")
+        if not self.storage.is_dir(self.journals_path):
+            raise ValueError(f"El directorio 'journals' no existe o no es un directorio: {self.journals_path}")
+        
+        # Locks del backend y escrituras optimistas (ver src/file_lock.py)
+        self.lock_stats = self.storage.lock_stats
+        self.max_write_retries = 5
+        
+        # Métricas agregadas (latencias, bytes escritos, archivos leídos por búsqueda,
+        # aciertos de las cachés); se exportan con self.metrics.render()
+        self.metrics = metrics or MetricsRegistry()
+        self._call_seconds = self.metrics.histogram(
+            "logseq_manager_call_seconds", "Duración de los métodos públicos de LogseqManager", ["method"]
+        )
+        self._write_bytes = self.metrics.counter(
+            "logseq_write_bytes_total", "Bytes escritos en el grafo", ["kind", "operation"]
+        )
+        self._files_scanned = self.metrics.histogram(
+            "logseq_search_files_scanned", "Archivos leídos por búsqueda", ["source"], buckets=COUNT_BUCKETS
+        )
+        self._cache_lookups = self.metrics.counter(
+            "logseq_cache_lookups_total",
+            "Consultas a las cachés del gestor (índices sin resincronizar, registro de títulos)",
+            ["cache", "result"],
+        )
+        
+        # Índice SQLite opcional. Antes de cada consulta se sincroniza con los mtime de
+        # los archivos, salvo que la última sincronización tenga menos de
+        # index_sync_interval segundos (las escrituras propias se indexan al momento).
+        self.sqlite_index = None
+        self.index_sync_interval = 0.0
+        # Nombre del índice (ver _FILE_INDEXES) → instante de su última sincronización
+        self._last_index_syncs: dict[str, float] = {}
+        
+        # Índice vectorial para la búsqueda semántica: se crea con el primer uso
+        self.vector_index = None
+        
+        # Índice de trigramas en memoria (subcadenas y erratas): con el primer uso
+        self.trigram_index = None
+        
+        # Índice posicional para consultas booleanas y de frases: con el primer uso
+        self.boolean_index = None
+        
+        # Índice de referencias entre páginas para rename_page: con el primer uso
+        self.reference_index = None
+        
+        # Índice de identificadores de bloque ("id::") para get_block y compañía: con
+        # el primer uso. Con assign_block_ids, los bloques nuevos reciben su "id::".
+        self.block_id_index = None
+        self.assign_block_ids = False
+        
+        # Registro de deshacer/rehacer (ver src/undo_log.py): desactivado hasta enable_undo_log
+        self.undo_log = None
+        
+        # Flujo de eventos de cambio (ver src/change_feed.py): con la primera suscripción.
+        # El vigilante de cambios externos, con watch_external_changes.
+        self.change_feed = None
+        self._external_watcher: typing.Optional["ExternalChangeWatcher"] = None
+        
+        # Títulos de página → archivos; se construye con el primer uso y se vuelve a
+        # listar pages/ solo cuando cambia su versión (ver src/title_registry.py)
+        self.title_registry = TitleRegistry()
+        self._pages_version: typing.Optional[int] = None
+        
+        # Tokens estimados máximos del contexto que build_context entrega al modelo
+        self.context_token_budget = 1500
+        
+        # Reaplicar bloques de diario aceptados por un proceso que murió sin escribirlos
+        if self.storage.persistent and self.state_path.is_dir():
+            recover_orphan_logs(self.state_path, self._append_text)
+        
+        # Buffer opcional de añadidos al diario; se vacía también al terminar el proceso.
+        # En memoria no hay nada que recuperar tras una caída, así que no lleva log.
+        self.journal_buffer: typing.Optional[AppendBuffer] = None
+        if buffer_journal_appends:
+            log_dir = self.state_path if self.storage.persistent else None
+            self.journal_buffer = AppendBuffer(self._append_text, log_dir)
+            atexit.register(self.journal_buffer.close)
+        
+        # Índice SQLite opcional (se crea al final, ya con el grafo recuperado)
+        if sqlite_index:
+            # Import diferido: sqlite3 solo se carga si el índice está activado
+            from src.sqlite_index import SqliteIndex
+            
+            if self.storage.persistent:
+                self.storage.mkdir(self.state_path)
+                self.sqlite_index = SqliteIndex(self.state_path / "search.sqlite3")
+            else:
+                self.sqlite_index = SqliteIndex(":memory:")
+            self._sync_file_index("sqlite_index", force=True)
+
+    def flush(self) -> None:
+        """
+        Escribe en disco los bloques de diario pendientes en el buffer, si lo hay.
+        """
+        if self.journal_buffer is not None:
+            self.journal_buffer.flush()
+
+    def _document_kind(self, file_path: pathlib.Path) -> str:
+        """Tipo de documento de un archivo del grafo: "journal" o "page"."""
+        return "journal" if file_path.parent == self.journals_path else "page"
+
+    def _title_from_path(self, file_path: pathlib.Path) -> str:
+        """Convierte el nombre de archivo al título legible (__, ___ o %2F → /)."""
+        return title_from_filename(file_path.stem)
+
+    def _refresh_titles(self) -> None:
+        """Vuelve a listar pages/ en el registro de títulos si el directorio cambió."""
+        version = self.storage.directory_version(self.pages_path)
+        if version != self._pages_version:
+            self._cache_lookups.inc("title_registry", "miss")
+            self.title_registry.rebuild(self.storage.list_stats(self.pages_path, "*.md"))
+            self._pages_version = version
+        else:
+            self._cache_lookups.inc("title_registry", "hit")
+
+    def _after_write(
+        self,
+        file_path: pathlib.Path,
+        operation: str = "modify",
+        blocks: tuple[str, ...] = (),
+        previous: typing.Optional[str] = None,
+    ) -> None:
+        """
+        Se llama después de cada escritura del gestor sobre un archivo del grafo.
+        
+        Mantiene al día los índices sin esperar a la siguiente sincronización y publica
+        el cambio en el flujo de eventos si alguien está suscrito.
+        
+        Args:
+            file_path: Archivo escrito
+            operation: Operación del evento ("create", "append", "modify", "rename");
+                si el archivo ya no existe, es "delete"
+            blocks: Textos de los bloques afectados
+            previous: Título anterior, en los renombrados
+        """
+        kind = self._document_kind(file_path)
+        for name in self._FILE_INDEXES:
+            index = getattr(self, name)
+            if index is not None:
+                index.update_file(self.storage, file_path, kind)
+        if file_path.parent == self.pages_path and self._pages_version is not None:
+            # La escritura propia (con su archivo temporal) cambia la versión de pages/:
+            # se registra aquí para no tener que volver a listar el directorio
+            if self.storage.exists(file_path):
+                self.title_registry.add(file_path.name)
+            else:
+                self.title_registry.remove(file_path.name)
+            self._pages_version = self.storage.directory_version(self.pages_path)
+        if self._external_watcher is not None:
+            self._external_watcher.acknowledge(file_path)
+        if self.change_feed is not None and self.change_feed.active:
+            from src.change_feed import ChangeEvent
+            
+            stat = self.storage.stat(file_path)
+            if stat is None:
+                operation = "delete"
+            self.change_feed.publish(ChangeEvent(
+                file_path,
+                self._document_kind(file_path),
+                self._title_from_path(file_path),
+                operation,
+                blocks,
+                None if stat is None else stat.mtime_ns,
+                False,
+                previous,
+            ))
+
+    def _count_write(self, file_path: pathlib.Path, text: str, operation: str) -> None:
+        """Anota en las métricas los bytes escritos en un archivo del grafo."""
+        self._write_bytes.inc(self._document_kind(file_path), operation, amount=len(text.encode('utf-8')))
+
+    def _changed_blocks(self, before: typing.Optional[str], after: str) -> tuple[str, ...]:
+        """Bloques que cambian entre dos versiones de un archivo, solo si hay suscriptores."""
+        if self.change_feed is None or not self.change_feed.active:
+            return ()
+        from src.change_feed import changed_blocks
+        
+        return changed_blocks(before or "", after)
+
+    def _sync_file_index(self, name: str, force: bool = False) -> None:
+        """
+        Sincroniza un índice con los archivos, respetando index_sync_interval.
+        
+        Args:
+            name: Uno de _FILE_INDEXES (ej: "trigram_index"), que es también su
+                etiqueta en las métricas de caché
+            force: Sincronizar aunque la última sincronización sea reciente
+        """
+        now = time.monotonic()
+        if not force and now - self._last_index_syncs.get(name, float("-inf")) < self.index_sync_interval:
+            self._cache_lookups.inc(name, "hit")
+            return
+        self._cache_lookups.inc(name, "miss")
+        self.flush()
+        getattr(self, name).sync(self.storage, {"page": self.pages_path, "journal": self.journals_path})
+        self._last_index_syncs[name] = now
+
+    def enable_vector_index(self, dim: int = 1024) -> None:
+        """
+        Activa el índice vectorial de bloques para semantic_search (ver src/vector_index.py).
+        
+        Con almacenamiento en disco se guarda en .logseq-agent/vectors/ y en los
+        siguientes arranques solo se reindexan los archivos que cambiaron.
+        
+        Raises:
+            ImportError: Si numpy no está instalado
+        """
+        if self.vector_index is not None:
+            return
+        
+        # Import diferido: numpy solo se carga si se usa la búsqueda semántica
+        from src.vector_index import VectorIndex
+        
+        directory = self.state_path / "vectors" if self.storage.persistent else None
+        self.vector_index = VectorIndex(directory, dim=dim)
+        atexit.register(self.vector_index.close)
+        self._sync_file_index("vector_index", force=True)
+
+    def enable_trigram_index(self) -> None:
+        """
+        Activa el índice de trigramas en memoria (ver src/trigram_index.py).
+        
+        Con él, search_in_pages solo verifica los archivos que contienen todos los
+        trigramas de la consulta (si el índice SQLite no está activado) y fuzzy_search
+        encuentra bloques aunque la consulta tenga erratas.
+        
+        Con almacenamiento en disco, el índice se guarda al terminar el proceso en una
+        instantánea binaria (.logseq-agent/trigram.snapshot, ver src/graph_snapshot.py)
+        y en el siguiente arranque se carga de ella: solo se vuelven a procesar los
+        archivos cuyo mtime o tamaño cambió.
+        """
+        if self.trigram_index is not None:
+            return
+        
+        from src.graph_snapshot import SnapshotError
+        from src.trigram_index import TrigramIndex
+        
+        if self.storage.persistent:
+            snapshot_path = self.state_path / "trigram.snapshot"
+            try:
+                self.trigram_index = TrigramIndex.load_snapshot(snapshot_path)
+            except (OSError, SnapshotError):
+                # Sin instantánea (o inservible): se construye desde los archivos
+                self.trigram_index = TrigramIndex()
+            atexit.register(self.save_index_snapshots)
+        else:
+            self.trigram_index = TrigramIndex()
+        self._sync_file_index("trigram_index", force=True)
+
+    def save_index_snapshots(self) -> None:
+        """
+        Guarda la instantánea del índice de trigramas si cambió desde la última.
+        
+        Se llama sola al terminar el proceso.
+        """
+        if self.trigram_index is None or not self.trigram_index.modified or not self.storage.persistent:
+            return
+        # El grafo puede haber desaparecido antes del atexit (ej: un directorio temporal)
+        if self.storage.is_dir(self.graph_path):
+            self.trigram_index.save_snapshot(self.state_path / "trigram.snapshot")
+
+    def enable_boolean_index(self) -> None:
+        """Activa el índice posicional de boolean_search (ver src/boolean_search.py)."""
+        if self.boolean_index is not None:
+            return
+        
+        from src.boolean_search import BooleanIndex
+        
+        self.boolean_index = BooleanIndex()
+        self._sync_file_index("boolean_index", force=True)
+
+    def enable_reference_index(self) -> None:
+        """Activa el índice de referencias entre páginas (ver src/reference_index.py)."""
+        if self.reference_index is not None:
+            return
+        
+        from src.reference_index import ReferenceIndex
+        
+        self.reference_index = ReferenceIndex()
+        self._sync_file_index("reference_index", force=True)
+
+    def enable_block_id_index(self) -> None:
+        """Activa el índice de identificadores de bloque (ver src/block_index.py)."""
+        if self.block_id_index is not None:
+            return
+        
+        from src.block_index import BlockIdIndex
+        
+        self.block_id_index = BlockIdIndex()
+        self._sync_file_index("block_id_index", force=True)
+
+    def enable_undo_log(self, max_bytes: typing.Optional[int] = None) -> None:
+        """
+        Activa el registro de deshacer/rehacer de las escrituras (ver src/undo_log.py).
+        
+        Con almacenamiento persistente se guarda en .logseq-agent/undo.log y sobrevive
+        entre sesiones; en memoria vive solo mientras dura el gestor.
+        
+        Args:
+            max_bytes: Tamaño a partir del cual el registro se compacta (por defecto 1 MiB)
+        """
+        if self.undo_log is not None:
+            return
+        
+        from src.undo_log import DEFAULT_MAX_BYTES, UndoLog
+        
+        path = None
+        if self.storage.persistent:
+            self.storage.mkdir(self.state_path)
+            path = self.state_path / "undo.log"
+        self.undo_log = UndoLog(path, max_bytes or DEFAULT_MAX_BYTES)
+
+    def undo_group(self, label: str) -> typing.ContextManager[None]:
+        """
+        Agrupa las escrituras del bloque with en una sola operación de undo().
+        
+        Example:
+            with manager.undo_group("Añadir las tareas de la compra"):
+                manager.append_to_page("Tareas", "TODO Leche")
+                manager.append_to_page("Tareas", "TODO Pan")
+            manager.undo()  # quita las dos
+        """
+        if self.undo_log is None:
+            return contextlib.nullcontext()
+        return self.undo_log.group(label)
+
+    def _enable_change_feed(self) -> None:
+        if self.change_feed is None:
+            from src.change_feed import ChangeFeed
+            
+            self.change_feed = ChangeFeed()
+
+    def subscribe(self, callback: typing.Callable[["ChangeEvent"], None]) -> typing.Callable[[], None]:
+        """
+        Llama a `callback` con un ChangeEvent por cada escritura del gestor (y por cada
+        cambio externo, con watch_external_changes). Ver src/change_feed.py.
+        
+        Returns:
+            Función sin argumentos que cancela la suscripción
+            
+        Example:
+            cancel = manager.subscribe(lambda event: print(event.operation, event.title))
+        """
+        self._enable_change_feed()
+        return self.change_feed.subscribe(callback)
+
+    def change_events(self, maxsize: int = 1000, overflow: str = "block") -> "EventStream":
+        """
+        Iterador asíncrono de los cambios del grafo, con una cola de `maxsize` eventos.
+        
+        Con overflow="block" el escritor espera (hasta un segundo) a que el consumidor
+        saque eventos; con "drop" se descarta el más antiguo. Los descartados se cuentan
+        en el atributo `dropped` del iterador.
+        
+        Example:
+            async for event in manager.change_events(maxsize=100):
+                reindexar(event.path)
+        """
+        self._enable_change_feed()
+        return self.change_feed.events(maxsize, overflow)
+
+    def watch_external_changes(self, interval: typing.Optional[float] = 1.0) -> "ExternalChangeWatcher":
+        """
+        Publica también los cambios que otros procesos hacen en pages/ y journals/.
+        
+        Se detectan comparando mtime y tamaño con el último estado conocido; las
+        escrituras del propio gestor no se publican dos veces.
+        
+        Args:
+            interval: Segundos entre sondeos en un hilo en segundo plano; None para no
+                lanzarlo y sondear a mano con poll()
+                
+        Returns:
+            El vigilante (poll() sondea una vez y devuelve cuántos eventos publicó)
+        """
+        self._enable_change_feed()
+        if self._external_watcher is None:
+            from src.change_feed import ExternalChangeWatcher
+            
+            self.flush()
+            self._external_watcher = ExternalChangeWatcher(
+                self.storage,
+                {"page": self.pages_path, "journal": self.journals_path},
+                self.change_feed.publish,
+                self._title_from_path,
+            )
+            atexit.register(self._external_watcher.stop)
+        if interval is not None:
+            self._external_watcher.start(interval)
+        return self._external_watcher
+
+    def serve_change_feed(self, socket_path: str) -> "ChangeFeedServer":
+        """
+        Exporta los cambios como JSON-lines por un socket Unix local, en segundo plano.
+        
+        Raises:
+            RuntimeError: Si ya hay otro proceso escuchando en esa ruta
+        """
+        self._enable_change_feed()
+        from src.change_feed import ChangeFeedServer
+        
+        server = ChangeFeedServer(self.change_feed, socket_path)
+        server.serve_in_background()
+        atexit.register(server.server_close)
+        return server
+
+    def _graph_relative(self, file_path: pathlib.Path) -> str:
+        """Ruta de un archivo relativa al grafo, como se guarda en el registro de deshacer."""
+        return file_path.relative_to(self.graph_path).as_posix()
+
+    def _format_block(self, content: str) -> str:
+        """Un bloque nuevo de primer nivel, con su "id::" si assign_block_ids está activado."""
+        if not self.assign_block_ids:
+            return f"- {content}"
+        from src.block_index import new_block_id
+        
+        return f"- {content}\n  id:: {new_block_id()}"
+
+    def _append_text(self, file_path: pathlib.Path, formatted_content: str) -> None:
+        """
+        Añade un bloque ya formateado al final de un archivo, creándolo si no existe.
+        
+        Se hace bajo el lock del archivo para no intercalarse con una sustitución
+        atómica de otro proceso (el añadido acabaría en el inodo reemplazado).
+        """
+        with self.storage.lock(file_path):
+            stat = self.storage.stat(file_path)
+            if stat is not None:
+                # Si existe, añadir el contenido al final con nueva línea inicial
+                text = f"\n{formatted_content}"
+                self.storage.append_text(file_path, text)
+            else:
+                # Si no existe, crearlo con el contenido formateado (sin \n inicial)
+                text = formatted_content
+                self.storage.write_text(file_path, text)
+        self._count_write(file_path, text, "create" if stat is None else "append")
+        if self.undo_log is not None:
+            self.undo_log.record_append(self._graph_relative(file_path), None if stat is None else stat.size, text)
+        self._after_write(file_path, "create" if stat is None else "append", self._changed_blocks(None, text))
+
+    def _modify_file(
+        self,
+        file_path: pathlib.Path,
+        transform: typing.Callable[[typing.Optional[str]], _TransformResult],
+        notify: bool = True,
+        undoable: bool = True,
+    ) -> typing.Any:
+        """
+        Lectura-modificación-escritura con control de concurrencia optimista.
+        
+        Lee el archivo y su versión (mtime_ns, tamaño, hash), calcula el contenido nuevo
+        con `transform` y solo lo escribe si, con el lock tomado, la versión sigue siendo
+        la leída. Si otro proceso lo modificó entretanto, se cuenta un conflicto y se
+        repite todo con el contenido nuevo.
+        
+        Args:
+            file_path: Archivo a modificar
+            transform: Recibe el contenido actual (None si el archivo no existe) y devuelve
+                (contenido_nuevo o None para no escribir, resultado para el llamador)
+            notify: Si False, no se llama a _after_write: lo hace el llamador (los índices
+                no se actualizan desde varios hilos a la vez)
+            undoable: Si False, la escritura no se anota en el registro de deshacer (la
+                hacen undo y redo)
+                
+        Returns:
+            El resultado devuelto por `transform` en el intento que se aplicó
+            
+        Raises:
+            ConcurrentModificationError: Si hubo conflicto en todos los reintentos
+        """
+        for _ in range(self.max_write_retries + 1):
+            try:
+                content, version = self.storage.read_versioned(file_path)
+            except FileNotFoundError:
+                content, version = None, None
+            
+            new_content, result = transform(content)
+            if new_content is None:
+                return result
+            
+            with self.storage.lock(file_path):
+                written = self.storage.version(file_path) == version
+                if written:
+                    self.storage.write_text(file_path, new_content)
+            if written:
+                self._count_write(file_path, new_content, "rewrite")
+                if undoable and self.undo_log is not None:
+                    self.undo_log.record_edit(self._graph_relative(file_path), content, new_content)
+                if notify:
+                    self._after_write(file_path, blocks=self._changed_blocks(content, new_content))
+                return result
+            
+            # Alguien escribió el archivo entre nuestra lectura y el lock: reintentar
+            self.lock_stats.record_conflict()
+        
+        self.lock_stats.record_failure()
+        raise ConcurrentModificationError(
+            f"{file_path} cambió en cada uno de los {self.max_write_retries + 1} intentos de escritura"
+        )
 
     def _get_page_path(self, page_title: str) -> pathlib.Path:
         """
         Función privada para obtener la ruta de un archivo de página.
         
-        Convierte el título de página a la convención de nombres de Logseq,
-        reemplazando barras (/) por doble guión bajo (__) y construyendo la ruta completa.
+        Si ya existe una página con ese título (exacto, sin distinguir mayúsculas o sin
+        distinguir acentos, y con cualquiera de las codificaciones de Logseq para "/")
+        devuelve su archivo. Si no, la ruta canónica: barras (/) reemplazadas por doble
+        guión bajo (__) y extensión .md.
         
         Args:
             page_title: Título de la página a buscar
             
         Returns:
             Path al archivo de la página (no verifica si existe)
+            
+        Raises:
+            AmbiguousPageTitleError: Si varias páginas encajan con el título
+            
+        Example:
+            Con "Tareas.md" en el grafo, _get_page_path("tareas") → pages/Tareas.md
         """
-        # Reemplazar barras por doble guión bajo según convención de Logseq
-        safe_filename = page_title.replace("/", "__")
+        self._refresh_titles()
+        existing_filename = self.title_registry.resolve(page_title)
         
-        # Construir la ruta completa con extensión .md
-        page_path = self.pages_path / f"{safe_filename}.md"
+        # Sin página existente, construir la ruta canónica según la convención de Logseq
+        return self.pages_path / (existing_filename or filename_for_title(page_title))
+
+    def complete_page_title(self, prefix: str, limit: int = 10) -> list[str]:
+        """
+        Títulos de página que empiezan por `prefix`, sin distinguir mayúsculas.
         
-        return page_path
+        Usa el árbol de espacios de nombres en memoria (ver src/namespace_tree.py), así
+        que no lee el disco salvo para volver a listar pages/ si cambió.
+        
+        Args:
+            prefix: Comienzo del título, con o sin espacio de nombres
+            limit: Número máximo de títulos a devolver
+            
+        Returns:
+            Títulos en orden alfabético
+            
+        Example:
+            complete_page_title("proyectos/mi") → ['Proyectos/Mi App', 'Proyectos/Mi App/Tareas']
+        """
+        self._refresh_titles()
+        return self.title_registry.namespaces.complete(prefix, limit)
+
+    def list_namespace(self, namespace: str = "") -> list[tuple[str, int]]:
+        """
+        Lista los hijos directos de un espacio de nombres con sus páginas.
+        
+        Args:
+            namespace: Espacio de nombres (ej: "Proyectos"); "" para el nivel superior
+            
+        Returns:
+            Lista de (título, páginas en su subárbol incluida ella misma). Un hijo puede
+            no tener archivo propio si solo existen páginas bajo él.
+            
+        Example:
+            list_namespace("Proyectos") → [('Proyectos/Apolo', 1), ('Proyectos/Mi App', 3)]
+        """
+        self._refresh_titles()
+        return self.title_registry.namespaces.children(namespace)
+
+    def namespace_pages(self, namespace: str) -> list[str]:
+        """
+        Títulos de todas las páginas bajo un espacio de nombres, a cualquier profundidad.
+        
+        Example:
+            namespace_pages("Proyectos") → ['Proyectos/Apolo', 'Proyectos/Mi App', 'Proyectos/Mi App/Tareas']
+        """
+        self._refresh_titles()
+        return self.title_registry.namespaces.subtree(namespace)
+
+    def _get_journal_path(self, journal_title: str) -> pathlib.Path:
+        """
+        Función privada para obtener la ruta de un archivo de diario.
+        
+        Args:
+            journal_title: Nombre del diario en formato de Logseq (ej: "2025_01_15")
+            
+        Returns:
+            Path al archivo del diario (no verifica si existe)
+        """
+        return self.journals_path / f"{journal_title}.md"
 
     def page_exists(self, page_title: str) -> bool:
         """
@@ -78,9 +765,10 @@ class LogseqManager:
         # Obtener la ruta potencial del archivo
         page_path = self._get_page_path(page_title)
         
-        # Verificar si el archivo realmente existe en el sistema de archivos
-        return page_path.exists() and page_path.is_file()
+        # Verificar si el archivo realmente existe en el almacenamiento
+        return self.storage.exists(page_path)
 
+    @_timed
     def read_page_content(self, page_title: str) -> typing.Optional[str]:
         """
         Lee el contenido completo de una página.
@@ -100,15 +788,83 @@ class LogseqManager:
         
         # Leer el contenido del archivo con encoding UTF-8
         try:
-            with open(page_path, 'r', encoding='utf-8') as file:
-                content = file.read()
-            return content
-        except (IOError, OSError) as e:
+            return self.storage.read_text(page_path)
+        except (IOError, OSError):
             # En caso de error de lectura, devolver None
             # Esto podría ocurrir si hay problemas de permisos o el archivo se elimina
             # entre la verificación de existencia y la lectura
             return None
 
+    def _block_file(self, page_title: str, is_journal: bool) -> typing.Optional[tuple[pathlib.Path, int]]:
+        """Ruta y tamaño del archivo de una página o diario, o None si no existe."""
+        if is_journal:
+            file_path = self._get_journal_path(page_title)
+            # Los bloques que esperan en el buffer también son parte del diario
+            if self.journal_buffer is not None:
+                self.journal_buffer.flush(file_path)
+        else:
+            file_path = self._get_page_path(page_title)
+        stat = self.storage.stat(file_path)
+        return None if stat is None else (file_path, stat.size)
+
+    @_timed
+    def read_page_blocks(
+        self,
+        page_title: str,
+        start: int = 0,
+        count: int = 20,
+        is_journal: bool = False,
+    ) -> typing.Optional[list[str]]:
+        """
+        Lee un tramo de bloques de una página sin cargar el archivo entero.
+        
+        Args:
+            page_title: Título de la página, o nombre del diario (ej: "2025_01_15")
+            start: Índice del primer bloque (desde 0); si es negativo se cuenta desde
+                el final, como en las listas de Python (-5 = el quinto empezando por el final)
+            count: Número máximo de bloques a devolver
+            is_journal: Si True, lee el diario de journals/ en lugar de una página
+            
+        Returns:
+            Las líneas de los bloques tal como están escritas (con su sangría), o None
+            si la página no existe
+            
+        Example:
+            read_page_blocks("Tareas", 0, 10)    # los 10 primeros bloques
+            read_page_blocks("Tareas", -20, 10)  # 10 bloques a partir del vigésimo por el final
+        """
+        found = self._block_file(page_title, is_journal)
+        if found is None:
+            return None
+        file_path, size = found
+        if count <= 0:
+            return []
+        
+        def read_range(offset: int, length: int) -> bytes:
+            return self.storage.read_range(file_path, offset, length)
+        
+        try:
+            if start < 0:
+                # Solo se lee desde el final lo necesario para llegar al bloque `start`
+                return tail_block_lines(read_range, size, -start)[:count]
+            return head_block_lines(read_range, size, start, count)
+        except (IOError, OSError):
+            return None
+
+    def tail_page(self, page_title: str, n: int = 10, is_journal: bool = False) -> typing.Optional[list[str]]:
+        """
+        Lee los últimos `n` bloques de una página o diario leyendo el archivo desde el final.
+        
+        El coste depende del tamaño de esos bloques, no del archivo: sirve para ver las
+        últimas entradas de diarios o registros largos.
+        
+        Returns:
+            Las líneas de los bloques en orden, o None si la página no existe
+        """
+        n = max(n, 0)
+        return self.read_page_blocks(page_title, -n, n, is_journal=is_journal)
+
+    @_timed
     def create_page(self, page_title: str, content: str = "") -> pathlib.Path:
         """
         Crea una nueva página con el contenido especificado.
@@ -130,12 +886,22 @@ class LogseqManager:
         # Si no existe, crear la nueva página
         page_path = self._get_page_path(page_title)
         
-        # Crear el archivo con el contenido especificado usando encoding UTF-8
-        page_path.write_text(content, encoding='utf-8')
+        # Crear el archivo con el contenido especificado, salvo que otro proceso
+        # la haya creado mientras esperábamos el lock
+        with self.storage.lock(page_path):
+            created = not self.storage.exists(page_path)
+            if created:
+                self.storage.write_text(page_path, content)
+        if created:
+            self._count_write(page_path, content, "create")
+            if self.undo_log is not None:
+                self.undo_log.record_append(self._graph_relative(page_path), None, content)
+            self._after_write(page_path, "create", self._changed_blocks(None, content))
         
         # Devolver la ruta del archivo recién creado
         return page_path
 
+    @_timed
     def append_to_page(self, page_title: str, content: str) -> None:
         """
         Añade contenido al final de una página existente como un bloque de Logseq.
@@ -151,17 +917,12 @@ class LogseqManager:
         page_path = self._get_page_path(page_title)
         
         # Formatear el contenido como un bloque de Logseq
-        formatted_content = f"- {content}"
+        formatted_content = self._format_block(content)
         
-        # Verificar si la página existe
-        if not self.page_exists(page_title):
-            # Si no existe, crear la página con el contenido formateado (sin \n inicial)
-            page_path.write_text(formatted_content, encoding='utf-8')
-        else:
-            # Si existe, añadir el contenido al final con nueva línea inicial
-            with open(page_path, 'a', encoding='utf-8') as file:
-                file.write(f"\n{formatted_content}")
+        # Añadir al final, o crear la página si no existe (sin \n inicial)
+        self._append_text(page_path, formatted_content)
 
+    @_timed
     def prepend_to_page(self, page_title: str, content: str) -> None:
         """
         Añade contenido al principio de una página existente como un bloque de Logseq.
@@ -176,28 +937,19 @@ class LogseqManager:
             content: Contenido a añadir al principio de la página (se formateará como bloque)
         """
         # Formatear el contenido como un bloque de Logseq
-        formatted_content = f"- {content}"
+        formatted_content = self._format_block(content)
         
-        # Verificar si la página existe
-        if not self.page_exists(page_title):
-            # Si no existe, crear la página con el contenido formateado
-            # Reutilizamos create_page para mantener consistencia
-            self.create_page(page_title, content=formatted_content)
-        else:
-            # Si existe, leer contenido actual y combinar
-            current_content = self.read_page_content(page_title)
-            
-            # Manejar el caso en que read_page_content devuelva None o cadena vacía
+        def prepend(current_content: typing.Optional[str]) -> _TransformResult:
+            # Si la página no existe, crearla solo con el contenido formateado
             if current_content is None:
-                current_content = ""
-            
-            # Construir el nuevo contenido completo: nuevo + \n + actual
-            new_content = f"{formatted_content}\n{current_content}"
+                return formatted_content, None
             
-            # Obtener la ruta del archivo y sobrescribir
-            page_path = self._get_page_path(page_title)
-            page_path.write_text(new_content, encoding='utf-8')
+            # Si existe, construir el nuevo contenido completo: nuevo + \n + actual
+            return f"{formatted_content}\n{current_content}", None
+        
+        self._modify_file(self._get_page_path(page_title), prepend)
 
+    @_timed
     def search_in_pages(self, query: str) -> list[str]:
         """
         Busca una cadena de texto en todas las páginas del grafo de Logseq.
@@ -217,36 +969,123 @@ class LogseqManager:
             Si busco "python" y se encuentra en "Ideas__Aprender.md" y "Proyectos__AgenteIA.md",
             devuelve ['Ideas/Aprender', 'Proyectos/AgenteIA']
         """
-        # Lista para almacenar los títulos de páginas que contienen la query
-        found_pages = []
-        
-        # Convertir la query a minúsculas para búsqueda insensible a mayúsculas
-        query_lower = query.lower()
-        
-        # Iterar sobre todos los archivos .md en el directorio de páginas
-        for page_file in self.pages_path.glob("*.md"):
+        return [hit.title for hit in self.search_graph(query, include_journals=False)]
+
+    def _scan_files(self, files: list[pathlib.Path], query_lower: str) -> list[pathlib.Path]:
+        """Archivos de la lista cuyo contenido contiene `query_lower` (sin distinguir mayúsculas)."""
+        found = []
+        for file_path in files:
             try:
-                # Leer el contenido del archivo
-                content = page_file.read_text(encoding='utf-8')
-                
-                # Verificar si la query existe en el contenido (insensible a mayúsculas)
-                if query_lower in content.lower():
-                    # Obtener el nombre del archivo sin la extensión .md
-                    page_name = page_file.stem
-                    
-                    # Convertir de vuelta al formato legible: reemplazar __ por /
-                    readable_title = page_name.replace("__", "/")
-                    
-                    # Añadir a la lista de resultados
-                    found_pages.append(readable_title)
-                    
+                if query_lower in self.storage.read_text(file_path).lower():
+                    found.append(file_path)
             except (IOError, OSError, UnicodeDecodeError):
                 # Si hay error leyendo el archivo (permisos, encoding, etc.),
                 # simplemente omitir este archivo y continuar con el siguiente
                 continue
+        return found
+
+    @_timed
+    def search_graph(
+        self,
+        query: str,
+        include_pages: bool = True,
+        include_journals: bool = True,
+        date_from: typing.Optional[date] = None,
+        date_to: typing.Optional[date] = None,
+    ) -> list[SearchHit]:
+        """
+        Busca una cadena de texto en las páginas y en los diarios del grafo.
         
-        return found_pages
+        La búsqueda no distingue mayúsculas, igual que search_in_pages. Los diarios se
+        filtran por la fecha de su nombre de archivo (AAAA_MM_DD) antes de leerlos, y
+        sin índice activado se recorren en un hilo aparte mientras se recorren las páginas.
+        
+        Args:
+            query: Cadena de texto a buscar
+            include_pages: Si True, busca en pages/
+            include_journals: Si True, busca en journals/
+            date_from: Primer día (incluido) de los diarios en los que buscar
+            date_to: Último día (incluido) de los diarios en los que buscar
+            
+        Returns:
+            Las páginas encontradas en orden alfabético y, después, los diarios del más
+            reciente al más antiguo, con su fecha
+            
+        Raises:
+            ValueError: Si date_from es posterior a date_to
+            
+        Example:
+            search_graph("apolo", include_pages=False, date_from=date(2025, 1, 1))
+            # → [SearchHit('2025_01_15', 'journal', date(2025, 1, 15)), ...]
+        """
+        if date_from is not None and date_to is not None and date_from > date_to:
+            raise ValueError(f"❌ ERROR: La fecha inicial ({date_from}) es posterior a la final ({date_to})")
+        
+        # Los nombres AAAA_MM_DD se ordenan como las fechas: se compara el nombre sin parsearlo
+        low = date_from.strftime("%Y_%m_%d") if date_from is not None else None
+        high = date_to.strftime("%Y_%m_%d") if date_to is not None else None
+        
+        def in_range(file_path: pathlib.Path) -> bool:
+            if low is None and high is None:
+                return True
+            # Un diario con otro nombre no tiene fecha: solo entra sin filtro de fechas
+            if _journal_date(file_path.stem) is None:
+                return False
+            return (low is None or file_path.stem >= low) and (high is None or file_path.stem <= high)
+        
+        query_lower = query.lower()
+        pages: list[pathlib.Path] = []
+        journals: list[pathlib.Path] = []
+        
+        # Con un índice activado (SQLite o trigramas), sus candidatos se verifican con la
+        # misma comparación que el recorrido de archivos para que los resultados sean idénticos
+        if self.sqlite_index is not None or self.trigram_index is not None:
+            if self.sqlite_index is not None:
+                self._sync_file_index("sqlite_index")
+                index, source = self.sqlite_index, "sqlite"
+            else:
+                self._sync_file_index("trigram_index")
+                index, source = self.trigram_index, "trigram"
+            candidates = 0
+            if include_pages:
+                page_candidates = index.substring_candidates(query, "page")
+                candidates += len(page_candidates)
+                pages = [path for path, content in page_candidates if query_lower in content.lower()]
+            if include_journals:
+                journal_candidates = index.substring_candidates(query, "journal")
+                candidates += len(journal_candidates)
+                journals = [
+                    path for path, content in journal_candidates
+                    if in_range(path) and query_lower in content.lower()
+                ]
+            self._files_scanned.observe(candidates, source)
+        elif include_journals:
+            # Los bloques de diario pendientes en el buffer también cuentan
+            self.flush()
+            journal_files = [path for path in self.storage.list_files(self.journals_path, "*.md") if in_range(path)]
+            if include_pages:
+                # La lectura de archivos libera el GIL: los diarios se recorren a la vez que las páginas
+                page_files = self.storage.list_files(self.pages_path, "*.md")
+                with concurrent.futures.ThreadPoolExecutor(max_workers=1, thread_name_prefix="busqueda-diarios") as executor:
+                    journal_scan = executor.submit(self._scan_files, journal_files, query_lower)
+                    pages = self._scan_files(page_files, query_lower)
+                    journals = journal_scan.result()
+                self._files_scanned.observe(len(page_files) + len(journal_files), "scan")
+            else:
+                journals = self._scan_files(journal_files, query_lower)
+                self._files_scanned.observe(len(journal_files), "scan")
+        elif include_pages:
+            page_files = self.storage.list_files(self.pages_path, "*.md")
+            pages = self._scan_files(page_files, query_lower)
+            self._files_scanned.observe(len(page_files), "scan")
+        
+        hits = [SearchHit(self._title_from_path(path), "page", None) for path in pages]
+        dated = [SearchHit(self._title_from_path(path), "journal", _journal_date(path.stem)) for path in journals]
+        # Los diarios con fecha, del más reciente al más antiguo; los que no la tienen, al final
+        dated.sort(key=lambda hit: (hit.date is not None, hit.title), reverse=True)
+        return hits + dated
 
+    @_timed
     def find_block_in_page(self, page_title: str, block_content: str) -> bool:
         """
         Busca un bloque específico de contenido dentro de una página de Logseq.
@@ -269,6 +1108,12 @@ class LogseqManager:
         if not self.page_exists(page_title):
             return False
         
+        # Con el índice activado, basta con consultar la tabla de bloques
+        if self.sqlite_index is not None:
+            page_path = self._get_page_path(page_title)
+            self.sqlite_index.update_file(self.storage, page_path, "page")
+            return self.sqlite_index.has_block(page_path, block_content)
+        
         # 2. Leer el contenido de la página
         content = self.read_page_content(page_title)
         if not content:  # Maneja None o cadena vacía
@@ -279,22 +1124,182 @@ class LogseqManager:
         
         # 4. Para cada línea del archivo
         for line in lines:
-            # a. Quitar el prefijo del bloque ("- ") y espacios en blanco
-            # Primero remover espacios al principio y final
-            cleaned_line = line.strip()
-            
-            # Si la línea comienza con "- ", remover ese prefijo
-            if cleaned_line.startswith("- "):
-                block_text = cleaned_line[2:].strip()  # Remover "- " y espacios adicionales
-                
-                # b. Comprobar si la línea resultante es igual al block_content buscado
-                if block_text == block_content:
-                    # 5. Si encuentra una coincidencia exacta, devolver True
-                    return True
+            # a. Quitar el prefijo del bloque ("- ") y espacios en blanco (ver src/blocks.py)
+            # b. Comprobar si la línea resultante es igual al block_content buscado
+            if block_text(line) == block_content:
+                # 5. Si encuentra una coincidencia exacta, devolver True
+                return True
         
         # 6. Si recorre todo el archivo y no encuentra nada, devolver False
         return False
 
+    @_timed
+    def search_blocks(self, query: str, limit: int = 20) -> list[tuple[str, str]]:
+        """
+        Busca bloques en páginas y diarios con la sintaxis de consultas de FTS5.
+        
+        Requiere el índice SQLite (sqlite_index=True). Admite prefijos (canc*),
+        frases ("mi canción") y los operadores AND, OR y NOT; no distingue acentos
+        ni mayúsculas.
+        
+        Args:
+            query: Consulta FTS5
+            limit: Número máximo de bloques a devolver
+            
+        Returns:
+            Lista de (título, texto del bloque) ordenada por relevancia. El título de
+            un diario es su nombre de archivo (ej: "2025_01_15").
+            
+        Raises:
+            ValueError: Si el índice no está activado o la consulta no es válida
+            
+        Example:
+            search_blocks('reunion AND (ana OR luis)')
+            # → [('Proyectos/Agente', 'Reunión con Ana'), ('2025_01_15', 'Reunión con Luis')]
+        """
+        if self.sqlite_index is None:
+            raise ValueError("❌ ERROR: search_blocks requiere el índice SQLite (sqlite_index=True)")
+        
+        self._sync_file_index("sqlite_index")
+        return [(self._title_from_path(hit.path), hit.text) for hit in self.sqlite_index.query_blocks(query, limit)]
+
+    @_timed
+    def semantic_search(self, query: str, top_k: int = 5) -> list[tuple[str, str, float]]:
+        """
+        Busca los bloques de páginas y diarios más relacionados con una consulta.
+        
+        A diferencia de search_in_pages no exige que aparezca el texto exacto: compara
+        vectores TF-IDF de palabras y fragmentos de palabra, sin red ni modelos externos.
+        La primera llamada construye el índice vectorial (enable_vector_index).
+        
+        Args:
+            query: Consulta en lenguaje natural
+            top_k: Número máximo de bloques a devolver
+            
+        Returns:
+            Lista de (título, texto del bloque, puntuación entre 0 y 1), de más a menos
+            relevante. El título de un diario es su nombre de archivo (ej: "2025_01_15").
+            
+        Raises:
+            ImportError: Si numpy no está instalado
+            
+        Example:
+            semantic_search("reuniones con el equipo")
+            # → [('Agenda', 'Reunión de equipo el lunes', 0.41), ...]
+        """
+        if self.vector_index is None:
+            self.enable_vector_index()
+        else:
+            self._sync_file_index("vector_index")
+        
+        return [
+            (self._title_from_path(hit.path), hit.text, hit.score)
+            for hit in self.vector_index.search(query, top_k)
+        ]
+
+    @_timed
+    def fuzzy_search(self, query: str, limit: int = 10, min_similarity: float = 0.6) -> list[tuple[str, str, float]]:
+        """
+        Busca bloques de páginas y diarios que contienen la consulta aunque tenga erratas.
+        
+        Compara trigramas sin distinguir mayúsculas ni acentos: "Proyeto Apolo" encuentra
+        "Reunión del Proyecto Apolo". La primera llamada construye el índice de
+        trigramas (enable_trigram_index).
+        
+        Args:
+            query: Texto a buscar, posiblemente con erratas
+            limit: Número máximo de bloques a devolver
+            min_similarity: Fracción mínima (0-1) de los trigramas de la consulta que
+                debe contener un bloque
+            
+        Returns:
+            Lista de (título, texto del bloque, similitud), de más a menos parecido. El
+            título de un diario es su nombre de archivo (ej: "2025_01_15").
+            
+        Raises:
+            ValueError: Si min_similarity no está entre 0 y 1
+            
+        Example:
+            fuzzy_search("Proyeto Apolo")
+            # → [('Proyectos', 'Reunión del Proyecto Apolo', 0.82)]
+        """
+        if not 0 < min_similarity <= 1:
+            raise ValueError(f"❌ ERROR: min_similarity debe estar entre 0 y 1 (valor: {min_similarity})")
+        
+        if self.trigram_index is None:
+            self.enable_trigram_index()
+        else:
+            self._sync_file_index("trigram_index")
+        
+        return [
+            (self._title_from_path(hit.path), hit.text, hit.score)
+            for hit in self.trigram_index.fuzzy_blocks(query, limit, min_similarity)
+        ]
+
+    @_timed
+    def boolean_search(self, query: str, include_journals: bool = True) -> list[str]:
+        """
+        Busca páginas (y diarios) con una consulta booleana o de frases.
+        
+        Admite palabras sueltas (todas deben aparecer), frases entre comillas
+        ("proyecto apolo"), AND, OR y NOT en mayúsculas y paréntesis; no distingue
+        mayúsculas ni acentos. La primera llamada construye el índice posicional
+        (enable_boolean_index).
+        
+        Args:
+            query: Consulta booleana
+            include_journals: Si True, incluye también los diarios que la cumplen
+            
+        Returns:
+            Títulos de las páginas que cumplen la consulta y, después, los nombres de
+            los diarios (ej: "2025_01_15"), cada grupo en orden alfabético.
+            
+        Raises:
+            ValueError: Si la consulta no es válida
+            
+        Example:
+            boolean_search('python AND agente NOT borrador')
+            # → ['Ideas/Aprender', 'Proyectos/AgenteIA']
+        """
+        if self.boolean_index is None:
+            self.enable_boolean_index()
+        else:
+            self._sync_file_index("boolean_index")
+        
+        found = self.boolean_index.search(query)
+        pages = [self._title_from_path(path) for path in found if self._document_kind(path) == "page"]
+        if not include_journals:
+            return pages
+        return pages + [self._title_from_path(path) for path in found if self._document_kind(path) == "journal"]
+
+    @_timed
+    def build_context(self, query: str, token_budget: typing.Optional[int] = None) -> "NoteContext":
+        """
+        Reúne los bloques del grafo más útiles para responder a una consulta.
+        
+        Combina búsqueda, páginas citadas como [[Página]] con sus backlinks y los
+        diarios recientes, sin repetir bloques y sin pasar del presupuesto de tokens
+        (ver src/context_builder.py).
+        
+        Args:
+            query: Pregunta o tema
+            token_budget: Tokens estimados máximos del contexto (por defecto
+                context_token_budget)
+            
+        Returns:
+            NoteContext: Texto listo para el prompt, bloques incluidos y tokens estimados
+            
+        Example:
+            build_context("¿Qué decidimos sobre [[Proyecto Apolo]]?", token_budget=500).text
+            # → "## Proyecto Apolo\n- Lanzamiento en marzo\n## 2025_01_15\n- Reunión de [[Proyecto Apolo]]...\n"
+        """
+        from src.context_builder import build_context
+        
+        if token_budget is None:
+            token_budget = self.context_token_budget
+        return build_context(self, query, token_budget=token_budget)
+
+    @_timed
     def update_block_in_page(self, page_title: str, old_content: str, new_content: str) -> bool:
         """
         Modifica un bloque específico dentro de una página de Logseq.
@@ -315,61 +1320,105 @@ class LogseqManager:
             update_block_in_page(page, "Comprar papel higiénico", "Comprar papel de baño"),
             el bloque se cambiará a "- Comprar papel de baño".
         """
-        # 1. Verificar que la página existe
-        if not self.page_exists(page_title):
-            return False
+        # Un lote de una sola edición: misma búsqueda del primer bloque coincidente
+        return self.apply_page_batch(page_title, edits=[(old_content, new_content)])[0]
+
+    @_timed
+    def rename_page(self, old_title: str, new_title: str) -> RenameResult:
+        """
+        Renombra una página y reescribe todas las referencias a ella.
         
-        # 2. Leer todo el contenido de la página línea por línea
-        content = self.read_page_content(page_title)
-        if not content:  # Maneja None o cadena vacía
-            return False
+        Con el índice de referencias (ver src/reference_index.py) solo se leen y reescriben
+        los archivos que enlazan la página con [[...]], #[[...]] o #etiqueta. Se reescriben
+        en paralelo, cada uno con una escritura atómica y control de concurrencia
+        optimista, y después se actualizan todos los índices y el registro de títulos.
+        La propiedad "title::" de la página, si la tiene, también cambia. Las páginas
+        del espacio de nombres de la antigua ("Antigua/Hija") no se renombran.
         
-        # Dividir en líneas
-        lines = content.splitlines()
+        Args:
+            old_title: Título actual (se resuelve como en el resto de métodos)
+            new_title: Título nuevo
+            
+        Returns:
+            RenameResult: Título y archivo nuevos, archivos actualizados y número de referencias
+            
+        Raises:
+            ValueError: Si la página no existe, el título nuevo está vacío o ya hay otra
+                página con ese título
+            
+        Example:
+            rename_page("Apolo", "Proyecto Apolo")
+            # pages/Apolo.md → pages/Proyecto Apolo.md y "[[Apolo]]" → "[[Proyecto Apolo]]"
+        """
+        new_title = new_title.strip()
+        if not new_title:
+            raise ValueError("❌ ERROR: El título nuevo de la página no puede estar vacío")
+        if not self.page_exists(old_title):
+            raise ValueError(f"❌ ERROR: La página '{old_title}' no existe")
+        old_path = self._get_page_path(old_title)
+        # Las referencias usan el título real, no el que escribió el usuario ("reunion")
+        old_name = self._title_from_path(old_path)
+        current = self._get_page_path(new_title)
+        if current != old_path and self.storage.exists(current):
+            raise ValueError(f"❌ ERROR: Ya existe una página '{new_title}'")
+        new_path = self.pages_path / filename_for_title(new_title)
         
-        # 3. Crear nueva lista para contenido modificado y bandera para saber si se encontró
-        modified_lines = []
-        block_found = False
+        from src.reference_index import rewrite_references
         
-        # 4. Iterar sobre cada línea en la lista de líneas originales
-        for line in lines:
-            # a. Limpiar la línea actual (quitando "- " y espacios) para compararla con old_content
-            cleaned_line = line.strip()
-            
-            # Si la línea comienza con "- ", remover ese prefijo para comparar
-            if cleaned_line.startswith("- ") and not block_found:
-                block_text = cleaned_line[2:].strip()  # Remover "- " y espacios adicionales
-                
-                # b. Si la línea limpia coincide con old_content
-                if block_text == old_content:
-                    # i. Marcar block_found = True
-                    block_found = True
-                    # ii. Añadir la nueva línea completa (new_content formateado como bloque)
-                    formatted_new_content = f"- {new_content}"
-                    modified_lines.append(formatted_new_content)
-                else:
-                    # c. Si no coincide: añadir la línea original sin cambios
-                    modified_lines.append(line)
-            else:
-                # c. Si no es un bloque (no empieza con "- ") o ya encontramos el bloque, añadir línea original
-                modified_lines.append(line)
+        if self.reference_index is None:
+            self.enable_reference_index()
+        else:
+            self._sync_file_index("reference_index", force=True)
+        referrers = self.reference_index.referrers(old_name)
         
-        # 5. Después del bucle
-        # a. Si block_found es False, no se modificó nada
-        if not block_found:
-            return False
+        # El renombrado y todas las referencias reescritas se deshacen de una vez
+        with self.undo_group(f"Renombrar '{old_name}' a '{new_title}'"):
+            # 1. Renombrar el archivo; la propia página se reescribe con las demás
+            if new_path != old_path:
+                with self.storage.lock(old_path):
+                    self.storage.rename(old_path, new_path)
+                if self.undo_log is not None:
+                    self.undo_log.record_rename(self._graph_relative(old_path), self._graph_relative(new_path))
+                self._after_write(old_path)
+                self._after_write(new_path, "rename", previous=old_name)
+            paths = [new_path if path == old_path else path for path in referrers]
+            if new_path not in paths:
+                paths.append(new_path)
         
-        # b. Si block_found es True:
-        # i. Unir la lista de contenido modificado en una sola cadena usando \n
-        new_file_content = "\n".join(modified_lines)
+            def rewrite(file_path: pathlib.Path) -> tuple[int, typing.Optional[tuple[str, ...]]]:
+                """Referencias sustituidas y bloques cambiados (None si el archivo no cambió)."""
+                def transform(content: typing.Optional[str]) -> _TransformResult:
+                    if content is None:
+                        return None, (0, None)
+                    new_content, count = rewrite_references(content, old_name, new_title)
+                    if file_path == new_path:
+                        new_content = _TITLE_PROPERTY_RE.sub(
+                            lambda match: match.group(1) + new_title if match.group(2).casefold() == old_name.casefold() else match.group(0),
+                            new_content,
+                            count=1,
+                        )
+                    if new_content == content:
+                        return None, (count, None)
+                    return new_content, (count, self._changed_blocks(content, new_content))
+            
+                return self._modify_file(file_path, transform, notify=False)
         
-        # ii. Obtener la ruta de la página y sobrescribir el archivo completo
-        page_path = self._get_page_path(page_title)
-        page_path.write_text(new_file_content, encoding='utf-8')
+            # 2. Reescribir las referencias en paralelo (la E/S libera el GIL); los índices se
+            #    actualizan después desde este hilo, solo con los archivos que cambiaron.
+            #    Los hilos del pool registran sus cambios en la operación de este hilo
+            if self.undo_log is not None:
+                rewrite = self.undo_log.bind(rewrite)
+            with concurrent.futures.ThreadPoolExecutor(max_workers=min(8, len(paths)), thread_name_prefix="renombrar") as executor:
+                results = list(executor.map(rewrite, paths))
+            for file_path, (_, blocks) in zip(paths, results):
+                if blocks is not None:
+                    self._after_write(file_path, blocks=blocks)
+            counts = [count for count, _ in results]
         
-        # iii. Devolver True para indicar que la operación fue exitosa
-        return True
+        updated = [self._title_from_path(path) for path, count in zip(paths, counts) if count]
+        return RenameResult(new_title, new_path, updated, sum(counts))
 
+    @_timed
     def append_to_journal(self, content: str, is_task: bool = False, target_date: typing.Optional[date] = None) -> None:
         """
         Añade contenido al diario de una fecha específica en Logseq.
@@ -404,29 +1453,29 @@ class LogseqManager:
         journal_filename = target_date.strftime("%Y_%m_%d")
         
         # 3. Construir la ruta completa al archivo del diario usando self.journals_path
-        journal_path = self.journals_path / f"{journal_filename}.md"
+        journal_path = self._get_journal_path(journal_filename)
         
         # 4. Formatear el contenido según si es tarea o no
         if is_task:
-            formatted_content = f"- TODO {content}"
+            formatted_content = self._format_block(f"TODO {content}")
         else:
-            formatted_content = f"- {content}"
+            formatted_content = self._format_block(content)
         
-        # 5. Comprobar si el archivo del diario ya existe
-        if not journal_path.exists():
-            # 6. Si no existe, crearlo con el contenido formateado (sin \n inicial)
-            journal_path.write_text(formatted_content, encoding='utf-8')
+        # 5. Añadir al final del diario, o crearlo si no existe (sin \n inicial).
+        #    Con el buffer activo, la escritura se agrupa con las siguientes.
+        if self.journal_buffer is not None:
+            self.journal_buffer.append(journal_path, formatted_content)
         else:
-            # 7. Si ya existe, abrirlo en modo de adición y añadir el nuevo contenido con salto de línea inicial
-            with open(journal_path, 'a', encoding='utf-8') as file:
-                file.write(f"\n{formatted_content}")
+            self._append_text(journal_path, formatted_content)
 
+    @_timed
     def delete_block_from_page(self, page_title: str, content_to_delete: str, is_journal: bool = False) -> bool:
         """
         Elimina un bloque específico de una página de Logseq o de un diario.
         
         Realiza una operación de lectura-modificación-escritura para eliminar
-        exactamente el primer bloque que coincida con content_to_delete.
+        exactamente el primer bloque que coincida con content_to_delete, junto con
+        sus bloques hijos. Solo se recorta su tramo del archivo.
         
         Args:
             page_title: Título de la página donde eliminar el bloque, o nombre del archivo de diario (ej: "2025_01_15")
@@ -443,66 +1492,560 @@ class LogseqManager:
             Para diarios:
             delete_block_from_page("2025_01_15", "Reunión cancelada", is_journal=True)
         """
-        # 1. Determinar la ruta correcta y verificar que el archivo existe
-        if is_journal:
-            # Para diarios: construir ruta directamente y verificar existencia
-            file_path = self.journals_path / f"{page_title}.md"
-            if not file_path.exists() or not file_path.is_file():
-                return False
-        else:
-            # Para páginas normales: usar métodos existentes
-            if not self.page_exists(page_title):
-                return False
-            file_path = self._get_page_path(page_title)
+        def delete(data: bytes, spans: list[BlockSpan]) -> typing.Optional[bytes]:
+            index = _find_span(spans, content_to_delete)
+            return None if index is None else delete_subtree(data, spans[index])
+        
+        # Se elimina el subárbol entero: dejar los hijos sin padre los subiría de nivel
+        return self._edit_block_tree(page_title, is_journal, delete)
+
+    def _edit_block_tree(
+        self,
+        page_title: str,
+        is_journal: bool,
+        edit: typing.Callable[[bytes, list[BlockSpan]], typing.Optional[bytes]],
+    ) -> bool:
+        """
+        Modifica un archivo a partir de su árbol de bloques (ver src/blocks.py).
+        
+        `edit` recibe el contenido en bytes y sus bloques y devuelve el contenido nuevo,
+        o None si no encontró lo que buscaba. La escritura usa _modify_file.
+        
+        Returns:
+            True si el archivo se modificó, False si no existe o `edit` devolvió None
+        """
+        found = self._block_file(page_title, is_journal)
+        if found is None:
+            return False
+        file_path, _ = found
+        
+        def transform(content: typing.Optional[str]) -> _TransformResult:
+            if content is None:
+                return None, False
+            data = content.encode('utf-8')
+            new_data = edit(data, block_tree(data))
+            if new_data is None:
+                return None, False
+            return new_data.decode('utf-8'), True
         
-        # 2. Leer todo el contenido del archivo línea por línea
         try:
-            content = file_path.read_text(encoding='utf-8')
-        except (IOError, OSError):
+            return self._modify_file(file_path, transform)
+        except (IOError, OSError, UnicodeDecodeError):
             return False
-        if not content:  # Maneja None o cadena vacía
+
+    @_timed
+    def add_nested_block(
+        self,
+        page_title: str,
+        parent_content: str,
+        content: str,
+        position: str = "child",
+        is_journal: bool = False,
+    ) -> bool:
+        """
+        Añade un bloque anidado bajo otro (o justo detrás de él) respetando el outline.
+        
+        El bloque de referencia es el primero cuyo texto coincide exactamente con
+        `parent_content`. Como hijo, el bloque nuevo va detrás de los hijos que ya tenga
+        y con un nivel más de sangría (la que use el archivo: tabuladores o espacios);
+        como hermano, va después de todo su subárbol y con su misma sangría. Solo se
+        empalma el bloque nuevo en su desplazamiento; el resto del archivo no se rehace.
+        
+        Args:
+            page_title: Título de la página, o nombre del diario (ej: "2025_01_15")
+            parent_content: Contenido exacto del bloque de referencia (sin el prefijo "- ")
+            content: Contenido del bloque nuevo (sin el prefijo "- ")
+            position: "child" (último hijo) o "sibling" (hermano siguiente)
+            is_journal: Si True, trabaja sobre journals/ en lugar de pages/
+            
+        Returns:
+            True si añadió el bloque, False si la página o el bloque de referencia no existen
+            
+        Raises:
+            ValueError: Si la posición no es "child" ni "sibling"
+            
+        Example:
+            Con "- Fase 1\n  - Diseño\n- Fase 2",
+            add_nested_block("Apolo", "Fase 1", "Pruebas")
+            # → "- Fase 1\n  - Diseño\n  - Pruebas\n- Fase 2"
+        """
+        _check_position(position)
+        
+        if self.assign_block_ids:
+            from src.block_index import new_block_id
+            
+            # format_block escribe las líneas siguientes como continuación del bloque
+            content = f"{content}\nid:: {new_block_id()}"
+        
+        def insert(data: bytes, spans: list[BlockSpan]) -> typing.Optional[bytes]:
+            index = _find_span(spans, parent_content)
+            return None if index is None else insert_block(data, spans, index, content, position)
+        
+        return self._edit_block_tree(page_title, is_journal, insert)
+
+    @_timed
+    def move_block(
+        self,
+        page_title: str,
+        block_content: str,
+        target_content: str,
+        position: str = "child",
+        is_journal: bool = False,
+    ) -> bool:
+        """
+        Mueve un bloque con todos sus hijos bajo otro bloque (o detrás de él) de la misma página.
+        
+        La sangría del subárbol se ajusta a su nueva profundidad. Se usa el primer bloque
+        que coincide con cada texto.
+        
+        Args:
+            page_title: Título de la página, o nombre del diario (ej: "2025_01_15")
+            block_content: Contenido exacto del bloque a mover (sin el prefijo "- ")
+            target_content: Contenido exacto del bloque de destino
+            position: "child" (último hijo del destino) o "sibling" (hermano siguiente)
+            is_journal: Si True, trabaja sobre journals/ en lugar de pages/
+            
+        Returns:
+            True si movió el bloque, False si la página o alguno de los bloques no existen
+            
+        Raises:
+            ValueError: Si la posición no es válida o el destino está dentro del subárbol movido
+            
+        Example:
+            Con "- A\n  - A1\n- B", move_block("Notas", "A", "B")
+            # → "- B\n  - A\n    - A1"
+        """
+        _check_position(position)
+        
+        def move(data: bytes, spans: list[BlockSpan]) -> typing.Optional[bytes]:
+            source = _find_span(spans, block_content)
+            target = _find_span(spans, target_content)
+            if source is None or target is None:
+                return None
+            return move_subtree(data, spans, source, target, position)
+        
+        return self._edit_block_tree(page_title, is_journal, move)
+
+    def _locate_block(self, block_id: str) -> typing.Optional["BlockLocation"]:
+        """Archivo y tramo del bloque con ese UUID según el índice (activándolo si hace falta)."""
+        if self.block_id_index is None:
+            self.enable_block_id_index()
+        else:
+            self._sync_file_index("block_id_index")
+        return self.block_id_index.locate(block_id)
+
+    @_timed
+    def get_block(self, block_id: str) -> typing.Optional[IndexedBlock]:
+        """
+        Lee un bloque por su identificador "id::" sin buscarlo por el grafo.
+        
+        El índice da el archivo y el tramo en bytes del bloque, y solo se lee ese tramo.
+        Si el archivo cambió por fuera desde la última sincronización y el tramo ya no
+        es el bloque, se vuelve a indexar ese archivo y se lee otra vez.
+        
+        Args:
+            block_id: UUID del bloque (sin distinguir mayúsculas)
+            
+        Returns:
+            IndexedBlock con la página, el texto y el bloque tal como está escrito, o
+            None si ningún bloque tiene ese identificador
+            
+        Example:
+            get_block("6512bd43-d9ca-4c3b-9b1d-2f0c5e6a7b10").text
+            # → "Decidir la fecha de lanzamiento"
+        """
+        block_id = block_id.strip().lower()
+        for attempt in range(2):
+            location = self._locate_block(block_id)
+            if location is None:
+                return None
+            try:
+                data = self.storage.read_range(location.path, location.start, location.end - location.start)
+            except (IOError, OSError):
+                data = b""
+            span = span_at(data, 0)
+            if span is not None and block_id.encode('ascii') in data.lower():
+                return IndexedBlock(
+                    block_id,
+                    self._title_from_path(location.path),
+                    location.path,
+                    span.text,
+                    data.decode('utf-8', 'replace'),
+                )
+            self.block_id_index.update_file(self.storage, location.path)
+        return None
+
+    def _edit_block_by_id(
+        self,
+        block_id: str,
+        edit: typing.Callable[[bytes, BlockSpan], bytes],
+    ) -> bool:
+        """
+        Modifica el bloque con ese UUID a partir de su tramo en el índice.
+        
+        Si al leer el archivo el tramo ya no corresponde al bloque (otra escritura lo
+        desplazó), se busca el identificador en ese mismo archivo.
+        """
+        from src.block_index import block_ids
+        
+        block_id = block_id.strip().lower()
+        location = self._locate_block(block_id)
+        if location is None:
             return False
         
-        # Dividir en líneas
-        lines = content.splitlines()
+        def transform(content: typing.Optional[str]) -> _TransformResult:
+            if content is None:
+                return None, False
+            data = content.encode('utf-8')
+            span = span_at(data, location.start) if location.start < len(data) else None
+            if span is None or block_id.encode('ascii') not in data[span.start:span.end].lower():
+                found = block_ids(data).get(block_id)
+                if found is None:
+                    return None, False
+                span = span_at(data, found[0])
+            return edit(data, span).decode('utf-8'), True
         
-        # 3. Crear nueva lista para el contenido que se conservará y bandera para saber si se encontró
-        kept_lines = []
-        block_found = False
+        try:
+            return self._modify_file(location.path, transform)
+        except (IOError, OSError, UnicodeDecodeError):
+            return False
+
+    @_timed
+    def update_block(self, block_id: str, new_content: str) -> bool:
+        """
+        Cambia el texto de un bloque identificado por su "id::", conservando su sangría,
+        sus propiedades (el propio "id::" incluido) y sus hijos.
         
-        # 4. Iterar sobre cada línea en la lista de líneas originales
-        for line in lines:
-            # a. Limpiar la línea actual (quitando "- " y espacios) para compararla con content_to_delete
-            cleaned_line = line.strip()
+        A diferencia de update_block_in_page no compara textos: sirve aunque haya
+        bloques repetidos.
+        
+        Args:
+            block_id: UUID del bloque
+            new_content: Nuevo contenido (sin el prefijo "- ")
             
-            # Si la línea comienza con "- " y aún no hemos encontrado el bloque a eliminar
-            if cleaned_line.startswith("- ") and not block_found:
-                block_text = cleaned_line[2:].strip()  # Remover "- " y espacios adicionales
-                
-                # b. Si la línea limpia coincide con content_to_delete Y block_found es False
-                if block_text == content_to_delete:
-                    # i. Marcar block_found = True
-                    block_found = True
-                    # ii. No hacer nada más (saltar esta línea, no añadirla a kept_lines)
+        Returns:
+            True si modificó el bloque, False si ningún bloque tiene ese identificador
+        """
+        def replace_first_line(data: bytes, span: BlockSpan) -> bytes:
+            newline = data.find(b"\n", span.start, span.end)
+            line_end = span.end if newline < 0 else newline
+            return data[:span.start] + format_block(new_content, span.indent) + data[line_end:]
+        
+        return self._edit_block_by_id(block_id, replace_first_line)
+
+    @_timed
+    def delete_block(self, block_id: str) -> bool:
+        """
+        Elimina un bloque identificado por su "id::", junto con sus hijos.
+        
+        Returns:
+            True si eliminó el bloque, False si ningún bloque tiene ese identificador
+        """
+        return self._edit_block_by_id(block_id, delete_subtree)
+
+    @_timed
+    def assign_block_id(self, page_title: str, block_content: str, is_journal: bool = False) -> typing.Optional[str]:
+        """
+        Devuelve el identificador de un bloque, dándole uno nuevo ("id::") si no lo tiene.
+        
+        Args:
+            page_title: Título de la página, o nombre del diario (ej: "2025_01_15")
+            block_content: Contenido exacto del bloque (sin el prefijo "- ")
+            is_journal: Si True, busca en journals/ en lugar de pages/
+            
+        Returns:
+            El UUID del bloque, o None si la página o el bloque no existen
+            
+        Example:
+            assign_block_id("Apolo", "Decidir la fecha")  # → "6512bd43-d9ca-..."
+            # El bloque queda como "- Decidir la fecha\n  id:: 6512bd43-d9ca-..."
+        """
+        from src.block_index import block_ids, new_block_id
+        
+        assigned: list[str] = []
+        
+        def add_id(data: bytes, spans: list[BlockSpan]) -> typing.Optional[bytes]:
+            assigned.clear()
+            index = _find_span(spans, block_content)
+            if index is None:
+                return None
+            span = spans[index]
+            existing = list(block_ids(data[span.start:span.end]))
+            if existing:
+                assigned.append(existing[0])
+                return None
+            assigned.append(new_block_id())
+            property_line = span.indent + f"  id:: {assigned[0]}".encode('ascii')
+            return data[:span.end] + b"\n" + property_line + data[span.end:]
+        
+        self._edit_block_tree(page_title, is_journal, add_id)
+        return assigned[0] if assigned else None
+
+    @_timed
+    def resolve_block_references(self, text: str) -> str:
+        """
+        Sustituye cada referencia ((uuid)) de un texto por el texto del bloque citado.
+        
+        Las referencias a bloques que no existen se dejan como están.
+        
+        Example:
+            resolve_block_references("Ver ((6512bd43-d9ca-...))")
+            # → "Ver Decidir la fecha de lanzamiento"
+        """
+        if "((" not in text:
+            return text
+        
+        from src.block_index import BLOCK_REF_RE
+        
+        def replace(match: re.Match) -> str:
+            block = self.get_block(match.group(1))
+            return match.group(0) if block is None else block.text
+        
+        return BLOCK_REF_RE.sub(replace, text)
+
+    @_timed
+    def apply_page_batch(
+        self,
+        page_title: str,
+        appends: typing.Sequence[str] = (),
+        edits: typing.Sequence[tuple[str, typing.Optional[str]]] = (),
+        is_journal: bool = False,
+        operations: typing.Optional[typing.Sequence[typing.Union[str, tuple[str, typing.Optional[str]]]]] = None,
+    ) -> list[bool]:
+        """
+        Aplica varias escrituras sobre un mismo archivo con una sola lectura y una sola escritura.
+        
+        Las operaciones se aplican en orden sobre el contenido que van dejando las
+        anteriores. Una edición reemplaza (o elimina, si el contenido nuevo es None) el
+        primer bloque que coincida exactamente y que no haya tocado una edición anterior
+        del lote, incluidos los bloques añadidos antes en el mismo lote. Un añadido pone
+        el bloque al final. Si el archivo no existe y hay bloques que añadir, se crea.
+        
+        Con `appends` y `edits` se aplican primero las ediciones y después los añadidos;
+        con `operations` se indica el orden exacto.
+        
+        Args:
+            page_title: Título de la página, o nombre del archivo de diario (ej: "2025_01_15")
+            appends: Contenidos a añadir al final como bloques (sin el prefijo "- ")
+            edits: Pares (contenido_actual, contenido_nuevo) sin el prefijo "- ";
+                   un contenido_nuevo None elimina el bloque y sus hijos
+            is_journal: Si True, trabaja sobre journals/ en lugar de pages/
+            operations: Añadidos (un texto) y ediciones (un par) mezclados en el orden
+                en que se deben aplicar; sustituye a `appends` y `edits`
+            
+        Returns:
+            Un booleano por operación (para las ediciones, True si encontró el bloque):
+            en el orden de `operations`, o primero las ediciones y después los añadidos
+            
+        Example:
+            apply_page_batch("Tareas", operations=["TODO Leche", ("TODO Leche", "DONE Leche")])
+            # Una sola escritura de pages/Tareas.md con "- DONE Leche" al final → [True, True]
+        """
+        if operations is None:
+            operations = [*edits, *appends]
+        
+        # 1. Determinar la ruta del archivo
+        if is_journal:
+            file_path = self._get_journal_path(page_title)
+        else:
+            file_path = self._get_page_path(page_title)
+        
+        # Los bloques que esperan en el buffer van antes que los de este lote
+        if self.journal_buffer is not None:
+            self.journal_buffer.flush(file_path)
+        
+        # 2. Sin ediciones basta con añadir al final (o crear el archivo), sin leerlo
+        if all(isinstance(operation, str) for operation in operations):
+            if operations:
+                self._append_text(file_path, "\n".join(self._format_block(block) for block in operations))
+            return [True] * len(operations)
+        
+        def apply_operations(content: typing.Optional[str]) -> _TransformResult:
+            # 3. Aplicar las operaciones sobre la lista de líneas (None marca una línea eliminada)
+            lines: list[typing.Optional[str]] = list((content or "").splitlines())
+            touched: set[int] = set()
+            appended: list[str] = []
+            edited = False
+            results = []
+            
+            for operation in operations:
+                if isinstance(operation, str):
+                    block = self._format_block(operation)
+                    appended.append(block)
+                    lines.extend(block.split("\n"))
+                    results.append(True)
                     continue
+                
+                old_content, new_content = operation
+                block_found = False
+                for index, line in enumerate(lines):
+                    if line is None or index in touched:
+                        continue
+                    
+                    # Quitar el prefijo del bloque ("- ") y espacios para comparar
+                    if block_text(line) == old_content:
+                        if new_content is None:
+                            # Eliminar un bloque elimina también sus hijos
+                            end = subtree_end(lines, index)
+                            lines[index:end] = [None] * (end - index)
+                            touched.update(range(index, end))
+                        else:
+                            # El bloque conserva su sangría (su nivel en el outline)
+                            lines[index] = f"{line[:len(line) - len(line.lstrip())]}- {new_content}"
+                            touched.add(index)
+                        block_found = True
+                        break
+                edited = edited or block_found
+                results.append(block_found)
+            
+            # 4. Si ninguna edición encontró su bloque y no hay nada que añadir, no se escribe nada
+            if not edited and not appended:
+                return None, results
+            
+            # 5. Reconstruir el archivo completo; sin ediciones, el original se conserva tal cual
+            if edited:
+                return "\n".join(line for line in lines if line is not None), results
+            new_blocks = "\n".join(appended)
+            # Sin separador si no queda contenido: el archivo no empieza con una línea vacía
+            return (f"{content}\n{new_blocks}" if content else new_blocks), results
+        
+        try:
+            return self._modify_file(file_path, apply_operations)
+        except (IOError, OSError, UnicodeDecodeError):
+            return [False] * len(operations)
+
+    def _apply_change(self, change: "Change", reverse: bool) -> None:
+        """
+        Revierte (reverse=True) o vuelve a aplicar un cambio del registro de deshacer.
+        
+        Raises:
+            UndoConflictError: Si el archivo no está como lo dejó (o lo encontró) el cambio
+        """
+        from src.undo_log import UndoConflictError, apply_hunks, checksum
+        
+        file_path = self.graph_path / change["path"]
+        conflict = UndoConflictError(f"❌ ERROR: {change['path']} cambió después de la operación; no se puede deshacer sin perder esos cambios")
+        
+        if change["kind"] == "rename":
+            source, target = file_path, self.graph_path / change["target"]
+            if reverse:
+                source, target = target, source
+            with self.storage.lock(source):
+                if not self.storage.exists(source) or self.storage.exists(target):
+                    raise conflict
+                self.storage.rename(source, target)
+            self._after_write(source)
+            self._after_write(target, "rename", previous=self._title_from_path(source))
+            return
+        
+        if change["kind"] == "append" and change["size"] is None:
+            # Un archivo creado por la operación: deshacer es borrarlo (si nadie lo tocó)
+            with self.storage.lock(file_path):
+                exists = self.storage.exists(file_path)
+                current = self.storage.read_text(file_path) if exists else None
+                if reverse:
+                    if current != change["text"]:
+                        raise conflict
+                    self.storage.delete(file_path)
                 else:
-                    # c. Si no coincide: añadir la línea original sin cambios a kept_lines
-                    kept_lines.append(line)
-            else:
-                # c. Si no es un bloque (no empieza con "- ") o ya encontramos el bloque, añadir línea original
-                kept_lines.append(line)
+                    if exists:
+                        raise conflict
+                    self.storage.write_text(file_path, change["text"])
+                    self._count_write(file_path, change["text"], "create")
+            self._after_write(file_path, "create", self._changed_blocks(None, change["text"]))
+            return
         
-        # 5. Después del bucle
-        # a. Si block_found es False, no se eliminó nada
-        if not block_found:
-            return False
+        def transform(content: typing.Optional[str]) -> _TransformResult:
+            if content is None:
+                raise conflict
+            if change["kind"] == "append":
+                data = content.encode('utf-8')
+                added = change["text"].encode('utf-8')
+                if reverse:
+                    if len(data) != change["size"] + len(added) or not data.endswith(added):
+                        raise conflict
+                    return data[:change["size"]].decode('utf-8'), None
+                if len(data) != change["size"]:
+                    raise conflict
+                return content + change["text"], None
+            expected = change["after"] if reverse else change["before"]
+            if checksum(content) != expected:
+                raise conflict
+            return apply_hunks(content, change["hunks"], reverse=reverse), None
+        
+        self._modify_file(file_path, transform, undoable=False)
+
+    def _replay(self, group: dict, reverse: bool) -> None:
+        """Deshace o rehace todos los cambios de una operación, o ninguno si hay conflicto."""
+        changes = group["changes"][::-1] if reverse else group["changes"]
+        applied = []
+        try:
+            for change in changes:
+                self._apply_change(change, reverse)
+                applied.append(change)
+        except Exception:
+            # Dejar la operación como estaba: se revierte lo que ya se aplicó
+            for change in reversed(applied):
+                self._apply_change(change, not reverse)
+            raise
+
+    @_timed
+    def undo(self, n: int = 1) -> list[str]:
+        """
+        Deshace las últimas `n` operaciones registradas (ver enable_undo_log).
         
-        # b. Si block_found es True:
-        # i. Unir kept_lines de nuevo en una sola cadena de texto, usando \n como separador
-        new_file_content = "\n".join(kept_lines)
+        Cada operación se deshace entera o no se deshace: si uno de sus archivos cambió
+        después (en Logseq, por ejemplo), se lanza UndoConflictError y el grafo queda
+        como estaba antes de intentarlo.
         
-        # ii. Sobrescribir el archivo completo con el nuevo contenido
-        file_path.write_text(new_file_content, encoding='utf-8')
+        Returns:
+            Etiquetas de las operaciones deshechas, de la más reciente a la más antigua
+            (menos de `n` si no había tantas)
+            
+        Raises:
+            ValueError: Si el registro no está activado
+            UndoConflictError: Si una operación no se puede deshacer sin perder cambios
+            
+        Example:
+            manager.delete_block_from_page("Tareas", "TODO Leche")
+            manager.undo()  # → ["Modificar pages/Tareas.md"]; el bloque vuelve
+        """
+        if self.undo_log is None:
+            raise ValueError("❌ ERROR: El registro de deshacer no está activado (enable_undo_log)")
+        
+        labels = []
+        for _ in range(n):
+            group = self.undo_log.peek_undo()
+            if group is None:
+                break
+            self._replay(group, reverse=True)
+            self.undo_log.mark_undone(group)
+            labels.append(group["label"])
+        return labels
+
+    @_timed
+    def redo(self, n: int = 1) -> list[str]:
+        """
+        Vuelve a aplicar las últimas `n` operaciones deshechas con undo.
+        
+        Una escritura nueva después de undo descarta lo que se podía rehacer.
+        
+        Returns:
+            Etiquetas de las operaciones rehechas, en el orden en que se aplicaron
+            
+        Raises:
+            ValueError: Si el registro no está activado
+            UndoConflictError: Si una operación no se puede rehacer sin perder cambios
+        """
+        if self.undo_log is None:
+            raise ValueError("❌ ERROR: El registro de deshacer no está activado (enable_undo_log)")
         
-        # iii. Devolver True para indicar que la eliminación fue exitosa
-        return True
\ No newline at end of file
+        labels = []
+        for _ in range(n):
+            group = self.undo_log.peek_redo()
+            if group is None:
+                break
+            self._replay(group, reverse=False)
+            self.undo_log.mark_redone(group)
+            labels.append(group["label"])
+        return labels
@@ -0,0 +1,260 @@
+"""
+Métricas agregadas del agente y del gestor en el formato de texto de Prometheus.
+
+Las trazas de logfire sirven para depurar un comando concreto; estas métricas dan los
+números de conjunto: latencia de cada método del gestor, latencia y tokens de las
+llamadas al modelo, aciertos de las cachés, archivos leídos por búsqueda y bytes
+escritos.
+
+MetricsRegistry reúne contadores (Counter) e histogramas (Histogram) con etiquetas.
+Anotar un valor cuesta un lock sin contención y una búsqueda en un diccionario; los
+histogramas localizan su intervalo con bisect. El registro se exporta con render()
+en el formato de exposición de texto 0.0.4 de Prometheus, que se puede:
+
+- servir por HTTP en 127.0.0.1 (serve(), GET /metrics), en modo demonio;
+- volcar a un archivo (write_file(), escritura atómica), en modo línea de comandos.
+  El archivo sirve tal cual para el textfile collector de node_exporter.
+
+Solo usa la biblioteca estándar.
+"""
+
+import bisect
+import contextlib
+import os
+import pathlib
+import threading
+import time
+import typing
+
+if typing.TYPE_CHECKING:
+    from src.metrics_server import MetricsServer
+
+
+# Intervalos por defecto de los histogramas de latencia, en segundos
+LATENCY_BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# Intervalos de los histogramas de recuentos (archivos leídos por búsqueda)
+COUNT_BUCKETS = (0, 1, 5, 10, 50, 100, 500, 1000, 5000, 10000)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class _Metric:
+    """Base de los contadores e histogramas: nombre, ayuda, etiquetas y lock."""
+
+    kind = ""
+
+    def __init__(self, name: str, help: str, labelnames: typing.Sequence[str] = ()) -> None:
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _check(self, labels: tuple[str, ...]) -> None:
+        if len(labels) != len(self.labelnames):
+            raise ValueError(
+                f"❌ ERROR: La métrica '{self.name}' tiene las etiquetas {self.labelnames} "
+                f"y se le pasaron {len(labels)} valores"
+            )
+
+    def _labels(self, labels: tuple[str, ...], extra: str = "") -> str:
+        pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(self.labelnames, labels)]
+        if extra:
+            pairs.append(extra)
+        return "{" + ",".join(pairs) + "}" if pairs else ""
+
+    def _samples(self) -> list[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        """La métrica en el formato de texto de Prometheus."""
+        lines = [f"# HELP {self.name} {_escape(self.help)}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self._samples())
+        return "\n".join(lines) + "\n"
+
+
+class Counter(_Metric):
+    """Contador que solo crece, con un valor por combinación de etiquetas."""
+
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labelnames: typing.Sequence[str] = ()) -> None:
+        super().__init__(name, help, labelnames)
+        self._values: dict[tuple[str, ...], float] = {}
+
+    def inc(self, *labels: str, amount: float = 1) -> None:
+        """
+        Suma `amount` al contador de esas etiquetas.
+
+        Example:
+            writes.inc("page", amount=128)
+        """
+        if amount < 0:
+            raise ValueError(f"❌ ERROR: Un contador no puede decrecer ({self.name}: {amount})")
+        with self._lock:
+            values = self._values
+            if labels not in values:
+                self._check(labels)
+                values[labels] = 0
+            values[labels] += amount
+
+    def value(self, *labels: str) -> float:
+        """Valor actual del contador de esas etiquetas (0 si nunca se incrementó)."""
+        with self._lock:
+            return self._values.get(labels, 0)
+
+    def _samples(self) -> list[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{self._labels(labels)} {_format_value(value)}" for labels, value in items]
+
+
+class Histogram(_Metric):
+    """
+    Histograma acumulado: recuento por intervalo (le), suma y recuento total.
+
+    Los intervalos se fijan al crearlo; un valor cuenta en el primero cuyo límite
+    sea mayor o igual.
+    """
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labelnames: typing.Sequence[str] = (),
+        buckets: typing.Sequence[float] = LATENCY_BUCKETS,
+    ) -> None:
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # Etiquetas → [recuentos por intervalo (el último es +Inf), suma]
+        self._series: dict[tuple[str, ...], list] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        """Anota un valor (por ejemplo, una duración en segundos)."""
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                self._check(labels)
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    @contextlib.contextmanager
+    def time(self, *labels: str) -> typing.Iterator[None]:
+        """Anota la duración del bloque with, en segundos, aunque lance una excepción."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, *labels)
+
+    def count(self, *labels: str) -> int:
+        """Número de valores anotados con esas etiquetas."""
+        with self._lock:
+            series = self._series.get(labels)
+            return sum(series[0]) if series is not None else 0
+
+    def sum(self, *labels: str) -> float:
+        """Suma de los valores anotados con esas etiquetas."""
+        with self._lock:
+            series = self._series.get(labels)
+            return series[1] if series is not None else 0.0
+
+    def _samples(self) -> list[str]:
+        with self._lock:
+            items = sorted((labels, (list(counts), total)) for labels, (counts, total) in self._series.items())
+        lines = []
+        for labels, (counts, total) in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{self._labels(labels, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{self._labels(labels)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{self._labels(labels)} {cumulative}")
+        return lines
+
+
+class MetricsRegistry:
+    """
+    Conjunto de métricas con nombre único.
+
+    counter() e histogram() devuelven la métrica existente si ya se registró con ese
+    nombre, así que el gestor y el bucle del agente pueden pedirla sin coordinarse.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._metrics: dict[str, _Metric] = {}
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._metrics
+
+    def __getitem__(self, name: str) -> _Metric:
+        return self._metrics[name]
+
+    def _register(self, metric_class: type, name: str, *args) -> typing.Any:
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = metric_class(name, *args)
+            elif not isinstance(metric, metric_class):
+                raise ValueError(f"❌ ERROR: La métrica '{name}' ya existe y es de tipo {metric.kind}")
+            return metric
+
+    def counter(self, name: str, help: str, labelnames: typing.Sequence[str] = ()) -> Counter:
+        """Contador `name`, creándolo si no existe."""
+        return self._register(Counter, name, help, labelnames)
+
+    def histogram(
+        self,
+        name: str,
+        help: str,
+        labelnames: typing.Sequence[str] = (),
+        buckets: typing.Sequence[float] = LATENCY_BUCKETS,
+    ) -> Histogram:
+        """Histograma `name`, creándolo si no existe."""
+        return self._register(Histogram, name, help, labelnames, buckets)
+
+    def render(self) -> str:
+        """Todas las métricas en el formato de texto de Prometheus, ordenadas por nombre."""
+        with self._lock:
+            metrics = sorted(self._metrics.items())
+        return "".join(metric.render() for _, metric in metrics)
+
+    def write_file(self, path: typing.Union[str, pathlib.Path]) -> None:
+        """Vuelca las métricas a un archivo de forma atómica (archivo temporal y os.replace)."""
+        path = pathlib.Path(path)
+        temp_path = path.with_name(f"{path.name}.tmp")
+        temp_path.write_text(self.render(), encoding='utf-8')
+        os.replace(temp_path, path)
+
+    def serve(self, port: int, host: str = "127.0.0.1") -> "MetricsServer":
+        """
+        Sirve las métricas por HTTP (GET /metrics) en un hilo en segundo plano.
+
+        Args:
+            port: Puerto TCP; 0 para que el sistema elija uno libre (ver server_address)
+            host: Dirección en la que escuchar; por defecto solo la local
+
+        Raises:
+            OSError: Si el puerto está ocupado
+        """
+        # Import diferido: http.server (y el paquete email que arrastra) solo se carga al servir
+        from src.metrics_server import MetricsServer
+        
+        server = MetricsServer(self, (host, port))
+        thread = threading.Thread(target=server.serve_forever, name="metricas-http", daemon=True)
+        thread.start()
+        return server
@@ -0,0 +1,42 @@
+"""
+Servidor HTTP local de las métricas (ver MetricsRegistry.serve en src/metrics.py).
+
+Va en un módulo aparte porque http.server tarda en importarse y solo hace falta en
+modo demonio.
+"""
+
+import http.server
+
+from src.metrics import MetricsRegistry
+
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+class _MetricsRequestHandler(http.server.BaseHTTPRequestHandler):
+    """Responde GET /metrics con el registro; cualquier otra ruta, 404."""
+
+    def do_GET(self) -> None:
+        if self.path.split("?", 1)[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = self.server.registry.render().encode('utf-8')
+        self.send_response(200)
+        self.send_header("Content-Type", CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args) -> None:
+        # Cada raspado de Prometheus no debe ensuciar la salida del demonio
+        pass
+
+
+class MetricsServer(http.server.ThreadingHTTPServer):
+    """Servidor HTTP local de un MetricsRegistry."""
+
+    daemon_threads = True
+
+    def __init__(self, registry: MetricsRegistry, address: tuple[str, int]) -> None:
+        self.registry = registry
+        super().__init__(address, _MetricsRequestHandler)
@@ -0,0 +1,198 @@
+"""
+Grabación y reproducción de las llamadas al modelo.
+
+RecordingModel envuelve un modelo real y guarda cada par petición/respuesta (con su
+latencia) en un archivo JSON Lines. ReplayModel sirve después esas respuestas sin
+red y de forma determinista, lo que permite ejecutar el bucle completo de comandos
+(incluido el despacho a LogseqManager) como benchmark reproducible o como suite
+de regresión.
+
+Las peticiones se identifican por una huella de su contenido conversacional (prompts
+del usuario, llamadas y resultados de herramientas) que ignora los system prompts y
+las marcas de tiempo: así una grabación sigue siendo válida otro día aunque el
+system prompt incluya la fecha actual.
+"""
+
+import asyncio
+import collections
+import copy
+import hashlib
+import json
+import pathlib
+import threading
+import time
+import typing
+
+from pydantic_ai.messages import (
+    ModelMessage,
+    ModelMessagesTypeAdapter,
+    ModelRequest,
+    ModelResponse,
+    RetryPromptPart,
+    TextPart,
+    ToolCallPart,
+    ToolReturnPart,
+    UserPromptPart,
+)
+from pydantic_ai.models import Model, ModelRequestParameters
+from pydantic_ai.models.function import AgentInfo, FunctionModel
+from pydantic_ai.models.wrapper import WrapperModel
+from pydantic_ai.settings import ModelSettings
+
+
+class ReplayMismatchError(LookupError):
+    """La petición al modelo no coincide con ninguna respuesta grabada pendiente."""
+
+
+def request_fingerprint(messages: list[ModelMessage]) -> str:
+    """
+    Calcula una huella estable de una conversación con el modelo.
+
+    Solo tiene en cuenta el contenido que decide la respuesta: prompts del usuario,
+    textos y llamadas a herramientas del modelo, y resultados o reintentos de
+    herramientas. Los system prompts, ids de llamada y marcas de tiempo se ignoran.
+    """
+    canonical = []
+    for message in messages:
+        for part in message.parts:
+            if isinstance(part, UserPromptPart):
+                canonical.append(["user", part.content if isinstance(part.content, str) else repr(part.content)])
+            elif isinstance(part, TextPart):
+                canonical.append(["text", part.content])
+            elif isinstance(part, ToolCallPart):
+                canonical.append(["call", part.tool_name, part.args_as_json_str()])
+            elif isinstance(part, ToolReturnPart):
+                canonical.append(["return", part.tool_name, part.model_response_str()])
+            elif isinstance(part, RetryPromptPart):
+                canonical.append(["retry", part.model_response()])
+    encoded = json.dumps(canonical, ensure_ascii=False, sort_keys=True).encode('utf-8')
+    return hashlib.sha256(encoded).hexdigest()
+
+
+def last_user_prompt(messages: list[ModelMessage]) -> typing.Optional[str]:
+    """Devuelve el último prompt de usuario de la conversación, si lo hay."""
+    for message in reversed(messages):
+        if isinstance(message, ModelRequest):
+            for part in reversed(message.parts):
+                if isinstance(part, UserPromptPart) and isinstance(part.content, str):
+                    return part.content
+    return None
+
+
+class RecordingModel(WrapperModel):
+    """
+    Modelo que delega en otro y graba cada petición/respuesta en un archivo JSONL.
+
+    Cada línea contiene: índice, huella, prompt del usuario, si es la primera
+    petición de un comando del usuario, latencia en ms, mensajes enviados y respuesta.
+    """
+
+    def __init__(self, wrapped: Model, recording_path: typing.Union[str, pathlib.Path]) -> None:
+        """
+        Args:
+            wrapped: Modelo real al que se reenvían las peticiones
+            recording_path: Archivo JSONL donde se añaden las grabaciones
+        """
+        super().__init__(wrapped)
+        self.recording_path = pathlib.Path(recording_path)
+        self._lock = threading.Lock()
+        # Compartido con las copias de nested(): una sola numeración por archivo
+        self._next_index = [0]
+        self._top_level = True
+
+    def nested(self) -> "RecordingModel":
+        """
+        Devuelve un modelo que graba en el mismo archivo, pero cuyas ejecuciones no
+        cuentan como comandos del usuario (starts_run es siempre False).
+
+        Sirve para las llamadas internas, como la respuesta de answer_from_notes: su
+        prompt lo construye el agente, así que no debe reproducirse como un comando.
+        """
+        nested = copy.copy(self)
+        nested._top_level = False
+        return nested
+
+    async def request(
+        self,
+        messages: list[ModelMessage],
+        model_settings: typing.Optional[ModelSettings],
+        model_request_parameters: ModelRequestParameters,
+    ) -> ModelResponse:
+        start = time.perf_counter()
+        response = await super().request(messages, model_settings, model_request_parameters)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+
+        record = {
+            "fingerprint": request_fingerprint(messages),
+            "prompt": last_user_prompt(messages),
+            "starts_run": self._top_level and len(messages) == 1,
+            "elapsed_ms": round(elapsed_ms, 3),
+            "request": ModelMessagesTypeAdapter.dump_python(messages, mode='json'),
+            "response": ModelMessagesTypeAdapter.dump_python([response], mode='json')[0],
+        }
+        with self._lock:
+            record["index"] = self._next_index[0]
+            self._next_index[0] += 1
+            with open(self.recording_path, 'a', encoding='utf-8') as file:
+                file.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+        return response
+
+
+def load_recordings(recording_path: typing.Union[str, pathlib.Path]) -> list[dict]:
+    """
+    Lee un archivo de grabaciones JSONL.
+
+    Raises:
+        FileNotFoundError: Si el archivo no existe
+    """
+    with open(recording_path, 'r', encoding='utf-8') as file:
+        return [json.loads(line) for line in file if line.strip()]
+
+
+def recorded_prompts(recordings: list[dict]) -> list[str]:
+    """
+    Devuelve, en orden, los prompts de usuario que iniciaron cada ejecución grabada.
+    """
+    return [record["prompt"] for record in recordings if record.get("starts_run") and record.get("prompt") is not None]
+
+
+class ReplayModel(FunctionModel):
+    """
+    Modelo que sirve respuestas grabadas por RecordingModel, sin red.
+
+    Para cada petición busca la siguiente respuesta pendiente con la misma huella;
+    si no hay ninguna lanza ReplayMismatchError (la conversación divergió de la
+    grabación). Opcionalmente reproduce la latencia grabada.
+    """
+
+    def __init__(self, recordings: list[dict], simulate_latency: bool = False) -> None:
+        """
+        Args:
+            recordings: Grabaciones cargadas con load_recordings
+            simulate_latency: Si True, espera la latencia grabada antes de responder
+        """
+        super().__init__(self._respond, model_name="replay")
+        self.simulate_latency = simulate_latency
+        self._pending: dict[str, collections.deque] = collections.defaultdict(collections.deque)
+        for record in sorted(recordings, key=lambda record: record.get("index", 0)):
+            self._pending[record["fingerprint"]].append(record)
+
+    @classmethod
+    def from_file(cls, recording_path: typing.Union[str, pathlib.Path], simulate_latency: bool = False) -> "ReplayModel":
+        """Crea un ReplayModel a partir de un archivo de grabaciones JSONL."""
+        return cls(load_recordings(recording_path), simulate_latency=simulate_latency)
+
+    async def _respond(self, messages: list[ModelMessage], info: AgentInfo) -> ModelResponse:
+        fingerprint = request_fingerprint(messages)
+        pending = self._pending.get(fingerprint)
+        if not pending:
+            raise ReplayMismatchError(
+                f"No hay respuesta grabada para la petición con prompt {last_user_prompt(messages)!r}"
+            )
+
+        record = pending.popleft()
+        if self.simulate_latency:
+            await asyncio.sleep(record["elapsed_ms"] / 1000)
+
+        return ModelMessagesTypeAdapter.validate_python([record["response"]])[0]
@@ -0,0 +1,153 @@
+"""
+Árbol de espacios de nombres de las páginas, para autocompletar y listar subárboles.
+
+Los títulos con "/" forman una jerarquía: "Proyectos/Mi App/Tareas" cuelga de
+"Proyectos/Mi App", que cuelga de "Proyectos". Cada nodo del árbol es un segmento del
+título, con sus hijos indexados por el segmento en minúsculas y una lista ordenada de
+esas claves, y el número de páginas de su subárbol. Así:
+
+- autocompletar "proyectos/mi" baja hasta "Proyectos" y busca con bisect los hijos
+  que empiezan por "mi", sin recorrer los demás,
+- listar o contar un espacio de nombres no recorre el resto del grafo,
+- añadir o quitar una página solo toca los nodos de su camino.
+
+Los nodos intermedios existen aunque no haya página con ese título (Logseq no crea
+un archivo para "Proyectos" si solo hay "Proyectos/Mi App").
+"""
+
+import bisect
+import typing
+
+
+class _Node:
+    __slots__ = ("name", "children", "keys", "titles", "count")
+
+    def __init__(self, name: str) -> None:
+        self.name = name                          # Segmento tal como se escribió
+        self.children: dict[str, "_Node"] = {}    # Segmento en minúsculas → nodo
+        self.keys: list[str] = []                 # Claves de `children`, ordenadas
+        self.titles: set[str] = set()             # Títulos de página que terminan aquí
+        self.count = 0                            # Páginas en el subárbol (incluido este nodo)
+
+
+def _segments(title: str) -> list[str]:
+    return [segment.strip() for segment in title.split("/")]
+
+
+class NamespaceTree:
+    """Árbol de títulos de página por segmentos de espacio de nombres."""
+
+    def __init__(self, titles: typing.Iterable[str] = ()) -> None:
+        self._root = _Node("")
+        for title in titles:
+            self.add(title)
+
+    def __len__(self) -> int:
+        return self._root.count
+
+    def __contains__(self, title: str) -> bool:
+        node = self._find(_segments(title))
+        return node is not None and title in node.titles
+
+    def _find(self, segments: list[str]) -> typing.Optional[_Node]:
+        node = self._root
+        for segment in segments:
+            node = node.children.get(segment.casefold())
+            if node is None:
+                return None
+        return node
+
+    def add(self, title: str) -> None:
+        """Añade una página (si ya estaba, no hace nada)."""
+        if title in self:
+            return
+        node = self._root
+        node.count += 1
+        for segment in _segments(title):
+            key = segment.casefold()
+            child = node.children.get(key)
+            if child is None:
+                child = node.children[key] = _Node(segment)
+                bisect.insort(node.keys, key)
+            node = child
+            node.count += 1
+        node.titles.add(title)
+
+    def remove(self, title: str) -> None:
+        """Quita una página y los nodos intermedios que se quedan vacíos."""
+        if title not in self:
+            return
+        path = [self._root]
+        for segment in _segments(title):
+            path.append(path[-1].children[segment.casefold()])
+        path[-1].titles.discard(title)
+        for node in path:
+            node.count -= 1
+        for parent, node in zip(reversed(path[:-1]), reversed(path[1:])):
+            if node.count == 0:
+                key = node.name.casefold()
+                del parent.children[key]
+                parent.keys.pop(bisect.bisect_left(parent.keys, key))
+
+    def _walk(self, node: _Node, limit: typing.Optional[int], out: list[str]) -> None:
+        """Títulos del subárbol en orden alfabético (sin mayúsculas), hasta `limit`."""
+        for title in sorted(node.titles):
+            if limit is not None and len(out) >= limit:
+                return
+            out.append(title)
+        for key in node.keys:
+            if limit is not None and len(out) >= limit:
+                return
+            self._walk(node.children[key], limit, out)
+
+    def complete(self, prefix: str, limit: int = 10) -> list[str]:
+        """
+        Títulos que empiezan por `prefix` (sin distinguir mayúsculas), en orden alfabético.
+
+        Example:
+            complete("proyectos/mi") → ["Proyectos/Mi App", "Proyectos/Mi App/Tareas"]
+        """
+        *namespace, partial = _segments(prefix)
+        parent = self._find(namespace)
+        if parent is None or limit <= 0:
+            return []
+        partial = partial.casefold()
+        out: list[str] = []
+        start = bisect.bisect_left(parent.keys, partial)
+        for key in parent.keys[start:]:
+            if not key.startswith(partial) or len(out) >= limit:
+                break
+            self._walk(parent.children[key], limit, out)
+        return out
+
+    def subtree(self, namespace: str) -> list[str]:
+        """Títulos de todas las páginas bajo `namespace` (sin incluir la propia)."""
+        node = self._find(_segments(namespace))
+        out: list[str] = []
+        if node is not None:
+            for key in node.keys:
+                self._walk(node.children[key], None, out)
+        return out
+
+    def count(self, namespace: str) -> int:
+        """Número de páginas bajo `namespace` (sin incluir la propia)."""
+        node = self._find(_segments(namespace))
+        return 0 if node is None else node.count - len(node.titles)
+
+    def children(self, namespace: str = "") -> list[tuple[str, int]]:
+        """
+        Hijos directos de un espacio de nombres ("" para la raíz) con sus páginas.
+
+        Returns:
+            Lista de (título del hijo, páginas en su subárbol incluida la suya)
+        """
+        node = self._root
+        names = []
+        for segment in (_segments(namespace) if namespace else []):
+            node = node.children.get(segment.casefold())
+            if node is None:
+                return []
+            names.append(node.name)
+        # El prefijo se escribe como en los títulos, aunque la consulta use otras mayúsculas
+        base = "".join(f"{name}/" for name in names)
+        return [(base + node.children[key].name, node.children[key].count) for key in node.keys]
@@ -0,0 +1,108 @@
+"""
+Índice de referencias entre páginas: qué archivos enlazan a cada página.
+
+Logseq enlaza una página con [[Página]], #[[Página]] o #Página, sin distinguir
+mayúsculas. Para renombrar una página hay que reescribir todas esas referencias; con
+este índice solo se leen los archivos que de verdad la enlazan, en lugar de recorrer
+el grafo entero.
+
+El índice guarda, por archivo, las páginas que referencia (en minúsculas), y la
+relación inversa página → archivos. Se sincroniza por stat como los demás índices del
+gestor (ver src/file_index.py).
+
+rewrite_references() hace la sustitución en el texto de un archivo.
+"""
+
+import pathlib
+import re
+
+from src.file_index import FileValueIndex
+from src.storage import StorageBackend
+
+
+_LINK_RE = re.compile(r"\[\[([^\[\]]+)\]\]")
+# Una etiqueta empieza al principio de la línea o tras un espacio (así no se confunde
+# con el ancla de una URL) y termina en un espacio o en la puntuación que la separa;
+# un punto o dos puntos finales ("#apolo.") no forman parte de ella
+_TAG_RE = re.compile(r"(?:(?<=\s)|^)#([^\s\[\]#,;!?()\"']+?)(?=[.:]*(?:[\s,;!?()\"']|$))", re.MULTILINE)
+# Caracteres que obligan a escribir una etiqueta como #[[...]]
+_TAG_UNSAFE_RE = re.compile(r"[\s\[\]#,;!?()\"']")
+
+
+def references(content: str) -> set[str]:
+    """Páginas (en minúsculas) que enlaza un texto con [[...]], #[[...]] o #etiqueta."""
+    found = {link.strip().casefold() for link in _LINK_RE.findall(content)}
+    found.update(tag.casefold() for tag in _TAG_RE.findall(content))
+    return found
+
+
+def rewrite_references(content: str, old_title: str, new_title: str) -> tuple[str, int]:
+    """
+    Sustituye las referencias a `old_title` (sin distinguir mayúsculas) por `new_title`.
+
+    Una etiqueta #Antigua pasa a #[[Nuevo Título]] si el título nuevo tiene espacios u
+    otros caracteres que cortarían la etiqueta.
+
+    Returns:
+        (texto nuevo, número de referencias sustituidas)
+
+    Example:
+        rewrite_references("Ver [[apolo]] y #Apolo", "Apolo", "Proyecto Apolo")
+        → ("Ver [[Proyecto Apolo]] y #[[Proyecto Apolo]]", 2)
+    """
+    old_key = old_title.strip().casefold()
+    tag = f"#{new_title}" if not _TAG_UNSAFE_RE.search(new_title) else f"#[[{new_title}]]"
+    count = 0
+
+    def replace_link(match: re.Match) -> str:
+        nonlocal count
+        if match.group(1).strip().casefold() != old_key:
+            return match.group(0)
+        count += 1
+        return f"[[{new_title}]]"
+
+    def replace_tag(match: re.Match) -> str:
+        nonlocal count
+        if match.group(1).casefold() != old_key:
+            return match.group(0)
+        count += 1
+        return tag
+
+    content = _LINK_RE.sub(replace_link, content)
+    content = _TAG_RE.sub(replace_tag, content)
+    return content, count
+
+
+class ReferenceIndex(FileValueIndex):
+    """Índice archivo → páginas enlazadas y página → archivos que la enlazan."""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self._referrers: dict[str, set[str]] = {}
+
+    def __len__(self) -> int:
+        """Número de archivos indexados."""
+        return len(self._files)
+
+    def _read(self, storage: StorageBackend, path: pathlib.Path) -> frozenset[str]:
+        try:
+            content = storage.read_text(path)
+        except (IOError, OSError, UnicodeDecodeError):
+            content = ""
+        return frozenset(references(content))
+
+    def _link(self, path: str, targets: frozenset[str]) -> None:
+        for target in targets:
+            self._referrers.setdefault(target, set()).add(path)
+
+    def _unlink(self, path: str, targets: frozenset[str]) -> None:
+        for target in targets:
+            referrers = self._referrers[target]
+            referrers.discard(path)
+            if not referrers:
+                del self._referrers[target]
+
+    def referrers(self, title: str) -> list[pathlib.Path]:
+        """Archivos que enlazan la página `title` (sin distinguir mayúsculas), ordenados."""
+        with self._lock:
+            return [pathlib.Path(path) for path in sorted(self._referrers.get(title.strip().casefold(), ()))]
@@ -0,0 +1,214 @@
+"""
+Índice opcional de búsqueda y metadatos sobre SQLite FTS5.
+
+Refleja en una base de datos SQLite las páginas y diarios del grafo y sus bloques:
+
+- documents: ruta, tipo (page/journal), mtime_ns, tamaño y contenido de cada archivo.
+- documents_trigram: FTS5 con tokenizador trigram sobre el contenido, para búsquedas
+  de subcadenas sin recorrer los archivos.
+- blocks / blocks_fts: cada bloque (ver src/blocks.py) con un FTS5 por palabras, que
+  admite la sintaxis de consultas de FTS5: prefijos (canc*), frases ("mi canción"),
+  y operadores AND, OR y NOT. Los acentos no se distinguen.
+
+Se sincroniza de forma incremental, por el mtime_ns y el tamaño de cada archivo, como
+los demás índices del gestor (ver src/file_index.py).
+
+Solo usa la biblioteca estándar (sqlite3 con FTS5, incluido en CPython).
+"""
+
+import pathlib
+import sqlite3
+import typing
+
+from src.blocks import iter_blocks
+from src.file_index import FileIndex
+from src.storage import FileStat, StorageBackend
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    id INTEGER PRIMARY KEY,
+    path TEXT NOT NULL UNIQUE,
+    kind TEXT NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    content TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS documents_by_kind ON documents(kind, path);
+CREATE VIRTUAL TABLE IF NOT EXISTS documents_trigram USING fts5(
+    content, content='documents', content_rowid='id', tokenize='trigram'
+);
+CREATE TABLE IF NOT EXISTS blocks (
+    id INTEGER PRIMARY KEY,
+    document_id INTEGER NOT NULL,
+    line INTEGER NOT NULL,
+    text TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS blocks_by_text ON blocks(document_id, text);
+CREATE VIRTUAL TABLE IF NOT EXISTS blocks_fts USING fts5(
+    text, content='blocks', content_rowid='id', tokenize='unicode61 remove_diacritics 2'
+);
+"""
+
+# El tokenizador trigram necesita al menos tres caracteres para usar el índice
+_MIN_TRIGRAM_QUERY = 3
+
+
+class BlockHit(typing.NamedTuple):
+    """Un bloque que coincide con una consulta FTS5."""
+    path: pathlib.Path
+    kind: str
+    line: int
+    text: str
+
+
+def _phrase(query: str) -> str:
+    """Convierte un texto literal en una frase FTS5 (escapando las comillas)."""
+    return '"' + query.replace('"', '""') + '"'
+
+
+class SqliteIndex(FileIndex):
+    """Réplica en SQLite de los archivos del grafo para búsquedas sin recorrer el disco."""
+
+    def __init__(self, db_path: typing.Union[str, pathlib.Path]) -> None:
+        """
+        Args:
+            db_path: Archivo de la base de datos, o ":memory:" para un índice temporal
+        """
+        super().__init__()
+        self.db_path = str(db_path)
+        self._connection = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._connection.executescript(_SCHEMA)
+        self._connection.commit()
+
+    def close(self) -> None:
+        with self._lock:
+            self._connection.close()
+
+    def _delete_document(self, document_id: int) -> None:
+        # Las tablas FTS5 de contenido externo necesitan el texto antiguo para borrar
+        self._connection.execute(
+            "INSERT INTO blocks_fts(blocks_fts, rowid, text) "
+            "SELECT 'delete', id, text FROM blocks WHERE document_id = ?",
+            (document_id,),
+        )
+        self._connection.execute("DELETE FROM blocks WHERE document_id = ?", (document_id,))
+        self._connection.execute(
+            "INSERT INTO documents_trigram(documents_trigram, rowid, content) "
+            "SELECT 'delete', id, content FROM documents WHERE id = ?",
+            (document_id,),
+        )
+        self._connection.execute("DELETE FROM documents WHERE id = ?", (document_id,))
+
+    def _store_document(self, path: str, kind: str, mtime_ns: int, size: int, content: str) -> None:
+        row = self._connection.execute("SELECT id FROM documents WHERE path = ?", (path,)).fetchone()
+        if row is not None:
+            self._delete_document(row[0])
+
+        cursor = self._connection.execute(
+            "INSERT INTO documents(path, kind, mtime_ns, size, content) VALUES (?, ?, ?, ?, ?)",
+            (path, kind, mtime_ns, size, content),
+        )
+        document_id = cursor.lastrowid
+        self._connection.execute(
+            "INSERT INTO documents_trigram(rowid, content) VALUES (?, ?)", (document_id, content)
+        )
+        for block in iter_blocks(content):
+            cursor = self._connection.execute(
+                "INSERT INTO blocks(document_id, line, text) VALUES (?, ?, ?)",
+                (document_id, block.line, block.text),
+            )
+            self._connection.execute(
+                "INSERT INTO blocks_fts(rowid, text) VALUES (?, ?)", (cursor.lastrowid, block.text)
+            )
+
+    def _known_stats(self, kind: typing.Optional[str]) -> dict[str, tuple[int, int]]:
+        return {
+            path: (mtime_ns, size)
+            for path, mtime_ns, size in self._connection.execute(
+                "SELECT path, mtime_ns, size FROM documents WHERE kind = ?", (kind,)
+            )
+        }
+
+    def _stat_of(self, path: str) -> typing.Optional[tuple[int, int]]:
+        row = self._connection.execute(
+            "SELECT mtime_ns, size FROM documents WHERE path = ?", (path,)
+        ).fetchone()
+        return None if row is None else (row[0], row[1])
+
+    def _refresh(
+        self,
+        storage: StorageBackend,
+        path: str,
+        kind: typing.Optional[str],
+        stat: typing.Optional[FileStat],
+    ) -> bool:
+        if stat is None:
+            row = self._connection.execute("SELECT id FROM documents WHERE path = ?", (path,)).fetchone()
+            if row is None:
+                return False
+            self._delete_document(row[0])
+            return True
+
+        try:
+            content = storage.read_text(pathlib.Path(path))
+        except (IOError, OSError, UnicodeDecodeError):
+            # Igual que el recorrido de archivos: lo que no se puede leer no aparece
+            content = ""
+        self._store_document(path, kind, stat.mtime_ns, stat.size, content)
+        return True
+
+    def _after_changes(self) -> None:
+        self._connection.commit()
+
+    def substring_candidates(self, query: str, kind: str) -> list[tuple[pathlib.Path, str]]:
+        """
+        Documentos que pueden contener `query` sin distinguir mayúsculas, ordenados por ruta.
+
+        Con tres caracteres o más se usa el índice trigram; con menos se devuelven todos
+        los documentos del tipo. El llamador verifica cada candidato con la misma
+        comparación que el recorrido de archivos, para que los resultados coincidan.
+        """
+        with self._lock:
+            if len(query) >= _MIN_TRIGRAM_QUERY:
+                # Subconsulta en lugar de JOIN: con JOIN el planificador recorre documents
+                # por tipo y evalúa el MATCH fila a fila, cientos de veces más lento
+                rows = self._connection.execute(
+                    "SELECT path, content FROM documents WHERE kind = ? AND id IN "
+                    "(SELECT rowid FROM documents_trigram WHERE documents_trigram MATCH ?) ORDER BY path",
+                    (kind, _phrase(query)),
+                )
+            else:
+                rows = self._connection.execute(
+                    "SELECT path, content FROM documents WHERE kind = ? ORDER BY path", (kind,)
+                )
+            return [(pathlib.Path(path), content) for path, content in rows]
+
+    def has_block(self, path: pathlib.Path, text: str) -> bool:
+        """True si el archivo tiene un bloque cuyo texto es exactamente `text`."""
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT 1 FROM blocks b JOIN documents d ON d.id = b.document_id "
+                "WHERE d.path = ? AND b.text = ? LIMIT 1",
+                (str(path), text),
+            ).fetchone()
+            return row is not None
+
+    def query_blocks(self, fts_query: str, limit: int = 20) -> list[BlockHit]:
+        """
+        Bloques que cumplen una consulta FTS5, del más al menos relevante (bm25).
+
+        Raises:
+            ValueError: Si la consulta no es sintácticamente válida para FTS5
+        """
+        with self._lock:
+            try:
+                rows = self._connection.execute(
+                    "SELECT d.path, d.kind, b.line, b.text FROM blocks_fts f "
+                    "JOIN blocks b ON b.id = f.rowid JOIN documents d ON d.id = b.document_id "
+                    "WHERE blocks_fts MATCH ? ORDER BY f.rank LIMIT ?",
+                    (fts_query, limit),
+                ).fetchall()
+            except sqlite3.OperationalError as e:
+                raise ValueError(f"❌ ERROR: Consulta de búsqueda no válida {fts_query!r}: {e}")
+            return [BlockHit(pathlib.Path(path), kind, line, text) for path, kind, line, text in rows]
@@ -0,0 +1,373 @@
+"""
+Backends de almacenamiento para LogseqManager.
+
+LogseqManager no toca el sistema de archivos directamente: todas sus lecturas,
+escrituras, listados y locks pasan por un StorageBackend. Hay dos implementaciones:
+
+- PosixStorage: el sistema de archivos real (escrituras atómicas, locks con flock).
+- MemoryStorage: un grafo completamente en memoria, para tests y benchmarks que
+  quieren medir el coste algorítmico sin el de E/S.
+
+Las rutas son siempre pathlib.Path absolutas construidas por el gestor a partir de
+graph_path; los backends no interpretan su significado.
+"""
+
+import abc
+import contextlib
+import fnmatch
+import hashlib
+import os
+import pathlib
+import threading
+import time
+import typing
+from stat import S_ISREG
+
+from src.file_lock import FileLocker, FileVersion, LockStats, read_versioned
+
+
+class FileStat(typing.NamedTuple):
+    """Metadatos mínimos de un archivo."""
+    size: int
+    mtime_ns: int
+
+
+class StorageBackend(abc.ABC):
+    """
+    Operaciones de almacenamiento que necesita LogseqManager.
+
+    Los métodos de lectura lanzan FileNotFoundError si el archivo no existe, igual
+    que sus equivalentes de la biblioteca estándar. Cada backend expone en
+    `lock_stats` los contadores de sus locks.
+    """
+
+    lock_stats: LockStats
+
+    @abc.abstractmethod
+    def is_dir(self, path: pathlib.Path) -> bool:
+        """True si `path` existe y es un directorio."""
+
+    @abc.abstractmethod
+    def mkdir(self, path: pathlib.Path) -> None:
+        """Crea el directorio y sus padres si no existen."""
+
+    @abc.abstractmethod
+    def list_files(self, directory: pathlib.Path, pattern: str = "*") -> list[pathlib.Path]:
+        """Archivos (no subdirectorios) de `directory` cuyo nombre encaja con `pattern`, ordenados."""
+
+    @abc.abstractmethod
+    def directory_version(self, directory: pathlib.Path) -> typing.Optional[int]:
+        """
+        Valor que cambia cada vez que se crea, borra o renombra un archivo del directorio.
+
+        Permite saber en O(1) si un listado guardado sigue al día. None si el
+        directorio no existe.
+        """
+
+    @abc.abstractmethod
+    def stat(self, path: pathlib.Path) -> typing.Optional[FileStat]:
+        """Metadatos del archivo, o None si no existe o no es un archivo."""
+
+    @abc.abstractmethod
+    def read_bytes(self, path: pathlib.Path) -> bytes:
+        """Contenido completo del archivo."""
+
+    @abc.abstractmethod
+    def write_bytes(self, path: pathlib.Path, data: bytes) -> None:
+        """Sustituye el contenido completo del archivo de forma atómica (lo crea si no existe)."""
+
+    @abc.abstractmethod
+    def append_bytes(self, path: pathlib.Path, data: bytes) -> None:
+        """Añade datos al final del archivo (lo crea si no existe)."""
+
+    @abc.abstractmethod
+    def rename(self, source: pathlib.Path, target: pathlib.Path) -> None:
+        """Mueve un archivo, sustituyendo el destino si existe."""
+
+    @abc.abstractmethod
+    def delete(self, path: pathlib.Path) -> None:
+        """Elimina un archivo."""
+
+    @abc.abstractmethod
+    def read_versioned(self, path: pathlib.Path) -> tuple[str, FileVersion]:
+        """Contenido UTF-8 del archivo junto con la versión exacta leída."""
+
+    @abc.abstractmethod
+    def lock(self, path: pathlib.Path) -> typing.ContextManager[None]:
+        """Lock exclusivo del archivo (entre procesos si el backend lo permite)."""
+
+    @property
+    def persistent(self) -> bool:
+        """True si los datos sobreviven al proceso (y tiene sentido un log de recuperación)."""
+        return True
+
+    def list_stats(self, directory: pathlib.Path, pattern: str = "*") -> dict[str, FileStat]:
+        """
+        Metadatos de los archivos de `directory` que encajan con `pattern`, por nombre.
+
+        Devuelve nombres y no rutas porque en grafos grandes construir un Path por
+        archivo cuesta más que el propio stat.
+        """
+        stats = {}
+        for path in self.list_files(directory, pattern):
+            stat = self.stat(path)
+            if stat is not None:
+                stats[path.name] = stat
+        return stats
+
+    def exists(self, path: pathlib.Path) -> bool:
+        """True si `path` es un archivo existente."""
+        return self.stat(path) is not None
+
+    def read_range(self, path: pathlib.Path, offset: int, length: int) -> bytes:
+        """Hasta `length` bytes del archivo a partir de `offset` (menos si llega al final)."""
+        return self.read_bytes(path)[offset:offset + length]
+
+    def read_text(self, path: pathlib.Path) -> str:
+        """Contenido del archivo decodificado como UTF-8."""
+        return self.read_bytes(path).decode('utf-8')
+
+    def write_text(self, path: pathlib.Path, content: str) -> None:
+        """Sustituye el contenido del archivo de forma atómica."""
+        self.write_bytes(path, content.encode('utf-8'))
+
+    def append_text(self, path: pathlib.Path, content: str) -> None:
+        """Añade texto UTF-8 al final del archivo."""
+        self.append_bytes(path, content.encode('utf-8'))
+
+    def version(self, path: pathlib.Path) -> typing.Optional[FileVersion]:
+        """Versión actual del archivo, o None si no existe."""
+        try:
+            return self.read_versioned(path)[1]
+        except FileNotFoundError:
+            return None
+
+
+class PosixStorage(StorageBackend):
+    """
+    Backend sobre el sistema de archivos real.
+
+    Las sustituciones son atómicas (temporal + os.replace) y los locks usan flock
+    sobre archivos auxiliares en `lock_dir` (ver src/file_lock.py).
+    """
+
+    def __init__(self, lock_dir: pathlib.Path, lock_stats: typing.Optional[LockStats] = None) -> None:
+        """
+        Args:
+            lock_dir: Directorio de los archivos de lock
+            lock_stats: Contadores donde registrar las esperas de los locks
+        """
+        self.lock_stats = lock_stats or LockStats()
+        self._locker = FileLocker(lock_dir, self.lock_stats)
+
+    def is_dir(self, path: pathlib.Path) -> bool:
+        return path.is_dir()
+
+    def mkdir(self, path: pathlib.Path) -> None:
+        path.mkdir(parents=True, exist_ok=True)
+
+    def list_files(self, directory: pathlib.Path, pattern: str = "*") -> list[pathlib.Path]:
+        return sorted(path for path in directory.glob(pattern) if path.is_file())
+
+    def list_stats(self, directory: pathlib.Path, pattern: str = "*") -> dict[str, FileStat]:
+        # Un solo stat por archivo: en grafos grandes es lo que domina la sincronización
+        stats = {}
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                if not fnmatch.fnmatchcase(entry.name, pattern):
+                    continue
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                if S_ISREG(stat.st_mode):
+                    stats[entry.name] = FileStat(stat.st_size, stat.st_mtime_ns)
+        return stats
+
+    def directory_version(self, directory: pathlib.Path) -> typing.Optional[int]:
+        # El mtime de un directorio cambia al añadir, quitar o renombrar entradas
+        try:
+            return directory.stat().st_mtime_ns
+        except (FileNotFoundError, NotADirectoryError):
+            return None
+
+    def stat(self, path: pathlib.Path) -> typing.Optional[FileStat]:
+        try:
+            stat = path.stat()
+        except (FileNotFoundError, NotADirectoryError):
+            return None
+        if not S_ISREG(stat.st_mode):
+            return None
+        return FileStat(stat.st_size, stat.st_mtime_ns)
+
+    def read_bytes(self, path: pathlib.Path) -> bytes:
+        return path.read_bytes()
+
+    def read_range(self, path: pathlib.Path, offset: int, length: int) -> bytes:
+        with open(path, 'rb') as file:
+            file.seek(offset)
+            return file.read(length)
+
+    def write_bytes(self, path: pathlib.Path, data: bytes) -> None:
+        # Quien lea el archivo ve la versión anterior completa o la nueva completa
+        temp_path = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        try:
+            with open(temp_path, 'wb') as file:
+                file.write(data)
+            os.replace(temp_path, path)
+        finally:
+            if temp_path.exists():
+                temp_path.unlink()
+
+    def append_bytes(self, path: pathlib.Path, data: bytes) -> None:
+        with open(path, 'ab') as file:
+            file.write(data)
+
+    def rename(self, source: pathlib.Path, target: pathlib.Path) -> None:
+        os.replace(source, target)
+
+    def delete(self, path: pathlib.Path) -> None:
+        path.unlink()
+
+    def read_versioned(self, path: pathlib.Path) -> tuple[str, FileVersion]:
+        return read_versioned(path)
+
+    def lock(self, path: pathlib.Path) -> typing.ContextManager[None]:
+        return self._locker.lock(path)
+
+
+class MemoryStorage(StorageBackend):
+    """
+    Backend completamente en memoria, seguro entre hilos (no entre procesos).
+
+    Cada escritura avanza un reloj lógico que hace de mtime_ns, así que las
+    comprobaciones de versión de LogseqManager funcionan igual que en disco.
+    """
+
+    def __init__(self, lock_stats: typing.Optional[LockStats] = None) -> None:
+        """
+        Args:
+            lock_stats: Contadores donde registrar las esperas de los locks
+        """
+        self.lock_stats = lock_stats or LockStats()
+        self._files: dict[pathlib.Path, tuple[bytes, int]] = {}
+        self._dirs: set[pathlib.Path] = set()
+        self._clock = 0
+        self._mutex = threading.Lock()
+        self._file_locks: dict[pathlib.Path, threading.Lock] = {}
+        self._directory_versions: dict[pathlib.Path, int] = {}
+
+    @classmethod
+    def with_graph(cls, graph_path: typing.Union[str, pathlib.Path]) -> "MemoryStorage":
+        """Crea un almacenamiento con un grafo vacío (pages/ y journals/) en `graph_path`."""
+        storage = cls()
+        graph_path = pathlib.Path(graph_path)
+        storage.mkdir(graph_path / "pages")
+        storage.mkdir(graph_path / "journals")
+        return storage
+
+    @classmethod
+    def from_directory(cls, graph_path: typing.Union[str, pathlib.Path]) -> "MemoryStorage":
+        """Carga en memoria las páginas y diarios de un grafo en disco, en la misma ruta."""
+        storage = cls.with_graph(graph_path)
+        graph_path = pathlib.Path(graph_path)
+        for folder in ("pages", "journals"):
+            for file_path in sorted((graph_path / folder).glob("*.md")):
+                storage.write_bytes(file_path, file_path.read_bytes())
+        return storage
+
+    def _tick(self) -> int:
+        self._clock += 1
+        return self._clock
+
+    @property
+    def persistent(self) -> bool:
+        return False
+
+    def is_dir(self, path: pathlib.Path) -> bool:
+        with self._mutex:
+            return path in self._dirs
+
+    def mkdir(self, path: pathlib.Path) -> None:
+        with self._mutex:
+            self._dirs.update([path, *path.parents])
+
+    def list_files(self, directory: pathlib.Path, pattern: str = "*") -> list[pathlib.Path]:
+        with self._mutex:
+            return sorted(
+                path for path in self._files
+                if path.parent == directory and fnmatch.fnmatchcase(path.name, pattern)
+            )
+
+    def directory_version(self, directory: pathlib.Path) -> typing.Optional[int]:
+        with self._mutex:
+            if directory not in self._dirs:
+                return None
+            return self._directory_versions.get(directory, 0)
+
+    def _touch_directory(self, path: pathlib.Path) -> None:
+        # Llamar con self._mutex adquirido, al crear, borrar o renombrar `path`
+        self._directory_versions[path.parent] = self._tick()
+
+    def stat(self, path: pathlib.Path) -> typing.Optional[FileStat]:
+        with self._mutex:
+            entry = self._files.get(path)
+        return None if entry is None else FileStat(len(entry[0]), entry[1])
+
+    def read_bytes(self, path: pathlib.Path) -> bytes:
+        with self._mutex:
+            entry = self._files.get(path)
+        if entry is None:
+            raise FileNotFoundError(f"No existe el archivo: {path}")
+        return entry[0]
+
+    def _check_parent(self, path: pathlib.Path) -> None:
+        if path.parent not in self._dirs:
+            raise FileNotFoundError(f"No existe el directorio: {path.parent}")
+
+    def write_bytes(self, path: pathlib.Path, data: bytes) -> None:
+        with self._mutex:
+            self._check_parent(path)
+            if path not in self._files:
+                self._touch_directory(path)
+            self._files[path] = (bytes(data), self._tick())
+
+    def append_bytes(self, path: pathlib.Path, data: bytes) -> None:
+        with self._mutex:
+            self._check_parent(path)
+            if path not in self._files:
+                self._touch_directory(path)
+            current = self._files.get(path, (b"", 0))[0]
+            self._files[path] = (current + data, self._tick())
+
+    def rename(self, source: pathlib.Path, target: pathlib.Path) -> None:
+        with self._mutex:
+            if source not in self._files:
+                raise FileNotFoundError(f"No existe el archivo: {source}")
+            self._check_parent(target)
+            self._touch_directory(source)
+            self._touch_directory(target)
+            self._files[target] = (self._files.pop(source)[0], self._tick())
+
+    def delete(self, path: pathlib.Path) -> None:
+        with self._mutex:
+            if self._files.pop(path, None) is None:
+                raise FileNotFoundError(f"No existe el archivo: {path}")
+            self._touch_directory(path)
+
+    def read_versioned(self, path: pathlib.Path) -> tuple[str, FileVersion]:
+        with self._mutex:
+            entry = self._files.get(path)
+        if entry is None:
+            raise FileNotFoundError(f"No existe el archivo: {path}")
+        data, mtime_ns = entry
+        return data.decode('utf-8'), FileVersion(mtime_ns, len(data), hashlib.sha256(data).hexdigest())
+
+    @contextlib.contextmanager
+    def lock(self, path: pathlib.Path) -> typing.Iterator[None]:
+        with self._mutex:
+            file_lock = self._file_locks.setdefault(path, threading.Lock())
+        start = time.perf_counter_ns()
+        with file_lock:
+            self.lock_stats.record_wait(time.perf_counter_ns() - start)
+            yield
@@ -0,0 +1,157 @@
+"""
+Registro de títulos de página: del título que dice el usuario (o el LLM) al archivo.
+
+El nombre de archivo de una página no siempre es su título con "/" → "__": Logseq
+ha usado varias codificaciones para los espacios de nombres ("%2F" en grafos antiguos,
+"___" con el formato :triple-lowbar), y el LLM puede escribir "tareas" para la página
+"Tareas" o "reunion" para "Reunión". El registro se construye con un único listado del
+directorio pages/ y resuelve un título en O(1) probando, en este orden:
+
+1. el título exacto,
+2. el título sin distinguir mayúsculas,
+3. el título sin distinguir mayúsculas ni acentos.
+
+Si en el primer nivel con coincidencias hay varios archivos, se prefiere el que tiene
+el nombre canónico ("/" → "__"); si ninguno lo tiene, se lanza
+AmbiguousPageTitleError con los candidatos en lugar de escoger uno al azar.
+
+El registro mantiene además el árbol de espacios de nombres de los títulos
+(src/namespace_tree.py) para autocompletar y listar subárboles sin tocar el disco.
+"""
+
+import threading
+import typing
+import unicodedata
+import urllib.parse
+
+from src.namespace_tree import NamespaceTree
+
+
+class AmbiguousPageTitleError(ValueError):
+    """Varios archivos de página encajan con un título y ninguno es el canónico."""
+
+    def __init__(self, title: str, candidates: list[str]) -> None:
+        self.title = title
+        self.candidates = candidates  # Nombres de archivo, ordenados
+        super().__init__(
+            f"❌ ERROR: El título '{title}' es ambiguo; puede referirse a los archivos: "
+            + ", ".join(candidates)
+        )
+
+
+def filename_for_title(title: str) -> str:
+    """Nombre de archivo canónico de una página: "Ideas/IA" → "Ideas__IA.md"."""
+    return f"{title.replace('/', '__')}.md"
+
+
+def title_from_filename(stem: str) -> str:
+    """
+    Título de una página a partir del nombre de su archivo (sin extensión).
+
+    Entiende las tres codificaciones de los espacios de nombres: "Ideas__IA",
+    "Ideas___IA" e "Ideas%2FIA" → "Ideas/IA".
+    """
+    if "%" in stem:
+        stem = urllib.parse.unquote(stem)
+    return stem.replace("___", "/").replace("__", "/")
+
+
+def fold_title(title: str) -> str:
+    """Clave sin mayúsculas ni acentos: "Reunión" → "reunion"."""
+    normalized = unicodedata.normalize("NFKD", title.casefold())
+    return "".join(char for char in normalized if not unicodedata.combining(char))
+
+
+class TitleRegistry:
+    """
+    Índice título → nombre de archivo de las páginas, con altas y bajas en O(1).
+
+    Es seguro entre hilos: todas las operaciones se serializan con un lock.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._names: set[str] = set()
+        # Nivel de coincidencia → clave → nombres de archivo
+        self._levels: tuple[dict[str, set[str]], ...] = ({}, {}, {})
+        self.namespaces = NamespaceTree()
+
+    @staticmethod
+    def _keys(title: str) -> tuple[str, str, str]:
+        return title, title.casefold(), fold_title(title)
+
+    def __len__(self) -> int:
+        return len(self._names)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._names
+
+    def rebuild(self, names: typing.Iterable[str]) -> None:
+        """Sustituye el contenido por los nombres de archivo *.md de un listado."""
+        levels: tuple[dict[str, set[str]], ...] = ({}, {}, {})
+        names = set(names)
+        titles = []
+        for name in names:
+            title = title_from_filename(name[:-3])
+            titles.append(title)
+            for level, key in zip(levels, self._keys(title)):
+                level.setdefault(key, set()).add(name)
+        namespaces = NamespaceTree(titles)
+        with self._lock:
+            self._names = names
+            self._levels = levels
+            self.namespaces = namespaces
+
+    def add(self, name: str) -> None:
+        """Registra un archivo de página (ej: "Ideas__IA.md")."""
+        with self._lock:
+            if name in self._names:
+                return
+            self._names.add(name)
+            title = title_from_filename(name[:-3])
+            for level, key in zip(self._levels, self._keys(title)):
+                level.setdefault(key, set()).add(name)
+            self.namespaces.add(title)
+
+    def remove(self, name: str) -> None:
+        """Olvida un archivo de página."""
+        with self._lock:
+            if name not in self._names:
+                return
+            self._names.discard(name)
+            title = title_from_filename(name[:-3])
+            for level, key in zip(self._levels, self._keys(title)):
+                level[key].discard(name)
+                if not level[key]:
+                    del level[key]
+            # Dos archivos pueden tener el mismo título (ej: "A__B.md" y "A%2FB.md")
+            if not self._levels[0].get(title):
+                self.namespaces.remove(title)
+
+    def titles(self) -> list[str]:
+        """Títulos de todas las páginas registradas, ordenados."""
+        with self._lock:
+            return sorted(title_from_filename(name[:-3]) for name in self._names)
+
+    def resolve(self, title: str) -> typing.Optional[str]:
+        """
+        Nombre del archivo de la página con ese título, o None si no hay ninguna.
+
+        Raises:
+            AmbiguousPageTitleError: Si varias páginas encajan y ninguna es la canónica
+        """
+        canonical = filename_for_title(title)
+        with self._lock:
+            for level, key in zip(self._levels, self._keys(title)):
+                names = level.get(key)
+                if not names:
+                    continue
+                if len(names) == 1:
+                    return next(iter(names))
+                if canonical in names:
+                    return canonical
+                candidates = sorted(names)
+                break
+            else:
+                return None
+        raise AmbiguousPageTitleError(title, candidates)
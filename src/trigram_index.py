@@ -0,0 +1,382 @@
+"""
+Índice de trigramas en memoria para búsquedas de subcadenas y con erratas.
+
+Cada página y diario, y cada uno de sus bloques (ver src/blocks.py), se descompone en
+trigramas (grupos de 3 caracteres consecutivos, en minúsculas y sin acentos). Para
+cada trigrama se guardan dos listas de identificadores ordenadas, en array('I') de
+4 bytes por entrada: los documentos y los bloques que lo contienen.
+
+- Subcadenas: un documento que contiene la consulta contiene todos sus trigramas,
+  así que basta con intersecar sus listas (empezando por la más corta, con búsqueda
+  binaria en las demás) para obtener pocos candidatos, que el llamador verifica.
+- Erratas: "Proyeto Apolo" comparte con "Proyecto Apolo" la mayoría de trigramas.
+  Un bloque con al menos `need` trigramas de la consulta aparece por fuerza en una de
+  las (total - need + 1) listas más cortas; solo se recorren esas, y los candidatos
+  se completan con búsquedas binarias en las largas. Se ordenan por la fracción de
+  trigramas de la consulta que contienen.
+
+Los identificadores nunca se reutilizan: al reindexar un archivo sus bloques reciben
+identificadores nuevos (mayores que todos los anteriores), así que las listas siguen
+ordenadas añadiendo al final. Los antiguos quedan marcados como borrados y se filtran
+al consultar; cuando son más de la mitad, el índice se compacta.
+
+El índice completo se puede guardar en una instantánea binaria (ver
+src/graph_snapshot.py) y recuperar en el siguiente arranque sin leer ni trocear los
+archivos: save_snapshot() y TrigramIndex.load_snapshot().
+
+Solo usa la biblioteca estándar.
+"""
+
+import array
+import bisect
+import math
+import pathlib
+import typing
+import unicodedata
+from collections import Counter
+
+from src.blocks import iter_blocks
+from src.file_index import FileIndex
+from src.graph_snapshot import SnapshotError, StringTable, open_snapshot, read_strings, write_snapshot
+from src.storage import FileStat, StorageBackend
+
+
+class FuzzyHit(typing.NamedTuple):
+    """Un bloque parecido a la consulta."""
+    path: pathlib.Path
+    line: int
+    text: str
+    score: float  # Fracción de los trigramas de la consulta presentes en el bloque
+
+
+class _FoldTable(dict):
+    """Tabla para str.translate que calcula (y recuerda) cada carácter sin acento."""
+
+    def __missing__(self, codepoint: int) -> str:
+        decomposed = unicodedata.normalize("NFKD", chr(codepoint))
+        folded = "".join(char for char in decomposed if not unicodedata.combining(char))
+        self[codepoint] = folded
+        return folded
+
+
+_FOLD_TABLE = _FoldTable()
+
+
+def fold(text: str) -> str:
+    """Minúsculas y sin acentos: "Canción" → "cancion"."""
+    text = text.lower()
+    if text.isascii():
+        return text
+    # translate() con la tabla en caché evita normalizar el texto completo
+    return text.translate(_FOLD_TABLE)
+
+
+def trigrams(text: str) -> set[str]:
+    """Trigramas distintos de un texto ya normalizado con fold()."""
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+def _contains(postings: array.array, item: int) -> bool:
+    """Búsqueda binaria en una lista de identificadores ordenada."""
+    position = bisect.bisect_left(postings, item)
+    return position < len(postings) and postings[position] == item
+
+
+def _intersect(lists: list[array.array]) -> list[int]:
+    """Intersección de listas ordenadas, recorriendo la más corta."""
+    if not lists:
+        return []
+    lists = sorted(lists, key=len)
+    result = []
+    for item in lists[0]:
+        if all(_contains(postings, item) for postings in lists[1:]):
+            result.append(item)
+    return result
+
+
+# Tipo de índice en la cabecera de la instantánea y versión de la disposición de sus
+# secciones (se incrementa si cambian las tablas de abajo)
+_SNAPSHOT_KIND = b"trigram"
+_SNAPSHOT_LAYOUT = 1
+
+# Bloque borrado en la tabla de bloques de la instantánea
+_DEAD_BLOCK = 0xFFFFFFFF
+
+
+class _Document(typing.NamedTuple):
+    path: str
+    kind: str
+    stat: tuple[int, int]  # (mtime_ns, tamaño) con el que se indexó
+    content: str
+    block_ids: range
+
+
+class TrigramIndex(FileIndex):
+    """Índice de trigramas de documentos y bloques con actualizaciones incrementales."""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self._reset()
+
+    def _reset(self) -> None:
+        self._documents: dict[int, _Document] = {}
+        self._document_by_path: dict[str, int] = {}
+        self._document_postings: dict[str, array.array] = {}
+        self._next_document = 0
+        # Por bloque: documento, línea, texto y número de trigramas (None si borrado)
+        self._blocks: list[typing.Optional[tuple[int, int, str, int]]] = []
+        self._block_postings: dict[str, array.array] = {}
+        self._dead_blocks = 0
+        # Hay cambios que la última instantánea guardada no tiene
+        self.modified = True
+
+    def __len__(self) -> int:
+        """Número de bloques indexados."""
+        return len(self._blocks) - self._dead_blocks
+
+    # --- Altas y bajas ---
+
+    def _add_document(self, path: str, kind: str, stat: tuple[int, int], content: str) -> None:
+        self.modified = True
+        document_id = self._next_document
+        self._next_document += 1
+        document_postings = self._document_postings
+        for gram in trigrams(fold(content)):
+            postings = document_postings.get(gram)
+            if postings is None:
+                postings = document_postings[gram] = array.array('I')
+            postings.append(document_id)
+
+        first_block = len(self._blocks)
+        block_postings = self._block_postings
+        for block in iter_blocks(content):
+            block_id = len(self._blocks)
+            grams = trigrams(fold(block.text))
+            for gram in grams:
+                postings = block_postings.get(gram)
+                if postings is None:
+                    postings = block_postings[gram] = array.array('I')
+                postings.append(block_id)
+            self._blocks.append((document_id, block.line, block.text, len(grams)))
+
+        self._documents[document_id] = _Document(path, kind, stat, content, range(first_block, len(self._blocks)))
+        self._document_by_path[path] = document_id
+
+    def _remove_document(self, path: str) -> None:
+        document_id = self._document_by_path.pop(path, None)
+        if document_id is None:
+            return
+        self.modified = True
+        # Las listas conservan los identificadores: se filtran al consultar
+        for block_id in self._documents.pop(document_id).block_ids:
+            self._blocks[block_id] = None
+            self._dead_blocks += 1
+
+    def _compact(self) -> None:
+        """Reconstruye las listas sin los identificadores borrados."""
+        documents = [(document.path, document.kind, document.stat, document.content)
+                     for document in self._documents.values()]
+        self._reset()
+        for document in documents:
+            self._add_document(*document)
+
+    def _known_stats(self, kind: typing.Optional[str]) -> dict[str, tuple[int, int]]:
+        return {document.path: document.stat for document in self._documents.values() if document.kind == kind}
+
+    def _stat_of(self, path: str) -> typing.Optional[tuple[int, int]]:
+        document_id = self._document_by_path.get(path)
+        return None if document_id is None else self._documents[document_id].stat
+
+    def _refresh(
+        self,
+        storage: StorageBackend,
+        path: str,
+        kind: typing.Optional[str],
+        stat: typing.Optional[FileStat],
+    ) -> bool:
+        document_id = self._document_by_path.get(path)
+        if stat is None:
+            if document_id is None:
+                return False
+            self._remove_document(path)
+            return True
+
+        try:
+            content = storage.read_text(pathlib.Path(path))
+        except (IOError, OSError, UnicodeDecodeError):
+            content = ""
+        if document_id is not None and self._documents[document_id].content == content:
+            # Solo cambió el mtime (ej: un checkout de git): no hace falta volver a trocearlo
+            self._documents[document_id] = self._documents[document_id]._replace(stat=(stat.mtime_ns, stat.size))
+            self.modified = True
+            return False
+        self._remove_document(path)
+        self._add_document(path, kind, (stat.mtime_ns, stat.size), content)
+        return True
+
+    def _after_changes(self) -> None:
+        if self._dead_blocks > 1024 and self._dead_blocks * 2 > len(self._blocks):
+            self._compact()
+
+    # --- Instantáneas ---
+
+    def save_snapshot(self, path: pathlib.Path) -> int:
+        """
+        Guarda el índice completo en una instantánea binaria (ver src/graph_snapshot.py).
+
+        Los identificadores se guardan tal cual, con los bloques borrados incluidos, así
+        que las listas de trigramas se copian sin recorrerlas.
+
+        Returns:
+            int: Tamaño de la instantánea en bytes
+        """
+        with self._lock:
+            strings = StringTable()
+            documents = array.array('Q')
+            for document_id, document in self._documents.items():
+                documents.extend((
+                    document_id, strings.intern(document.path), strings.intern(document.kind),
+                    document.stat[0], document.stat[1], strings.intern(document.content),
+                    document.block_ids.start, document.block_ids.stop,
+                ))
+
+            blocks = array.array('I')
+            for block in self._blocks:
+                if block is None:
+                    blocks.extend((_DEAD_BLOCK, 0, 0, 0))
+                else:
+                    document_id, line, text, count = block
+                    blocks.extend((document_id, line, strings.intern(text), count))
+
+            sections = {
+                b"META": array.array('Q', [_SNAPSHOT_LAYOUT, self._next_document, self._dead_blocks]),
+                b"DOCS": documents,
+                b"BLKS": blocks,
+            }
+            for prefix, all_postings in ((b"DP", self._document_postings), (b"BP", self._block_postings)):
+                keys = array.array('Q')
+                ids = array.array('I')
+                for gram, postings in all_postings.items():
+                    keys.extend((strings.intern(gram), len(ids), len(postings)))
+                    ids.extend(postings)
+                sections[prefix + b"KY"] = keys
+                sections[prefix + b"ID"] = ids
+            sections.update(strings.sections(b"STR"))
+
+            size = write_snapshot(path, _SNAPSHOT_KIND, sections)
+            self.modified = False
+            return size
+
+    @classmethod
+    def load_snapshot(cls, path: pathlib.Path) -> "TrigramIndex":
+        """
+        Recupera un índice guardado con save_snapshot().
+
+        El índice refleja los archivos tal como estaban al guardarlo: hay que
+        sincronizarlo después para reprocesar los que hayan cambiado.
+
+        Raises:
+            OSError: Si la instantánea no se puede leer
+            SnapshotError: Si está corrupta o es de otra versión
+        """
+        index = cls()
+        with open_snapshot(path, _SNAPSHOT_KIND) as snapshot:
+            meta = snapshot.array(b"META", 'Q')
+            if len(meta) != 3 or meta[0] != _SNAPSHOT_LAYOUT:
+                raise SnapshotError(f"❌ ERROR: Instantánea de trigramas de otra versión: {path}")
+            index._next_document, index._dead_blocks = meta[1], meta[2]
+            try:
+                strings = read_strings(snapshot, b"STR")
+
+                documents = snapshot.array(b"DOCS", 'Q')
+                for i in range(0, len(documents), 8):
+                    document_id, path_id, kind_id, mtime_ns, size, content_id, start, stop = documents[i:i + 8]
+                    document = _Document(
+                        strings[path_id], strings[kind_id], (mtime_ns, size), strings[content_id], range(start, stop)
+                    )
+                    index._documents[document_id] = document
+                    index._document_by_path[document.path] = document_id
+
+                blocks = snapshot.array(b"BLKS", 'I').tolist()
+                index._blocks = [
+                    None if document_id == _DEAD_BLOCK else (document_id, line, strings[text_id], count)
+                    for document_id, line, text_id, count in zip(*[iter(blocks)] * 4)
+                ]
+
+                for prefix, all_postings in ((b"DP", index._document_postings), (b"BP", index._block_postings)):
+                    keys = snapshot.array(prefix + b"KY", 'Q')
+                    ids = snapshot.section(prefix + b"ID")
+                    for i in range(0, len(keys), 3):
+                        start = keys[i + 1] * 4
+                        postings = array.array('I')
+                        # Copia directa de bytes desde el mapa, sin decodificar enteros
+                        postings.frombytes(ids[start:start + keys[i + 2] * 4])
+                        all_postings[strings[keys[i]]] = postings
+            except (IndexError, ValueError) as error:
+                raise SnapshotError(f"❌ ERROR: Instantánea de trigramas inconsistente: {path} ({error})") from None
+        index.modified = False
+        return index
+
+    # --- Consultas ---
+
+    def substring_candidates(self, query: str, kind: str) -> list[tuple[pathlib.Path, str]]:
+        """
+        Documentos que pueden contener `query` sin distinguir mayúsculas, ordenados por ruta.
+
+        Con menos de tres caracteres se devuelven todos los documentos del tipo. El
+        llamador verifica cada candidato con la misma comparación que el recorrido de
+        archivos, para que los resultados coincidan.
+        """
+        grams = trigrams(fold(query))
+        with self._lock:
+            if grams:
+                lists = [self._document_postings.get(gram) for gram in grams]
+                if any(postings is None for postings in lists):
+                    return []
+                document_ids = _intersect(lists)
+            else:
+                document_ids = list(self._documents)
+            documents = [self._documents.get(document_id) for document_id in document_ids]
+        return sorted(
+            (pathlib.Path(document.path), document.content)
+            for document in documents
+            if document is not None and document.kind == kind
+        )
+
+    def fuzzy_blocks(self, query: str, limit: int = 10, min_similarity: float = 0.6) -> list[FuzzyHit]:
+        """
+        Bloques que contienen al menos `min_similarity` de los trigramas de la consulta.
+
+        Se ordenan por esa fracción y, a igualdad, por el bloque más corto (el que más
+        se parece a la consulta en conjunto).
+        """
+        grams = trigrams(fold(query))
+        if not grams or limit <= 0:
+            return []
+        need = max(1, math.ceil(min_similarity * len(grams)))
+
+        with self._lock:
+            lists = sorted((self._block_postings.get(gram, array.array('I')) for gram in grams), key=len)
+            # Un bloque con `need` trigramas en común está en alguna de estas listas
+            short_lists, long_lists = lists[: len(grams) - need + 1], lists[len(grams) - need + 1:]
+            counts = Counter()
+            for postings in short_lists:
+                counts.update(postings)
+
+            scored = []
+            for block_id, count in counts.items():
+                block = self._blocks[block_id]
+                if block is None or count + len(long_lists) < need:
+                    continue
+                count += sum(1 for postings in long_lists if _contains(postings, block_id))
+                if count >= need:
+                    # Coeficiente de Dice para desempatar: penaliza bloques mucho más largos
+                    dice = 2 * count / (len(grams) + block[3])
+                    scored.append((count / len(grams), dice, block_id))
+
+            scored.sort(key=lambda item: (-item[0], -item[1], item[2]))
+            hits = []
+            for score, _, block_id in scored[:limit]:
+                document_id, line, text, _ = self._blocks[block_id]
+                hits.append(FuzzyHit(pathlib.Path(self._documents[document_id].path), line, text, score))
+            return hits
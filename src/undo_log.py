@@ -0,0 +1,357 @@
+"""
+Registro de deshacer/rehacer de las escrituras del gestor, con diffs mínimos por líneas.
+
+Guardar una copia entera de cada página antes de modificarla sale caro con páginas
+grandes. El registro guarda, por cada archivo modificado, solo los tramos de líneas que
+cambiaron (antes y después) y el crc32 del archivo antes y después. Los añadidos al
+final guardan el texto añadido y el tamaño previo, y los renombrados, las dos rutas.
+
+Las escrituras se agrupan en operaciones (un comando del usuario, un renombrado con
+todas sus referencias...). Cada hilo abre sus propias operaciones: lo que escribe otro
+hilo mientras tanto (el temporizador del buffer de escritura, por ejemplo) no entra en
+ellas, salvo que se le pase con bind(). undo() revierte operaciones enteras, empezando por la
+última; redo() las vuelve a aplicar. Antes de revertir un cambio se comprueba que el
+archivo sigue como lo dejó la operación: si alguien lo modificó después, se lanza
+UndoConflictError en lugar de pisar esos cambios.
+
+En disco es un archivo JSON-lines de solo añadido (.logseq-agent/undo.log). Cada línea
+lleva delante el crc32 de su contenido, así que una línea a medio escribir por una
+caída se descarta al cargar. Deshacer y rehacer añaden una marca en lugar de reescribir
+el archivo. Cuando pasa de max_bytes se compacta: se reescribe de forma atómica solo con
+las operaciones más recientes, hasta la mitad del límite.
+"""
+
+import contextlib
+import difflib
+import json
+import os
+import pathlib
+import threading
+import time
+import typing
+import zlib
+
+
+# Límite por defecto del archivo del registro antes de compactarlo
+DEFAULT_MAX_BYTES = 1 << 20
+
+# Por encima de este producto de líneas distintas no se busca un diff mínimo: el tramo
+# cambiado se guarda entero (SequenceMatcher es cuadrático en el peor caso)
+_MAX_DIFF_WORK = 1_000_000
+
+# Un cambio: {"kind": "edit" | "append" | "rename", "path": ruta relativa al grafo, ...}
+Change = dict[str, typing.Any]
+
+
+class UndoConflictError(ValueError):
+    """El archivo cambió después de la operación; deshacerla pisaría esos cambios."""
+
+
+class _GroupState:
+    """Operación abierta con group() en un hilo (o compartida con bind())."""
+
+    __slots__ = ("depth", "label", "current")
+
+    def __init__(self) -> None:
+        self.depth = 0
+        self.label: typing.Optional[str] = None
+        self.current: typing.Optional[dict] = None
+
+
+def checksum(text: str) -> int:
+    """crc32 del texto en UTF-8."""
+    return zlib.crc32(text.encode('utf-8', 'surrogatepass'))
+
+
+def line_diff(before: str, after: str) -> list[list]:
+    """
+    Tramos de líneas que cambian entre dos textos.
+
+    Returns:
+        Lista de [línea en `before`, línea en `after`, líneas antes, líneas después],
+        con las líneas con su salto de línea para reconstruir el texto exacto
+
+    Example:
+        line_diff("- A\\n- B\\n- C", "- A\\n- C") → [[1, 1, ["- B\\n"], []]]
+    """
+    old_lines = before.splitlines(keepends=True)
+    new_lines = after.splitlines(keepends=True)
+    # Casi todas las operaciones tocan una zona: se recortan antes las partes iguales
+    limit = min(len(old_lines), len(new_lines))
+    prefix = 0
+    while prefix < limit and old_lines[prefix] == new_lines[prefix]:
+        prefix += 1
+    suffix = 0
+    while suffix < limit - prefix and old_lines[-1 - suffix] == new_lines[-1 - suffix]:
+        suffix += 1
+    old_middle = old_lines[prefix:len(old_lines) - suffix]
+    new_middle = new_lines[prefix:len(new_lines) - suffix]
+    if not old_middle and not new_middle:
+        return []
+    if len(old_middle) * len(new_middle) > _MAX_DIFF_WORK:
+        return [[prefix, prefix, old_middle, new_middle]]
+
+    matcher = difflib.SequenceMatcher(None, old_middle, new_middle, autojunk=False)
+    return [
+        [prefix + i1, prefix + j1, old_middle[i1:i2], new_middle[j1:j2]]
+        for tag, i1, i2, j1, j2 in matcher.get_opcodes()
+        if tag != "equal"
+    ]
+
+
+def apply_hunks(text: str, hunks: list[list], reverse: bool = False) -> str:
+    """
+    Aplica los tramos de line_diff: de `before` a `after`, o al revés si `reverse`.
+
+    Se aplican del último al primero para que las posiciones de los anteriores sigan
+    siendo válidas.
+    """
+    lines = text.splitlines(keepends=True)
+    for old_start, new_start, old, new in reversed(hunks):
+        if reverse:
+            lines[new_start:new_start + len(new)] = old
+        else:
+            lines[old_start:old_start + len(old)] = new
+    return "".join(lines)
+
+
+def _encode_line(record: dict) -> bytes:
+    payload = json.dumps(record, ensure_ascii=False, separators=(",", ":"))
+    return f"{checksum(payload):08x} {payload}\n".encode('utf-8', 'surrogatepass')
+
+
+def _decode_line(line: bytes) -> typing.Optional[dict]:
+    """El registro de una línea, o None si está truncada o su crc32 no cuadra."""
+    try:
+        text = line.decode('utf-8', 'surrogatepass').rstrip("\n")
+        crc, payload = text.split(" ", 1)
+        if int(crc, 16) != checksum(payload):
+            return None
+        return json.loads(payload)
+    except ValueError:
+        return None
+
+
+class UndoLog:
+    """
+    Pilas de operaciones hechas y deshechas, con su archivo de solo añadido.
+
+    Es seguro entre hilos: las escrituras de un renombrado, que se hacen en paralelo,
+    se registran en la misma operación.
+    """
+
+    def __init__(self, path: typing.Optional[pathlib.Path] = None, max_bytes: int = DEFAULT_MAX_BYTES) -> None:
+        """
+        Args:
+            path: Archivo del registro; None para guardarlo solo en memoria
+            max_bytes: Tamaño a partir del cual se compacta
+        """
+        self.path = path
+        self.max_bytes = max_bytes
+        self._lock = threading.RLock()
+        # Operación: {"id", "label", "time", "changes", "bytes"}
+        self._done: list[dict] = []
+        self._undone: list[dict] = []
+        self._next_id = 1
+        self._size = 0
+        # Operación abierta con group(), por hilo: las escrituras de otros hilos (el
+        # temporizador del buffer de escritura, un uso como biblioteca) no entran en ella
+        self._local = threading.local()
+        if path is not None and path.exists():
+            self._load()
+
+    def __len__(self) -> int:
+        """Operaciones que se pueden deshacer."""
+        return len(self._done)
+
+    @property
+    def size(self) -> int:
+        """Bytes que ocupa el registro."""
+        return self._size
+
+    def _load(self) -> None:
+        groups: dict[int, dict] = {}
+        with open(self.path, 'rb') as file:
+            for line in file:
+                if not line.endswith(b"\n"):
+                    # Última línea a medio escribir: se corta para que las siguientes
+                    # no se peguen a ella
+                    os.truncate(self.path, self._size)
+                    break
+                self._size += len(line)
+                record = _decode_line(line)
+                if record is None:
+                    continue
+                if "change" in record:
+                    group = groups.get(record["group"])
+                    if group is None:
+                        group = groups[record["group"]] = self._new_group(record["group"], record["label"], record["time"])
+                    group["changes"].append(record["change"])
+                    group["bytes"] += len(line)
+                elif "undo" in record and self._done and self._done[-1]["id"] == record["undo"]:
+                    self._undone.append(self._done.pop())
+                elif "redo" in record and self._undone and self._undone[-1]["id"] == record["redo"]:
+                    self._done.append(self._undone.pop())
+        self._next_id = max(groups, default=0) + 1
+
+    def _open_group(self) -> "_GroupState":
+        """Estado de group() del hilo actual: profundidad, etiqueta y operación abierta."""
+        state = getattr(self._local, "state", None)
+        if state is None:
+            state = self._local.state = _GroupState()
+        return state
+
+    def bind(self, function: typing.Callable) -> typing.Callable:
+        """
+        Envuelve `function` para que, aunque se ejecute en otro hilo (p. ej. en un pool),
+        registre sus cambios en la operación que este hilo tiene abierta con group().
+        """
+        state = self._open_group()
+
+        def bound(*args, **kwargs):
+            previous = getattr(self._local, "state", None)
+            self._local.state = state
+            try:
+                return function(*args, **kwargs)
+            finally:
+                self._local.state = previous
+
+        return bound
+
+    def _new_group(self, group_id: int, label: str, started: float) -> dict:
+        group = {"id": group_id, "label": label, "time": started, "changes": [], "bytes": 0}
+        self._done.append(group)
+        # Una operación nueva descarta las que se podían rehacer
+        self._undone.clear()
+        return group
+
+    def _append_line(self, line: bytes) -> None:
+        if self.path is not None:
+            with open(self.path, 'ab') as file:
+                file.write(line)
+        self._size += len(line)
+
+    @contextlib.contextmanager
+    def group(self, label: str) -> typing.Iterator[None]:
+        """
+        Agrupa en una sola operación las escrituras hechas dentro del bloque with.
+
+        Los grupos anidados se funden con el exterior, que da la etiqueta. Si dentro no
+        se escribe nada, no se registra ninguna operación. El grupo es del hilo que lo
+        abre: las escrituras de otros hilos forman sus propias operaciones.
+        """
+        state = self._open_group()
+        state.depth += 1
+        if state.depth == 1:
+            state.label = label
+        try:
+            yield
+        finally:
+            state.depth -= 1
+            if state.depth == 0:
+                state.label = None
+                state.current = None
+
+    def record(self, change: Change, label: str) -> None:
+        """
+        Registra un cambio en la operación abierta por este hilo, o en una operación propia.
+
+        Args:
+            change: Cambio ya calculado (ver record_edit, record_append y record_rename)
+            label: Descripción si el cambio abre una operación nueva fuera de group()
+        """
+        state = self._open_group()
+        with self._lock:
+            group = state.current
+            if group is None:
+                group = self._new_group(self._next_id, state.label or label, time.time())
+                self._next_id += 1
+                if state.depth:
+                    state.current = group
+            group["changes"].append(change)
+            line = _encode_line({"group": group["id"], "label": group["label"], "time": group["time"], "change": change})
+            group["bytes"] += len(line)
+            self._append_line(line)
+            if self._size > self.max_bytes:
+                self._compact()
+
+    def record_edit(self, path: str, before: typing.Optional[str], after: str) -> None:
+        """Registra que `path` pasó de `before` (None si no existía) a `after`."""
+        if before is None:
+            self.record_append(path, None, after)
+            return
+        hunks = line_diff(before, after)
+        if hunks:
+            change = {"kind": "edit", "path": path, "before": checksum(before), "after": checksum(after), "hunks": hunks}
+            self.record(change, f"Modificar {path}")
+
+    def record_append(self, path: str, size: typing.Optional[int], text: str) -> None:
+        """Registra que se añadió `text` al final de `path`, que tenía `size` bytes (None si no existía)."""
+        label = f"Añadir a {path}" if size is not None else f"Crear {path}"
+        self.record({"kind": "append", "path": path, "size": size, "text": text}, label)
+
+    def record_rename(self, path: str, target: str) -> None:
+        """Registra que `path` pasó a llamarse `target`."""
+        self.record({"kind": "rename", "path": path, "target": target}, f"Renombrar {path}")
+
+    def peek_undo(self) -> typing.Optional[dict]:
+        """Última operación hecha (la que desharía undo), o None."""
+        with self._lock:
+            return self._done[-1] if self._done else None
+
+    def peek_redo(self) -> typing.Optional[dict]:
+        """Última operación deshecha (la que rehacería redo), o None."""
+        with self._lock:
+            return self._undone[-1] if self._undone else None
+
+    def mark_undone(self, group: dict) -> None:
+        """Anota que la operación `group` (la última hecha) se deshizo."""
+        with self._lock:
+            if not self._done or self._done[-1] is not group:
+                raise ValueError("❌ ERROR: Solo se puede deshacer la última operación")
+            self._undone.append(self._done.pop())
+            self._append_line(_encode_line({"undo": group["id"]}))
+
+    def mark_redone(self, group: dict) -> None:
+        """Anota que la operación `group` (la última deshecha) se rehízo."""
+        with self._lock:
+            if not self._undone or self._undone[-1] is not group:
+                raise ValueError("❌ ERROR: Solo se puede rehacer la última operación deshecha")
+            self._done.append(self._undone.pop())
+            self._append_line(_encode_line({"redo": group["id"]}))
+
+    def history(self, limit: int = 10) -> list[str]:
+        """Etiquetas de las últimas operaciones que se pueden deshacer, de la más reciente a la más antigua."""
+        with self._lock:
+            return [group["label"] for group in reversed(self._done[-limit:])]
+
+    def _compact(self) -> None:
+        """Se queda con las operaciones más recientes que quepan en la mitad del límite."""
+        budget = self.max_bytes // 2
+        # Las deshechas son siempre más recientes que las hechas
+        chronological = self._done + self._undone[::-1]
+        kept: list[dict] = []
+        used = 0
+        for group in reversed(chronological):
+            if used + group["bytes"] > budget and kept:
+                break
+            kept.append(group)
+            used += group["bytes"]
+        kept.reverse()
+        kept_ids = {group["id"] for group in kept}
+        self._done = [group for group in self._done if group["id"] in kept_ids]
+        self._undone = [group for group in self._undone if group["id"] in kept_ids]
+
+        lines = [
+            _encode_line({"group": group["id"], "label": group["label"], "time": group["time"], "change": change})
+            for group in kept
+            for change in group["changes"]
+        ]
+        lines.extend(_encode_line({"undo": group["id"]}) for group in self._undone)
+        data = b"".join(lines)
+        if self.path is not None:
+            temp_path = self.path.with_name(f"{self.path.name}.tmp")
+            with open(temp_path, 'wb') as file:
+                file.write(data)
+            os.replace(temp_path, self.path)
+        self._size = len(data)
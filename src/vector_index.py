@@ -0,0 +1,319 @@
+"""
+Recuperación semántica local (RAG) sobre los bloques del grafo, con NumPy.
+
+Cada bloque (ver src/blocks.py) se convierte en un vector TF-IDF con el truco del
+hashing: las palabras (sin acentos ni mayúsculas), los pares de palabras consecutivas
+y los fragmentos de 4 letras de cada palabra se reparten con crc32 entre `dim`
+posiciones con signo. No hace falta vocabulario ni red, y los fragmentos de palabra
+hacen que "reunión" y "reuniones" se parezcan.
+
+Los vectores se guardan en una matriz float32 (en disco como memmap, en
+.logseq-agent/vectors/) con una fila por bloque. Al cambiar un archivo solo se
+sustituyen las filas de sus bloques, y las filas libres se reutilizan. El IDF se
+mantiene de forma incremental a partir de la frecuencia por posición. La búsqueda
+calcula el coseno contra toda la matriz con operaciones vectorizadas por tramos y
+selecciona los k mejores con argpartition.
+
+NumPy es opcional: solo se necesita si se usa la búsqueda semántica.
+"""
+
+import json
+import math
+import os
+import pathlib
+import re
+import typing
+import unicodedata
+import zlib
+from collections import Counter
+
+try:
+    import numpy as np
+except ImportError:  # numpy es opcional (pip install numpy)
+    np = None
+
+from src.blocks import iter_blocks
+from src.file_index import FileIndex
+from src.storage import FileStat, StorageBackend
+
+
+_WORD_RE = re.compile(r"\w+")
+
+# Filas por tramo al puntuar: acota la memoria temporal de cada búsqueda
+_SCORE_CHUNK_ROWS = 65536
+
+
+class VectorHit(typing.NamedTuple):
+    """Un bloque devuelto por la búsqueda semántica."""
+    path: pathlib.Path
+    line: int
+    text: str
+    score: float
+
+
+def _features(text: str) -> Counter:
+    """Rasgos de un texto: palabras, pares de palabras y fragmentos de 4 letras."""
+    normalized = unicodedata.normalize("NFKD", text.lower())
+    normalized = "".join(char for char in normalized if not unicodedata.combining(char))
+    words = [word for word in _WORD_RE.findall(normalized) if len(word) > 1]
+
+    features = Counter(words)
+    features.update(f"{first} {second}" for first, second in zip(words, words[1:]))
+    for word in words:
+        padded = f"<{word}>"
+        features.update(f"#{padded[i:i + 4]}" for i in range(len(padded) - 3))
+    return features
+
+
+class VectorIndex(FileIndex):
+    """
+    Índice vectorial de bloques con altas y bajas incrementales por archivo.
+
+    search() y save() también toman el lock: el gestor actualiza el índice desde el
+    hilo del buffer de diario mientras otro hilo puede estar buscando.
+    """
+
+    def __init__(self, directory: typing.Optional[pathlib.Path], dim: int = 1024) -> None:
+        """
+        Args:
+            directory: Directorio donde persistir la matriz (memmap) y sus metadatos;
+                None para un índice solo en memoria
+            dim: Número de posiciones del vector (tamaño del hashing)
+
+        Raises:
+            ImportError: Si numpy no está instalado
+        """
+        if np is None:
+            raise ImportError("❌ ERROR: La búsqueda semántica necesita numpy. Instálalo con: pip install numpy")
+
+        super().__init__()
+        self.directory = directory
+        self.dim = dim
+        self._rows: list[typing.Optional[tuple[str, int, str]]] = []   # (ruta, línea, texto) o None si libre
+        self._free: list[int] = []
+        self._file_rows: dict[str, list[int]] = {}
+        self._file_stats: dict[str, tuple[int, int]] = {}
+        self._document_frequency = np.zeros(dim, dtype=np.float64)
+        self._norms: typing.Optional[np.ndarray] = None
+        self._dirty = False
+
+        if directory is not None:
+            directory.mkdir(parents=True, exist_ok=True)
+            self._load()
+        else:
+            self._matrix = self._allocate(1024)
+
+    # --- Persistencia ---
+
+    @property
+    def _matrix_path(self) -> pathlib.Path:
+        return self.directory / "vectors.f32"
+
+    @property
+    def _meta_path(self) -> pathlib.Path:
+        return self.directory / "rows.json"
+
+    @property
+    def _dirty_path(self) -> pathlib.Path:
+        return self.directory / "dirty"
+
+    def _allocate(self, capacity: int) -> "np.ndarray":
+        """Crea (o amplía, conservando las filas) la matriz con `capacity` filas."""
+        if self.directory is None:
+            matrix = np.zeros((capacity, self.dim), dtype=np.float32)
+            if hasattr(self, "_matrix"):
+                matrix[: len(self._matrix)] = self._matrix
+            return matrix
+
+        if hasattr(self, "_matrix"):
+            self._matrix.flush()
+            del self._matrix
+        with open(self._matrix_path, 'ab') as file:
+            file.truncate(capacity * self.dim * 4)
+        return np.memmap(self._matrix_path, dtype=np.float32, mode='r+', shape=(capacity, self.dim))
+
+    def _load(self) -> None:
+        """Carga el índice guardado; si falta, es de otra dimensión o quedó a medias, empieza de cero."""
+        try:
+            if self._dirty_path.exists():
+                raise ValueError("índice a medio escribir")
+            meta = json.loads(self._meta_path.read_text(encoding='utf-8'))
+            if meta["dim"] != self.dim:
+                raise ValueError("dimensión distinta")
+        except (OSError, ValueError, KeyError):
+            self._reset_files()
+            return
+
+        self._rows = [tuple(row) if row is not None else None for row in meta["rows"]]
+        self._file_stats = {path: tuple(stat) for path, stat in meta["files"].items()}
+        capacity = max(1024, len(self._rows))
+        self._matrix = self._allocate(capacity)
+        for index, row in enumerate(self._rows):
+            if row is None:
+                self._free.append(index)
+            else:
+                self._file_rows.setdefault(row[0], []).append(index)
+        if self._rows:
+            self._document_frequency = np.count_nonzero(self._matrix[: len(self._rows)], axis=0).astype(np.float64)
+
+    def _reset_files(self) -> None:
+        for path in (self._meta_path, self._matrix_path):
+            path.unlink(missing_ok=True)
+        self._matrix = self._allocate(1024)
+        self._dirty_path.unlink(missing_ok=True)
+
+    def _mark_dirty(self) -> None:
+        self._norms = None
+        if self.directory is not None and not self._dirty:
+            # Si el proceso muere antes de save(), el siguiente arranque reconstruye
+            self._dirty_path.touch()
+        self._dirty = True
+
+    def save(self) -> None:
+        """Guarda la matriz y los metadatos si hubo cambios desde el último guardado."""
+        with self._lock:
+            if self.directory is None or not self._dirty:
+                return
+            self._matrix.flush()
+            meta = {"dim": self.dim, "rows": self._rows, "files": self._file_stats}
+            temp_path = self._meta_path.with_suffix(".tmp")
+            temp_path.write_text(json.dumps(meta, ensure_ascii=False), encoding='utf-8')
+            os.replace(temp_path, self._meta_path)
+            self._dirty_path.unlink(missing_ok=True)
+            self._dirty = False
+
+    # --- Altas y bajas ---
+
+    def embed(self, text: str) -> "np.ndarray":
+        """Vector TF (sin IDF) de un texto: 1 + log(frecuencia) por rasgo, con signo."""
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for feature, count in _features(text).items():
+            hashed = zlib.crc32(feature.encode('utf-8'))
+            sign = 1.0 if hashed & 0x80000000 else -1.0
+            vector[hashed % self.dim] += sign * (1.0 + math.log(count))
+        return vector
+
+    def _remove_file(self, path: str) -> None:
+        rows = self._file_rows.pop(path, [])
+        if not rows:
+            return
+        self._document_frequency -= np.count_nonzero(self._matrix[rows], axis=0)
+        self._matrix[rows] = 0.0
+        for index in rows:
+            self._rows[index] = None
+        self._free.extend(rows)
+
+    def _add_block(self, path: str, line: int, text: str) -> None:
+        if self._free:
+            index = self._free.pop()
+            self._rows[index] = (path, line, text)
+        else:
+            index = len(self._rows)
+            if index >= len(self._matrix):
+                self._matrix = self._allocate(len(self._matrix) * 2)
+            self._rows.append((path, line, text))
+
+        vector = self.embed(text)
+        self._matrix[index] = vector
+        self._document_frequency += vector != 0
+        self._file_rows.setdefault(path, []).append(index)
+
+    def _known_stats(self, kind: typing.Optional[str]) -> dict[str, tuple[int, int]]:
+        return self._file_stats
+
+    def _stat_of(self, path: str) -> typing.Optional[tuple[int, int]]:
+        return self._file_stats.get(path)
+
+    def _refresh(
+        self,
+        storage: StorageBackend,
+        path: str,
+        kind: typing.Optional[str],
+        stat: typing.Optional[FileStat],
+    ) -> bool:
+        if stat is None:
+            if path not in self._file_stats:
+                return False
+            self._mark_dirty()
+            self._remove_file(path)
+            del self._file_stats[path]
+            return True
+
+        try:
+            content = storage.read_text(pathlib.Path(path))
+        except (IOError, OSError, UnicodeDecodeError):
+            content = ""
+        self._mark_dirty()
+        self._remove_file(path)
+        for block in iter_blocks(content):
+            if block.text:
+                self._add_block(path, block.line, block.text)
+        self._file_stats[path] = (stat.mtime_ns, stat.size)
+        return True
+
+    def sync(
+        self,
+        storage: StorageBackend,
+        directories: typing.Union[typing.Mapping[str, pathlib.Path], typing.Iterable[pathlib.Path]],
+    ) -> int:
+        """Como FileIndex.sync(), y además guarda el índice."""
+        changed = super().sync(storage, directories)
+        self.save()
+        return changed
+
+    # --- Búsqueda ---
+
+    def __len__(self) -> int:
+        return len(self._rows) - len(self._free)
+
+    def search(self, query: str, top_k: int = 5) -> list[VectorHit]:
+        """
+        Devuelve los `top_k` bloques más parecidos a la consulta (similitud del coseno).
+
+        Los bloques sin ningún rasgo en común con la consulta no se devuelven.
+        """
+        query_vector = self.embed(query)
+        with self._lock:
+            row_count = len(self._rows)
+            if row_count == 0 or top_k <= 0:
+                return []
+
+            # IDF suavizado a partir de la frecuencia por posición
+            alive = len(self)
+            idf = (np.log((1.0 + alive) / (1.0 + self._document_frequency)) + 1.0).astype(np.float32)
+            idf_squared = idf * idf
+
+            query_norm = float(np.sqrt(np.dot(query_vector * query_vector, idf_squared)))
+            if query_norm == 0.0:
+                return []
+            weighted_query = query_vector * idf_squared
+
+            # Normas ponderadas de todas las filas; se recalculan solo tras un cambio
+            if self._norms is None or len(self._norms) != row_count:
+                self._norms = np.empty(row_count, dtype=np.float32)
+                for start in range(0, row_count, _SCORE_CHUNK_ROWS):
+                    chunk = self._matrix[start:start + _SCORE_CHUNK_ROWS][: row_count - start]
+                    self._norms[start:start + len(chunk)] = np.sqrt((chunk * chunk) @ idf_squared)
+
+            scores = np.empty(row_count, dtype=np.float32)
+            for start in range(0, row_count, _SCORE_CHUNK_ROWS):
+                chunk = self._matrix[start:start + _SCORE_CHUNK_ROWS][: row_count - start]
+                scores[start:start + len(chunk)] = chunk @ weighted_query
+            with np.errstate(divide='ignore', invalid='ignore'):
+                scores = np.where(self._norms > 0, scores / (self._norms * query_norm), 0.0)
+
+            top_k = min(top_k, row_count)
+            candidates = np.argpartition(-scores, top_k - 1)[:top_k]
+            candidates = candidates[np.argsort(-scores[candidates], kind='stable')]
+
+            hits = []
+            for index in candidates:
+                row = self._rows[index]
+                if row is None or scores[index] <= 0:
+                    continue
+                hits.append(VectorHit(pathlib.Path(row[0]), row[1], row[2], float(scores[index])))
+            return hits
+
+    def close(self) -> None:
+        """Guarda los cambios pendientes."""
+        self.save()
@@ -0,0 +1,241 @@
+"""
+Buffer de escritura diferida (group commit) para ráfagas de añadidos.
+
+Cuando se capturan notas en ráfaga (notas de voz, importaciones), append_to_journal
+se llama decenas de veces por segundo sobre el mismo archivo. AppendBuffer acumula
+los bloques por archivo de destino y los escribe juntos, con una sola operación por
+archivo, cuando:
+
+- los bytes pendientes superan `max_pending_bytes`,
+- pasan `max_delay` segundos desde el primer bloque pendiente,
+- se llama a flush() o close(), o termina el proceso (atexit).
+
+Cada bloque aceptado se registra antes en un log de recuperación de solo añadido
+(una línea JSON por bloque, ya entregada al sistema operativo; con durable=True
+además se hace fsync, para sobrevivir también a un corte de luz). Tras escribir cada
+archivo se añade una marca de confirmación; al vaciarse el buffer por completo, el
+log se trunca. Si el proceso
+muere con bloques pendientes, el siguiente LogseqManager sobre el grafo los reaplica
+con recover_orphan_logs(). Cada buffer tiene su propio log, bloqueado con flock
+mientras vive, así que nunca se recupera el log de un buffer que sigue en marcha.
+"""
+
+import fcntl
+import json
+import os
+import pathlib
+import threading
+import typing
+import uuid
+
+
+# Función que escribe de una vez varios bloques ya formateados al final de un archivo
+AppendWriter = typing.Callable[[pathlib.Path, str], None]
+
+RECOVERY_LOG_PATTERN = "journal-buffer.*.log"
+
+# Log recién creado que todavía no tiene su nombre definitivo (ver AppendBuffer)
+PENDING_LOG_PATTERN = "journal-buffer.*.log.tmp"
+
+
+def _read_log(log_path: pathlib.Path) -> list[tuple[pathlib.Path, str]]:
+    """
+    Devuelve los bloques del log que no tienen marca de confirmación, en orden.
+
+    Una última línea incompleta (el proceso murió mientras escribía) se ignora: ese
+    bloque nunca llegó a confirmarse al llamador.
+    """
+    entries: dict[int, tuple[pathlib.Path, str]] = {}
+    with open(log_path, 'r', encoding='utf-8') as file:
+        for line in file:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if "done" in record:
+                for seq in record["done"]:
+                    entries.pop(seq, None)
+            else:
+                entries[record["seq"]] = (pathlib.Path(record["path"]), record["block"])
+    return [entries[seq] for seq in sorted(entries)]
+
+
+def _group_by_file(entries: typing.Iterable[tuple[pathlib.Path, str]]) -> dict[pathlib.Path, list[str]]:
+    """Agrupa bloques por archivo conservando el orden de llegada dentro de cada uno."""
+    grouped: dict[pathlib.Path, list[str]] = {}
+    for file_path, block in entries:
+        grouped.setdefault(file_path, []).append(block)
+    return grouped
+
+
+def recover_orphan_logs(state_path: pathlib.Path, writer: AppendWriter) -> int:
+    """
+    Reaplica los logs de recuperación abandonados por procesos que terminaron sin vaciarlos.
+
+    Args:
+        state_path: Directorio de estado del grafo (.logseq-agent)
+        writer: Función que añade bloques formateados al final de un archivo
+
+    Returns:
+        int: Número de bloques recuperados
+    """
+    recovered = 0
+    # Un log que no llegó a renombrarse está vacío: si su dueño murió, se borra
+    for pending_path in state_path.glob(PENDING_LOG_PATTERN):
+        with open(pending_path, 'a') as pending_file:
+            try:
+                fcntl.flock(pending_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                continue
+            pending_path.unlink()
+
+    for log_path in sorted(state_path.glob(RECOVERY_LOG_PATTERN)):
+        with open(log_path, 'a+', encoding='utf-8') as log_file:
+            try:
+                fcntl.flock(log_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                # El proceso dueño del log sigue vivo y lo vaciará él mismo
+                continue
+            for file_path, blocks in _group_by_file(_read_log(log_path)).items():
+                writer(file_path, "\n".join(blocks))
+                recovered += len(blocks)
+            log_path.unlink()
+    return recovered
+
+
+class AppendBuffer:
+    """
+    Buffer de añadidos por archivo con log de recuperación y vaciado por tamaño o tiempo.
+
+    Es seguro entre hilos: append() puede llamarse desde varios hilos y el vaciado por
+    tiempo ocurre en un temporizador en segundo plano.
+    """
+
+    def __init__(
+        self,
+        writer: AppendWriter,
+        state_path: typing.Optional[pathlib.Path],
+        max_pending_bytes: int = 64 * 1024,
+        max_delay: float = 0.5,
+        durable: bool = False,
+    ) -> None:
+        """
+        Args:
+            writer: Función que añade bloques formateados al final de un archivo
+            state_path: Directorio donde crear el log de recuperación (None para no
+                llevar log, p. ej. con un almacenamiento en memoria)
+            max_pending_bytes: Bytes pendientes a partir de los cuales se vacía el buffer
+            max_delay: Segundos máximos que un bloque puede esperar en el buffer
+            durable: Si True, hace fsync del log antes de aceptar cada bloque (protege
+                también frente a caídas del sistema, a costa de un fsync por bloque)
+        """
+        self.writer = writer
+        self.max_pending_bytes = max_pending_bytes
+        self.max_delay = max_delay
+        self.durable = durable
+
+        self._lock = threading.RLock()
+        self._pending: dict[pathlib.Path, list[tuple[int, str]]] = {}
+        self._pending_bytes = 0
+        self._next_seq = 0
+        self._timer: typing.Optional[threading.Timer] = None
+        self.flushes = 0
+
+        self.log_path: typing.Optional[pathlib.Path] = None
+        self._log: typing.Optional[typing.TextIO] = None
+        self._closed = False
+        if state_path is not None:
+            state_path.mkdir(parents=True, exist_ok=True)
+            # Un log por buffer, no por proceso: dos gestores del mismo proceso sobre el
+            # mismo grafo no comparten (ni truncan) el log del otro
+            self.log_path = state_path / f"journal-buffer.{os.getpid()}.{uuid.uuid4().hex[:12]}.log"
+            # Mientras el buffer viva, nadie más puede dar este log por abandonado. Se crea
+            # y se bloquea con un nombre que recover_orphan_logs no recoge, y solo después
+            # se renombra: si no, otro proceso podría bloquearlo y borrarlo entre el open y
+            # el flock, y el buffer escribiría en un archivo ya sin nombre
+            pending_path = self.log_path.with_name(f"{self.log_path.name}.tmp")
+            self._log = open(pending_path, 'a', encoding='utf-8')
+            fcntl.flock(self._log.fileno(), fcntl.LOCK_EX)
+            os.rename(pending_path, self.log_path)
+
+    def _log_record(self, record: dict) -> None:
+        if self._log is None:
+            return
+        self._log.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self._log.flush()
+        if self.durable:
+            os.fsync(self._log.fileno())
+
+    def append(self, file_path: pathlib.Path, formatted_block: str) -> None:
+        """
+        Acepta un bloque ya formateado para añadirlo al final de `file_path`.
+
+        Cuando retorna, el bloque está en el log de recuperación: sobrevive a una caída
+        del proceso aunque todavía no se haya escrito en su archivo.
+        """
+        with self._lock:
+            if self._closed:
+                raise ValueError("❌ ERROR: El buffer de escritura ya está cerrado")
+
+            seq = self._next_seq
+            self._next_seq += 1
+            self._log_record({"seq": seq, "path": str(file_path), "block": formatted_block})
+
+            self._pending.setdefault(file_path, []).append((seq, formatted_block))
+            self._pending_bytes += len(formatted_block.encode('utf-8')) + 1
+
+            if self._pending_bytes >= self.max_pending_bytes:
+                self.flush()
+            elif self._timer is None:
+                self._timer = threading.Timer(self.max_delay, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def pending_files(self) -> set[pathlib.Path]:
+        """Archivos con bloques todavía sin escribir."""
+        with self._lock:
+            return set(self._pending)
+
+    def flush(self, file_path: typing.Optional[pathlib.Path] = None) -> None:
+        """
+        Escribe los bloques pendientes: todos, o solo los de `file_path`.
+
+        Cada archivo se escribe con una única llamada a `writer`. Si una escritura falla,
+        sus bloques siguen en el buffer y en el log, y la excepción se propaga.
+        """
+        with self._lock:
+            targets = [file_path] if file_path is not None else list(self._pending)
+            try:
+                for target in targets:
+                    entries = self._pending.get(target)
+                    if not entries:
+                        continue
+                    self.writer(target, "\n".join(block for _, block in entries))
+                    del self._pending[target]
+                    self._pending_bytes -= sum(len(block.encode('utf-8')) + 1 for _, block in entries)
+                    self._log_record({"done": [seq for seq, _ in entries]})
+                    self.flushes += 1
+            finally:
+                # Si la escritura falla en el temporizador, ese temporizador ya venció: sin
+                # soltarlo, ningún append posterior programaría otro vaciado
+                if self._timer is not None and (not self._pending or threading.current_thread() is self._timer):
+                    self._timer.cancel()
+                    self._timer = None
+
+            if not self._pending:
+                self._pending_bytes = 0
+                # Todo lo registrado está ya escrito: el log puede empezar de cero
+                if self._log is not None:
+                    self._log.truncate(0)
+                    self._log.seek(0)
+
+    def close(self) -> None:
+        """Vacía el buffer y elimina el log de recuperación."""
+        with self._lock:
+            if self._closed:
+                return
+            self.flush()
+            self._closed = True
+            if self._log is not None:
+                self._log.close()
+                self.log_path.unlink(missing_ok=True)
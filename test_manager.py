@@ -1,8 +1,16 @@
+import multiprocessing
 import os
+import pathlib
 import sys
+import tempfile
+import threading
+import time
 from datetime import date
 from dotenv import load_dotenv
+from src.context_builder import estimate_tokens
 from src.logseq_manager import LogseqManager
+from src.storage import MemoryStorage
+from src.title_registry import AmbiguousPageTitleError
 
 # Constantes para pruebas
 TEST_CREATE_PAGE_NAME = "página-de-prueba-para-borrar"
@@ -20,6 +28,30 @@ TEST_DELETE_EMPTY_PAGE_NAME = "página-vacía-para-eliminar"
 TEST_DELETE_MULTIPLE_PAGE_NAME = "página-con-bloques-duplicados-eliminar"
 TEST_DELETE_JOURNAL_NAME = "2025_01_15"  # Journal de prueba para tests de eliminación
 TEST_DELETE_JOURNAL_EMPTY_NAME = "2025_01_16"  # Journal vacío para tests
+TEST_BATCH_PAGE_NAME = "página-para-lotes"
+TEST_BATCH_JOURNAL_NAME = "2025_01_17"  # Journal de prueba para lotes
+TEST_CONCURRENCY_PAGE_NAME = "página-para-concurrencia"
+TEST_BUFFER_JOURNAL_NAME = "2025_01_18"  # Journal de prueba para el buffer de escritura
+
+
+def _memory_manager(graph_name, files=None, **options):
+    """
+    Crea un LogseqManager sobre un grafo en memoria, para las pruebas que no deben
+    dejar archivos en el grafo de pruebas.
+    
+    Args:
+        graph_name: Nombre del grafo, que se monta en /grafo-<nombre>
+        files: Archivos iniciales, como {"pages/Tareas.md": "- TODO Pan"}
+        **options: Argumentos adicionales de LogseqManager
+    
+    Returns:
+        LogseqManager: Gestor del grafo; su almacenamiento está en .storage
+    """
+    graph_path = pathlib.Path(f"/grafo-{graph_name}")
+    storage = MemoryStorage.with_graph(graph_path)
+    for relative_path, content in (files or {}).items():
+        storage.write_text(graph_path / relative_path, content)
+    return LogseqManager(str(graph_path), storage=storage, **options)
 
 
 def run_write_tests(manager):
@@ -1024,6 +1056,2031 @@ def run_delete_journal_tests(manager):
     return journal_delete_tests_passed, total_journal_delete_tests
 
 
+def run_batch_tests(manager):
+    """
+    Ejecuta pruebas para apply_page_batch del LogseqManager (varias escrituras
+    sobre un mismo archivo con una sola lectura y una sola escritura).
+    Incluye limpieza automática de archivos de prueba.
+    """
+    print("\n=== Pruebas de apply_page_batch ===")
+    
+    batch_tests_passed = 0
+    total_batch_tests = 5  # Total de pruebas de lotes
+    
+    try:
+        # === PRUEBA 1: Crear página nueva con varios bloques a la vez ===
+        print(f"📝 Prueba 1: Crear '{TEST_BATCH_PAGE_NAME}' con tres bloques en un lote...")
+        results = manager.apply_page_batch(TEST_BATCH_PAGE_NAME, appends=["TODO Leche", "TODO Pan", "TODO Huevos"])
+        content = manager.read_page_content(TEST_BATCH_PAGE_NAME)
+        expected = "- TODO Leche\n- TODO Pan\n- TODO Huevos"
+        if results == [True, True, True] and content == expected:
+            batch_tests_passed += 1
+            print(f"   ✅ ÉXITO: Página creada con los tres bloques")
+        else:
+            print(f"   ❌ FALLO: Resultado {results}, contenido {repr(content)}")
+        
+        # === PRUEBA 2: Ediciones y añadidos en el mismo lote ===
+        print(f"📝 Prueba 2: Marcar hecha, borrar y añadir en un solo lote...")
+        results = manager.apply_page_batch(
+            TEST_BATCH_PAGE_NAME,
+            appends=["TODO Café"],
+            edits=[("TODO Pan", "DONE Pan"), ("TODO Huevos", None)]
+        )
+        content = manager.read_page_content(TEST_BATCH_PAGE_NAME)
+        expected = "- TODO Leche\n- DONE Pan\n- TODO Café"
+        if results == [True, True, True] and content == expected:
+            batch_tests_passed += 1
+            print(f"   ✅ ÉXITO: Contenido correcto: {repr(content)}")
+        else:
+            print(f"   ❌ FALLO: Resultado {results}, contenido {repr(content)}")
+        
+        # === PRUEBA 3: Edición inexistente no modifica el archivo ===
+        print(f"📝 Prueba 3: Edición de un bloque inexistente...")
+        results = manager.apply_page_batch(TEST_BATCH_PAGE_NAME, edits=[("NO EXISTE", "X")])
+        if results == [False] and manager.read_page_content(TEST_BATCH_PAGE_NAME) == expected:
+            batch_tests_passed += 1
+            print(f"   ✅ ÉXITO: Devolvió [False] sin tocar el archivo")
+        else:
+            print(f"   ❌ FALLO: Resultado {results}")
+        
+        # === PRUEBA 4: Operaciones en orden y borrado de todo el contenido ===
+        print(f"📝 Prueba 4: Añadir una tarea y marcarla hecha en el mismo lote tras vaciar la página...")
+        results = manager.apply_page_batch(
+            TEST_BATCH_PAGE_NAME,
+            operations=[("TODO Leche", None), ("DONE Pan", None), ("TODO Café", None), "TODO Té", ("TODO Té", "DONE Té")],
+        )
+        content = manager.read_page_content(TEST_BATCH_PAGE_NAME)
+        if results == [True] * 5 and content == "- DONE Té":
+            batch_tests_passed += 1
+            print(f"   ✅ ÉXITO: Operaciones aplicadas en orden y sin línea vacía inicial")
+        else:
+            print(f"   ❌ FALLO: Resultado {results}, contenido {repr(content)}")
+        
+        # === PRUEBA 5: Lote sobre un diario ===
+        print(f"📅 Prueba 5: Lote sobre el diario '{TEST_BATCH_JOURNAL_NAME}'...")
+        manager.apply_page_batch(TEST_BATCH_JOURNAL_NAME, appends=["Fui al súper"], is_journal=True)
+        manager.apply_page_batch(TEST_BATCH_JOURNAL_NAME, appends=["Compré pan"], is_journal=True)
+        journal_content = (manager.journals_path / f"{TEST_BATCH_JOURNAL_NAME}.md").read_text(encoding='utf-8')
+        if journal_content == "- Fui al súper\n- Compré pan":
+            batch_tests_passed += 1
+            print(f"   ✅ ÉXITO: Diario correcto: {repr(journal_content)}")
+        else:
+            print(f"   ❌ FALLO: Contenido del diario {repr(journal_content)}")
+    
+    except Exception as e:
+        print(f"   ❌ ERROR durante las pruebas de lotes: {e}")
+    
+    finally:
+        # === LIMPIEZA ===
+        print(f"\n🧹 Limpiando archivos de prueba de lotes...")
+        for file_path in [manager._get_page_path(TEST_BATCH_PAGE_NAME), manager.journals_path / f"{TEST_BATCH_JOURNAL_NAME}.md"]:
+            if file_path.exists():
+                try:
+                    file_path.unlink()
+                    print(f"   ✅ Archivo eliminado: {file_path}")
+                except Exception as e:
+                    print(f"   ⚠️ No se pudo eliminar {file_path}: {e}")
+    
+    # Imprimir resumen de pruebas de lotes
+    print(f"\n=== RESUMEN DE PRUEBAS DE LOTES ===")
+    print(f"🎯 Pruebas de lotes: {batch_tests_passed}/{total_batch_tests} pasaron")
+    
+    return batch_tests_passed, total_batch_tests
+
+
+def _concurrent_writer(graph_path, worker_id, iterations):
+    """
+    Proceso de la prueba de concurrencia: mezcla prepends, appends y actualizaciones
+    sobre la misma página. Devuelve los contadores de locks de su LogseqManager.
+    """
+    worker_manager = LogseqManager(graph_path)
+    for i in range(iterations):
+        worker_manager.prepend_to_page(TEST_CONCURRENCY_PAGE_NAME, f"P{worker_id}-{i}")
+        worker_manager.append_to_page(TEST_CONCURRENCY_PAGE_NAME, f"A{worker_id}-{i}")
+    worker_manager.update_block_in_page(TEST_CONCURRENCY_PAGE_NAME, f"TODO W{worker_id}", f"DONE W{worker_id}")
+    return worker_manager.lock_stats.as_dict()
+
+
+def run_concurrency_tests(manager):
+    """
+    Ejecuta pruebas de escrituras concurrentes desde varios procesos sobre la misma
+    página (locks entre procesos y escrituras con comparación de versión).
+    Incluye limpieza automática de archivos de prueba.
+    """
+    print("\n=== Pruebas de concurrencia entre procesos ===")
+    
+    concurrency_tests_passed = 0
+    total_concurrency_tests = 2  # Total de pruebas de concurrencia
+    workers = 4
+    iterations = 15
+    page_path = manager._get_page_path(TEST_CONCURRENCY_PAGE_NAME)
+    
+    try:
+        # Preparar una tarea por proceso para las actualizaciones
+        manager.create_page(TEST_CONCURRENCY_PAGE_NAME, "\n".join(f"- TODO W{w}" for w in range(workers)))
+        
+        # === PRUEBA 1: Ninguna escritura se pierde ===
+        print(f"📝 Prueba 1: {workers} procesos × {iterations} prepends + appends + 1 actualización...")
+        with multiprocessing.Pool(workers) as pool:
+            stats = pool.starmap(
+                _concurrent_writer,
+                [(str(manager.graph_path), w, iterations) for w in range(workers)]
+            )
+        
+        blocks = manager.read_page_content(TEST_CONCURRENCY_PAGE_NAME).splitlines()
+        expected = {f"- {kind}{w}-{i}" for kind in "PA" for w in range(workers) for i in range(iterations)}
+        expected |= {f"- DONE W{w}" for w in range(workers)}
+        if len(blocks) == len(expected) and set(blocks) == expected:
+            concurrency_tests_passed += 1
+            print(f"   ✅ ÉXITO: Los {len(expected)} bloques están presentes exactamente una vez")
+        else:
+            missing = expected - set(blocks)
+            print(f"   ❌ FALLO: {len(blocks)} líneas, {len(missing)} bloques perdidos (ej: {sorted(missing)[:3]})")
+        
+        # === PRUEBA 2: Conflictos detectados y reintentados sin fallos ===
+        conflicts = sum(s["conflicts"] for s in stats)
+        failures = sum(s["failures"] for s in stats)
+        wait_max = max(s["wait_ms_max"] for s in stats)
+        print(f"📝 Prueba 2: Contadores de locks: {conflicts} conflictos reintentados, {failures} fallos, espera máxima {wait_max:.1f} ms")
+        if failures == 0:
+            concurrency_tests_passed += 1
+            print(f"   ✅ ÉXITO: Todas las escrituras se aplicaron sin agotar los reintentos")
+        else:
+            print(f"   ❌ FALLO: {failures} escrituras agotaron los reintentos")
+    
+    except Exception as e:
+        print(f"   ❌ ERROR durante las pruebas de concurrencia: {e}")
+    
+    finally:
+        # === LIMPIEZA ===
+        print(f"\n🧹 Limpiando archivos de prueba de concurrencia...")
+        if page_path.exists():
+            try:
+                page_path.unlink()
+                print(f"   ✅ Archivo eliminado: {page_path}")
+            except Exception as e:
+                print(f"   ⚠️ No se pudo eliminar {page_path}: {e}")
+    
+    # Imprimir resumen de pruebas de concurrencia
+    print(f"\n=== RESUMEN DE PRUEBAS DE CONCURRENCIA ===")
+    print(f"🎯 Pruebas de concurrencia: {concurrency_tests_passed}/{total_concurrency_tests} pasaron")
+    
+    return concurrency_tests_passed, total_concurrency_tests
+
+
+def _crashing_buffered_writer(graph_path, blocks):
+    """
+    Proceso de la prueba de recuperación: acepta bloques en el buffer y muere sin
+    vaciarlo (os._exit no ejecuta los manejadores de atexit).
+    """
+    worker_manager = LogseqManager(graph_path, buffer_journal_appends=True)
+    worker_manager.journal_buffer.max_delay = 3600
+    for block in blocks:
+        worker_manager.append_to_journal(block, target_date=date(2025, 1, 18))
+    os._exit(0)
+
+
+def run_journal_buffer_tests(manager):
+    """
+    Ejecuta pruebas del buffer de escritura diferida de append_to_journal
+    (agrupación de añadidos, vaciado por tamaño y recuperación tras una caída).
+    Incluye limpieza automática de archivos de prueba.
+    """
+    print("\n=== Pruebas del buffer de escritura del diario ===")
+    
+    buffer_tests_passed = 0
+    total_buffer_tests = 5  # Total de pruebas del buffer
+    journal_path = manager.journals_path / f"{TEST_BUFFER_JOURNAL_NAME}.md"
+    buffered_manager = LogseqManager(str(manager.graph_path), buffer_journal_appends=True)
+    buffered_manager.journal_buffer.max_delay = 3600  # Solo vaciados explícitos o por tamaño
+    
+    try:
+        # === PRUEBA 1: Una ráfaga de añadidos se escribe de una sola vez ===
+        print(f"📝 Prueba 1: 50 añadidos al diario '{TEST_BUFFER_JOURNAL_NAME}' con buffer...")
+        for i in range(50):
+            buffered_manager.append_to_journal(f"Nota {i}", target_date=date(2025, 1, 18))
+        written_before_flush = journal_path.exists()
+        buffered_manager.flush()
+        expected = "\n".join(f"- Nota {i}" for i in range(50))
+        content = journal_path.read_text(encoding='utf-8')
+        if not written_before_flush and content == expected and buffered_manager.journal_buffer.flushes == 1:
+            buffer_tests_passed += 1
+            print(f"   ✅ ÉXITO: 50 bloques escritos en orden con una sola escritura")
+        else:
+            print(f"   ❌ FALLO: Escrito antes del flush: {written_before_flush}, escrituras: {buffered_manager.journal_buffer.flushes}")
+        
+        # === PRUEBA 2: Vaciado automático al superar el tamaño máximo ===
+        print(f"📝 Prueba 2: Vaciado automático por tamaño...")
+        buffered_manager.journal_buffer.max_pending_bytes = 40
+        buffered_manager.append_to_journal("Bloque corto", target_date=date(2025, 1, 18))
+        pending_after_small = bool(buffered_manager.journal_buffer.pending_files())
+        buffered_manager.append_to_journal("Un bloque bastante más largo que el límite", target_date=date(2025, 1, 18))
+        content = journal_path.read_text(encoding='utf-8')
+        if pending_after_small and not buffered_manager.journal_buffer.pending_files() and content.endswith("- Bloque corto\n- Un bloque bastante más largo que el límite"):
+            buffer_tests_passed += 1
+            print(f"   ✅ ÉXITO: El buffer se vació solo al superar {buffered_manager.journal_buffer.max_pending_bytes} bytes")
+        else:
+            print(f"   ❌ FALLO: Pendientes: {buffered_manager.journal_buffer.pending_files()}")
+        
+        # === PRUEBA 3: Recuperación de bloques aceptados antes de una caída ===
+        print(f"📝 Prueba 3: Recuperación tras la caída de un proceso con bloques en el buffer...")
+        journal_path.unlink()
+        crashed = multiprocessing.Process(
+            target=_crashing_buffered_writer,
+            args=(str(manager.graph_path), ["Antes de la caída 1", "Antes de la caída 2"])
+        )
+        crashed.start()
+        crashed.join()
+        written_by_crashed = journal_path.exists()
+        LogseqManager(str(manager.graph_path))  # Al crearse reaplica los logs abandonados
+        content = journal_path.read_text(encoding='utf-8') if journal_path.exists() else None
+        orphan_logs = list(manager.state_path.glob("journal-buffer.*.log"))
+        own_log = buffered_manager.journal_buffer.log_path
+        if not written_by_crashed and content == "- Antes de la caída 1\n- Antes de la caída 2" and orphan_logs == [own_log]:
+            buffer_tests_passed += 1
+            print(f"   ✅ ÉXITO: Bloques recuperados del log: {repr(content)}")
+        else:
+            print(f"   ❌ FALLO: Contenido {repr(content)}, logs restantes {orphan_logs}")
+        
+        # === PRUEBA 4: Dos gestores con buffer sobre el mismo grafo en un proceso ===
+        print(f"📝 Prueba 4: Segundo gestor con buffer en el mismo proceso (sin bloquearse)...")
+        second_manager = LogseqManager(str(manager.graph_path), buffer_journal_appends=True)
+        try:
+            second_manager.append_to_journal("Del segundo gestor", target_date=date(2025, 1, 18))
+            buffered_manager.append_to_journal("Del primer gestor", target_date=date(2025, 1, 18))
+            second_manager.flush()
+            buffered_manager.flush()
+            separate_logs = second_manager.journal_buffer.log_path != buffered_manager.journal_buffer.log_path
+        finally:
+            second_manager.journal_buffer.close()
+        content = journal_path.read_text(encoding='utf-8')
+        pending_logs = list(manager.state_path.glob("journal-buffer.*.log.tmp"))
+        if separate_logs and not pending_logs and content.endswith("- Del segundo gestor\n- Del primer gestor"):
+            buffer_tests_passed += 1
+            print(f"   ✅ ÉXITO: Cada gestor usa su propio log de recuperación")
+        else:
+            print(f"   ❌ FALLO: Logs distintos: {separate_logs}, sin renombrar {pending_logs}, contenido {repr(content)}")
+        
+        # === PRUEBA 5: Un fallo al vaciar desde el temporizador no detiene los siguientes ===
+        print(f"📝 Prueba 5: Vaciado por tiempo tras una escritura fallida...")
+        from src.write_buffer import AppendBuffer
+        written = []
+        
+        def flaky_writer(file_path, text):
+            if not written:
+                written.append(None)
+                raise OSError("disco lleno")
+            written.append(text)
+        
+        excepthook = threading.excepthook
+        threading.excepthook = lambda args: None  # El fallo del temporizador es el esperado
+        try:
+            with tempfile.TemporaryDirectory() as temp_dir:
+                buffer = AppendBuffer(flaky_writer, pathlib.Path(temp_dir), max_delay=0.05)
+                target = pathlib.Path(temp_dir) / "diario.md"
+                buffer.append(target, "- Primero")
+                time.sleep(0.3)
+                buffer.append(target, "- Segundo")
+                time.sleep(0.3)
+                pending = buffer.pending_files()
+                buffer.close()
+        finally:
+            threading.excepthook = excepthook
+        if written == [None, "- Primero\n- Segundo"] and not pending:
+            buffer_tests_passed += 1
+            print(f"   ✅ ÉXITO: El siguiente añadido programó otro vaciado y se escribieron los dos bloques")
+        else:
+            print(f"   ❌ FALLO: Escrituras {written}, pendientes {pending}")
+    
+    except Exception as e:
+        print(f"   ❌ ERROR durante las pruebas del buffer: {e}")
+    
+    finally:
+        # === LIMPIEZA ===
+        print(f"\n🧹 Limpiando archivos de prueba del buffer...")
+        buffered_manager.journal_buffer.close()
+        if journal_path.exists():
+            try:
+                journal_path.unlink()
+                print(f"   ✅ Archivo eliminado: {journal_path}")
+            except Exception as e:
+                print(f"   ⚠️ No se pudo eliminar {journal_path}: {e}")
+    
+    # Imprimir resumen de pruebas del buffer
+    print(f"\n=== RESUMEN DE PRUEBAS DEL BUFFER DE ESCRITURA ===")
+    print(f"🎯 Pruebas del buffer: {buffer_tests_passed}/{total_buffer_tests} pasaron")
+    
+    return buffer_tests_passed, total_buffer_tests
+
+
+def _storage_scenario(storage_manager):
+    """
+    Secuencia de operaciones de la prueba de backends: se ejecuta igual sobre disco
+    y sobre memoria. Devuelve los resultados de las operaciones que retornan algo.
+    """
+    storage_manager.create_page("Proyectos/Agente", "- Idea inicial")
+    storage_manager.append_to_page("Proyectos/Agente", "TODO Escribir tests")
+    storage_manager.prepend_to_page("Proyectos/Agente", "Resumen")
+    storage_manager.append_to_page("Compras", "Leche")
+    storage_manager.append_to_journal("Reunión", target_date=date(2025, 1, 19))
+    return [
+        storage_manager.update_block_in_page("Proyectos/Agente", "TODO Escribir tests", "DONE Escribir tests"),
+        storage_manager.delete_block_from_page("Compras", "Leche"),
+        storage_manager.apply_page_batch("2025_01_19", appends=["Cena"], edits=[("Reunión", "Reunión movida")], is_journal=True),
+        storage_manager.find_block_in_page("Proyectos/Agente", "Resumen"),
+        storage_manager.search_in_pages("escribir"),
+        storage_manager.read_page_content("Proyectos/Agente"),
+    ]
+
+
+def run_storage_tests(manager):
+    """
+    Ejecuta pruebas de los backends de almacenamiento: LogseqManager debe comportarse
+    igual sobre el sistema de archivos y sobre MemoryStorage.
+    Trabaja en un grafo temporal, así que no deja archivos en el grafo de pruebas.
+    """
+    print("\n=== Pruebas de backends de almacenamiento ===")
+    
+    storage_tests_passed = 0
+    total_storage_tests = 3  # Total de pruebas de almacenamiento
+    
+    try:
+        with tempfile.TemporaryDirectory() as temp_dir:
+            disk_graph = pathlib.Path(temp_dir) / "grafo"
+            (disk_graph / "pages").mkdir(parents=True)
+            (disk_graph / "journals").mkdir()
+            memory_graph = pathlib.Path(temp_dir) / "grafo-en-memoria"
+            
+            disk_manager = LogseqManager(str(disk_graph))
+            memory_storage = MemoryStorage.with_graph(memory_graph)
+            memory_manager = LogseqManager(str(memory_graph), storage=memory_storage)
+            
+            # === PRUEBA 1: Mismos resultados en disco y en memoria ===
+            print(f"📝 Prueba 1: La misma secuencia de operaciones en disco y en memoria...")
+            disk_results = _storage_scenario(disk_manager)
+            memory_results = _storage_scenario(memory_manager)
+            disk_files = {
+                path.relative_to(disk_graph).as_posix(): path.read_text(encoding='utf-8')
+                for folder in ("pages", "journals") for path in sorted((disk_graph / folder).glob("*.md"))
+            }
+            memory_files = {
+                path.relative_to(memory_graph).as_posix(): memory_storage.read_text(path)
+                for folder in ("pages", "journals") for path in memory_storage.list_files(memory_graph / folder, "*.md")
+            }
+            if disk_results == memory_results and disk_files == memory_files:
+                storage_tests_passed += 1
+                print(f"   ✅ ÉXITO: {len(disk_files)} archivos idénticos y mismos resultados")
+            else:
+                print(f"   ❌ FALLO: Resultados {disk_results} vs {memory_results}")
+            
+            # === PRUEBA 2: El backend en memoria no toca el disco ===
+            print(f"📝 Prueba 2: El grafo en memoria no existe en disco...")
+            if not memory_graph.exists():
+                storage_tests_passed += 1
+                print(f"   ✅ ÉXITO: No se creó nada en {memory_graph}")
+            else:
+                print(f"   ❌ FALLO: Se escribió en disco: {list(memory_graph.rglob('*'))}")
+            
+            # === PRUEBA 3: Cargar un grafo de disco en memoria ===
+            print(f"📝 Prueba 3: MemoryStorage.from_directory sobre el grafo de prueba...")
+            loaded_manager = LogseqManager(str(manager.graph_path), storage=MemoryStorage.from_directory(manager.graph_path))
+            if loaded_manager.search_in_pages("promo") == sorted(manager.search_in_pages("promo")):
+                storage_tests_passed += 1
+                print(f"   ✅ ÉXITO: La búsqueda en memoria coincide con la de disco")
+            else:
+                print(f"   ❌ FALLO: {loaded_manager.search_in_pages('promo')} vs {manager.search_in_pages('promo')}")
+    
+    except Exception as e:
+        print(f"   ❌ ERROR durante las pruebas de almacenamiento: {e}")
+    
+    # Imprimir resumen de pruebas de almacenamiento
+    print(f"\n=== RESUMEN DE PRUEBAS DE ALMACENAMIENTO ===")
+    print(f"🎯 Pruebas de almacenamiento: {storage_tests_passed}/{total_storage_tests} pasaron")
+    
+    return storage_tests_passed, total_storage_tests
+
+
+def run_sqlite_index_tests(manager):
+    """
+    Ejecuta pruebas del índice SQLite FTS5: mismos resultados que el recorrido de
+    archivos, sincronización incremental y consultas de bloques.
+    Trabaja en un grafo temporal, así que no deja archivos en el grafo de pruebas.
+    """
+    print("\n=== Pruebas del índice SQLite ===")
+    
+    index_tests_passed = 0
+    total_index_tests = 4  # Total de pruebas del índice
+    
+    try:
+        with tempfile.TemporaryDirectory() as temp_dir:
+            graph = pathlib.Path(temp_dir)
+            (graph / "pages").mkdir()
+            (graph / "journals").mkdir()
+            (graph / "pages" / "Música.md").write_text("- Mi CANCIÓN favorita\n- Otra canción", encoding='utf-8')
+            (graph / "pages" / "Proyectos__Agente.md").write_text("- TODO Escribir tests\n  - Reunión con Ana", encoding='utf-8')
+            (graph / "pages" / "Compras.md").write_text("- Leche\n- Pan de centeno", encoding='utf-8')
+            (graph / "journals" / "2025_01_20.md").write_text("- Reunión con Luis", encoding='utf-8')
+            
+            scan_manager = LogseqManager(str(graph))
+            index_manager = LogseqManager(str(graph), sqlite_index=True)
+            queries = ["canción", "CANCIÓN", "an", "e", "pan de", "reunión con", "__", "inexistente", "- "]
+            
+            # === PRUEBA 1: Resultados idénticos al recorrido de archivos ===
+            print(f"📝 Prueba 1: {len(queries)} búsquedas con índice y sin índice...")
+            mismatches = [q for q in queries if index_manager.search_in_pages(q) != sorted(scan_manager.search_in_pages(q))]
+            blocks = [("Música", "Otra canción"), ("Proyectos/Agente", "Reunión con Ana"), ("Compras", "Leche "), ("Compras", "Pan")]
+            mismatches += [b for b in blocks if index_manager.find_block_in_page(*b) != scan_manager.find_block_in_page(*b)]
+            if not mismatches:
+                index_tests_passed += 1
+                print(f"   ✅ ÉXITO: Mismos resultados en todas las búsquedas y bloques")
+            else:
+                print(f"   ❌ FALLO: Resultados distintos para {mismatches}")
+            
+            # === PRUEBA 2: Sincronización incremental con cambios externos ===
+            print(f"📝 Prueba 2: Cambios hechos fuera del gestor...")
+            (graph / "pages" / "Compras.md").write_text("- Leche\n- Huevos camperos", encoding='utf-8')
+            os.utime(graph / "pages" / "Compras.md", ns=(1, 1))  # mtime distinto aunque el reloj no avance
+            (graph / "pages" / "Música.md").unlink()
+            if index_manager.search_in_pages("camperos") == ["Compras"] and index_manager.search_in_pages("canción") == []:
+                index_tests_passed += 1
+                print(f"   ✅ ÉXITO: El índice refleja la edición y el borrado")
+            else:
+                print(f"   ❌ FALLO: {index_manager.search_in_pages('camperos')}, {index_manager.search_in_pages('canción')}")
+            
+            # === PRUEBA 3: Escrituras propias indexadas al momento ===
+            print(f"📝 Prueba 3: Escrituras del gestor sin esperar a la sincronización...")
+            index_manager.index_sync_interval = 3600
+            index_manager.append_to_page("Compras", "Café de Colombia")
+            index_manager.update_block_in_page("Compras", "Leche", "Leche de avena")
+            if index_manager.search_in_pages("colombia") == ["Compras"] and index_manager.find_block_in_page("Compras", "Leche de avena"):
+                index_tests_passed += 1
+                print(f"   ✅ ÉXITO: Los cambios propios ya están en el índice")
+            else:
+                print(f"   ❌ FALLO: {index_manager.search_in_pages('colombia')}")
+            
+            # === PRUEBA 4: Consultas de bloques con prefijos, frases y operadores ===
+            print(f"📝 Prueba 4: search_blocks con prefijo, frase y operadores...")
+            results = {
+                "reun*": sorted(index_manager.search_blocks("reun*")),
+                '"leche de avena"': index_manager.search_blocks('"leche de avena"'),
+                "reunion NOT ana": index_manager.search_blocks("reunion NOT ana"),
+            }
+            expected = {
+                "reun*": [("2025_01_20", "Reunión con Luis"), ("Proyectos/Agente", "Reunión con Ana")],
+                '"leche de avena"': [("Compras", "Leche de avena")],
+                "reunion NOT ana": [("2025_01_20", "Reunión con Luis")],
+            }
+            if results == expected:
+                index_tests_passed += 1
+                print(f"   ✅ ÉXITO: Las tres consultas devuelven los bloques esperados")
+            else:
+                print(f"   ❌ FALLO: {results}")
+            index_manager.sqlite_index.close()
+    
+    except Exception as e:
+        print(f"   ❌ ERROR durante las pruebas del índice: {e}")
+    
+    # Imprimir resumen de pruebas del índice
+    print(f"\n=== RESUMEN DE PRUEBAS DEL ÍNDICE SQLITE ===")
+    print(f"🎯 Pruebas del índice SQLite: {index_tests_passed}/{total_index_tests} pasaron")
+    
+    return index_tests_passed, total_index_tests
+
+
+def run_semantic_search_tests(manager):
+    """
+    Ejecuta pruebas de la búsqueda semántica por bloques (índice vectorial local):
+    relevancia, actualización incremental, persistencia entre arranques y búsquedas
+    concurrentes con las escrituras.
+    Trabaja en un grafo temporal, así que no deja archivos en el grafo de pruebas.
+    """
+    print("\n=== Pruebas de búsqueda semántica ===")
+    
+    semantic_tests_passed = 0
+    total_semantic_tests = 4  # Total de pruebas de búsqueda semántica
+    
+    try:
+        with tempfile.TemporaryDirectory() as temp_dir:
+            graph = pathlib.Path(temp_dir)
+            (graph / "pages").mkdir()
+            (graph / "journals").mkdir()
+            (graph / "pages" / "Agenda.md").write_text("- Reunión de equipo el lunes\n- Dentista el martes", encoding='utf-8')
+            (graph / "pages" / "Recetas.md").write_text("- Tortilla de patatas con cebolla\n- Gazpacho andaluz", encoding='utf-8')
+            (graph / "journals" / "2025_01_21.md").write_text("- Preparar las reuniones del equipo de producto", encoding='utf-8')
+            
+            semantic_manager = LogseqManager(str(graph))
+            
+            # === PRUEBA 1: Los bloques relevantes aparecen primero ===
+            print(f"📝 Prueba 1: Buscar 'reuniones con el equipo'...")
+            results = semantic_manager.semantic_search("reuniones con el equipo", top_k=2)
+            found = {(title, block) for title, block, _ in results}
+            expected = {("Agenda", "Reunión de equipo el lunes"), ("2025_01_21", "Preparar las reuniones del equipo de producto")}
+            if found == expected:
+                semantic_tests_passed += 1
+                print(f"   ✅ ÉXITO: {results}")
+            else:
+                print(f"   ❌ FALLO: {results}")
+            
+            # === PRUEBA 2: Cambios incrementales tras escrituras del gestor ===
+            print(f"📝 Prueba 2: Añadir y borrar bloques...")
+            semantic_manager.append_to_page("Recetas", "Paella valenciana de marisco")
+            semantic_manager.delete_block_from_page("Agenda", "Reunión de equipo el lunes")
+            top_paella = semantic_manager.semantic_search("paella", top_k=1)
+            reunion_titles = [title for title, _, _ in semantic_manager.semantic_search("reunión equipo")]
+            if top_paella and top_paella[0][1] == "Paella valenciana de marisco" and "Agenda" not in reunion_titles:
+                semantic_tests_passed += 1
+                print(f"   ✅ ÉXITO: Índice actualizado ({len(semantic_manager.vector_index)} bloques)")
+            else:
+                print(f"   ❌ FALLO: {top_paella}, {reunion_titles}")
+            
+            # === PRUEBA 3: Persistencia entre arranques sin reindexar ===
+            print(f"📝 Prueba 3: Reabrir el índice guardado en disco...")
+            semantic_manager.vector_index.close()
+            reopened_manager = LogseqManager(str(graph))
+            reopened_manager.enable_vector_index()
+            changed = reopened_manager.vector_index.sync(reopened_manager.storage, [reopened_manager.pages_path, reopened_manager.journals_path])
+            if changed == 0 and reopened_manager.semantic_search("paella", top_k=1) == top_paella:
+                semantic_tests_passed += 1
+                print(f"   ✅ ÉXITO: Mismos resultados sin reindexar ningún archivo")
+            else:
+                print(f"   ❌ FALLO: {changed} archivos reindexados")
+        
+        # === PRUEBA 4: Búsquedas mientras otro hilo actualiza el índice ===
+        # Es lo que pasa cuando el temporizador del buffer de diario escribe
+        print(f"📝 Prueba 4: Buscar mientras otro hilo escribe...")
+        # Con miles de bloques cada búsqueda dura lo bastante para cruzarse con las escrituras
+        base_blocks = "\n".join(f"- Nota {number} sobre el equipo" for number in range(4000))
+        concurrent_manager = _memory_manager("vectores", {"pages/Base.md": base_blocks, "pages/Notas.md": "- Nota inicial"})
+        concurrent_manager.enable_vector_index()
+        search_errors = []
+        writing = threading.Event()
+        writing.set()
+        
+        def search_while_writing():
+            while writing.is_set():
+                try:
+                    concurrent_manager.vector_index.search("nota del equipo", top_k=3)
+                except Exception as e:
+                    search_errors.append(e)
+                    return
+        
+        searcher = threading.Thread(target=search_while_writing)
+        searcher.start()
+        for number in range(200):
+            concurrent_manager.append_to_page("Notas", f"Nota {number} del equipo de producto")
+        writing.clear()
+        searcher.join()
+        if not search_errors and len(concurrent_manager.vector_index) == 4201:
+            semantic_tests_passed += 1
+            print(f"   ✅ ÉXITO: 200 escrituras sin errores en las búsquedas concurrentes")
+        else:
+            print(f"   ❌ FALLO: {search_errors[:1]}, {len(concurrent_manager.vector_index)} bloques")
+    
+    except ImportError as e:
+        print(f"   ⚠️ Búsqueda semántica no disponible: {e}")
+    except Exception as e:
+        print(f"   ❌ ERROR durante las pruebas de búsqueda semántica: {e}")
+    
+    # Imprimir resumen de pruebas de búsqueda semántica
+    print(f"\n=== RESUMEN DE PRUEBAS DE BÚSQUEDA SEMÁNTICA ===")
+    print(f"🎯 Pruebas de búsqueda semántica: {semantic_tests_passed}/{total_semantic_tests} pasaron")
+    
+    return semantic_tests_passed, total_semantic_tests
+
+
+def run_context_tests(manager):
+    """
+    Ejecuta pruebas del ensamblado de contexto para responder preguntas sobre las notas:
+    páginas citadas con sus backlinks, sin bloques repetidos, y presupuesto de tokens.
+    """
+    print("\n=== Pruebas de ensamblado de contexto ===")
+    
+    context_tests_passed = 0
+    total_context_tests = 2  # Total de pruebas de ensamblado de contexto
+    
+    try:
+        context_manager = _memory_manager("contexto")
+        context_manager.append_to_page("Proyecto Apolo", "Lanzamiento previsto en marzo")
+        context_manager.append_to_page("Proyecto Apolo", "Presupuesto aprobado")
+        context_manager.append_to_page("Notas", "Revisar riesgos de [[Proyecto Apolo]] con Ana")
+        context_manager.append_to_page("Notas", "Comprar café")
+        context_manager.append_to_journal("Reunión de [[Proyecto Apolo]]: retrasar pruebas", target_date=date(2025, 1, 20))
+        context_manager.append_to_journal("Presupuesto aprobado", target_date=date(2025, 1, 21))
+        context_manager.append_to_page("Enorme", "\n- ".join(f"Bloque de relleno número {i} " + "x" * 200 for i in range(500)))
+        
+        # === PRUEBA 1: Página citada, sus backlinks y bloques repetidos ===
+        print(f"📝 Prueba 1: Contexto de '¿Qué presupuesto tiene [[Proyecto Apolo]]?'...")
+        context = context_manager.build_context("¿Qué presupuesto tiene [[Proyecto Apolo]]?", token_budget=1000)
+        sources = {(block.title, block.source) for block in context.blocks}
+        expected = {("Proyecto Apolo", "page"), ("Notas", "backlink"), ("2025_01_20", "backlink")}
+        repeated = [block for block in context.blocks if block.text == "Presupuesto aprobado"]
+        if expected <= sources and len(repeated) == 1 \
+                and context.text.startswith("## Proyecto Apolo\n- Lanzamiento previsto en marzo\n"):
+            context_tests_passed += 1
+            print(f"   ✅ ÉXITO: {len(context.blocks)} bloques de {len({title for title, _ in sources})} archivos; "
+                  f"'Presupuesto aprobado' una sola vez")
+        else:
+            print(f"   ❌ FALLO: {sources}, {len(repeated)} repetidos\n{context.text}")
+        
+        # === PRUEBA 2: El presupuesto se respeta aunque haya páginas enormes ===
+        print(f"📝 Prueba 2: Presupuesto de 300 tokens con una página de ~30000...")
+        context = context_manager.build_context("[[Enorme]] relleno", token_budget=300)
+        if 0 < context.tokens <= 300 and context.dropped > 0 and estimate_tokens(context.text) == context.tokens:
+            context_tests_passed += 1
+            print(f"   ✅ ÉXITO: {context.tokens} tokens, {context.dropped} bloques descartados")
+        else:
+            print(f"   ❌ FALLO: {context.tokens} tokens, {context.dropped} descartados")
+    
+    except Exception as e:
+        print(f"   ❌ ERROR durante las pruebas de ensamblado de contexto: {e}")
+    
+    # === RESUMEN DE PRUEBAS DE CONTEXTO ===
+    print(f"\n=== RESUMEN DE PRUEBAS DE ENSAMBLADO DE CONTEXTO ===")
+    print(f"🎯 Pruebas de ensamblado de contexto: {context_tests_passed}/{total_context_tests} pasaron")
+    
+    return context_tests_passed, total_context_tests
+
+
+def run_trigram_tests(manager):
+    """
+    Ejecuta pruebas del índice de trigramas: búsquedas de subcadenas con los mismos
+    resultados que el recorrido de archivos, búsquedas con erratas y actualizaciones.
+    """
+    print("\n=== Pruebas del índice de trigramas ===")
+    
+    trigram_tests_passed = 0
+    total_trigram_tests = 3  # Total de pruebas del índice de trigramas
+    
+    try:
+        scan_manager = _memory_manager("trigramas", {
+            "pages/Proyectos.md": "- Reunión del Proyecto Apolo\n- Canción para el vídeo",
+            "pages/Ideas__IA.md": "title:: Ideas/IA\n- Agente de IA para Logseq",
+            "journals/2025_01_22.md": "- Llamar al equipo de Apolo",
+        })
+        trigram_manager = LogseqManager(str(scan_manager.graph_path), storage=scan_manager.storage)
+        trigram_manager.enable_trigram_index()
+        
+        # === PRUEBA 1: Mismos resultados que el recorrido de archivos ===
+        print(f"📝 Prueba 1: Comparar search_in_pages con y sin índice...")
+        queries = ["apolo", "CANCIÓN", "cancion", "ia", "title::", "no existe", "o"]
+        mismatches = [q for q in queries if trigram_manager.search_in_pages(q) != scan_manager.search_in_pages(q)]
+        if not mismatches:
+            trigram_tests_passed += 1
+            print(f"   ✅ ÉXITO: {len(queries)} consultas con resultados idénticos")
+        else:
+            print(f"   ❌ FALLO: Resultados distintos para {mismatches}")
+        
+        # === PRUEBA 2: Búsqueda con erratas ===
+        print(f"📝 Prueba 2: Buscar 'Proyeto Apolo' (con errata)...")
+        results = trigram_manager.fuzzy_search("Proyeto Apolo")
+        if results and results[0][:2] == ("Proyectos", "Reunión del Proyecto Apolo") and not trigram_manager.fuzzy_search("zzz qqq"):
+            trigram_tests_passed += 1
+            print(f"   ✅ ÉXITO: {results[0]}")
+        else:
+            print(f"   ❌ FALLO: {results}")
+        
+        # === PRUEBA 3: El índice sigue a las escrituras y borrados ===
+        print(f"📝 Prueba 3: Añadir y borrar bloques...")
+        trigram_manager.append_to_page("Notas", "Presupuesto de Artemisa")
+        trigram_manager.delete_block_from_page("Proyectos", "Reunión del Proyecto Apolo")
+        found_new = trigram_manager.search_in_pages("artemisa") == ["Notas"]
+        apolo_titles = [title for title, _, _ in trigram_manager.fuzzy_search("Proyeto Apolo")]
+        if found_new and "Proyectos" not in apolo_titles:
+            trigram_tests_passed += 1
+            print(f"   ✅ ÉXITO: Índice actualizado ({len(trigram_manager.trigram_index)} bloques)")
+        else:
+            print(f"   ❌ FALLO: {found_new}, {apolo_titles}")
+    
+    except Exception as e:
+        print(f"   ❌ ERROR durante las pruebas del índice de trigramas: {e}")
+    
+    # === RESUMEN DE PRUEBAS DEL ÍNDICE DE TRIGRAMAS ===
+    print(f"\n=== RESUMEN DE PRUEBAS DEL ÍNDICE DE TRIGRAMAS ===")
+    print(f"🎯 Pruebas del índice de trigramas: {trigram_tests_passed}/{total_trigram_tests} pasaron")
+    
+    return trigram_tests_passed, total_trigram_tests
+
+
+def run_boolean_search_tests(manager):
+    """
+    Ejecuta pruebas de las consultas booleanas y de frases sobre el índice posicional:
+    operadores, frases, errores de sintaxis y actualización tras las escrituras.
+    """
+    print("\n=== Pruebas de búsqueda booleana ===")
+    
+    boolean_tests_passed = 0
+    total_boolean_tests = 4  # Total de pruebas de búsqueda booleana
+    
+    try:
+        boolean_manager = _memory_manager("booleano", {
+            "pages/Agente.md": "- Agente en Python\n- Usa pydantic",
+            "pages/Borrador.md": "- Borrador del agente en Python",
+            "pages/Apolo.md": "- Reunión del Proyecto Apolo\n- Canción del equipo",
+            "pages/Separado.md": "- Un proyecto\n- Apolo en otra línea",
+            "journals/2025_01_23.md": "- Revisar el agente de python",
+        })
+        
+        # === PRUEBA 1: AND, OR, NOT y paréntesis ===
+        print(f"📝 Prueba 1: Operadores booleanos...")
+        cases = {
+            "python AND agente NOT borrador": ["Agente", "2025_01_23"],
+            "pydantic OR apolo": ["Agente", "Apolo", "Separado"],
+            "(borrador OR reunion) python": ["Borrador"],
+            "CANCIÓN": ["Apolo"],
+        }
+        failures = {query: boolean_manager.boolean_search(query) for query in cases}
+        failures = {query: result for query, result in failures.items() if result != cases[query]}
+        if not failures:
+            boolean_tests_passed += 1
+            print(f"   ✅ ÉXITO: {len(cases)} consultas correctas")
+        else:
+            print(f"   ❌ FALLO: {failures}")
+        
+        # === PRUEBA 2: Frases exactas ===
+        print(f"📝 Prueba 2: Buscar la frase \"proyecto apolo\"...")
+        phrase_result = boolean_manager.boolean_search('"proyecto apolo"')
+        if phrase_result == ["Apolo"]:
+            boolean_tests_passed += 1
+            print(f"   ✅ ÉXITO: Frase solo en 'Apolo', no en 'Separado' (palabras en bloques distintos)")
+        else:
+            print(f"   ❌ FALLO: {phrase_result}")
+        
+        # === PRUEBA 3: Consultas no válidas ===
+        print(f"📝 Prueba 3: Rechazar consultas con errores de sintaxis...")
+        bad_queries = ['(python', '"sin cerrar', 'python OR', 'AND']
+        accepted = []
+        for bad_query in bad_queries:
+            try:
+                boolean_manager.boolean_search(bad_query)
+                accepted.append(bad_query)
+            except ValueError:
+                pass
+        if not accepted:
+            boolean_tests_passed += 1
+            print(f"   ✅ ÉXITO: {len(bad_queries)} consultas rechazadas")
+        else:
+            print(f"   ❌ FALLO: Se aceptaron {accepted}")
+        
+        # === PRUEBA 4: El índice sigue a las escrituras del gestor ===
+        print(f"📝 Prueba 4: Añadir y borrar bloques...")
+        boolean_manager.append_to_page("Notas", "Lanzamiento del proyecto Apolo")
+        boolean_manager.delete_block_from_page("Apolo", "Reunión del Proyecto Apolo")
+        result = boolean_manager.boolean_search('"proyecto apolo"', include_journals=False)
+        if result == ["Notas"]:
+            boolean_tests_passed += 1
+            print(f"   ✅ ÉXITO: {result}")
+        else:
+            print(f"   ❌ FALLO: {result}")
+    
+    except Exception as e:
+        print(f"   ❌ ERROR durante las pruebas de búsqueda booleana: {e}")
+    
+    # === RESUMEN DE PRUEBAS DE BÚSQUEDA BOOLEANA ===
+    print(f"\n=== RESUMEN DE PRUEBAS DE BÚSQUEDA BOOLEANA ===")
+    print(f"🎯 Pruebas de búsqueda booleana: {boolean_tests_passed}/{total_boolean_tests} pasaron")
+    
+    return boolean_tests_passed, total_boolean_tests
+
+
+def run_title_registry_tests(manager):
+    """
+    Ejecuta pruebas del registro de títulos de página: coincidencias sin mayúsculas ni
+    acentos, codificaciones alternativas de los espacios de nombres, y ambigüedades,
+    también en las acciones de página del agente.
+    """
+    print("\n=== Pruebas del registro de títulos ===")
+    
+    title_tests_passed = 0
+    total_title_tests = 4  # Total de pruebas del registro de títulos
+    
+    try:
+        title_manager = _memory_manager("titulos", {
+            "pages/Tareas.md": "- TODO Comprar pan",
+            "pages/Reunión.md": "- Lunes",
+            "pages/Proyectos%2FApolo.md": "- Lanzamiento",
+            "pages/Ideas___IA.md": "- Agente",
+        })
+        storage = title_manager.storage
+        graph_path = title_manager.graph_path
+        
+        # === PRUEBA 1: Mayúsculas y acentos no crean páginas duplicadas ===
+        print(f"📝 Prueba 1: Añadir a 'tareas' y 'REUNION'...")
+        title_manager.append_to_page("tareas", "TODO Llamar a Ana")
+        title_manager.append_to_page("REUNION", "Martes")
+        pages = sorted(path.name for path in storage.list_files(graph_path / "pages", "*.md"))
+        if len(pages) == 4 and title_manager.read_page_content("Tareas").endswith("TODO Llamar a Ana") \
+                and title_manager.read_page_content("Reunión").endswith("Martes"):
+            title_tests_passed += 1
+            print(f"   ✅ ÉXITO: Sin duplicados ({len(pages)} páginas)")
+        else:
+            print(f"   ❌ FALLO: {pages}")
+        
+        # === PRUEBA 2: Codificaciones %2F y ___ de los espacios de nombres ===
+        print(f"📝 Prueba 2: Resolver 'Proyectos/Apolo' e 'ideas/ia'...")
+        apolo_path = title_manager._get_page_path("Proyectos/Apolo")
+        ideas_path = title_manager._get_page_path("ideas/ia")
+        search_titles = title_manager.search_in_pages("agente")
+        if apolo_path.name == "Proyectos%2FApolo.md" and ideas_path.name == "Ideas___IA.md" and search_titles == ["Ideas/IA"]:
+            title_tests_passed += 1
+            print(f"   ✅ ÉXITO: {apolo_path.name}, {ideas_path.name}")
+        else:
+            print(f"   ❌ FALLO: {apolo_path.name}, {ideas_path.name}, {search_titles}")
+        
+        # === PRUEBA 3: Ambigüedades y páginas nuevas creadas fuera del gestor ===
+        print(f"📝 Prueba 3: Títulos ambiguos y archivos nuevos...")
+        storage.write_text(graph_path / "pages" / "TAREAS.md", "- Otra lista")
+        try:
+            title_manager.page_exists("tareas")
+            ambiguous_reported = False
+        except AmbiguousPageTitleError as e:
+            ambiguous_reported = e.candidates == ["TAREAS.md", "Tareas.md"]
+        exact_still_works = title_manager._get_page_path("Tareas").name == "Tareas.md"
+        if ambiguous_reported and exact_still_works:
+            title_tests_passed += 1
+            print(f"   ✅ ÉXITO: 'tareas' ambiguo entre Tareas.md y TAREAS.md; 'Tareas' exacto")
+        else:
+            print(f"   ❌ FALLO: ambigüedad {ambiguous_reported}, exacto {exact_still_works}")
+        
+        # === PRUEBA 4: Las acciones del agente informan de la ambigüedad ===
+        print(f"📝 Prueba 4: Ejecutar las acciones de página del agente sobre 'tareas'...")
+        os.environ.setdefault('LOGFIRE_IGNORE_NO_CONFIG', '1')
+        import agent
+        actions = [
+            agent.CreateTask(page_title="tareas", content="Llamar a Luis"),
+            agent.MarkTaskAsDone(page_title="tareas", task_content="Comprar pan"),
+            agent.AppendToPage(page_title="tareas", content="Nota"),
+            agent.ReadPageContent(page_title="tareas"),
+            agent.AddNestedBlock(page_title="tareas", parent_block="TODO Comprar pan", content="Integral"),
+            agent.DeleteBlockFromPage(page_title="tareas", content_to_delete="TODO Comprar pan"),
+        ]
+        before = {path.name: storage.read_text(path) for path in storage.list_files(graph_path / "pages", "*.md")}
+        unreported = []
+        for action in actions:
+            output = []
+            agent.execute_action(action, title_manager, confirm=lambda description: True, emit=output.append)
+            if not any("es ambiguo" in message and "TAREAS.md, Tareas.md" in message for message in output):
+                unreported.append(action.tool)
+        after = {path.name: storage.read_text(path) for path in storage.list_files(graph_path / "pages", "*.md")}
+        if not unreported and after == before:
+            title_tests_passed += 1
+            print(f"   ✅ ÉXITO: {len(actions)} acciones muestran los archivos candidatos sin escribir nada")
+        else:
+            print(f"   ❌ FALLO: Sin aviso de ambigüedad en {unreported}; archivos cambiados: {after != before}")
+    
+    except Exception as e:
+        print(f"   ❌ ERROR durante las pruebas del registro de títulos: {e}")
+    
+    # === RESUMEN DE PRUEBAS DEL REGISTRO DE TÍTULOS ===
+    print(f"\n=== RESUMEN DE PRUEBAS DEL REGISTRO DE TÍTULOS ===")
+    print(f"🎯 Pruebas del registro de títulos: {title_tests_passed}/{total_title_tests} pasaron")
+    
+    return title_tests_passed, total_title_tests
+
+
+def run_namespace_tests(manager):
+    """
+    Ejecuta pruebas del árbol de espacios de nombres: autocompletado por prefijo,
+    listado y recuento de subárboles, y actualización tras crear o borrar páginas.
+    """
+    print("\n=== Pruebas de espacios de nombres ===")
+    
+    namespace_tests_passed = 0
+    total_namespace_tests = 3  # Total de pruebas de espacios de nombres
+    
+    try:
+        namespace_manager = _memory_manager("espacios", {
+            f"pages/{filename}": "- Nota"
+            for filename in ["Proyectos__Mi App.md", "Proyectos__Mi App__Tareas.md", "Proyectos___Apolo.md",
+                             "Proyectos%2FMinería.md", "Ideas.md", "Ideas__IA.md"]
+        })
+        storage = namespace_manager.storage
+        graph_path = namespace_manager.graph_path
+        
+        # === PRUEBA 1: Autocompletar por prefijo sin distinguir mayúsculas ===
+        print(f"📝 Prueba 1: Autocompletar 'proyectos/mi'...")
+        completions = namespace_manager.complete_page_title("proyectos/mi")
+        expected = ["Proyectos/Mi App", "Proyectos/Mi App/Tareas", "Proyectos/Minería"]
+        if completions == expected and namespace_manager.complete_page_title("id", limit=1) == ["Ideas"]:
+            namespace_tests_passed += 1
+            print(f"   ✅ ÉXITO: {completions}")
+        else:
+            print(f"   ❌ FALLO: {completions}")
+        
+        # === PRUEBA 2: Listado y recuento de un espacio de nombres ===
+        print(f"📝 Prueba 2: Listar 'Proyectos'...")
+        children = namespace_manager.list_namespace("proyectos")
+        subtree = namespace_manager.namespace_pages("Proyectos")
+        top_level = namespace_manager.list_namespace()
+        if children == [("Proyectos/Apolo", 1), ("Proyectos/Mi App", 2), ("Proyectos/Minería", 1)] \
+                and len(subtree) == 4 and top_level == [("Ideas", 2), ("Proyectos", 4)]:
+            namespace_tests_passed += 1
+            print(f"   ✅ ÉXITO: {children}")
+        else:
+            print(f"   ❌ FALLO: {children}, {subtree}, {top_level}")
+        
+        # === PRUEBA 3: Páginas creadas por el gestor y borradas fuera de él ===
+        print(f"📝 Prueba 3: Crear 'Proyectos/Zeta' y borrar 'Ideas/IA' desde fuera...")
+        namespace_manager.create_page("Proyectos/Zeta", "- Nueva")
+        storage.delete(graph_path / "pages" / "Ideas__IA.md")
+        top_level = namespace_manager.list_namespace()
+        if top_level == [("Ideas", 1), ("Proyectos", 5)] and namespace_manager.namespace_pages("Ideas") == []:
+            namespace_tests_passed += 1
+            print(f"   ✅ ÉXITO: {top_level}")
+        else:
+            print(f"   ❌ FALLO: {top_level}")
+    
+    except Exception as e:
+        print(f"   ❌ ERROR durante las pruebas de espacios de nombres: {e}")
+    
+    # === RESUMEN DE PRUEBAS DE ESPACIOS DE NOMBRES ===
+    print(f"\n=== RESUMEN DE PRUEBAS DE ESPACIOS DE NOMBRES ===")
+    print(f"🎯 Pruebas de espacios de nombres: {namespace_tests_passed}/{total_namespace_tests} pasaron")
+    
+    return namespace_tests_passed, total_namespace_tests
+
+
+def run_snapshot_tests(manager):
+    """
+    Ejecuta pruebas de las instantáneas binarias del índice de trigramas: carga sin
+    reprocesar archivos, reproceso solo de los archivos cambiados y rechazo de una
+    instantánea corrupta. Usa un grafo temporal en disco, que se borra al terminar.
+    """
+    print("\n=== Pruebas de instantáneas del índice ===")
+    
+    snapshot_tests_passed = 0
+    total_snapshot_tests = 3  # Total de pruebas de instantáneas
+    
+    try:
+        from src.graph_snapshot import SnapshotError
+        from src.trigram_index import TrigramIndex
+        
+        with tempfile.TemporaryDirectory() as temp_dir:
+            graph_path = pathlib.Path(temp_dir)
+            (graph_path / "pages").mkdir()
+            (graph_path / "journals").mkdir()
+            (graph_path / "pages" / "Apolo.md").write_text("- Proyecto Apolo\n- Reunión con el cliente", encoding='utf-8')
+            (graph_path / "pages" / "Ideas.md").write_text("- Canción nueva", encoding='utf-8')
+            (graph_path / "journals" / "2025_01_15.md").write_text("- Revisar [[Apolo]]", encoding='utf-8')
+            snapshot_path = graph_path / ".logseq-agent" / "trigram.snapshot"
+            
+            first_manager = LogseqManager(str(graph_path))
+            first_manager.enable_trigram_index()
+            first_manager.append_to_page("Ideas", "Otra idea")
+            expected = first_manager.fuzzy_search("Proyeto Apolo")
+            first_manager.save_index_snapshots()
+            
+            # === PRUEBA 1: Cargar la instantánea sin reprocesar archivos ===
+            print(f"📝 Prueba 1: Recuperar el índice desde la instantánea...")
+            loaded = TrigramIndex.load_snapshot(snapshot_path)
+            reparsed = loaded.sync(first_manager.storage, {"page": first_manager.pages_path, "journal": first_manager.journals_path})
+            if reparsed == 0 and len(loaded) == len(first_manager.trigram_index) \
+                    and loaded.fuzzy_blocks("Proyeto Apolo") == first_manager.trigram_index.fuzzy_blocks("Proyeto Apolo"):
+                snapshot_tests_passed += 1
+                print(f"   ✅ ÉXITO: {len(loaded)} bloques recuperados sin leer los archivos")
+            else:
+                print(f"   ❌ FALLO: {reparsed} archivos reprocesados, {len(loaded)} bloques")
+            
+            # === PRUEBA 2: Solo se reprocesan los archivos que cambiaron ===
+            print(f"📝 Prueba 2: Arrancar tras cambiar un archivo y tocar otro...")
+            ideas_path = graph_path / "pages" / "Ideas.md"
+            ideas_stat = ideas_path.stat()
+            os.utime(ideas_path, ns=(ideas_stat.st_atime_ns, ideas_stat.st_mtime_ns + 10**9))
+            (graph_path / "pages" / "Apolo.md").write_text("- Proyecto Hermes", encoding='utf-8')
+            second_manager = LogseqManager(str(graph_path))
+            second_manager.enable_trigram_index()
+            if second_manager.search_in_pages("hermes") == ["Apolo"] and second_manager.search_in_pages("apolo") == [] \
+                    and second_manager.fuzzy_search("Otra idae") and expected:
+                snapshot_tests_passed += 1
+                print(f"   ✅ ÉXITO: La página cambiada se reindexó al arrancar")
+            else:
+                print(f"   ❌ FALLO: {second_manager.search_in_pages('hermes')}")
+            
+            # === PRUEBA 3: Una instantánea corrupta se rechaza y el índice se reconstruye ===
+            print(f"📝 Prueba 3: Corromper un byte de la instantánea...")
+            second_manager.save_index_snapshots()
+            data = bytearray(snapshot_path.read_bytes())
+            data[-1] ^= 0xFF
+            snapshot_path.write_bytes(bytes(data))
+            try:
+                TrigramIndex.load_snapshot(snapshot_path)
+                rejected = False
+            except SnapshotError:
+                rejected = True
+            third_manager = LogseqManager(str(graph_path))
+            third_manager.enable_trigram_index()
+            if rejected and third_manager.search_in_pages("hermes") == ["Apolo"]:
+                snapshot_tests_passed += 1
+                print(f"   ✅ ÉXITO: Instantánea rechazada y índice reconstruido desde los archivos")
+            else:
+                print(f"   ❌ FALLO: rechazada={rejected}")
+    
+    except Exception as e:
+        print(f"   ❌ ERROR durante las pruebas de instantáneas: {e}")
+    
+    # === RESUMEN DE PRUEBAS DE INSTANTÁNEAS ===
+    print(f"\n=== RESUMEN DE PRUEBAS DE INSTANTÁNEAS ===")
+    print(f"🎯 Pruebas de instantáneas: {snapshot_tests_passed}/{total_snapshot_tests} pasaron")
+    
+    return snapshot_tests_passed, total_snapshot_tests
+
+
+def run_block_range_tests(manager):
+    """
+    Ejecuta pruebas de lectura parcial de páginas: tramos de bloques desde el principio
+    y desde el final, lectura de los últimos bloques de un diario grande sin leerlo
+    entero, y páginas inexistentes.
+    """
+    print("\n=== Pruebas de lectura por tramos de bloques ===")
+    
+    block_range_tests_passed = 0
+    total_block_range_tests = 3  # Total de pruebas de lectura por tramos
+    
+    try:
+        range_manager = _memory_manager("tramos", {
+            "pages/Registro.md": "title:: Registro\n- Uno\n  - Uno.a\n  continuación de Uno.a\n- Dos\n- Tres\n- Cuatro",
+        })
+        storage = range_manager.storage
+        graph_path = range_manager.graph_path
+        
+        # === PRUEBA 1: Tramos desde el principio y desde el final ===
+        print(f"📝 Prueba 1: Leer tramos de bloques de 'Registro'...")
+        head = range_manager.read_page_blocks("Registro", 0, 2)
+        middle = range_manager.read_page_blocks("registro", 2, 10)
+        from_end = range_manager.read_page_blocks("Registro", -3, 2)
+        if head == ["- Uno", "  - Uno.a"] and middle == ["- Dos", "- Tres", "- Cuatro"] and from_end == ["- Dos", "- Tres"]:
+            block_range_tests_passed += 1
+            print(f"   ✅ ÉXITO: {head} / {middle} / {from_end}")
+        else:
+            print(f"   ❌ FALLO: {head} / {middle} / {from_end}")
+        
+        # === PRUEBA 2: Los últimos bloques de un diario grande ===
+        print(f"📝 Prueba 2: Leer los 3 últimos bloques de un diario de 5000 entradas...")
+        journal_path = graph_path / "journals" / "2025_01_15.md"
+        storage.write_text(journal_path, "\n".join(f"- Entrada {i} del registro de hoy" for i in range(5000)))
+        bytes_read = []
+        read_range = storage.read_range
+        storage.read_range = lambda path, offset, length: bytes_read.append(length) or read_range(path, offset, length)
+        tail = range_manager.tail_page("2025_01_15", 3, is_journal=True)
+        del storage.read_range
+        journal_size = storage.stat(journal_path).size
+        if tail == [f"- Entrada {i} del registro de hoy" for i in (4997, 4998, 4999)] and sum(bytes_read) < journal_size / 10:
+            block_range_tests_passed += 1
+            print(f"   ✅ ÉXITO: {sum(bytes_read)} de {journal_size} bytes leídos")
+        else:
+            print(f"   ❌ FALLO: {tail}, {sum(bytes_read)} de {journal_size} bytes leídos")
+        
+        # === PRUEBA 3: Página inexistente y tramos vacíos ===
+        print(f"📝 Prueba 3: Página inexistente y cero bloques...")
+        missing = range_manager.tail_page("No Existe", 5)
+        empty = range_manager.tail_page("Registro", 0)
+        beyond = range_manager.read_page_blocks("Registro", 50, 5)
+        if missing is None and empty == [] and beyond == []:
+            block_range_tests_passed += 1
+            print(f"   ✅ ÉXITO: None para la página inexistente y [] para los tramos vacíos")
+        else:
+            print(f"   ❌ FALLO: {missing}, {empty}, {beyond}")
+    
+    except Exception as e:
+        print(f"   ❌ ERROR durante las pruebas de lectura por tramos: {e}")
+    
+    # === RESUMEN DE PRUEBAS DE LECTURA POR TRAMOS ===
+    print(f"\n=== RESUMEN DE PRUEBAS DE LECTURA POR TRAMOS ===")
+    print(f"🎯 Pruebas de lectura por tramos: {block_range_tests_passed}/{total_block_range_tests} pasaron")
+    
+    return block_range_tests_passed, total_block_range_tests
+
+
+def run_journal_search_tests(manager):
+    """
+    Ejecuta pruebas de la búsqueda en páginas y diarios: resultados con fecha,
+    filtro por rango de fechas sin leer los diarios de fuera y mismos resultados con
+    el índice de trigramas.
+    """
+    print("\n=== Pruebas de búsqueda en diarios ===")
+    
+    journal_search_tests_passed = 0
+    total_journal_search_tests = 3  # Total de pruebas de búsqueda en diarios
+    
+    try:
+        search_manager = _memory_manager("diarios", {
+            "pages/Apolo.md": "- Proyecto Apolo",
+            "pages/Cocina.md": "- Receta de pan",
+            "journals/2025_01_10.md": "- Reunión de Apolo",
+            "journals/2025_02_03.md": "- Apolo en pruebas",
+            "journals/2025_03_20.md": "- Comprar pan",
+            "journals/borrador.md": "- Apolo sin fecha",
+        }, buffer_journal_appends=True)
+        storage = search_manager.storage
+        search_manager.append_to_journal("Cierre de APOLO", target_date=date(2025, 3, 21))
+        
+        # === PRUEBA 1: Páginas y diarios, con los diarios fechados y del más reciente al más antiguo ===
+        print(f"📝 Prueba 1: Buscar 'apolo' en todo el grafo...")
+        hits = search_manager.search_graph("apolo")
+        summary = [(hit.title, hit.kind, hit.date) for hit in hits]
+        expected = [("Apolo", "page", None), ("2025_03_21", "journal", date(2025, 3, 21)),
+                    ("2025_02_03", "journal", date(2025, 2, 3)), ("2025_01_10", "journal", date(2025, 1, 10)),
+                    ("borrador", "journal", None)]
+        if summary == expected and search_manager.search_in_pages("apolo") == ["Apolo"]:
+            journal_search_tests_passed += 1
+            print(f"   ✅ ÉXITO: {len(hits)} resultados, incluido el diario aún en el buffer")
+        else:
+            print(f"   ❌ FALLO: {summary}")
+        
+        # === PRUEBA 2: El rango de fechas descarta diarios sin leerlos ===
+        print(f"📝 Prueba 2: Buscar 'apolo' en los diarios de febrero y marzo...")
+        files_read = []
+        read_text = storage.read_text
+        storage.read_text = lambda path: files_read.append(path.name) or read_text(path)
+        hits = search_manager.search_graph("apolo", include_pages=False, date_from=date(2025, 2, 1), date_to=date(2025, 3, 20))
+        del storage.read_text
+        if [hit.title for hit in hits] == ["2025_02_03"] and sorted(files_read) == ["2025_02_03.md", "2025_03_20.md"]:
+            journal_search_tests_passed += 1
+            print(f"   ✅ ÉXITO: Solo se leyeron {sorted(files_read)}")
+        else:
+            print(f"   ❌ FALLO: {hits}, leídos {files_read}")
+        
+        # === PRUEBA 3: Mismos resultados con índice y rango inválido ===
+        print(f"📝 Prueba 3: Repetir con el índice de trigramas y un rango invertido...")
+        search_manager.enable_trigram_index()
+        indexed = search_manager.search_graph("apolo", date_from=date(2025, 2, 1))
+        try:
+            search_manager.search_graph("apolo", date_from=date(2025, 3, 1), date_to=date(2025, 2, 1))
+            rejected = False
+        except ValueError:
+            rejected = True
+        if [hit.title for hit in indexed] == ["Apolo", "2025_03_21", "2025_02_03"] and rejected:
+            journal_search_tests_passed += 1
+            print(f"   ✅ ÉXITO: {[hit.title for hit in indexed]}")
+        else:
+            print(f"   ❌ FALLO: {indexed}, rango invertido rechazado: {rejected}")
+    
+    except Exception as e:
+        print(f"   ❌ ERROR durante las pruebas de búsqueda en diarios: {e}")
+    
+    # === RESUMEN DE PRUEBAS DE BÚSQUEDA EN DIARIOS ===
+    print(f"\n=== RESUMEN DE PRUEBAS DE BÚSQUEDA EN DIARIOS ===")
+    print(f"🎯 Pruebas de búsqueda en diarios: {journal_search_tests_passed}/{total_journal_search_tests} pasaron")
+    
+    return journal_search_tests_passed, total_journal_search_tests
+
+
+def run_bulk_import_tests(manager):
+    """
+    Ejecuta pruebas de la importación masiva: un directorio Markdown con el pool de
+    procesos, un CSV con páginas y diarios, y la reanudación desde el checkpoint tras
+    una interrupción a mitad de tanda sin duplicar bloques. Los orígenes se crean en
+    un directorio temporal y el grafo de destino está en memoria.
+    """
+    print("\n=== Pruebas de importación masiva ===")
+    
+    bulk_import_tests_passed = 0
+    total_bulk_import_tests = 3  # Total de pruebas de importación masiva
+    
+    try:
+        from src.bulk_import import bulk_import
+        
+        with tempfile.TemporaryDirectory() as temp_dir:
+            source = pathlib.Path(temp_dir) / "volcado"
+            (source / "Proyectos").mkdir(parents=True)
+            (source / "Proyectos" / "Apolo.md").write_text("# Apolo\n\nObjetivo del proyecto.\n\n* Fase 1\n  * Diseño\n", encoding='utf-8')
+            (source / "Ideas.md").write_text("- Idea existente\n```\ncódigo\n```\n", encoding='utf-8')
+            (source / "Vacía.md").write_text("\n", encoding='utf-8')
+            
+            # === PRUEBA 1: Directorio Markdown con el pool de procesos ===
+            print(f"📝 Prueba 1: Importar un directorio Markdown con 2 procesos...")
+            import_manager = _memory_manager("importacion")
+            storage = import_manager.storage
+            graph_path = import_manager.graph_path
+            import_manager.create_page("Ideas", "- Idea previa")
+            result = bulk_import(import_manager, source, workers=2)
+            apolo = import_manager.read_page_content("Proyectos/Apolo")
+            ideas = import_manager.read_page_content("Ideas")
+            if apolo == "- # Apolo\n- Objetivo del proyecto.\n- Fase 1\n  - Diseño" \
+                    and ideas == "- Idea previa\n- Idea existente\n- ```\n  código\n  ```" \
+                    and (result.sources_done, result.blocks, result.pages_written, result.skipped) == (3, 6, 2, 1):
+                bulk_import_tests_passed += 1
+                print(f"   ✅ ÉXITO: {result.blocks} bloques en {result.pages_written} escrituras")
+            else:
+                print(f"   ❌ FALLO: {result}, {apolo!r}, {ideas!r}")
+            
+            # === PRUEBA 2: CSV con páginas, diarios y filas sin destino ===
+            print(f"📝 Prueba 2: Importar un CSV a páginas y diarios...")
+            csv_path = pathlib.Path(temp_dir) / "notas.csv"
+            csv_path.write_text(
+                "page,content,date\nCompras,Pan,\n,Reunión de equipo,2025-01-15\nCompras,Leche,\n,Sin destino,\nCompras,,\n",
+                encoding='utf-8',
+            )
+            result = bulk_import(import_manager, csv_path)
+            compras = import_manager.read_page_content("Compras")
+            journal = storage.read_text(graph_path / "journals" / "2025_01_15.md")
+            if compras == "- Pan\n- Leche" and journal == "- Reunión de equipo" \
+                    and (result.blocks, result.pages_written, result.skipped) == (3, 2, 2):
+                bulk_import_tests_passed += 1
+                print(f"   ✅ ÉXITO: 'Compras' escrita una vez con {compras.count('- ')} bloques")
+            else:
+                print(f"   ❌ FALLO: {result}, {compras!r}, {journal!r}")
+            
+            # === PRUEBA 3: Reanudar tras una interrupción a mitad de tanda ===
+            print(f"📝 Prueba 3: Interrumpir la importación y reanudarla con el checkpoint...")
+            rows = "".join(f"Página {i % 4},Nota {i},\n" for i in range(40))
+            csv_path.write_text("page,content,date\n" + rows, encoding='utf-8')
+            checkpoint = pathlib.Path(temp_dir) / "checkpoint.json"
+            resume_manager = _memory_manager("importacion")
+            append_text = resume_manager._append_text
+            writes = []
+            
+            def failing_append(file_path, text):
+                # La sexta escritura falla: la segunda tanda (4 páginas) queda a medias
+                writes.append(file_path)
+                if len(writes) == 6:
+                    raise OSError("disco lleno")
+                append_text(file_path, text)
+            
+            resume_manager._append_text = failing_append
+            try:
+                bulk_import(resume_manager, csv_path, checkpoint=checkpoint, max_pending_bytes=100)
+                interrupted = False
+            except OSError:
+                interrupted = True
+            resume_manager._append_text = append_text
+            result = bulk_import(resume_manager, csv_path, checkpoint=checkpoint, max_pending_bytes=100)
+            contents = [resume_manager.read_page_content(f"Página {i}") or "" for i in range(4)]
+            expected = ["\n".join(f"- Nota {n}" for n in range(i, 40, 4)) for i in range(4)]
+            if interrupted and contents == expected and result.sources_done == 40:
+                bulk_import_tests_passed += 1
+                print(f"   ✅ ÉXITO: 40 filas importadas una sola vez tras la interrupción")
+            else:
+                print(f"   ❌ FALLO: interrumpida={interrupted}, {result}, {contents}")
+    
+    except Exception as e:
+        print(f"   ❌ ERROR durante las pruebas de importación masiva: {e}")
+    
+    # === RESUMEN DE PRUEBAS DE IMPORTACIÓN MASIVA ===
+    print(f"\n=== RESUMEN DE PRUEBAS DE IMPORTACIÓN MASIVA ===")
+    print(f"🎯 Pruebas de importación masiva: {bulk_import_tests_passed}/{total_bulk_import_tests} pasaron")
+    
+    return bulk_import_tests_passed, total_bulk_import_tests
+
+
+def run_rename_tests(manager):
+    """
+    Ejecuta pruebas del renombrado de páginas: los enlaces [[...]], #[[...]] y
+    #etiquetas de páginas y diarios se reescriben, solo se tocan los archivos que
+    enlazan la página, y los índices y el registro de títulos reflejan el nombre
+    nuevo. El grafo está en memoria.
+    """
+    print("\n=== Pruebas de renombrado de páginas ===")
+    
+    rename_tests_passed = 0
+    total_rename_tests = 3  # Total de pruebas de renombrado
+    
+    try:
+        rename_manager = _memory_manager("renombrado")
+        storage = rename_manager.storage
+        graph_path = rename_manager.graph_path
+        rename_manager.create_page("Apolo", "title:: Apolo\n- Objetivo del proyecto")
+        rename_manager.create_page("Ideas", "- Ver [[apolo]] y #Apolo.\n- Enlace #[[APOLO]]")
+        rename_manager.create_page("Otra", "- Sin enlaces, solo #apolonia")
+        rename_manager.create_page("Proyecto Beta", "- Beta")
+        storage.write_text(graph_path / "journals" / "2025_01_15.md", "- Reunión #apolo")
+        rename_manager.enable_trigram_index()
+        otra_before = storage.stat(graph_path / "pages" / "Otra.md")
+        
+        # === PRUEBA 1: Se reescriben todas las formas de enlace ===
+        print(f"📝 Prueba 1: Renombrar 'Apolo' a 'Proyecto Apolo'...")
+        result = rename_manager.rename_page("Apolo", "Proyecto Apolo")
+        ideas = rename_manager.read_page_content("Ideas")
+        journal = storage.read_text(graph_path / "journals" / "2025_01_15.md")
+        page = rename_manager.read_page_content("Proyecto Apolo")
+        if ideas == "- Ver [[Proyecto Apolo]] y #[[Proyecto Apolo]].\n- Enlace #[[Proyecto Apolo]]" \
+                and journal == "- Reunión #[[Proyecto Apolo]]" \
+                and page == "title:: Proyecto Apolo\n- Objetivo del proyecto" \
+                and result.references == 4:
+            rename_tests_passed += 1
+            print(f"   ✅ ÉXITO: {result.references} enlaces actualizados en {len(result.updated)} archivos")
+        else:
+            print(f"   ❌ FALLO: {result}, {ideas!r}, {journal!r}, {page!r}")
+        
+        # === PRUEBA 2: Solo se tocan los archivos que enlazan y los índices se actualizan ===
+        print(f"📝 Prueba 2: Comprobar los archivos tocados y los índices...")
+        otra_after = storage.stat(graph_path / "pages" / "Otra.md")
+        hits = rename_manager.search_in_pages("objetivo del proyecto")
+        if otra_before == otra_after \
+                and rename_manager.read_page_content("Apolo") is None \
+                and rename_manager.page_exists("Proyecto Apolo") \
+                and hits == ["Proyecto Apolo"] \
+                and [path.name for path in rename_manager.reference_index.referrers("proyecto apolo")] == ["2025_01_15.md", "Ideas.md"]:
+            rename_tests_passed += 1
+            print(f"   ✅ ÉXITO: 'Otra' no se reescribió y la búsqueda encuentra 'Proyecto Apolo'")
+        else:
+            print(f"   ❌ FALLO: {otra_before} → {otra_after}, {hits}")
+        
+        # === PRUEBA 3: Destino existente u origen inexistente ===
+        print(f"📝 Prueba 3: Renombrar sobre una página existente o desde una inexistente...")
+        errors = 0
+        for old_title, new_title in (("Ideas", "Proyecto Beta"), ("Fantasma", "Nueva")):
+            try:
+                rename_manager.rename_page(old_title, new_title)
+            except ValueError:
+                errors += 1
+        if errors == 2 and rename_manager.read_page_content("Ideas") is not None:
+            rename_tests_passed += 1
+            print(f"   ✅ ÉXITO: Ambos renombrados se rechazaron sin tocar el grafo")
+        else:
+            print(f"   ❌ FALLO: Solo {errors} de 2 renombrados se rechazaron")
+    
+    except Exception as e:
+        print(f"   ❌ ERROR durante las pruebas de renombrado: {e}")
+    
+    print(f"\n=== RESUMEN DE PRUEBAS DE RENOMBRADO ===")
+    print(f"🎯 Renombrado: {rename_tests_passed}/{total_rename_tests} pasaron")
+    
+    return rename_tests_passed, total_rename_tests
+
+
+def run_nested_block_tests(manager):
+    """
+    Ejecuta pruebas de las operaciones sobre el árbol de bloques: añadir hijos y
+    hermanos con la sangría del archivo, mover un subárbol ajustando su nivel, y
+    eliminar un bloque junto con sus hijos. El grafo está en memoria.
+    """
+    print("\n=== Pruebas de bloques anidados ===")
+    
+    nested_tests_passed = 0
+    total_nested_tests = 3  # Total de pruebas de bloques anidados
+    
+    try:
+        nested_manager = _memory_manager("anidados")
+        nested_manager.create_page("Apolo", "title:: Apolo\n- Fase 1\n\t- Diseño\n\t  detalle del diseño\n- Fase 2  \n- Fase 3")
+        
+        # === PRUEBA 1: Añadir un hijo y un hermano ===
+        print(f"📝 Prueba 1: Añadir un hijo a 'Fase 1' y un hermano tras 'Diseño'...")
+        child = nested_manager.add_nested_block("Apolo", "Fase 1", "Pruebas")
+        sibling = nested_manager.add_nested_block("Apolo", "Diseño", "Prototipo", position="sibling")
+        missing = nested_manager.add_nested_block("Apolo", "Fase 9", "Nada")
+        content = nested_manager.read_page_content("Apolo")
+        expected = "title:: Apolo\n- Fase 1\n\t- Diseño\n\t  detalle del diseño\n\t- Prototipo\n\t- Pruebas\n- Fase 2  \n- Fase 3"
+        if child and sibling and not missing and content == expected:
+            nested_tests_passed += 1
+            print(f"   ✅ ÉXITO: Bloques insertados con la sangría del archivo (tabuladores)")
+        else:
+            print(f"   ❌ FALLO: {child}, {sibling}, {missing}, {content!r}")
+        
+        # === PRUEBA 2: Mover un subárbol ===
+        print(f"📝 Prueba 2: Mover 'Fase 1' con sus hijos dentro de 'Fase 3'...")
+        moved = nested_manager.move_block("Apolo", "Fase 1", "Fase 3")
+        content = nested_manager.read_page_content("Apolo")
+        expected = "title:: Apolo\n- Fase 2  \n- Fase 3\n\t- Fase 1\n\t\t- Diseño\n\t\t  detalle del diseño\n\t\t- Prototipo\n\t\t- Pruebas"
+        if moved and content == expected:
+            nested_tests_passed += 1
+            print(f"   ✅ ÉXITO: Subárbol movido y re-sangrado")
+        else:
+            print(f"   ❌ FALLO: {moved}, {content!r}")
+        
+        # === PRUEBA 3: Eliminar un subárbol y rechazar movimientos imposibles ===
+        print(f"📝 Prueba 3: Eliminar 'Fase 1' con sus hijos y mover un bloque dentro de sí mismo...")
+        try:
+            nested_manager.move_block("Apolo", "Fase 3", "Diseño")
+            rejected = False
+        except ValueError:
+            rejected = True
+        deleted = nested_manager.delete_block_from_page("Apolo", "Fase 1")
+        content = nested_manager.read_page_content("Apolo")
+        if rejected and deleted and content == "title:: Apolo\n- Fase 2  \n- Fase 3":
+            nested_tests_passed += 1
+            print(f"   ✅ ÉXITO: Los hijos se eliminaron con su padre")
+        else:
+            print(f"   ❌ FALLO: {rejected}, {deleted}, {content!r}")
+    
+    except Exception as e:
+        print(f"   ❌ ERROR durante las pruebas de bloques anidados: {e}")
+    
+    print(f"\n=== RESUMEN DE PRUEBAS DE BLOQUES ANIDADOS ===")
+    print(f"🎯 Bloques anidados: {nested_tests_passed}/{total_nested_tests} pasaron")
+    
+    return nested_tests_passed, total_nested_tests
+
+
+def run_block_id_tests(manager):
+    """
+    Ejecuta pruebas del índice de identificadores de bloque: leer un bloque por su
+    "id::" aunque haya bloques con el mismo texto, editarlo y eliminarlo después de
+    que otras escrituras desplacen su posición, resolver referencias ((uuid)) y
+    asignar identificadores a bloques nuevos. El grafo está en memoria.
+    """
+    print("\n=== Pruebas de identificadores de bloque ===")
+    
+    block_id_tests_passed = 0
+    total_block_id_tests = 3  # Total de pruebas de identificadores de bloque
+    
+    try:
+        id_manager = _memory_manager("identificadores")
+        storage = id_manager.storage
+        graph_path = id_manager.graph_path
+        block_id = "6512bd43-d9ca-4c3b-9b1d-2f0c5e6a7b10"
+        id_manager.create_page("Apolo", f"- Revisar\n- Revisar\n  id:: {block_id}\n  - Detalle\n- Cerrar")
+        storage.write_text(graph_path / "journals" / "2025_01_15.md", f"- Hablamos de (({block_id}))")
+        
+        # === PRUEBA 1: Leer por UUID y resolver referencias ===
+        print(f"📝 Prueba 1: Leer el segundo 'Revisar' por su id y resolver ((uuid))...")
+        block = id_manager.get_block(block_id.upper())
+        journal = storage.read_text(graph_path / "journals" / "2025_01_15.md")
+        resolved = id_manager.resolve_block_references(journal)
+        if block is not None and (block.title, block.text) == ("Apolo", "Revisar") \
+                and block.content == f"- Revisar\n  id:: {block_id}" \
+                and resolved == "- Hablamos de Revisar" \
+                and id_manager.get_block("00000000-0000-0000-0000-000000000000") is None:
+            block_id_tests_passed += 1
+            print(f"   ✅ ÉXITO: Bloque localizado en '{block.title}' sin comparar textos")
+        else:
+            print(f"   ❌ FALLO: {block}, {resolved!r}")
+        
+        # === PRUEBA 2: Editar y eliminar tras desplazarse el bloque ===
+        print(f"📝 Prueba 2: Editar y eliminar el bloque después de escribir delante de él...")
+        id_manager.prepend_to_page("Apolo", "Nota inicial")
+        updated = id_manager.update_block(block_id, "Revisar el presupuesto")
+        after_update = id_manager.read_page_content("Apolo")
+        deleted = id_manager.delete_block(block_id)
+        after_delete = id_manager.read_page_content("Apolo")
+        if updated and deleted \
+                and after_update == f"- Nota inicial\n- Revisar\n- Revisar el presupuesto\n  id:: {block_id}\n  - Detalle\n- Cerrar" \
+                and after_delete == "- Nota inicial\n- Revisar\n- Cerrar" \
+                and id_manager.get_block(block_id) is None:
+            block_id_tests_passed += 1
+            print(f"   ✅ ÉXITO: Solo se tocó el bloque identificado (y sus hijos al eliminarlo)")
+        else:
+            print(f"   ❌ FALLO: {updated}, {deleted}, {after_update!r}, {after_delete!r}")
+        
+        # === PRUEBA 3: Asignar identificadores ===
+        print(f"📝 Prueba 3: Asignar identificadores a bloques existentes y nuevos...")
+        assigned = id_manager.assign_block_id("Apolo", "Cerrar")
+        again = id_manager.assign_block_id("Apolo", "Cerrar")
+        id_manager.assign_block_ids = True
+        id_manager.append_to_journal("Nota con id", target_date=date(2025, 1, 15))
+        journal_lines = storage.read_text(graph_path / "journals" / "2025_01_15.md").splitlines()
+        new_id = journal_lines[-1].split("id:: ")[-1]
+        new_block = id_manager.get_block(new_id)
+        if assigned is not None and again == assigned and id_manager.get_block(assigned).text == "Cerrar" \
+                and new_block is not None and new_block.text == "Nota con id":
+            block_id_tests_passed += 1
+            print(f"   ✅ ÉXITO: Identificadores asignados e indexados al escribir")
+        else:
+            print(f"   ❌ FALLO: {assigned}, {again}, {journal_lines}")
+    
+    except Exception as e:
+        print(f"   ❌ ERROR durante las pruebas de identificadores de bloque: {e}")
+    
+    print(f"\n=== RESUMEN DE PRUEBAS DE IDENTIFICADORES DE BLOQUE ===")
+    print(f"🎯 Identificadores de bloque: {block_id_tests_passed}/{total_block_id_tests} pasaron")
+    
+    return block_id_tests_passed, total_block_id_tests
+
+
+def run_undo_tests(manager):
+    """
+    Ejecuta pruebas del registro de deshacer: deshacer y rehacer eliminaciones y
+    ediciones guardando solo el diff, rechazar un deshacer cuando el archivo cambió
+    por fuera, deshacer un renombrado entero, y recargar el registro desde disco tras
+    compactarlo y con una línea a medio escribir, y que las escrituras de otro hilo no
+    entren en el grupo abierto por un comando. Solo la tercera prueba usa un directorio
+    temporal; las demás, un grafo en memoria.
+    """
+    print("\n=== Pruebas de deshacer ===")
+    
+    undo_tests_passed = 0
+    total_undo_tests = 4  # Total de pruebas de deshacer
+    
+    try:
+        undo_manager = _memory_manager("deshacer")
+        storage = undo_manager.storage
+        graph_path = undo_manager.graph_path
+        undo_manager.enable_undo_log()
+        original = "".join(f"- Nota {i}\n" for i in range(500)) + "- TODO Leche\n  - Entera\n- TODO Pan"
+        undo_manager.create_page("Compras", original)
+        
+        # === PRUEBA 1: Deshacer y rehacer con diffs mínimos ===
+        print(f"📝 Prueba 1: Eliminar y editar bloques, deshacer y rehacer...")
+        log_size = undo_manager.undo_log.size
+        undo_manager.delete_block_from_page("Compras", "TODO Leche")
+        undo_manager.update_block_in_page("Compras", "TODO Pan", "DONE Pan")
+        diff_bytes = undo_manager.undo_log.size - log_size
+        edited = undo_manager.read_page_content("Compras")
+        undone = undo_manager.undo(2)
+        restored = undo_manager.read_page_content("Compras")
+        redone = undo_manager.redo(2)
+        if len(undone) == 2 and len(redone) == 2 and restored == original \
+                and undo_manager.read_page_content("Compras") == edited \
+                and diff_bytes < 1000 < len(original):
+            undo_tests_passed += 1
+            print(f"   ✅ ÉXITO: Contenido restaurado exacto; el registro creció {diff_bytes} bytes")
+        else:
+            print(f"   ❌ FALLO: {undone}, {redone}, {diff_bytes} bytes, {restored == original}")
+        
+        # === PRUEBA 2: Conflictos y renombrado ===
+        print(f"📝 Prueba 2: Rechazar un deshacer tras un cambio externo y deshacer un renombrado...")
+        undo_manager.create_page("Menú", "- Cena con [[Compras]]")
+        undo_manager.rename_page("Compras", "Súper")
+        renamed_menu = undo_manager.read_page_content("Menú")
+        undone = undo_manager.undo()
+        menu_after_undo = undo_manager.read_page_content("Menú")
+        undo_manager.update_block_in_page("Menú", "Cena con [[Compras]]", "Cena temprano")
+        storage.write_text(graph_path / "pages" / "Menú.md", "- Cambiado en Logseq")
+        try:
+            undo_manager.undo()
+            conflict = False
+        except ValueError:
+            conflict = True
+        if renamed_menu == "- Cena con [[Súper]]" and menu_after_undo == "- Cena con [[Compras]]" \
+                and undone == ["Renombrar 'Compras' a 'Súper'"] and undo_manager.page_exists("Compras") \
+                and not undo_manager.page_exists("Súper") and conflict \
+                and undo_manager.read_page_content("Menú") == "- Cambiado en Logseq":
+            undo_tests_passed += 1
+            print(f"   ✅ ÉXITO: Renombrado deshecho de una vez y conflicto detectado sin tocar el archivo")
+        else:
+            print(f"   ❌ FALLO: {renamed_menu!r}, {menu_after_undo!r}, {undone}, {conflict}")
+        
+        # === PRUEBA 3: Persistencia, compactación y líneas a medio escribir ===
+        print(f"📝 Prueba 3: Recargar el registro compactado desde disco...")
+        with tempfile.TemporaryDirectory() as temp_dir:
+            graph = pathlib.Path(temp_dir)
+            (graph / "pages").mkdir()
+            (graph / "journals").mkdir()
+            disk_manager = LogseqManager(str(graph))
+            disk_manager.enable_undo_log(max_bytes=3000)
+            disk_manager.create_page("Registro", "".join(f"- Línea {i}\n" for i in range(1000)))
+            for i in range(40):
+                disk_manager.update_block_in_page("Registro", f"Línea {i}", f"Revisada {i}")
+            log_path = graph / ".logseq-agent" / "undo.log"
+            compacted = log_path.stat().st_size <= 3000
+            with open(log_path, "ab") as file:
+                file.write(b'0000 {"group": 99')
+            reloaded = LogseqManager(str(graph))
+            reloaded.enable_undo_log(max_bytes=3000)
+            undone = reloaded.undo(2)
+            content = reloaded.read_page_content("Registro")
+            if compacted and len(undone) == 2 and "Revisada 37" in content and "Revisada 38" not in content \
+                    and "- Línea 39" in content:
+                undo_tests_passed += 1
+                print(f"   ✅ ÉXITO: Registro compactado ({log_path.stat().st_size} bytes) y recargado")
+            else:
+                print(f"   ❌ FALLO: {compacted}, {undone}")
+    
+        # === PRUEBA 4: Los grupos son de cada hilo ===
+        print(f"📝 Prueba 4: Escribir desde otro hilo mientras un comando tiene su grupo abierto...")
+        thread_manager = _memory_manager("deshacer-hilos")
+        thread_manager.enable_undo_log()
+        thread_manager.create_page("Compras", "- TODO Leche")
+        with thread_manager.undo_group("apunta pan y huevos"):
+            thread_manager.append_to_page("Compras", "TODO Pan")
+            writer = threading.Thread(target=thread_manager.append_to_page, args=("Notas", "Desde otro hilo"))
+            writer.start()
+            writer.join()
+            thread_manager.append_to_page("Compras", "TODO Huevos")
+        # La escritura del otro hilo es una operación aparte: deshacerla deja el comando entero
+        undone_other = thread_manager.undo()
+        compras_after_other = thread_manager.read_page_content("Compras")
+        undone_command = thread_manager.undo()
+        if undone_other == ["Crear pages/Notas.md"] and compras_after_other == "- TODO Leche\n- TODO Pan\n- TODO Huevos" \
+                and undone_command == ["apunta pan y huevos"] and thread_manager.read_page_content("Compras") == "- TODO Leche":
+            undo_tests_passed += 1
+            print(f"   ✅ ÉXITO: La escritura del otro hilo y el comando se deshacen por separado")
+        else:
+            print(f"   ❌ FALLO: {undone_other}, {compras_after_other!r}, {undone_command}")
+    
+    except Exception as e:
+        print(f"   ❌ ERROR durante las pruebas de deshacer: {e}")
+    
+    print(f"\n=== RESUMEN DE PRUEBAS DE DESHACER ===")
+    print(f"🎯 Deshacer: {undo_tests_passed}/{total_undo_tests} pasaron")
+    
+    return undo_tests_passed, total_undo_tests
+
+
+def run_change_feed_tests(manager):
+    """
+    Ejecuta pruebas del flujo de cambios: eventos de las escrituras del gestor para
+    un suscriptor síncrono, un iterador asíncrono con cola acotada que cuenta los
+    descartes, y la detección de cambios externos sin repetir las escrituras propias.
+    Usa un grafo en memoria.
+    """
+    import asyncio
+    
+    print("\n=== Pruebas del flujo de cambios ===")
+    
+    feed_tests_passed = 0
+    total_feed_tests = 3  # Total de pruebas del flujo de cambios
+    
+    try:
+        feed_manager = _memory_manager("cambios")
+        storage = feed_manager.storage
+        graph_path = feed_manager.graph_path
+        feed_manager.create_page("Tareas", "- TODO Leche\n- TODO Pan")
+        
+        # === PRUEBA 1: Suscriptor síncrono ===
+        print(f"📝 Prueba 1: Recibir los eventos de añadir, editar, renombrar y eliminar...")
+        received = []
+        cancel = feed_manager.subscribe(received.append)
+        feed_manager.append_to_page("Tareas", "TODO Huevos")
+        feed_manager.update_block_in_page("Tareas", "TODO Pan", "DONE Pan")
+        feed_manager.rename_page("Tareas", "Compras")
+        feed_manager.delete_block_from_page("Compras", "TODO Leche")
+        cancel()
+        feed_manager.append_to_page("Compras", "TODO Sal")
+        summary = [(event.operation, event.title, event.blocks) for event in received]
+        expected = [
+            ("append", "Tareas", ("TODO Huevos",)),
+            ("modify", "Tareas", ("TODO Pan", "DONE Pan")),
+            ("delete", "Tareas", ()),
+            ("rename", "Compras", ()),
+            ("modify", "Compras", ("TODO Leche",)),
+        ]
+        if summary == expected and received[3].previous == "Tareas" \
+                and all(event.mtime_ns for event in received if event.operation != "delete"):
+            feed_tests_passed += 1
+            print(f"   ✅ ÉXITO: {len(received)} eventos con su operación y sus bloques")
+        else:
+            print(f"   ❌ FALLO: {summary}")
+        
+        # === PRUEBA 2: Iterador asíncrono con cola acotada ===
+        print(f"📝 Prueba 2: Consumir eventos con async for y descartar los que no caben...")
+        stream = feed_manager.change_events(maxsize=3, overflow="drop")
+        for i in range(5):
+            feed_manager.append_to_page("Compras", f"Nota {i}")
+        stream.close()
+        
+        async def consume():
+            return [event.blocks async for event in stream]
+        
+        consumed = asyncio.run(consume())
+        
+        async def produce_and_consume():
+            live = feed_manager.change_events(maxsize=2)
+            writer = asyncio.get_running_loop().run_in_executor(
+                None, lambda: [feed_manager.append_to_page("Compras", f"Tarde {i}") for i in range(4)]
+            )
+            blocks = [(await live.__anext__()).blocks for _ in range(4)]
+            await writer
+            live.close()
+            return blocks, live.dropped
+        
+        live_blocks, live_dropped = asyncio.run(produce_and_consume())
+        if consumed == [("Nota 2",), ("Nota 3",), ("Nota 4",)] and stream.dropped == 2 \
+                and live_blocks == [(f"Tarde {i}",) for i in range(4)] and live_dropped == 0:
+            feed_tests_passed += 1
+            print(f"   ✅ ÉXITO: Orden conservado, {stream.dropped} descartes sin contrapresión y ninguno con ella")
+        else:
+            print(f"   ❌ FALLO: {consumed}, {stream.dropped}, {live_blocks}, {live_dropped}")
+        
+        # === PRUEBA 3: Cambios externos ===
+        print(f"📝 Prueba 3: Detectar cambios de otros procesos sin repetir los propios...")
+        received = []
+        feed_manager.subscribe(received.append)
+        watcher = feed_manager.watch_external_changes(interval=None)
+        feed_manager.append_to_page("Compras", "TODO Aceite")
+        own_changes = watcher.poll()
+        storage.write_text(graph_path / "pages" / "Compras.md", "- Editado en Logseq")
+        storage.write_text(graph_path / "journals" / "2025_01_15.md", "- Nota del móvil")
+        storage.delete(graph_path / "pages" / "Compras.md")
+        external = watcher.poll()
+        summary = sorted((event.operation, event.title, event.external) for event in received)
+        if own_changes == 0 and external == 2 and summary == [
+            ("append", "Compras", False),
+            ("create", "2025_01_15", True),
+            ("delete", "Compras", True),
+        ]:
+            feed_tests_passed += 1
+            print(f"   ✅ ÉXITO: {external} cambios externos detectados; las escrituras propias no se repiten")
+        else:
+            print(f"   ❌ FALLO: {own_changes}, {external}, {summary}")
+    
+    except Exception as e:
+        print(f"   ❌ ERROR durante las pruebas del flujo de cambios: {e}")
+    
+    print(f"\n=== RESUMEN DE PRUEBAS DEL FLUJO DE CAMBIOS ===")
+    print(f"🎯 Pruebas del flujo de cambios: {feed_tests_passed}/{total_feed_tests} pasaron")
+    
+    return feed_tests_passed, total_feed_tests
+
+
+def run_metrics_tests(manager):
+    """
+    Ejecuta pruebas de las métricas: formato de texto de Prometheus de contadores e
+    histogramas, métricas anotadas por el gestor (latencias, bytes escritos, archivos
+    leídos por búsqueda, aciertos de caché) y exportación por HTTP local y a archivo.
+    Usa un grafo en memoria y un directorio temporal para el volcado.
+    """
+    import urllib.error
+    import urllib.request
+    from src.metrics import MetricsRegistry
+    
+    print("\n=== Pruebas de métricas ===")
+    
+    metrics_tests_passed = 0
+    total_metrics_tests = 3  # Total de pruebas de métricas
+    
+    try:
+        # === PRUEBA 1: Formato de Prometheus ===
+        print(f"📝 Prueba 1: Exportar contadores e histogramas en formato Prometheus...")
+        registry = MetricsRegistry()
+        requests_counter = registry.counter("prueba_total", "Peticiones", ["ruta"])
+        requests_counter.inc('/a"b')
+        requests_counter.inc('/a"b', amount=2)
+        latency = registry.histogram("prueba_segundos", "Latencia", buckets=(0.1, 1.0))
+        for value in (0.05, 0.5, 0.5, 3.0):
+            latency.observe(value)
+        try:
+            requests_counter.inc()
+            rejected = False
+        except ValueError:
+            rejected = True
+        text = registry.render()
+        expected_lines = [
+            '# TYPE prueba_total counter',
+            'prueba_total{ruta="/a\\"b"} 3',
+            '# TYPE prueba_segundos histogram',
+            'prueba_segundos_bucket{le="0.1"} 1',
+            'prueba_segundos_bucket{le="1"} 3',
+            'prueba_segundos_bucket{le="+Inf"} 4',
+            'prueba_segundos_sum 4.05',
+            'prueba_segundos_count 4',
+        ]
+        missing = [line for line in expected_lines if line not in text.splitlines()]
+        if not missing and rejected and registry.counter("prueba_total", "Peticiones", ["ruta"]) is requests_counter:
+            metrics_tests_passed += 1
+            print(f"   ✅ ÉXITO: Intervalos acumulados, etiquetas escapadas y etiquetas incorrectas rechazadas")
+        else:
+            print(f"   ❌ FALLO: Faltan {missing}; rechazada: {rejected}")
+        
+        # === PRUEBA 2: Métricas del gestor ===
+        print(f"📝 Prueba 2: Anotar latencias, bytes escritos, archivos leídos y cachés del gestor...")
+        metrics_manager = _memory_manager("metricas")
+        metrics_manager.create_page("Café", "- Arábica")
+        metrics_manager.append_to_page("Café", "Molido fino")
+        metrics_manager.create_page("Té", "- Verde")
+        metrics_manager.search_in_pages("verde")
+        metrics_manager.search_in_pages("arábica")
+        registry = metrics_manager.metrics
+        written = registry["logseq_write_bytes_total"]
+        scanned = registry["logseq_search_files_scanned"]
+        calls = registry["logseq_manager_call_seconds"]
+        caches = registry["logseq_cache_lookups_total"]
+        expected_bytes = len("- Arábica".encode('utf-8')) + len("\n- Molido fino".encode('utf-8')) + len("- Verde")
+        total_bytes = written.value("page", "create") + written.value("page", "append")
+        if total_bytes == expected_bytes and scanned.count("scan") == 2 and scanned.sum("scan") == 4 \
+                and calls.count("search_in_pages") == 2 and calls.count("search_graph") == 2 \
+                and calls.count("create_page") == 2 and caches.value("title_registry", "hit") > 0:
+            metrics_tests_passed += 1
+            print(f"   ✅ ÉXITO: {int(total_bytes)} bytes escritos y 2 archivos leídos por búsqueda")
+        else:
+            print(f"   ❌ FALLO: {total_bytes} != {expected_bytes}, {scanned.count('scan')}, {scanned.sum('scan')}")
+        
+        # === PRUEBA 3: Exportación por HTTP y a archivo ===
+        print(f"📝 Prueba 3: Servir las métricas por HTTP y volcarlas a un archivo...")
+        server = registry.serve(0)
+        try:
+            url = f"http://127.0.0.1:{server.server_address[1]}"
+            with urllib.request.urlopen(f"{url}/metrics") as response:
+                body = response.read().decode('utf-8')
+                content_type = response.headers["Content-Type"]
+            try:
+                urllib.request.urlopen(f"{url}/otra")
+                not_found = False
+            except urllib.error.HTTPError as e:
+                not_found = e.code == 404
+        finally:
+            server.shutdown()
+            server.server_close()
+        with tempfile.TemporaryDirectory() as temp_dir:
+            dump_path = pathlib.Path(temp_dir) / "logseq.prom"
+            registry.write_file(dump_path)
+            dumped = dump_path.read_text(encoding='utf-8')
+        if body == registry.render() == dumped and "version=0.0.4" in content_type and not_found \
+                and "logseq_write_bytes_total{" in body:
+            metrics_tests_passed += 1
+            print(f"   ✅ ÉXITO: Mismo contenido por HTTP ({len(body)} bytes) y en el archivo")
+        else:
+            print(f"   ❌ FALLO: HTTP y archivo no coinciden ({content_type}, 404: {not_found})")
+    
+    except Exception as e:
+        print(f"   ❌ ERROR durante las pruebas de métricas: {e}")
+    
+    print(f"\n=== RESUMEN DE PRUEBAS DE MÉTRICAS ===")
+    print(f"🎯 Pruebas de métricas: {metrics_tests_passed}/{total_metrics_tests} pasaron")
+    
+    return metrics_tests_passed, total_metrics_tests
+
+
+def run_model_replay_tests(manager):
+    """
+    Ejecuta pruebas de grabación y reproducción del modelo: graba una sesión de
+    comandos pasándolos por process_command con un FunctionModel de pega envuelto en
+    RecordingModel, y la reproduce con ReplayModel sobre otro grafo en memoria
+    comprobando que el gestor acaba igual sin volver a llamar al modelo. La sesión
+    incluye una pregunta (AnswerFromNotes), cuya segunda llamada al modelo no debe
+    aparecer entre los comandos grabados.
+    """
+    os.environ.setdefault('LOGFIRE_IGNORE_NO_CONFIG', '1')
+    import agent
+    from pydantic_ai.messages import ModelResponse, TextPart, ToolCallPart
+    from pydantic_ai.models.function import FunctionModel
+    from src.model_recording import (
+        RecordingModel, ReplayMismatchError, ReplayModel, last_user_prompt, load_recordings, recorded_prompts,
+    )
+    
+    print("\n=== Pruebas de grabación y reproducción del modelo ===")
+    
+    replay_tests_passed = 0
+    total_replay_tests = 2  # Total de pruebas de grabación y reproducción
+    
+    # Respuesta del modelo de pega para cada comando de la sesión
+    answers = {
+        "apunta leche en la compra": ("CreateTask", {"page_title": "Compras", "content": "Leche"}),
+        "apunta pan en la compra": ("CreateTask", {"page_title": "Compras", "content": "Pan"}),
+        "ya compré la leche": ("MarkTaskAsDone", {"page_title": "Compras", "task_content": "Leche"}),
+        "¿qué falta en [[Compras]]?": ("AnswerFromNotes", {"question": "¿Qué falta en [[Compras]]?"}),
+        "y el pan también": ("MarkTaskAsDone", {"page_title": "Compras", "task_content": "Pan"}),
+    }
+    session = [*answers, "deshacer"]
+    model_calls = []
+    
+    def stub_model(messages, info):
+        prompt = last_user_prompt(messages)
+        model_calls.append(prompt)
+        if prompt.startswith("Notas:"):
+            # Segunda llamada de AnswerFromNotes: responder con texto a partir de las notas
+            return ModelResponse(parts=[TextPart("Falta el pan")])
+        tool, args = answers[prompt]
+        return ModelResponse(parts=[ToolCallPart(f"final_result_{tool}", {"tool": tool, **args})])
+    
+    def run_session(model, graph_name):
+        session_manager = _memory_manager(graph_name)
+        session_manager.enable_undo_log()
+        ai_agent = agent.create_logseq_agent(None, model=model)
+        output = []
+        for prompt in session:
+            agent.process_command(prompt, ai_agent, session_manager, confirm=lambda description: True, emit=output.append)
+        return session_manager, ai_agent, output
+    
+    try:
+        with tempfile.TemporaryDirectory() as temp_dir:
+            recording_path = pathlib.Path(temp_dir) / "sesion.jsonl"
+            
+            # === PRUEBA 1: Grabar la sesión ===
+            print(f"📝 Prueba 1: Grabar una sesión de comandos con un modelo de pega...")
+            recorded_manager, _, recorded_output = run_session(
+                RecordingModel(FunctionModel(stub_model), recording_path), "grabacion"
+            )
+            recorded_content = recorded_manager.read_page_content("Compras")
+            recordings = load_recordings(recording_path)
+            prompts = recorded_prompts(recordings)
+            if recorded_content == "- DONE Leche\n- TODO Pan" and "💬 Falta el pan" in recorded_output \
+                    and len(recordings) == len(model_calls) == len(answers) + 1 and prompts == list(answers):
+                replay_tests_passed += 1
+                print(f"   ✅ ÉXITO: {len(recordings)} llamadas grabadas como {len(prompts)} comandos; "
+                      f"'deshacer' no llamó al modelo")
+            else:
+                print(f"   ❌ FALLO: {recorded_content!r}, {prompts}, {len(recordings)} llamadas")
+            
+            # === PRUEBA 2: Reproducir la sesión en otro grafo ===
+            print(f"📝 Prueba 2: Reproducir la sesión grabada sobre un grafo nuevo...")
+            model_calls.clear()
+            replayed_manager, replay_agent, replayed_output = run_session(
+                ReplayModel.from_file(recording_path), "reproduccion"
+            )
+            try:
+                agent.process_command("apunta café en la compra", replay_agent, replayed_manager,
+                                      confirm=lambda description: True, emit=lambda message: None)
+                mismatch = False
+            except ReplayMismatchError:
+                mismatch = True
+            if replayed_manager.read_page_content("Compras") == recorded_content \
+                    and replayed_output == recorded_output and not model_calls and mismatch:
+                replay_tests_passed += 1
+                print(f"   ✅ ÉXITO: Mismo contenido y mismos mensajes sin llamar al modelo; un comando nuevo se rechaza")
+            else:
+                print(f"   ❌ FALLO: {replayed_manager.read_page_content('Compras')!r}, {model_calls}, {mismatch}")
+    
+    except Exception as e:
+        print(f"   ❌ ERROR durante las pruebas de grabación y reproducción: {e}")
+    
+    print(f"\n=== RESUMEN DE PRUEBAS DE GRABACIÓN Y REPRODUCCIÓN ===")
+    print(f"🎯 Grabación y reproducción: {replay_tests_passed}/{total_replay_tests} pasaron")
+    
+    return replay_tests_passed, total_replay_tests
+
+
+def run_daemon_tests(manager):
+    """
+    Ejecuta pruebas del modo demonio: limpieza de un socket abandonado y permisos
+    0600, el protocolo de líneas JSON (comando, confirmación y fin) y el cliente
+    ligero DaemonClient, con un manejador de pega en lugar del agente.
+    """
+    import json
+    import socket
+    import stat
+    from src.daemon import AgentDaemon, DaemonClient
+    
+    print("\n=== Pruebas del modo demonio ===")
+    
+    daemon_tests_passed = 0
+    total_daemon_tests = 3  # Total de pruebas del modo demonio
+    
+    def fake_handler(prompt, confirm, emit):
+        if prompt == "falla":
+            raise ValueError("comando imposible")
+        emit(f"Procesando '{prompt}'")
+        emit("Hecho" if confirm(f"Añadir '{prompt}'") else "Cancelado")
+    
+    try:
+        with tempfile.TemporaryDirectory() as temp_dir:
+            socket_path = os.path.join(temp_dir, "agente.sock")
+            
+            # === PRUEBA 1: Socket abandonado y permisos ===
+            print(f"📝 Prueba 1: Arrancar sobre un socket abandonado y con permisos 0600...")
+            stale = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            stale.bind(socket_path)
+            stale.close()
+            daemon = AgentDaemon(socket_path, fake_handler)
+            thread = threading.Thread(target=daemon.serve_forever, daemon=True)
+            thread.start()
+            try:
+                mode = stat.S_IMODE(os.stat(socket_path).st_mode)
+                try:
+                    AgentDaemon(socket_path, fake_handler)
+                    rejected = False
+                except RuntimeError:
+                    rejected = True
+                if mode == 0o600 and rejected:
+                    daemon_tests_passed += 1
+                    print(f"   ✅ ÉXITO: Socket abandonado reemplazado; un segundo demonio se rechaza")
+                else:
+                    print(f"   ❌ FALLO: Permisos {oct(mode)}, segundo demonio rechazado: {rejected}")
+                
+                # === PRUEBA 2: Protocolo de líneas JSON ===
+                print(f"📝 Prueba 2: Intercambiar comando, confirmación y fin en líneas JSON...")
+                with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as raw:
+                    raw.connect(socket_path)
+                    rfile = raw.makefile('rb')
+                    wfile = raw.makefile('wb')
+                    
+                    def send(message):
+                        wfile.write((json.dumps(message) + "\n").encode('utf-8'))
+                        wfile.flush()
+                    
+                    def receive():
+                        return json.loads(rfile.readline())
+                    
+                    send({"type": "ping"})
+                    messages = [receive()]
+                    send({"type": "command", "prompt": "Leche"})
+                    messages += [receive(), receive()]
+                    send({"type": "confirm", "answer": True})
+                    messages += [receive(), receive()]
+                    rfile.close()
+                    wfile.close()
+                expected = [
+                    {"type": "pong"},
+                    {"type": "output", "text": "Procesando 'Leche'"},
+                    {"type": "confirm", "description": "Añadir 'Leche'"},
+                    {"type": "output", "text": "Hecho"},
+                    {"type": "done"},
+                ]
+                if messages == expected:
+                    daemon_tests_passed += 1
+                    print(f"   ✅ ÉXITO: {len(messages)} mensajes en el orden del protocolo")
+                else:
+                    print(f"   ❌ FALLO: {messages}")
+                
+                # === PRUEBA 3: Cliente ligero ===
+                print(f"📝 Prueba 3: Enviar comandos con DaemonClient...")
+                client = DaemonClient(socket_path)
+                output, questions = [], []
+                try:
+                    client.execute("Pan", confirm=lambda description: questions.append(description) or False, emit=output.append)
+                    client.execute("falla", confirm=lambda description: True, emit=output.append)
+                    client.execute("Café", confirm=lambda description: questions.append(description) or True, emit=output.append)
+                finally:
+                    client.close()
+                if output == ["Procesando 'Pan'", "Cancelado", "❌ Error al procesar el comando: comando imposible",
+                              "Procesando 'Café'", "Hecho"] and questions == ["Añadir 'Pan'", "Añadir 'Café'"]:
+                    daemon_tests_passed += 1
+                    print(f"   ✅ ÉXITO: Respuestas de confirmación respetadas y el error no corta la conexión")
+                else:
+                    print(f"   ❌ FALLO: {output}, {questions}")
+            finally:
+                daemon.shutdown()
+                daemon.server_close()
+                thread.join()
+    
+    except Exception as e:
+        print(f"   ❌ ERROR durante las pruebas del modo demonio: {e}")
+    
+    print(f"\n=== RESUMEN DE PRUEBAS DEL MODO DEMONIO ===")
+    print(f"🎯 Modo demonio: {daemon_tests_passed}/{total_daemon_tests} pasaron")
+    
+    return daemon_tests_passed, total_daemon_tests
+
+
 def main():
     """
     Script de prueba para verificar las funcionalidades de lectura y escritura del LogseqManager.
@@ -1178,9 +3235,78 @@ def main():
         # === PRUEBAS DE ELIMINACIÓN EN JOURNALS ===
         journal_delete_passed, journal_delete_total = run_delete_journal_tests(manager)
         
+        # === PRUEBAS DE LOTES ===
+        batch_passed, batch_total = run_batch_tests(manager)
+        
+        # === PRUEBAS DE CONCURRENCIA ===
+        concurrency_passed, concurrency_total = run_concurrency_tests(manager)
+        
+        # === PRUEBAS DEL BUFFER DE ESCRITURA ===
+        buffer_passed, buffer_total = run_journal_buffer_tests(manager)
+        
+        # === PRUEBAS DE ALMACENAMIENTO ===
+        storage_passed, storage_total = run_storage_tests(manager)
+        
+        # === PRUEBAS DEL ÍNDICE SQLITE ===
+        sqlite_passed, sqlite_total = run_sqlite_index_tests(manager)
+        
+        # === PRUEBAS DE BÚSQUEDA SEMÁNTICA ===
+        semantic_passed, semantic_total = run_semantic_search_tests(manager)
+        
+        # === PRUEBAS DE ENSAMBLADO DE CONTEXTO ===
+        context_passed, context_total = run_context_tests(manager)
+        
+        # === PRUEBAS DEL ÍNDICE DE TRIGRAMAS ===
+        trigram_passed, trigram_total = run_trigram_tests(manager)
+        
+        # === PRUEBAS DE BÚSQUEDA BOOLEANA ===
+        boolean_passed, boolean_total = run_boolean_search_tests(manager)
+        
+        # === PRUEBAS DEL REGISTRO DE TÍTULOS ===
+        titles_passed, titles_total = run_title_registry_tests(manager)
+        
+        # === PRUEBAS DE ESPACIOS DE NOMBRES ===
+        namespace_passed, namespace_total = run_namespace_tests(manager)
+        
+        # === PRUEBAS DE INSTANTÁNEAS ===
+        snapshot_passed, snapshot_total = run_snapshot_tests(manager)
+        
+        # === PRUEBAS DE LECTURA POR TRAMOS ===
+        block_range_passed, block_range_total = run_block_range_tests(manager)
+        
+        # === PRUEBAS DE BÚSQUEDA EN DIARIOS ===
+        journal_search_passed, journal_search_total = run_journal_search_tests(manager)
+        
+        # === PRUEBAS DE IMPORTACIÓN MASIVA ===
+        bulk_import_passed, bulk_import_total = run_bulk_import_tests(manager)
+        
+        # === PRUEBAS DE RENOMBRADO DE PÁGINAS ===
+        rename_passed, rename_total = run_rename_tests(manager)
+        
+        # === PRUEBAS DE BLOQUES ANIDADOS ===
+        nested_passed, nested_total = run_nested_block_tests(manager)
+        
+        # === PRUEBAS DE IDENTIFICADORES DE BLOQUE ===
+        block_id_passed, block_id_total = run_block_id_tests(manager)
+        
+        # === PRUEBAS DE DESHACER ===
+        undo_passed, undo_total = run_undo_tests(manager)
+        
+        # === PRUEBAS DEL FLUJO DE CAMBIOS ===
+        feed_passed, feed_total = run_change_feed_tests(manager)
+        
+        # === PRUEBAS DE MÉTRICAS ===
+        metrics_passed, metrics_total = run_metrics_tests(manager)
+        
+        # === PRUEBAS DE GRABACIÓN Y REPRODUCCIÓN DEL MODELO ===
+        replay_passed, replay_total = run_model_replay_tests(manager)
+        
+        # === PRUEBAS DEL MODO DEMONIO ===
+        daemon_passed, daemon_total = run_daemon_tests(manager)
+        
         # === RESUMEN FINAL ===
-        total_all_tests = total_tests + write_total + block_total + update_total + daily_total + delete_total + journal_delete_total
-        total_all_passed = passed_tests + write_passed + block_passed + update_passed + daily_passed + delete_passed + journal_delete_passed
+        total_all_tests = total_tests + write_total + block_total + update_total + daily_total + delete_total + journal_delete_total + batch_total + concurrency_total + buffer_total + storage_total + sqlite_total + semantic_total + context_total + trigram_total + boolean_total + titles_total + namespace_total + snapshot_total + block_range_total + journal_search_total + bulk_import_total + rename_total + nested_total + block_id_total + undo_total + feed_total + metrics_total + replay_total + daemon_total
+        total_all_passed = passed_tests + write_passed + block_passed + update_passed + daily_passed + delete_passed + journal_delete_passed + batch_passed + concurrency_passed + buffer_passed + storage_passed + sqlite_passed + semantic_passed + context_passed + trigram_passed + boolean_passed + titles_passed + namespace_passed + snapshot_passed + block_range_passed + journal_search_passed + bulk_import_passed + rename_passed + nested_passed + block_id_passed + undo_passed + feed_passed + metrics_passed + replay_passed + daemon_passed
         
         print(f"\n{'='*50}")
         print(f"🎯 RESUMEN FINAL DE TODAS LAS PRUEBAS")
@@ -1192,6 +3318,29 @@ def main():
         print(f"📅 Pruebas de diario diario: {daily_passed}/{daily_total}")
         print(f"🗑️ Pruebas de eliminación: {delete_passed}/{delete_total}")
         print(f"📅 Pruebas de eliminación en journals: {journal_delete_passed}/{journal_delete_total}")
+        print(f"📦 Pruebas de lotes: {batch_passed}/{batch_total}")
+        print(f"🔒 Pruebas de concurrencia: {concurrency_passed}/{concurrency_total}")
+        print(f"🧺 Pruebas del buffer de escritura: {buffer_passed}/{buffer_total}")
+        print(f"💾 Pruebas de almacenamiento: {storage_passed}/{storage_total}")
+        print(f"🗄️ Pruebas del índice SQLite: {sqlite_passed}/{sqlite_total}")
+        print(f"🧠 Pruebas de búsqueda semántica: {semantic_passed}/{semantic_total}")
+        print(f"📚 Pruebas de ensamblado de contexto: {context_passed}/{context_total}")
+        print(f"🔤 Pruebas del índice de trigramas: {trigram_passed}/{trigram_total}")
+        print(f"🔣 Pruebas de búsqueda booleana: {boolean_passed}/{boolean_total}")
+        print(f"🏷️ Pruebas del registro de títulos: {titles_passed}/{titles_total}")
+        print(f"📂 Pruebas de espacios de nombres: {namespace_passed}/{namespace_total}")
+        print(f"💾 Pruebas de instantáneas: {snapshot_passed}/{snapshot_total}")
+        print(f"📑 Pruebas de lectura por tramos: {block_range_passed}/{block_range_total}")
+        print(f"📅 Pruebas de búsqueda en diarios: {journal_search_passed}/{journal_search_total}")
+        print(f"📦 Pruebas de importación masiva: {bulk_import_passed}/{bulk_import_total}")
+        print(f"✏️ Pruebas de renombrado: {rename_passed}/{rename_total}")
+        print(f"🌳 Pruebas de bloques anidados: {nested_passed}/{nested_total}")
+        print(f"🆔 Pruebas de identificadores de bloque: {block_id_passed}/{block_id_total}")
+        print(f"↩️ Pruebas de deshacer: {undo_passed}/{undo_total}")
+        print(f"📡 Pruebas del flujo de cambios: {feed_passed}/{feed_total}")
+        print(f"📈 Pruebas de métricas: {metrics_passed}/{metrics_total}")
+        print(f"🎞️ Pruebas de grabación y reproducción: {replay_passed}/{replay_total}")
+        print(f"🛰️ Pruebas del modo demonio: {daemon_passed}/{daemon_total}")
         print(f"🎯 TOTAL: {total_all_passed}/{total_all_tests} pruebas pasaron")
         
         if total_all_passed == total_all_tests: